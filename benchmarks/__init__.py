@@ -0,0 +1,8 @@
+"""
+Prompt-Scribe 離線基準測試
+
+在本地以 SQLite 版 PostgREST 替身與 OpenAI 替身啟動 API，
+以固定的工作負載測量各端點的吞吐量與延遲分佈。
+
+    python -m benchmarks --requests 500 --output benchmarks/results/latest.json
+"""
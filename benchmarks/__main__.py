@@ -0,0 +1,71 @@
+"""
+命令列入口
+
+    python -m benchmarks                                   # 預設工作負載
+    python -m benchmarks --save-baseline benchmarks/baselines/local.json
+    python -m benchmarks --baseline benchmarks/baselines/local.json --fail-on-regression
+"""
+import argparse
+import logging
+import sys
+
+from .harness import WORKLOAD, BenchmarkConfig, compare_results, format_report, load_results, run_benchmark, save_results
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Prompt-Scribe offline benchmark")
+    parser.add_argument("--requests", type=int, default=defaults.requests, help="量測的請求數")
+    parser.add_argument("--warmup", type=int, default=defaults.warmup, help="暖機請求數（不計入結果）")
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--tag-count", type=int, default=defaults.tag_count, help="產生的 tags_final 筆數")
+    parser.add_argument("--tags-csv", default=None, help="改用 tags_final 的 CSV 匯出檔")
+    parser.add_argument("--openai-latency-ms", type=float, default=defaults.openai_latency_ms)
+    parser.add_argument("--openai-jitter-ms", type=float, default=defaults.openai_jitter_ms)
+    parser.add_argument("--db-latency-ms", type=float, default=defaults.db_latency_ms)
+    parser.add_argument(
+        "--endpoints", nargs="+", choices=[w.name for w in WORKLOAD], default=None,
+        help="只執行部分端點（權重不變）",
+    )
+    parser.add_argument("--output", default=None, help="結果 JSON 路徑")
+    parser.add_argument("--save-baseline", default=None, help="將結果另存為基準線")
+    parser.add_argument("--baseline", default=None, help="與此基準線比較")
+    parser.add_argument("--threshold", type=float, default=0.2, help="退步門檻（比例，預設 0.2 = 20%%）")
+    parser.add_argument("--fail-on-regression", action="store_true", help="有退步時以非零狀態結束")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    config = BenchmarkConfig(
+        requests=args.requests,
+        warmup=args.warmup,
+        concurrency=args.concurrency,
+        seed=args.seed,
+        tag_count=args.tag_count,
+        tags_csv=args.tags_csv,
+        openai_latency_ms=args.openai_latency_ms,
+        openai_jitter_ms=args.openai_jitter_ms,
+        db_latency_ms=args.db_latency_ms,
+        endpoints=args.endpoints,
+    )
+    results = run_benchmark(config)
+
+    regressions = None
+    if args.baseline:
+        regressions = compare_results(load_results(args.baseline), results, args.threshold)
+        results["regressions"] = regressions
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            save_results(results, path)
+
+    print(format_report(results, regressions))
+    return 1 if args.fail_on_regression and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
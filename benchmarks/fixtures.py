@@ -0,0 +1,201 @@
+"""
+Benchmark Fixtures
+離線基準測試的本地資料 - 以固定亂數種子產生 tags_final 與 inspire_sessions 的 SQLite 資料庫
+
+1. 先放入一組常用的真實標籤（推薦 / 驗證端點的查詢需要命中）
+2. 其餘以「形容詞_名詞」組合補足到指定數量，post_count 呈長尾（Zipf）分佈
+3. 也可以從 CSV 匯出檔（與 tags_final 欄位相同）載入
+"""
+from typing import Dict, Iterable, List, Optional
+import csv
+import random
+import sqlite3
+
+TAGS_FINAL_COLUMNS = {
+    "id": "TEXT PRIMARY KEY",
+    "name": "TEXT NOT NULL UNIQUE",
+    "danbooru_cat": "INTEGER NOT NULL DEFAULT 0",
+    "post_count": "INTEGER NOT NULL DEFAULT 0",
+    "main_category": "TEXT",
+    "sub_category": "TEXT",
+    "confidence": "REAL",
+    "classification_source": "TEXT",
+    "nsfw_level": "TEXT NOT NULL DEFAULT 'all-ages'",
+    "content_level": "INTEGER",
+    "content_rating_version": "TEXT",
+    "created_at": "TEXT",
+    "updated_at": "TEXT",
+}
+
+INSPIRE_SESSIONS_COLUMNS = {
+    "session_id": "TEXT PRIMARY KEY",
+    "user_id": "TEXT",
+    "user_access_level": "TEXT DEFAULT 'all-ages'",
+    "current_phase": "TEXT NOT NULL DEFAULT 'understanding'",
+    "extracted_intent": "JSON",
+    "generated_directions": "JSON",
+    "selected_direction_index": "INTEGER",
+    "final_output": "JSON",
+    "total_cost": "REAL DEFAULT 0",
+    "total_tokens": "INTEGER DEFAULT 0",
+    "total_tool_calls": "INTEGER NOT NULL DEFAULT 0",
+    "tool_call_count": "JSON DEFAULT '{}'",
+    "abort_reason": "TEXT",
+    "quality_score": "INTEGER",
+    "user_satisfaction": "INTEGER",
+    "user_feedback": "TEXT",
+    "feedback_text": "TEXT",
+    "would_use_again": "BOOLEAN",
+    "feedback_at": "TEXT",
+    "processing_time_ms": "REAL",
+    "last_response_id": "TEXT",
+    "last_user_message": "TEXT",
+    "last_agent_message": "TEXT",
+    "turn_count": "INTEGER DEFAULT 0",
+    "created_at": "TEXT",
+    "updated_at": "TEXT",
+    "completed_at": "TEXT",
+}
+
+API_USAGE_LOGS_COLUMNS = {
+    "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+    "endpoint": "TEXT NOT NULL",
+    "method": "TEXT",
+    "query_params": "JSON",
+    "request_body": "JSON",
+    "response_summary": "JSON",
+    "response_time_ms": "INTEGER",
+    "status_code": "INTEGER",
+    "cache_hit": "BOOLEAN",
+    "error_message": "TEXT",
+    "timestamp": "TEXT",
+}
+
+TABLES = {
+    "tags_final": TAGS_FINAL_COLUMNS,
+    "inspire_sessions": INSPIRE_SESSIONS_COLUMNS,
+    "api_usage_logs": API_USAGE_LOGS_COLUMNS,
+}
+
+# (名稱, danbooru_cat, main_category, post_count)
+SEED_TAGS = [
+    ("1girl", 0, "CHARACTER", 5200000),
+    ("solo", 0, "CHARACTER", 4300000),
+    ("long_hair", 0, "CHARACTER_RELATED", 3300000),
+    ("smile", 0, "ACTION_POSE", 2800000),
+    ("looking_at_viewer", 0, "COMPOSITION", 2500000),
+    ("short_hair", 0, "CHARACTER_RELATED", 2000000),
+    ("blue_eyes", 0, "CHARACTER_RELATED", 1600000),
+    ("school_uniform", 0, "CHARACTER_RELATED", 1200000),
+    ("2girls", 0, "CHARACTER", 900000),
+    ("outdoors", 0, "ENVIRONMENT", 800000),
+    ("night", 0, "ENVIRONMENT", 500000),
+    ("city", 0, "ENVIRONMENT", 300000),
+    ("cityscape", 0, "ENVIRONMENT", 150000),
+    ("cyberpunk", 0, "THEME_CONCEPT", 60000),
+    ("neon_lights", 0, "VISUAL_EFFECTS", 40000),
+    ("cherry_blossoms", 0, "ENVIRONMENT", 120000),
+    ("sky", 0, "ENVIRONMENT", 700000),
+    ("cat", 0, "OBJECTS", 200000),
+    ("cat_ears", 0, "CHARACTER_RELATED", 400000),
+    ("masterpiece", 5, "QUALITY", 1000000),
+    ("best_quality", 5, "QUALITY", 900000),
+    ("highres", 5, "TECHNICAL", 3000000),
+    ("watercolor_(medium)", 0, "ART_STYLE", 50000),
+    ("from_above", 0, "COMPOSITION", 250000),
+    ("rain", 0, "ENVIRONMENT", 180000),
+]
+
+ADJECTIVES = [
+    "red", "blue", "green", "black", "white", "long", "short", "small", "large", "dark",
+    "bright", "soft", "night", "summer", "winter", "floating", "broken", "glowing", "wet", "ancient",
+]
+NOUNS = [
+    "hair", "eyes", "dress", "skirt", "sky", "city", "forest", "sword", "flower", "ribbon",
+    "background", "light", "water", "window", "street", "cat", "bird", "moon", "sleeves", "hat",
+]
+CATEGORIES = [
+    "CHARACTER_RELATED", "OBJECTS", "ENVIRONMENT", "COMPOSITION", "VISUAL_EFFECTS",
+    "ART_STYLE", "ACTION_POSE", "THEME_CONCEPT",
+]
+
+FIXTURE_TIMESTAMP = "2025-01-01T00:00:00+00:00"
+
+
+def generate_tag_rows(count: int = 20000, seed: int = 42) -> List[Dict]:
+    """產生固定的 tags_final 資料列（相同 count / seed 結果相同）"""
+    rng = random.Random(seed)
+    rows = []
+    names = set()
+
+    def add(name, cat, category, post_count):
+        if name in names:
+            return
+        names.add(name)
+        rows.append({
+            "id": f"tag-{len(rows)}",
+            "name": name,
+            "danbooru_cat": cat,
+            "post_count": post_count,
+            "main_category": category,
+            "sub_category": None,
+            "confidence": 0.9,
+            "classification_source": "rule",
+            "nsfw_level": "all-ages",
+            "content_level": None,
+            "content_rating_version": None,
+            "created_at": FIXTURE_TIMESTAMP,
+            "updated_at": FIXTURE_TIMESTAMP,
+        })
+
+    for name, cat, category, post_count in SEED_TAGS[:count]:
+        add(name, cat, category, post_count)
+
+    rank = len(rows)
+    while len(rows) < count:
+        rank += 1
+        name = f"{rng.choice(ADJECTIVES)}_{rng.choice(NOUNS)}"
+        if name in names:
+            name = f"{name}_{rng.randrange(10 ** 6)}"
+        add(name, rng.choice((0, 0, 0, 3, 4)), rng.choice(CATEGORIES), max(int(2_000_000 / rank ** 1.1), 0))
+    return rows
+
+
+def load_tag_rows_csv(path: str) -> List[Dict]:
+    """從 CSV 匯出檔載入 tags_final（未知欄位忽略）"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = []
+        for i, row in enumerate(csv.DictReader(f)):
+            row = {k: (v if v != "" else None) for k, v in row.items() if k in TAGS_FINAL_COLUMNS}
+            row.setdefault("id", f"tag-{i}")
+            row["post_count"] = int(row.get("post_count") or 0)
+            row["danbooru_cat"] = int(row.get("danbooru_cat") or 0)
+            rows.append(row)
+        return rows
+
+
+def create_fixture_database(
+    tag_rows: Iterable[Dict],
+    path: str = ":memory:",
+) -> sqlite3.Connection:
+    """建立含 tags_final / inspire_sessions / api_usage_logs 的 SQLite 資料庫"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for table, columns in TABLES.items():
+        definition = ", ".join(f'"{name}" {spec}' for name, spec in columns.items())
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({definition})')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tags_keyset ON tags_final (post_count DESC, name)')
+
+    columns = list(TAGS_FINAL_COLUMNS)
+    placeholders = ", ".join("?" for _ in columns)
+    conn.executemany(
+        f'INSERT INTO tags_final ({", ".join(columns)}) VALUES ({placeholders})',
+        ([row.get(c) for c in columns] for row in tag_rows),
+    )
+    conn.commit()
+    return conn
+
+
+def build_fixture(count: int = 20000, seed: int = 42, csv_path: Optional[str] = None) -> sqlite3.Connection:
+    rows = load_tag_rows_csv(csv_path) if csv_path else generate_tag_rows(count, seed)
+    return create_fixture_database(rows)
@@ -0,0 +1,404 @@
+"""
+Offline Benchmark Harness
+在本地啟動 API + PostgREST / OpenAI 替身，以固定的工作負載測量吞吐量與延遲
+
+流程：
+1. 以固定種子建立 tags_final fixture（SQLite），啟動 PostgREST stub 與 OpenAI stub
+2. 將 SUPABASE_URL / OPENAI_BASE_URL 指向替身後載入 src.api.main，以 uvicorn 啟動
+3. 依權重與種子產生請求序列（每次執行相同），以 N 個並行 worker 送出
+4. 彙總各端點的 p50 / p95 / p99 與吞吐量，附上 /metrics/stages 的階段耗時
+5. 結果可存為 JSON 基準線，之後的執行與基準線比較，超過門檻即視為退步
+"""
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from .fixtures import build_fixture
+from .openai_stub import OpenAIStub
+from .postgrest_stub import PostgrestStub
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# PostgREST 只檢查格式（supabase-py 要求 JWT 形式）
+BENCHMARK_API_KEY = "eyJhbGciOiJub25lIn0.eyJyb2xlIjoic2VydmljZV9yb2xlIn0."
+
+SEARCH_QUERIES = ["girl", "hair", "city", "night", "blue", "cat", "sky", "dress", "light", "forest"]
+DESCRIPTIONS = [
+    "a lonely girl in cyberpunk city at night",
+    "cute cat girl with cat ears under cherry blossoms",
+    "watercolor landscape with rain and city lights",
+    "a girl with long hair smiling at the viewer",
+    "cyberpunk cityscape seen from above",
+]
+TAG_SETS = [
+    ["1girl", "solo", "long_hair", "smile"],
+    ["cyberpunk", "city", "night", "neon_lights"],
+    ["1girl", "2girls", "solo", "highres"],
+    ["cat_ears", "school_uniform", "blue_eyes", "unknown_tag_xyz"],
+]
+INSPIRE_MESSAGES = ["櫻花樹下的和服少女", "雨夜的賽博龐克城市", "溫柔寧靜的水彩風景"]
+
+
+@dataclass
+class WorkloadItem:
+    """工作負載中的一種請求"""
+    name: str
+    weight: int
+    path: str
+    body: Callable[[random.Random], Dict[str, Any]]
+    needs_session: bool = False
+
+
+WORKLOAD: List[WorkloadItem] = [
+    WorkloadItem("search", 30, "/api/v1/search", lambda rng: {"query": rng.choice(SEARCH_QUERIES), "limit": 20}),
+    WorkloadItem(
+        "recommend_tags", 30, "/api/llm/recommend-tags",
+        lambda rng: {"description": rng.choice(DESCRIPTIONS), "max_tags": 10},
+    ),
+    WorkloadItem("validate_prompt", 20, "/api/llm/validate-prompt", lambda rng: {"tags": rng.choice(TAG_SETS)}),
+    WorkloadItem(
+        "inspire_start", 10, "/api/inspire/start",
+        lambda rng: {"message": rng.choice(INSPIRE_MESSAGES), "user_access_level": "all-ages"},
+    ),
+    WorkloadItem(
+        "inspire_continue", 10, "/api/inspire/continue",
+        lambda rng: {"message": "我喜歡第一個方向，再柔和一點"}, needs_session=True,
+    ),
+]
+
+
+@dataclass
+class BenchmarkConfig:
+    """基準測試參數（會寫入結果，方便比較時確認條件相同）"""
+    requests: int = 500
+    warmup: int = 50
+    concurrency: int = 8
+    seed: int = 42
+    tag_count: int = 20000
+    tags_csv: Optional[str] = None
+    openai_latency_ms: float = 50.0
+    openai_jitter_ms: float = 10.0
+    db_latency_ms: float = 2.0
+    request_timeout: float = 60.0
+    endpoints: Optional[List[str]] = None
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    status: int
+    seconds: float
+
+
+@dataclass
+class RunResult:
+    samples: List[Sample] = field(default_factory=list)
+    skipped: Dict[str, int] = field(default_factory=dict)
+    wall_seconds: float = 0.0
+
+
+# ----------------------------------------------------------------------
+# 統計
+# ----------------------------------------------------------------------
+
+def percentile(values: List[float], q: float) -> float:
+    """nearest-rank 百分位數（與 services.metrics 相同算法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)), 1) - 1]
+
+
+def summarize(samples: List[Sample], wall_seconds: float) -> Dict[str, Any]:
+    """{count, errors, error_rate, throughput_rps, mean_ms, p50_ms, p95_ms, p99_ms, max_ms, status_codes}"""
+    durations = [s.seconds * 1000 for s in samples]
+    errors = sum(1 for s in samples if s.status >= 400 or s.status == 0)
+    status_codes: Dict[str, int] = {}
+    for s in samples:
+        status_codes[str(s.status)] = status_codes.get(str(s.status), 0) + 1
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / wall_seconds, 2) if wall_seconds else 0.0,
+        "mean_ms": round(sum(durations) / len(durations), 3) if durations else 0.0,
+        "p50_ms": round(percentile(durations, 50), 3),
+        "p95_ms": round(percentile(durations, 95), 3),
+        "p99_ms": round(percentile(durations, 99), 3),
+        "max_ms": round(max(durations), 3) if durations else 0.0,
+        "status_codes": status_codes,
+    }
+
+
+def compare_results(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = 0.2,
+    metrics: Tuple[str, ...] = ("p50_ms", "p95_ms", "p99_ms"),
+) -> List[Dict[str, Any]]:
+    """
+    與基準線比較
+
+    延遲增加或吞吐量下降超過 threshold（比例）視為退步；錯誤率上升也列入。
+    只比較兩邊都有的端點。
+    """
+    regressions = []
+    for name, base in baseline.get("endpoints", {}).items():
+        now = current.get("endpoints", {}).get(name)
+        if not now:
+            continue
+        for metric in metrics:
+            before, after = base.get(metric, 0.0), now.get(metric, 0.0)
+            if before > 0 and (after - before) / before > threshold:
+                regressions.append({
+                    "endpoint": name, "metric": metric, "baseline": before, "current": after,
+                    "change": round((after - before) / before, 4),
+                })
+        before, after = base.get("throughput_rps", 0.0), now.get("throughput_rps", 0.0)
+        if before > 0 and (before - after) / before > threshold:
+            regressions.append({
+                "endpoint": name, "metric": "throughput_rps", "baseline": before, "current": after,
+                "change": round((after - before) / before, 4),
+            })
+        if now.get("error_rate", 0.0) > base.get("error_rate", 0.0):
+            regressions.append({
+                "endpoint": name, "metric": "error_rate", "baseline": base.get("error_rate", 0.0),
+                "current": now["error_rate"], "change": None,
+            })
+    return regressions
+
+
+# ----------------------------------------------------------------------
+# 伺服器
+# ----------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class BackgroundServer:
+    """在背景執行緒中執行 uvicorn（各自的事件迴圈）"""
+
+    def __init__(self, app: Any, lifespan: str = "off"):
+        self.port = _free_port()
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=self.port, log_level="warning", lifespan=lifespan,
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 60.0) -> "BackgroundServer":
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.05)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+def _configure_app_environment(postgrest_url: str, openai_url: str, work_dir: str) -> None:
+    """在載入 src.api.main 前設定環境變數（settings 於匯入時讀取）"""
+    os.environ.update({
+        "SUPABASE_URL": postgrest_url,
+        "SUPABASE_ANON_KEY": BENCHMARK_API_KEY,
+        "SUPABASE_SERVICE_KEY": BENCHMARK_API_KEY,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"{openai_url}/v1",
+        "REDIS_ENABLED": "false",
+        "CACHE_STRATEGY": "memory",
+        "EMBEDDING_CACHE_BACKEND": "memory",
+        "MODERATION_CACHE_BACKEND": "memory",
+        "USAGE_LOG_SPOOL_PATH": os.path.join(work_dir, "usage_spool.jsonl"),
+        "LOG_LEVEL": "WARNING",
+    })
+    # 部分模組以 `from config import settings` 匯入（部署時從 src/api 啟動），與 railway.toml 相同的匯入路徑
+    api_dir = os.path.join(REPO_ROOT, "src", "api")
+    if api_dir not in sys.path:
+        sys.path.append(api_dir)
+
+
+# ----------------------------------------------------------------------
+# 工作負載
+# ----------------------------------------------------------------------
+
+def build_schedule(count: int, seed: int, endpoints: Optional[List[str]] = None) -> List[WorkloadItem]:
+    """依權重產生固定的請求序列"""
+    items = [w for w in WORKLOAD if not endpoints or w.name in endpoints]
+    if not items:
+        raise ValueError(f"No workload items match {endpoints}")
+    rng = random.Random(seed)
+    return rng.choices(items, weights=[w.weight for w in items], k=count)
+
+
+async def _drive(
+    client: httpx.AsyncClient,
+    schedule: List[WorkloadItem],
+    concurrency: int,
+    seed: int,
+    sessions: List[str],
+) -> RunResult:
+    result = RunResult()
+    queue = list(enumerate(schedule))
+    queue.reverse()
+
+    async def worker(worker_id: int) -> None:
+        rng = random.Random(seed * 1000 + worker_id)
+        while queue:
+            index, item = queue.pop()
+            body = item.body(rng)
+            if item.needs_session:
+                if not sessions:
+                    result.skipped[item.name] = result.skipped.get(item.name, 0) + 1
+                    continue
+                body["session_id"] = sessions[index % len(sessions)]
+
+            start = time.perf_counter()
+            try:
+                response = await client.post(item.path, json=body)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            result.samples.append(Sample(item.name, status, time.perf_counter() - start))
+
+            if item.name == "inspire_start" and status == 200:
+                session_id = response.json().get("session_id")
+                if session_id:
+                    sessions.append(session_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    result.wall_seconds = time.perf_counter() - start
+    return result
+
+
+async def _run_workload(
+    app_url: str,
+    config: BenchmarkConfig,
+    reset_metrics: Callable[[], None],
+) -> Tuple[RunResult, Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=config.concurrency, max_keepalive_connections=config.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=config.request_timeout, limits=limits) as client:
+        sessions: List[str] = []
+        if config.warmup:
+            await _drive(client, build_schedule(config.warmup, config.seed + 1, config.endpoints),
+                         config.concurrency, config.seed + 1, sessions)
+            reset_metrics()  # API 在同一行程內，階段指標只保留正式量測
+        result = await _drive(client, build_schedule(config.requests, config.seed, config.endpoints),
+                              config.concurrency, config.seed, sessions)
+        stages = (await client.get("/metrics/stages")).json()
+    return result, stages
+
+
+def run_benchmark(config: BenchmarkConfig) -> Dict[str, Any]:
+    """啟動替身與 API、執行工作負載並返回結果字典"""
+    fixture = build_fixture(config.tag_count, config.seed, config.tags_csv)
+    postgrest = PostgrestStub(fixture, latency_ms=config.db_latency_ms)
+    openai_stub = OpenAIStub(config.openai_latency_ms, config.openai_jitter_ms, config.seed)
+
+    servers = []
+    with tempfile.TemporaryDirectory(prefix="prompt-scribe-bench-") as work_dir:
+        try:
+            postgrest_server = BackgroundServer(postgrest.app).start()
+            openai_server = BackgroundServer(openai_stub.app).start()
+            servers += [postgrest_server, openai_server]
+
+            _configure_app_environment(postgrest_server.url, openai_server.url, work_dir)
+            from src.api.main import app
+            from src.api.services.metrics import get_metrics_registry
+
+            app_server = BackgroundServer(app, lifespan="on").start(timeout=120)
+            servers.append(app_server)
+
+            result, stages = asyncio.run(_run_workload(app_server.url, config, get_metrics_registry().reset))
+        finally:
+            for server in reversed(servers):
+                server.stop()
+
+    by_endpoint: Dict[str, List[Sample]] = {}
+    for sample in result.samples:
+        by_endpoint.setdefault(sample.endpoint, []).append(sample)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": asdict(config),
+        },
+        "overall": summarize(result.samples, result.wall_seconds),
+        "endpoints": {
+            name: summarize(samples, result.wall_seconds) for name, samples in sorted(by_endpoint.items())
+        },
+        "skipped": result.skipped,
+        "stages": stages,
+        "stubs": {"postgrest": postgrest.stats, "openai": openai_stub.stats},
+    }
+
+
+# ----------------------------------------------------------------------
+# 輸出
+# ----------------------------------------------------------------------
+
+def save_results(results: Dict[str, Any], path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def format_report(results: Dict[str, Any], regressions: Optional[List[Dict[str, Any]]] = None) -> str:
+    """終端機用的表格"""
+    header = f"{'endpoint':<18}{'count':>7}{'err':>6}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+    lines = [header, "-" * len(header)]
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["overall"])]
+    for name, s in rows:
+        lines.append(
+            f"{name:<18}{s['count']:>7}{s['errors']:>6}{s['throughput_rps']:>9.1f}"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}"
+        )
+    if results.get("skipped"):
+        lines.append(f"skipped: {results['skipped']}")
+
+    slowest = sorted(results.get("stages", {}).items(), key=lambda kv: kv[1].get("p95_ms", 0), reverse=True)[:8]
+    if slowest:
+        lines += ["", "slowest stages (p95 ms):"]
+        lines += [f"  {stage:<40}{s['p95_ms']:>10.1f}  (n={s['count']})" for stage, s in slowest]
+
+    if regressions is not None:
+        lines.append("")
+        if not regressions:
+            lines.append("no regressions against baseline")
+        for r in regressions:
+            change = f"{r['change']:+.1%}" if r["change"] is not None else "increased"
+            lines.append(f"REGRESSION {r['endpoint']} {r['metric']}: {r['baseline']} -> {r['current']} ({change})")
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+"""
+OpenAI Stub
+模擬 OpenAI API 的本地伺服器 - 回應內容固定，延遲可設定
+
+支援 API 用到的端點：
+- POST /v1/chat/completions   GPT-5 Nano 標籤推薦（回傳標籤 JSON）
+- POST /v1/responses          json_schema 格式回傳標籤 JSON；其他（Inspire Agent）回傳純文字訊息，不觸發工具
+- POST /v1/embeddings         語義搜尋（以文字雜湊產生固定向量）
+- POST /v1/moderations        內容審核（一律未標記）
+"""
+from typing import Any, Dict, List
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+EMBEDDING_DIMENSIONS = 1536
+
+# 依描述中的關鍵字挑選標籤，讓推薦結果能命中 fixture 中的種子標籤
+KEYWORD_TAGS = {
+    "girl": ["1girl", "solo", "long_hair", "smile"],
+    "cyberpunk": ["cyberpunk", "neon_lights", "city", "night"],
+    "city": ["city", "cityscape", "night"],
+    "cat": ["cat", "cat_ears"],
+    "cherry": ["cherry_blossoms", "outdoors"],
+    "rain": ["rain", "outdoors"],
+    "watercolor": ["sky", "outdoors"],  # 結構化輸出只允許 [a-zA-Z0-9_-]
+}
+DEFAULT_TAGS = ["1girl", "solo", "masterpiece", "best_quality", "looking_at_viewer"]
+
+
+def _pick_tags(text: str) -> List[str]:
+    text = text.lower()
+    tags: List[str] = []
+    for keyword, keyword_tags in KEYWORD_TAGS.items():
+        if keyword in text:
+            tags.extend(t for t in keyword_tags if t not in tags)
+    return tags[:10] or list(DEFAULT_TAGS)
+
+
+def _tags_json(text: str) -> str:
+    """符合 gpt5_output_schema 的標籤推薦結果"""
+    return json.dumps({
+        "tags": _pick_tags(text),
+        "confidence": 0.85,
+        "reasoning": "Benchmark stub response",
+        "categories": ["CHARACTER", "SCENE"],
+    })
+
+
+def _fake_embedding(text: str) -> List[float]:
+    """以 SHA-256 為種子的固定單位向量"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.uniform(-1.0, 1.0) for _ in range(EMBEDDING_DIMENSIONS)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+def _usage(prompt_tokens: int = 120, completion_tokens: int = 60) -> Dict[str, int]:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _last_user_text(messages: Any) -> str:
+    if isinstance(messages, str):
+        return messages
+    for message in reversed(messages or []):
+        if isinstance(message, dict) and message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return str(content or "")
+    return ""
+
+
+class OpenAIStub:
+    """固定回應的 OpenAI 相容伺服器"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self.stats: Dict[str, int] = {}
+        self.app = Starlette(routes=[
+            Route("/v1/chat/completions", self._chat_completions, methods=["POST"]),
+            Route("/v1/responses", self._responses, methods=["POST"]),
+            Route("/v1/embeddings", self._embeddings, methods=["POST"]),
+            Route("/v1/moderations", self._moderations, methods=["POST"]),
+        ])
+
+    async def _delay(self, endpoint: str) -> None:
+        self.stats[endpoint] = self.stats.get(endpoint, 0) + 1
+        delay = self.latency_ms + (self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    async def _chat_completions(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        await self._delay("chat.completions")
+        content = _tags_json(_last_user_text(body.get("messages")))
+        return JSONResponse({
+            "id": f"chatcmpl-bench-{time.monotonic_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-5-nano"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(),
+        })
+
+    async def _responses(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        await self._delay("responses")
+        user_text = _last_user_text(body.get("input"))
+        if ((body.get("text") or {}).get("format") or {}).get("type") == "json_schema":
+            text = _tags_json(user_text)  # GPT-5 Nano 標籤推薦（結構化輸出）
+        else:
+            text = f"Benchmark stub reply: {' '.join(_pick_tags(user_text))}"
+        response_id = f"resp_bench_{time.monotonic_ns()}"
+        return JSONResponse({
+            "id": response_id,
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model", "gpt-5"),
+            "output": [{
+                "type": "message",
+                "id": f"msg_{response_id}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": 200,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": 40,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": 240,
+            },
+        })
+
+    async def _embeddings(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        await self._delay("embeddings")
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        return JSONResponse({
+            "object": "list",
+            "model": body.get("model", "text-embedding-3-small"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _fake_embedding(str(text))}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 8 * len(inputs), "total_tokens": 8 * len(inputs)},
+        })
+
+    async def _moderations(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        await self._delay("moderations")
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        categories = ["sexual", "sexual/minors", "violence", "violence/graphic", "hate", "self-harm", "harassment"]
+        return JSONResponse({
+            "id": f"modr-bench-{time.monotonic_ns()}",
+            "model": "omni-moderation-latest",
+            "results": [
+                {
+                    "flagged": False,
+                    "categories": {c: False for c in categories},
+                    "category_scores": {c: 0.0 for c in categories},
+                }
+                for _ in inputs
+            ],
+        })
@@ -0,0 +1,409 @@
+"""
+PostgREST Stub
+以 SQLite 模擬 Supabase 的 PostgREST 介面，讓 API 在本地跑基準測試
+
+支援 API 實際用到的子集：
+- select（欄位列表 / *）、order（含 nullsfirst / nullslast）、limit / offset / Range 標頭
+- 過濾：eq, neq, gt, gte, lt, lte, like, ilike, in, is，not. 前綴與 or=(...) / and=(...)（可巢狀）
+- Prefer: count=exact（Content-Range）、return=representation|minimal、resolution=merge-duplicates|ignore-duplicates
+- insert / upsert / update / delete，以及以 Python 實作的 RPC
+錯誤回應沿用 PostgREST 的格式與代碼（42703 / PGRST202 / PGRST204 / 23505）。
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import re
+import sqlite3
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from .fixtures import TABLES
+
+FILTER_OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class PostgrestError(Exception):
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+    def response(self) -> JSONResponse:
+        return JSONResponse(
+            {"code": self.code, "message": self.message, "details": None, "hint": None},
+            status_code=self.status,
+        )
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top_level(text: str) -> List[str]:
+    """以逗號分割，略過括號與雙引號內的逗號"""
+    parts, depth, quoted, current = [], 0, False, []
+    escaped = False
+    for ch in text:
+        if escaped:
+            escaped = False
+        elif quoted and ch == "\\":
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', value[1:-1])
+    return value
+
+
+class SQLiteTable:
+    """單一表格的欄位資訊"""
+
+    def __init__(self, name: str, columns: Dict[str, str]):
+        self.name = name
+        self.columns = columns
+        self.json_columns = {c for c, spec in columns.items() if spec.startswith("JSON")}
+        self.bool_columns = {c for c, spec in columns.items() if spec.startswith("BOOLEAN")}
+        self.primary_key = next(c for c, spec in columns.items() if "PRIMARY KEY" in spec)
+
+    def check_column(self, column: str) -> str:
+        if column not in self.columns:
+            raise PostgrestError(400, "42703", f"column {self.name}.{column} does not exist")
+        return column
+
+    def encode(self, column: str, value: Any) -> Any:
+        if column not in self.columns:
+            raise PostgrestError(
+                400, "PGRST204", f"Could not find the '{column}' column of '{self.name}' in the schema cache"
+            )
+        if column in self.json_columns and value is not None:
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
+    def decode(self, row: sqlite3.Row) -> Dict[str, Any]:
+        data = dict(row)
+        for column in self.json_columns & data.keys():
+            if data[column] is not None:
+                data[column] = json.loads(data[column])
+        for column in self.bool_columns & data.keys():
+            if data[column] is not None:
+                data[column] = bool(data[column])
+        return data
+
+
+class PostgrestStub:
+    """SQLite 上的 PostgREST 子集"""
+
+    def __init__(self, conn: sqlite3.Connection, latency_ms: float = 0.0):
+        self.conn = conn
+        self.conn.execute("PRAGMA case_sensitive_like = ON")  # like 區分大小寫，與 PostgreSQL 相同
+        self.latency_ms = latency_ms
+        self.tables = {name: SQLiteTable(name, columns) for name, columns in TABLES.items()}
+        self.rpcs: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "apply_inspire_session_delta": self._apply_inspire_session_delta,
+            "semantic_tag_search": lambda params: [],
+            "semantic_tag_search_rated": lambda params: [],
+        }
+        self.stats = {"requests": 0, "rpc_calls": 0, "errors": 0}
+        self.app = Starlette(routes=[
+            Route("/rest/v1/rpc/{name}", self._handle_rpc, methods=["POST", "GET"]),
+            Route("/rest/v1/{table}", self._handle_table, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+        ])
+
+    # ------------------------------------------------------------------
+    # 查詢轉換
+    # ------------------------------------------------------------------
+
+    def _condition(self, table: SQLiteTable, column: str, expression: str) -> Tuple[str, List[Any]]:
+        negate = expression.startswith("not.")
+        if negate:
+            expression = expression[4:]
+        operator, _, value = expression.partition(".")
+        sql_column = f'"{table.check_column(column)}"'
+
+        if operator in FILTER_OPERATORS:
+            sql, params = f"{sql_column} {FILTER_OPERATORS[operator]} ?", [_unquote(value)]
+        elif operator in ("like", "ilike"):
+            pattern = _unquote(value).replace("*", "%")
+            if operator == "ilike":
+                sql, params = f"LOWER({sql_column}) LIKE LOWER(?)", [pattern]
+            else:
+                sql, params = f"{sql_column} LIKE ?", [pattern]
+        elif operator == "in":
+            values = [_unquote(v) for v in _split_top_level(value.strip()[1:-1])] if value.strip("()") else []
+            sql = f"{sql_column} IN ({', '.join('?' for _ in values)})" if values else "0"
+            params = values
+        elif operator == "is":
+            keyword = {"null": "NULL", "true": "1", "false": "0"}.get(value.lower())
+            if keyword is None:
+                raise PostgrestError(400, "PGRST100", f"failed to parse filter (is.{value})")
+            sql, params = (f"{sql_column} IS NULL" if keyword == "NULL" else f"{sql_column} = {keyword}"), []
+        else:
+            raise PostgrestError(400, "PGRST100", f"failed to parse filter ({operator})")
+
+        return (f"NOT ({sql})" if negate else sql), params
+
+    def _logic(self, table: SQLiteTable, operator: str, value: str) -> Tuple[str, List[Any]]:
+        """or=(...) / and=(...)，可巢狀 and(...) / or(...)"""
+        parts, params = [], []
+        for condition in _split_top_level(value.strip()[1:-1]):
+            condition = condition.strip()
+            nested = re.match(r"^(not\.)?(and|or)(\(.*\))$", condition, re.S)
+            if nested:
+                sql, condition_params = self._logic(table, nested.group(2), nested.group(3))
+                sql = f"NOT {sql}" if nested.group(1) else sql
+            else:
+                column, _, expression = condition.partition(".")
+                sql, condition_params = self._condition(table, column.strip(), expression)
+            parts.append(sql)
+            params.extend(condition_params)
+        return f"({f' {operator.upper()} '.join(parts)})", params
+
+    def _where(self, table: SQLiteTable, request: Request) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for key, value in request.query_params.multi_items():
+            if key in RESERVED_PARAMS:
+                continue
+            if key in ("or", "and", "not.or", "not.and"):
+                sql, condition_params = self._logic(table, key.split(".")[-1], value)
+                clauses.append(f"NOT {sql}" if key.startswith("not.") else sql)
+                params.extend(condition_params)
+                continue
+            sql, condition_params = self._condition(table, key, value)
+            clauses.append(sql)
+            params.extend(condition_params)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _order(self, table: SQLiteTable, order: Optional[str]) -> str:
+        if not order:
+            return ""
+        terms = []
+        for term in order.split(","):
+            column, *modifiers = term.strip().split(".")
+            direction = "DESC" if "desc" in modifiers else "ASC"
+            if "nullsfirst" in modifiers:
+                nulls = "NULLS FIRST"
+            elif "nullslast" in modifiers:
+                nulls = "NULLS LAST"
+            else:
+                nulls = "NULLS FIRST" if direction == "DESC" else "NULLS LAST"  # PostgreSQL 預設
+            terms.append(f'"{table.check_column(column)}" {direction} {nulls}')
+        return " ORDER BY " + ", ".join(terms)
+
+    def _select_columns(self, table: SQLiteTable, select: Optional[str]) -> Optional[List[str]]:
+        if not select or select.strip() == "*":
+            return None
+        return [table.check_column(c.strip()) for c in select.split(",") if c.strip()]
+
+    @staticmethod
+    def _prefer(request: Request) -> Dict[str, str]:
+        prefer = {}
+        for item in request.headers.get("prefer", "").split(","):
+            key, _, value = item.strip().partition("=")
+            if key:
+                prefer[key] = value
+        return prefer
+
+    # ------------------------------------------------------------------
+    # 端點
+    # ------------------------------------------------------------------
+
+    async def _respond(self, handler, *args) -> Response:
+        self.stats["requests"] += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        try:
+            return await handler(*args)
+        except PostgrestError as e:
+            self.stats["errors"] += 1
+            return e.response()
+        except sqlite3.IntegrityError as e:
+            self.stats["errors"] += 1
+            return PostgrestError(409, "23505", str(e)).response()
+
+    async def _handle_table(self, request: Request) -> Response:
+        return await self._respond(self._table_request, request)
+
+    async def _handle_rpc(self, request: Request) -> Response:
+        return await self._respond(self._rpc_request, request)
+
+    async def _table_request(self, request: Request) -> Response:
+        name = request.path_params["table"]
+        table = self.tables.get(name)
+        if table is None:
+            raise PostgrestError(404, "42P01", f'relation "public.{name}" does not exist')
+
+        if request.method in ("GET", "HEAD"):
+            return self._select(table, request)
+        if request.method == "POST":
+            return self._insert(table, request, await request.json())
+        if request.method == "PATCH":
+            return self._update(table, request, await request.json())
+        return self._delete(table, request)
+
+    def _select(self, table: SQLiteTable, request: Request) -> Response:
+        params = request.query_params
+        where, where_params = self._where(table, request)
+        prefer = self._prefer(request)
+
+        select = params.get("select")
+        if select and select.strip() == "count":
+            total = self.conn.execute(f'SELECT COUNT(*) FROM "{table.name}"{where}', where_params).fetchone()[0]
+            return JSONResponse([{"count": total}])
+        columns = self._select_columns(table, select)
+
+        offset = int(params.get("offset", 0))
+        limit = int(params["limit"]) if "limit" in params else None
+        range_header = request.headers.get("range")
+        if range_header:
+            start, _, end = range_header.partition("-")
+            offset = int(start)
+            if end:
+                range_limit = int(end) - offset + 1
+                limit = range_limit if limit is None else min(limit, range_limit)
+
+        sql = (
+            f'SELECT {", ".join(f"{chr(34)}{c}{chr(34)}" for c in columns) if columns else "*"} '
+            f'FROM "{table.name}"{where}{self._order(table, params.get("order"))}'
+            f' LIMIT {limit if limit is not None else -1} OFFSET {offset}'
+        )
+        rows = [table.decode(r) for r in self.conn.execute(sql, where_params).fetchall()]
+
+        total = "*"
+        if prefer.get("count") in ("exact", "planned", "estimated"):
+            total = self.conn.execute(f'SELECT COUNT(*) FROM "{table.name}"{where}', where_params).fetchone()[0]
+        content_range = f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+
+        if request.method == "HEAD":
+            return Response(headers={"content-range": content_range})
+        return JSONResponse(rows, headers={"content-range": content_range})
+
+    def _insert(self, table: SQLiteTable, request: Request, body: Any) -> Response:
+        rows = body if isinstance(body, list) else [body]
+        prefer = self._prefer(request)
+        resolution = prefer.get("resolution")
+        conflict = request.query_params.get("on_conflict") or table.primary_key
+
+        keys = []
+        for row in rows:
+            if "created_at" in table.columns and row.get("created_at") is None:
+                row["created_at"] = _now()
+            if "updated_at" in table.columns and row.get("updated_at") is None:
+                row["updated_at"] = _now()
+            if table.primary_key == "id" and "AUTOINCREMENT" not in table.columns["id"] and row.get("id") is None:
+                raise PostgrestError(400, "23502", f'null value in column "id" of relation "{table.name}"')
+            columns = list(row)
+            values = [table.encode(c, row[c]) for c in columns]
+            sql = (
+                f'INSERT INTO "{table.name}" ({", ".join(chr(34) + c + chr(34) for c in columns)}) '
+                f'VALUES ({", ".join("?" for _ in columns)})'
+            )
+            if resolution == "merge-duplicates":
+                updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c != conflict)
+                sql += f' ON CONFLICT ("{conflict}") DO ' + (f"UPDATE SET {updates}" if updates else "NOTHING")
+            elif resolution == "ignore-duplicates":
+                sql += f' ON CONFLICT ("{conflict}") DO NOTHING'
+            cursor = self.conn.execute(sql + " RETURNING *", values)
+            keys.extend(table.decode(r) for r in cursor.fetchall())
+        self.conn.commit()
+
+        if prefer.get("return") == "minimal":
+            return Response(status_code=201)
+        return JSONResponse(keys, status_code=201)
+
+    def _update(self, table: SQLiteTable, request: Request, body: Dict[str, Any]) -> Response:
+        where, where_params = self._where(table, request)
+        if not body:
+            return JSONResponse([])
+        assignments = ", ".join(f'"{c}" = ?' for c in body)
+        values = [table.encode(c, v) for c, v in body.items()]
+        cursor = self.conn.execute(
+            f'UPDATE "{table.name}" SET {assignments}{where} RETURNING *', values + where_params
+        )
+        rows = [table.decode(r) for r in cursor.fetchall()]
+        self.conn.commit()
+        if self._prefer(request).get("return") == "minimal":
+            return Response(status_code=204)
+        return JSONResponse(rows)
+
+    def _delete(self, table: SQLiteTable, request: Request) -> Response:
+        where, where_params = self._where(table, request)
+        cursor = self.conn.execute(f'DELETE FROM "{table.name}"{where} RETURNING *', where_params)
+        rows = [table.decode(r) for r in cursor.fetchall()]
+        self.conn.commit()
+        return JSONResponse(rows)
+
+    async def _rpc_request(self, request: Request) -> Response:
+        name = request.path_params["name"]
+        handler = self.rpcs.get(name)
+        if handler is None:
+            raise PostgrestError(404, "PGRST202", f"Could not find the function public.{name} in the schema cache")
+        self.stats["rpc_calls"] += 1
+        params = await request.json() if request.method == "POST" else dict(request.query_params)
+        return JSONResponse(handler(params or {}))
+
+    # ------------------------------------------------------------------
+    # RPC（與 scripts/*.sql 的語義相同）
+    # ------------------------------------------------------------------
+
+    def _apply_inspire_session_delta(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """scripts/15_session_write_behind.sql"""
+        table = self.tables["inspire_sessions"]
+        session_id = params["p_session_id"]
+        if params.get("p_create"):
+            self.conn.execute(
+                "INSERT INTO inspire_sessions (session_id, created_at, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO NOTHING",
+                (session_id, _now(), _now()),
+            )
+        row = self.conn.execute("SELECT * FROM inspire_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            self.conn.commit()
+            return []
+        row = table.decode(row)
+
+        fields = params.get("p_fields") or {}
+        tool_calls = params.get("p_tool_calls") or {}
+        counts = dict(row.get("tool_call_count") or {})
+        for tool_name, count in tool_calls.items():
+            counts[tool_name] = counts.get(tool_name, 0) + int(count)
+        skipped = {"session_id", "created_at", "updated_at", "total_cost", "total_tokens", "tool_call_count", "total_tool_calls"}
+        update = {c: v for c, v in fields.items() if c in table.columns and c not in skipped}
+        base_tool_calls = fields.get("total_tool_calls")
+        update.update({
+            "total_cost": (row.get("total_cost") or 0) + float(params.get("p_cost_delta") or 0),
+            "total_tokens": (row.get("total_tokens") or 0) + int(params.get("p_tokens_delta") or 0),
+            "total_tool_calls": (base_tool_calls if base_tool_calls is not None else row.get("total_tool_calls") or 0)
+            + sum(int(v) for v in tool_calls.values()),
+            "tool_call_count": counts,
+            "updated_at": _now(),
+        })
+        assignments = ", ".join(f'"{c}" = ?' for c in update)
+        cursor = self.conn.execute(
+            f"UPDATE inspire_sessions SET {assignments} WHERE session_id = ? RETURNING *",
+            [table.encode(c, v) for c, v in update.items()] + [session_id],
+        )
+        result = [table.decode(r) for r in cursor.fetchall()]
+        self.conn.commit()
+        return result
@@ -0,0 +1,85 @@
+-- ============================================================================
+-- Script 14: Precomputed content level on tags_final
+-- 預先計算每個標籤的內容等級，讓權限過濾在資料庫端完成（不必多取再用 Python 過濾）
+--
+-- content_level 對應 content_rating.py 的 ACCESS_HIERARCHY：
+--   0 = all-ages, 1 = r15, 2 = r18, 999 = blocked
+-- content_rating_version 為分級規則的版本指紋，規則變更後需重新執行：
+--   python scripts/compute_content_levels.py
+-- ============================================================================
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'tags_final' AND column_name = 'content_level'
+    ) THEN
+        ALTER TABLE tags_final
+        ADD COLUMN content_level SMALLINT;
+
+        COMMENT ON COLUMN tags_final.content_level IS '內容等級（0=all-ages, 1=r15, 2=r18, 999=blocked），由 scripts/compute_content_levels.py 寫入';
+        RAISE NOTICE '✅ 已添加 content_level 欄位到 tags_final';
+    ELSE
+        RAISE NOTICE '⚠️ content_level 已存在，跳過';
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'tags_final' AND column_name = 'content_rating_version'
+    ) THEN
+        ALTER TABLE tags_final
+        ADD COLUMN content_rating_version TEXT;
+
+        COMMENT ON COLUMN tags_final.content_rating_version IS '計算 content_level 時的分級規則版本';
+        RAISE NOTICE '✅ 已添加 content_rating_version 欄位到 tags_final';
+    ELSE
+        RAISE NOTICE '⚠️ content_rating_version 已存在，跳過';
+    END IF;
+END $$;
+
+-- 權限過濾 + 熱門度排序（search_tags_by_keywords / get_popular_tags）
+CREATE INDEX IF NOT EXISTS idx_tags_final_content_level_post_count
+    ON tags_final (content_level, post_count DESC);
+
+-- 版本檢查（找出尚未依目前規則計算的標籤）
+CREATE INDEX IF NOT EXISTS idx_tags_final_content_rating_version
+    ON tags_final (content_rating_version);
+
+-- ============================================================================
+-- 依內容等級過濾的語義搜尋
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION public.semantic_tag_search_rated(
+    query_embedding vector(1536),
+    match_count integer DEFAULT 10,
+    min_similarity real DEFAULT 0.7,
+    max_content_level integer DEFAULT 0
+)
+RETURNS TABLE (
+    tag_name text,
+    similarity real,
+    main_category text,
+    post_count integer
+)
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public, pg_temp
+AS $func$
+BEGIN
+    RETURN QUERY
+    SELECT
+        e.tag_name,
+        (1 - (e.embedding <=> query_embedding))::real AS similarity,
+        t.main_category,
+        t.post_count
+    FROM tag_embeddings e
+    JOIN tags_final t ON e.tag_name = t.name
+    WHERE
+        (1 - (e.embedding <=> query_embedding)) > min_similarity
+        AND t.content_level <= max_content_level
+    ORDER BY e.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$func$;
+
+GRANT EXECUTE ON FUNCTION public.semantic_tag_search_rated(vector, integer, real, integer) TO anon, authenticated, service_role;
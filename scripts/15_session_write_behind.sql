@@ -0,0 +1,80 @@
+-- ============================================================================
+-- Script 15: Atomic session delta for the write-behind session store
+-- 每輪對話把 inspire_sessions 的所有變更合併為一次 RPC（src/api/services/session_store.py）
+--
+-- apply_inspire_session_delta 在同一個交易中：
+--   1. p_create 為 true 時先建立 Session（已存在則略過）
+--   2. 覆寫 p_fields 中的欄位（最後寫入者為準）
+--   3. total_cost / total_tokens / tool_call_count / total_tool_calls 以伺服器端累加，
+--      重疊的請求不會再互相覆蓋（原本是讀取 → 修改 → 寫回）
+-- 返回更新後的 Session；Session 不存在時返回空集合。
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION public.apply_inspire_session_delta(
+    p_session_id text,
+    p_fields jsonb DEFAULT '{}'::jsonb,
+    p_cost_delta numeric DEFAULT 0,
+    p_tokens_delta integer DEFAULT 0,
+    p_tool_calls jsonb DEFAULT '{}'::jsonb,
+    p_create boolean DEFAULT false
+)
+RETURNS SETOF inspire_sessions
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public, pg_temp
+AS $func$
+DECLARE
+    v_set text;
+    v_tool_calls_delta integer;
+BEGIN
+    IF p_create THEN
+        INSERT INTO inspire_sessions (session_id)
+        VALUES (p_session_id)
+        ON CONFLICT (session_id) DO NOTHING;
+    END IF;
+
+    SELECT COALESCE(SUM(value::integer), 0)
+    INTO v_tool_calls_delta
+    FROM jsonb_each_text(COALESCE(p_tool_calls, '{}'::jsonb));
+
+    -- 只覆寫實際存在的欄位；累加欄位與時間戳由下方統一處理
+    SELECT string_agg(
+        format('%1$I = (jsonb_populate_record(NULL::inspire_sessions, $1)).%1$I', c.column_name),
+        ', '
+    )
+    INTO v_set
+    FROM information_schema.columns c
+    WHERE c.table_schema = 'public'
+      AND c.table_name = 'inspire_sessions'
+      AND p_fields ? c.column_name
+      AND c.column_name NOT IN (
+          'session_id', 'created_at', 'updated_at',
+          'total_cost', 'total_tokens', 'tool_call_count', 'total_tool_calls'
+      );
+
+    RETURN QUERY EXECUTE format(
+        'UPDATE inspire_sessions AS s SET
+            total_cost = COALESCE(s.total_cost, 0) + $3,
+            total_tokens = COALESCE(s.total_tokens, 0) + $4,
+            total_tool_calls = COALESCE(
+                (jsonb_populate_record(NULL::inspire_sessions, $1)).total_tool_calls,
+                s.total_tool_calls, 0
+            ) + $5,
+            tool_call_count = COALESCE(s.tool_call_count, ''{}''::jsonb) || (
+                SELECT COALESCE(
+                    jsonb_object_agg(d.key, COALESCE((s.tool_call_count ->> d.key)::integer, 0) + d.value::integer),
+                    ''{}''::jsonb
+                )
+                FROM jsonb_each_text($6) AS d
+            ),
+            updated_at = NOW()%s
+        WHERE s.session_id = $2
+        RETURNING s.*',
+        CASE WHEN v_set IS NULL THEN '' ELSE ', ' || v_set END
+    )
+    USING p_fields, p_session_id, p_cost_delta, p_tokens_delta, v_tool_calls_delta,
+          COALESCE(p_tool_calls, '{}'::jsonb);
+END;
+$func$;
+
+GRANT EXECUTE ON FUNCTION public.apply_inspire_session_delta(text, jsonb, numeric, integer, jsonb, boolean) TO service_role;
@@ -0,0 +1,37 @@
+-- ============================================================================
+-- Script 16: API usage log table
+-- 使用數據記錄表（src/api/services/usage_logger.py，usage_log_backend = "database"）
+--
+-- 背景寫入任務以批次 insert 寫入；資料庫無法連線時先寫入本地 spool 檔，恢復後重播。
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS api_usage_logs (
+    id BIGSERIAL PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    method TEXT NOT NULL DEFAULT 'POST',
+    query_params JSONB DEFAULT '{}'::jsonb,
+    request_body JSONB DEFAULT '{}'::jsonb,
+    response_summary JSONB,
+    response_time_ms INTEGER,
+    status_code INTEGER NOT NULL DEFAULT 200,
+    cache_hit BOOLEAN NOT NULL DEFAULT FALSE,
+    error_message TEXT,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE api_usage_logs IS 'API 使用數據（由 UsageLogger 背景批次寫入）';
+
+CREATE INDEX IF NOT EXISTS idx_api_usage_logs_endpoint_time
+    ON api_usage_logs (endpoint, timestamp DESC);
+
+CREATE INDEX IF NOT EXISTS idx_api_usage_logs_time
+    ON api_usage_logs (timestamp DESC);
+
+ALTER TABLE api_usage_logs ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow service role full access to usage logs" ON api_usage_logs;
+CREATE POLICY "Allow service role full access to usage logs"
+    ON api_usage_logs
+    FOR ALL
+    TO service_role
+    USING (true);
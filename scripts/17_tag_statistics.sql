@@ -0,0 +1,183 @@
+-- ============================================================================
+-- Script 17: Incrementally maintained tag statistics
+-- 預先彙總的標籤統計（src/api/services/tag_statistics.py）
+--
+-- tag_statistics 以 (dimension, bucket) 保存標籤數：
+--   total            ''                      全部標籤
+--   main_category    主分類                  已分類標籤（main_category 非 NULL）
+--   sub_category     '主分類/副分類'
+--   popularity_tier  very_popular / popular / moderate / niche
+--                    （門檻與 API 的 calculate_popularity_tier 相同）
+--
+-- tags_final 的 INSERT / UPDATE / DELETE 以 statement-level trigger 依轉換表增減計數，
+-- 不需要重新掃描全表；TRUNCATE 或大量匯入後可呼叫 refresh_tag_statistics() 重建。
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS tag_statistics (
+    dimension TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    tag_count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (dimension, bucket)
+);
+
+COMMENT ON TABLE tag_statistics IS 'tags_final 的預先彙總計數（trigger 增量維護）';
+
+ALTER TABLE tag_statistics ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow public read access to tag statistics" ON tag_statistics;
+CREATE POLICY "Allow public read access to tag statistics"
+    ON tag_statistics
+    FOR SELECT
+    USING (true);
+
+-- 單一標籤所屬的統計桶
+CREATE OR REPLACE FUNCTION public.tag_statistic_buckets(
+    p_main_category TEXT,
+    p_sub_category TEXT,
+    p_post_count BIGINT
+)
+RETURNS TABLE (dimension TEXT, bucket TEXT)
+LANGUAGE sql
+IMMUTABLE
+SET search_path = public, pg_temp
+AS $$
+    SELECT 'total', ''
+    UNION ALL
+    SELECT 'main_category', p_main_category WHERE p_main_category IS NOT NULL
+    UNION ALL
+    SELECT 'sub_category', p_main_category || '/' || p_sub_category
+        WHERE p_main_category IS NOT NULL AND p_sub_category IS NOT NULL
+    UNION ALL
+    SELECT 'popularity_tier', CASE
+        WHEN COALESCE(p_post_count, 0) > 100000 THEN 'very_popular'
+        WHEN COALESCE(p_post_count, 0) > 10000 THEN 'popular'
+        WHEN COALESCE(p_post_count, 0) > 1000 THEN 'moderate'
+        ELSE 'niche'
+    END;
+$$;
+
+-- 依轉換表增減計數（INSERT 只有 new_rows、DELETE 只有 old_rows、UPDATE 兩者皆有）
+CREATE OR REPLACE FUNCTION public.apply_tag_statistics_delta()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO tag_statistics AS s (dimension, bucket, tag_count, updated_at)
+        SELECT b.dimension, b.bucket, COUNT(*), NOW()
+        FROM new_rows n
+        CROSS JOIN LATERAL public.tag_statistic_buckets(n.main_category, n.sub_category, n.post_count) b
+        GROUP BY b.dimension, b.bucket
+        ON CONFLICT (dimension, bucket)
+        DO UPDATE SET tag_count = s.tag_count + EXCLUDED.tag_count, updated_at = EXCLUDED.updated_at;
+
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO tag_statistics AS s (dimension, bucket, tag_count, updated_at)
+        SELECT b.dimension, b.bucket, -COUNT(*), NOW()
+        FROM old_rows o
+        CROSS JOIN LATERAL public.tag_statistic_buckets(o.main_category, o.sub_category, o.post_count) b
+        GROUP BY b.dimension, b.bucket
+        ON CONFLICT (dimension, bucket)
+        DO UPDATE SET tag_count = s.tag_count + EXCLUDED.tag_count, updated_at = EXCLUDED.updated_at;
+
+    ELSE
+        INSERT INTO tag_statistics AS s (dimension, bucket, tag_count, updated_at)
+        SELECT d.dimension, d.bucket, SUM(d.delta), NOW()
+        FROM (
+            SELECT b.dimension, b.bucket, 1 AS delta
+            FROM new_rows n
+            CROSS JOIN LATERAL public.tag_statistic_buckets(n.main_category, n.sub_category, n.post_count) b
+            UNION ALL
+            SELECT b.dimension, b.bucket, -1 AS delta
+            FROM old_rows o
+            CROSS JOIN LATERAL public.tag_statistic_buckets(o.main_category, o.sub_category, o.post_count) b
+        ) d
+        GROUP BY d.dimension, d.bucket
+        HAVING SUM(d.delta) <> 0
+        ON CONFLICT (dimension, bucket)
+        DO UPDATE SET tag_count = s.tag_count + EXCLUDED.tag_count, updated_at = EXCLUDED.updated_at;
+    END IF;
+
+    DELETE FROM tag_statistics WHERE tag_count = 0 AND dimension <> 'total';
+    RETURN NULL;
+END;
+$$;
+
+-- 全表重建（初始化、TRUNCATE 後或懷疑計數偏移時）
+CREATE OR REPLACE FUNCTION public.refresh_tag_statistics()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    DELETE FROM tag_statistics;
+
+    INSERT INTO tag_statistics (dimension, bucket, tag_count, updated_at)
+    SELECT b.dimension, b.bucket, COUNT(*), NOW()
+    FROM tags_final t
+    CROSS JOIN LATERAL public.tag_statistic_buckets(t.main_category, t.sub_category, t.post_count) b
+    GROUP BY b.dimension, b.bucket;
+
+    -- 空表時仍保留 total 列
+    INSERT INTO tag_statistics (dimension, bucket, tag_count, updated_at)
+    VALUES ('total', '', 0, NOW())
+    ON CONFLICT (dimension, bucket) DO NOTHING;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.refresh_tag_statistics_on_truncate()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    PERFORM public.refresh_tag_statistics();
+    RETURN NULL;
+END;
+$$;
+
+-- 轉換表的 trigger 只能對應單一事件
+DROP TRIGGER IF EXISTS tag_statistics_insert ON tags_final;
+CREATE TRIGGER tag_statistics_insert
+    AFTER INSERT ON tags_final
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.apply_tag_statistics_delta();
+
+DROP TRIGGER IF EXISTS tag_statistics_update ON tags_final;
+CREATE TRIGGER tag_statistics_update
+    AFTER UPDATE ON tags_final
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.apply_tag_statistics_delta();
+
+DROP TRIGGER IF EXISTS tag_statistics_delete ON tags_final;
+CREATE TRIGGER tag_statistics_delete
+    AFTER DELETE ON tags_final
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.apply_tag_statistics_delta();
+
+DROP TRIGGER IF EXISTS tag_statistics_truncate ON tags_final;
+CREATE TRIGGER tag_statistics_truncate
+    AFTER TRUNCATE ON tags_final
+    FOR EACH STATEMENT EXECUTE FUNCTION public.refresh_tag_statistics_on_truncate();
+
+-- API 讀取（列數與表大小無關）
+CREATE OR REPLACE FUNCTION public.get_tag_statistics()
+RETURNS TABLE (dimension TEXT, bucket TEXT, tag_count BIGINT, updated_at TIMESTAMP WITH TIME ZONE)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+SET search_path = public, pg_temp
+AS $$
+    SELECT dimension, bucket, tag_count, updated_at FROM tag_statistics;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.get_tag_statistics() TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.refresh_tag_statistics() TO service_role;
+
+-- 初始化
+SELECT public.refresh_tag_statistics();
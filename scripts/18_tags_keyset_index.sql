@@ -0,0 +1,17 @@
+-- ============================================================================
+-- Script 18: Keyset pagination indexes
+-- /api/v1/tags 游標分頁（src/api/services/tag_cursor.py）
+--
+-- 排序鍵為 (post_count DESC, name)：
+--   WHERE post_count <= :p AND (post_count < :p OR name > :n)
+--   ORDER BY post_count DESC, name LIMIT :limit
+-- 索引掃描從游標位置開始，每頁成本與頁碼無關。
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_tags_final_keyset
+    ON tags_final (post_count DESC, name);
+
+CREATE INDEX IF NOT EXISTS idx_tags_final_category_keyset
+    ON tags_final (main_category, post_count DESC, name);
+
+ANALYZE tags_final;
@@ -0,0 +1,38 @@
+-- ============================================================================
+-- Script 19: Incremental export index
+-- GET /api/v1/tags/export?since=...（src/api/services/tag_export.py）
+--
+-- 增量匯出依 (updated_at, name) keyset 分批：
+--   WHERE updated_at > :since AND updated_at >= :u AND (updated_at > :u OR name > :n)
+--   ORDER BY updated_at, name LIMIT :batch
+-- 全量匯出依 name 分批（使用既有的 name 唯一索引）。
+--
+-- 增量同步依賴 updated_at 在每次修改時更新；02_create_tables.sql 只有 DEFAULT NOW()，
+-- 這裡補上 BEFORE UPDATE trigger。刪除的標籤不會出現在增量匯出中。
+-- ============================================================================
+
+-- 先補齊舊資料（在建立 trigger 之前，保留原本的建立時間）
+UPDATE tags_final SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
+
+CREATE OR REPLACE FUNCTION public.set_tags_final_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS tags_final_set_updated_at ON tags_final;
+CREATE TRIGGER tags_final_set_updated_at
+    BEFORE UPDATE ON tags_final
+    FOR EACH ROW
+    WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION public.set_tags_final_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_tags_final_updated_at
+    ON tags_final (updated_at, name);
+
+ANALYZE tags_final;
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Prompt-Scribe 本地標籤資料庫建置工具
+產生供 TAG_STORAGE_BACKEND=sqlite 使用的唯讀 SQLite 檔案（邊緣部署、離線環境）。
+
+使用方式：
+    # 從 Supabase 匯出 tags_final
+    python scripts/build_local_tag_db.py [輸出路徑]
+
+    # 使用舊管線產出的 tags.db（複製後建立索引，不修改原檔）
+    python scripts/build_local_tag_db.py [輸出路徑] --from-sqlite stage1/output/tags.db
+
+輸出路徑預設為環境變數 TAG_STORAGE_PATH 或 data/tags.db。
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# 讓腳本可以匯入 API 服務模組
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.api.services.tag_storage import export_tags_to_local_database, prepare_local_tag_database
+
+DEFAULT_STORAGE_PATH = "data/tags.db"
+
+
+def build_from_sqlite(source: str, path: str) -> dict:
+    """複製既有的 SQLite 檔案並建立索引"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + ".tmp")
+    shutil.copyfile(source, tmp_path)
+    summary = prepare_local_tag_database(str(tmp_path))
+    tmp_path.replace(target)
+    summary["path"] = str(target)
+    return summary
+
+
+def build_from_supabase(path: str) -> dict:
+    """從 Supabase 匯出 tags_final"""
+    from supabase import create_client
+
+    supabase_url = os.environ.get("SUPABASE_URL")
+    supabase_key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_ANON_KEY")
+    if not all([supabase_url, supabase_key]):
+        raise ValueError("Missing required environment variables: SUPABASE_URL, SUPABASE_SERVICE_KEY")
+
+    return export_tags_to_local_database(create_client(supabase_url, supabase_key), path)
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Build the local read-only tag database")
+    parser.add_argument("path", nargs="?", default=None, help="output path (default: TAG_STORAGE_PATH or data/tags.db)")
+    parser.add_argument("--from-sqlite", dest="source", help="copy an existing tags.db instead of exporting from Supabase")
+    args = parser.parse_args()
+
+    path = args.path or os.environ.get("TAG_STORAGE_PATH") or DEFAULT_STORAGE_PATH
+    print(f"Building local tag database at {path} ...")
+    start = time.time()
+    summary = build_from_sqlite(args.source, path) if args.source else build_from_supabase(path)
+    print(f"Wrote {summary['tags']} tags in {time.time() - start:.1f}s")
+    print("Set TAG_STORAGE_BACKEND=sqlite and TAG_STORAGE_PATH to use it.")
+
+
+if __name__ == "__main__":
+    main()
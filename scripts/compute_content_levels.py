@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Prompt-Scribe 內容等級計算工具
+依 src/api/inspire_config/content_rating.py 的分級規則計算每個標籤的內容等級，
+寫回 tags_final.content_level / content_rating_version（需先執行 14_add_content_level.sql）。
+
+只更新等級或規則版本不符的標籤，分級規則變更後重新執行即可。
+
+使用方式：
+    python scripts/compute_content_levels.py [--force] [--dry-run]
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+# 讓腳本可以匯入 API 服務模組
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.api.services.content_levels import compute_content_levels
+
+
+def main():
+    load_dotenv()
+
+    supabase_url = os.environ.get("SUPABASE_URL")
+    supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
+    if not all([supabase_url, supabase_key]):
+        raise ValueError("Missing required environment variables: SUPABASE_URL, SUPABASE_SERVICE_KEY")
+
+    supabase: Client = create_client(supabase_url, supabase_key)
+    summary = compute_content_levels(
+        supabase,
+        force="--force" in sys.argv,
+        dry_run="--dry-run" in sys.argv,
+    )
+    print(
+        f"Rating version {summary['version']}: scanned {summary['scanned']} tags, "
+        f"{'would update' if summary['dry_run'] else 'updated'} {summary['updated']} "
+        f"{summary['by_level']} in {summary['elapsed_seconds']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Prompt-Scribe 嵌入矩陣匯出工具
+從 tags_final 讀取所有嵌入向量，匯出為本地 memory-map 矩陣 + IVF 索引，
+供 API 在 semantic_tag_search RPC 不可用時做全庫語義搜尋。
+
+使用方式：
+    python scripts/export_embedding_matrix.py [輸出前綴]
+
+輸出前綴預設為環境變數 EMBEDDING_INDEX_PATH 或 data/embeddings/tag_embeddings，
+API 端設定相同的 EMBEDDING_INDEX_PATH 即可載入。
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+# 讓腳本可以匯入 API 服務模組
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.api.services.embedding_index import export_embeddings_from_database
+
+DEFAULT_INDEX_PATH = "data/embeddings/tag_embeddings"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def export_embedding_matrix(supabase: Client, base_path: str = None) -> dict:
+    """匯出嵌入矩陣（供其他嵌入生成腳本在完成後呼叫）"""
+    base_path = base_path or os.environ.get("EMBEDDING_INDEX_PATH") or DEFAULT_INDEX_PATH
+
+    print(f"Exporting embedding matrix to {base_path} ...")
+    start = time.time()
+    summary = export_embeddings_from_database(supabase, base_path, model=EMBEDDING_MODEL)
+    print(
+        f"Exported {summary['count']} vectors ({summary['dimension']} dims, "
+        f"{summary['n_lists']} IVF lists) in {time.time() - start:.1f}s"
+    )
+    return summary
+
+
+def main():
+    load_dotenv()
+
+    supabase_url = os.environ.get("SUPABASE_URL")
+    supabase_key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_ANON_KEY")
+    if not all([supabase_url, supabase_key]):
+        raise ValueError("Missing required environment variables: SUPABASE_URL, SUPABASE_SERVICE_KEY")
+
+    supabase: Client = create_client(supabase_url, supabase_key)
+    base_path = sys.argv[1] if len(sys.argv) > 1 else None
+    export_embedding_matrix(supabase, base_path)
+
+
+if __name__ == "__main__":
+    main()
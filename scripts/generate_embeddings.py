@@ -49,6 +49,10 @@ def main():
 
             if not tags_to_process:
                 print("All tags have been processed. Exiting.")
+                # 匯出本地嵌入矩陣（設定 EMBEDDING_INDEX_PATH 時）
+                if os.environ.get("EMBEDDING_INDEX_PATH"):
+                    from export_embedding_matrix import export_embedding_matrix
+                    export_embedding_matrix(supabase)
                 break
 
             print(f"Processing a batch of {len(tags_to_process)} tags...")
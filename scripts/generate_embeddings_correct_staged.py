@@ -104,6 +104,11 @@ class CorrectStagedEmbeddingGenerator:
                 }
         
         self.print_final_summary()
+
+        # 匯出本地嵌入矩陣（設定 EMBEDDING_INDEX_PATH 時）
+        if os.environ.get("EMBEDDING_INDEX_PATH"):
+            from export_embedding_matrix import export_embedding_matrix
+            export_embedding_matrix(self.supabase)
     
     async def process_stage_correctly(self, stage: Dict):
         """正確處理單一階段 - 只處理當前階段範圍的標籤"""
@@ -111,6 +111,11 @@ class StagedEmbeddingGenerator:
                 }
         
         self.print_final_summary()
+
+        # 匯出本地嵌入矩陣（設定 EMBEDDING_INDEX_PATH 時）
+        if os.environ.get("EMBEDDING_INDEX_PATH"):
+            from export_embedding_matrix import export_embedding_matrix
+            export_embedding_matrix(self.supabase)
     
     async def process_stage(self, stage_id: str, stage_config: Dict):
         """處理單一階段"""
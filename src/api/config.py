@@ -42,16 +42,22 @@ class Settings(BaseSettings):
     
     # 快取設定
     cache_ttl_seconds: int = 3600  # 1 小時
-    cache_max_size: int = 1000
+    cache_max_size: int = 1000  # 每個記憶體快取的最大項目數
+    cache_max_bytes: int = 64 * 1024 * 1024  # 每個記憶體快取的最大位元組數（0 表示不限制）
+    cache_sweep_interval_seconds: int = 60  # 背景清理過期項目的間隔
     
     # LLM 設定
     llm_default_max_tags: int = 10
     llm_min_popularity: int = 100
+    llm_candidate_limit: int = 1000  # 兩階段推薦粗篩的候選數量
     llm_exclude_adult_default: bool = True
     
     # 效能設定
     request_timeout_seconds: int = 30
     db_connection_pool_size: int = 10
+    db_max_concurrency: int = 32  # 同時進行的資料庫查詢上限（HTTP/2 可在同一連線多工）
+    db_timeout_seconds: float = 10.0  # 單一查詢逾時（含排隊時間）
+    db_http2: bool = True
     
     # 日誌設定
     log_level: str = "INFO"
@@ -69,6 +75,67 @@ class Settings(BaseSettings):
     hybrid_l1_ttl: int = 300
     hybrid_l2_ttl: int = 3600
 
+    # 標籤儲存後端（supabase / sqlite）；sqlite 為唯讀本地檔案，由 scripts/build_local_tag_db.py 產生
+    tag_storage_backend: str = "supabase"
+    tag_storage_path: str = "data/tags.db"
+    tag_storage_mmap_bytes: int = 256 * 1024 * 1024
+
+    # 標籤快照設定（行程內標籤字典）
+    tag_snapshot_enabled: bool = True
+    tag_snapshot_path: Optional[str] = None  # 本地傾印（.jsonl/.json/.db），未設定則從標籤儲存後端載入
+    tag_snapshot_refresh_seconds: int = 3600  # 0 表示只在啟動時載入
+    tag_snapshot_page_size: int = 1000
+
+    # 標籤統計（預先彙總，需先執行 scripts/17_tag_statistics.sql；未套用時退回全表計數）
+    tag_statistics_refresh_seconds: int = 300  # 快取超過此時間後於背景刷新，0 表示只在啟動時計算
+
+    # 標籤匯出：回傳的 watermark 比已匯出的最大 updated_at 早此秒數，
+    # 涵蓋匯出時尚未提交、updated_at（交易開始時間）較早的更新；客戶端依名稱 upsert 即可去重
+    tag_export_watermark_margin_seconds: int = 300
+
+    # 語義搜尋本地索引（scripts/export_embedding_matrix.py 匯出的檔案前綴）
+    embedding_index_path: Optional[str] = None
+    embedding_index_nprobe: int = 8
+
+    # 查詢嵌入快取（memory / sqlite / redis）
+    embedding_cache_enabled: bool = True
+    embedding_cache_size: int = 2048
+    embedding_cache_backend: str = "memory"
+    embedding_cache_path: str = "data/embedding_cache.db"
+    embedding_cache_ttl: int = 30 * 24 * 3600  # 同模型的嵌入結果不會改變，TTL 只用於回收空間
+
+    # 預先計算的內容等級欄位（scripts/14_add_content_level.sql + scripts/compute_content_levels.py）
+    content_level_column_enabled: bool = True
+    content_level_recheck_seconds: int = 600  # 重新確認欄位版本與分級規則一致的間隔
+
+    # 外部標籤別名檔（Danbooru tag_aliases 匯出 .csv 或 .json），與內建別名表合併
+    tag_alias_path: Optional[str] = None
+
+    # Moderation 判定快取（memory / redis）
+    moderation_cache_enabled: bool = True
+    moderation_cache_size: int = 4096
+    moderation_cache_backend: str = "memory"
+    moderation_cache_ttl: int = 24 * 3600
+
+    # Inspire Session 寫後快取（scripts/15_session_write_behind.sql）
+    session_write_behind_enabled: bool = True
+    session_flush_interval_seconds: float = 5.0  # 背景補寫未 flush 變更的間隔
+
+    # 使用數據記錄（log / database，database 需先執行 scripts/16_api_usage_logs.sql）
+    usage_log_enabled: bool = True
+    usage_log_backend: str = "log"
+    usage_log_queue_size: int = 10000
+    usage_log_batch_size: int = 100
+    usage_log_flush_interval: float = 2.0
+    usage_log_overflow_policy: str = "drop_newest"  # drop_newest / drop_oldest / block
+    usage_log_spool_path: str = "data/usage_spool.jsonl"  # 資料庫無法連線時的本地暫存
+    usage_log_spool_max_bytes: int = 50 * 1024 * 1024
+    usage_log_replay_interval: float = 60.0
+
+    # 階段耗時指標（/metrics）
+    metrics_reservoir_size: int = 1024  # 每個階段保留最近幾筆樣本計算 p50/p95/p99
+    server_timing_enabled: bool = False  # 在回應加上 Server-Timing 標頭
+
     # OpenAI / GPT-5 設定
     openai_api_key: Optional[str] = None
     openai_model: str = "gpt-5-mini"  # gpt-5-nano, gpt-5-mini, gpt-5, gpt-4o, gpt-4o-mini
@@ -77,6 +144,12 @@ class Settings(BaseSettings):
     openai_timeout: int = 30
     enable_openai_integration: bool = True  # 預設啟用，可透過環境變數覆蓋
 
+    # Inspire Agent 設定
+    inspire_tool_turn_timeout_seconds: float = 20.0  # 同一輪並行工具呼叫的總期限
+    inspire_followup_deadline_seconds: float = 20.0  # 提交工具輸出後等待文字回覆的總期限
+    inspire_poll_initial_delay_seconds: float = 0.05  # 輪詢退避的初始間隔
+    inspire_poll_max_delay_seconds: float = 1.0  # 輪詢退避的最大間隔
+
     # 代理設定（公司網路可選）
     http_proxy: Optional[str] = None  # e.g. http://proxy.company.com:8080
     https_proxy: Optional[str] = None  # e.g. http://proxy.company.com:8080
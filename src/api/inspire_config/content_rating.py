@@ -3,7 +3,10 @@
 支援全年齡、付費用戶、封禁內容的多級管理
 """
 
-from typing import Literal
+from collections import deque
+import hashlib
+import json
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Tuple
 
 ContentLevel = Literal["all-ages", "r15", "r18", "blocked"]
 
@@ -66,6 +69,192 @@ SAFE_CONTENT = [
 # 分級函數
 # ============================================
 
+# 權限等級
+ACCESS_HIERARCHY = {
+    "all-ages": 0,
+    "r15": 1,
+    "r18": 2,
+    "blocked": 999  # 永不允許
+}
+
+
+def compute_rating_version(tiers: Sequence[Tuple[ContentLevel, Sequence[str]]]) -> str:
+    """
+    分級規則的版本指紋（關鍵字列表任何變動都會改變版本）
+    
+    資料庫預先計算的 content_level 欄位記錄此版本，版本不符時需要重新計算。
+    """
+    payload = json.dumps(
+        [[level, sorted(k.lower() for k in keywords)] for level, keywords in tiers],
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def max_allowed_level(user_access_level: str) -> int:
+    """使用者可見的最高內容等級值（對應 ACCESS_HIERARCHY，封禁內容永不包含）"""
+    return min(ACCESS_HIERARCHY.get(user_access_level, 0), ACCESS_HIERARCHY["r18"])
+
+
+class ContentRatingAutomaton:
+    """
+    多模式關鍵字自動機（Aho–Corasick）
+    
+    所有等級的關鍵字編譯進同一個自動機，一次掃描標籤即可得出命中的最嚴格等級；
+    掃描成本只與標籤長度相關，與關鍵字數量無關。
+    """
+    
+    def __init__(self, tiers: Sequence[Tuple[ContentLevel, Iterable[str]]]):
+        """
+        Args:
+            tiers: (等級, 關鍵字) 列表，依嚴格程度由高到低排列
+        """
+        self.levels: List[ContentLevel] = [level for level, _ in tiers]
+        self._no_match = len(self.levels)
+        
+        # 節點轉移、失敗鏈、節點（含失敗鏈上所有輸出）可命中的最嚴格等級
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._rank: List[int] = [self._no_match]
+        self.pattern_count = 0
+        
+        for rank, (_, keywords) in enumerate(tiers):
+            for keyword in keywords:
+                self._insert(keyword.lower(), rank)
+        self._build_failure_links()
+    
+    def _insert(self, keyword: str, rank: int) -> None:
+        if not keyword:
+            return
+        node = 0
+        for ch in keyword:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._rank.append(self._no_match)
+            node = next_node
+        self._rank[node] = min(self._rank[node], rank)
+        self.pattern_count += 1
+    
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # 失敗鏈上的模式也是當前位置的後綴，合併其等級
+                self._rank[child] = min(self._rank[child], self._rank[self._fail[child]])
+                queue.append(child)
+    
+    def match_rank(self, text: str) -> int:
+        """返回命中的最嚴格等級索引（未命中返回等級數量）"""
+        goto, fail, ranks = self._goto, self._fail, self._rank
+        best = self._no_match
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            rank = ranks[node]
+            if rank < best:
+                best = rank
+                if best == 0:
+                    break  # 已命中最嚴格等級
+        return best
+    
+    def classify(self, text: str) -> Optional[ContentLevel]:
+        """返回命中的最嚴格等級（未命中返回 None）"""
+        rank = self.match_rank(text.lower())
+        return self.levels[rank] if rank < self._no_match else None
+
+
+class ContentRater:
+    """
+    內容分級器（編譯後的自動機 + 結果記憶表）
+    
+    標籤字典有限且高度重複，記憶表讓熱門標籤的分級成為一次字典查詢。
+    """
+    
+    def __init__(
+        self,
+        blocked_keywords: Iterable[str] = BLOCKED_KEYWORDS,
+        r18_keywords: Iterable[str] = R18_KEYWORDS,
+        r15_keywords: Iterable[str] = R15_KEYWORDS,
+        memo_size: int = 65536,
+    ):
+        tiers = [
+            ("blocked", list(blocked_keywords)),
+            ("r18", list(r18_keywords)),
+            ("r15", list(r15_keywords)),
+        ]
+        self.automaton = ContentRatingAutomaton(tiers)
+        self.version = compute_rating_version(tiers)
+        self.memo_size = memo_size
+        self._memo: Dict[str, ContentLevel] = {}
+        self.stats = {"hits": 0, "misses": 0}
+    
+    def classify(self, tag_name: str) -> ContentLevel:
+        """分類單一標籤"""
+        level = self._memo.get(tag_name)
+        if level is not None:
+            self.stats["hits"] += 1
+            return level
+        
+        self.stats["misses"] += 1
+        level = self.automaton.classify(tag_name) or "all-ages"
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[tag_name] = level
+        return level
+    
+    def classify_many(self, tags: Iterable[str]) -> List[ContentLevel]:
+        """批次分類（重複標籤只計算一次），結果順序與輸入相同"""
+        levels: Dict[str, ContentLevel] = {}
+        result = []
+        for tag in tags:
+            level = levels.get(tag)
+            if level is None:
+                level = levels[tag] = self.classify(tag)
+            result.append(level)
+        return result
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "memo_size": len(self._memo),
+            "patterns": self.automaton.pattern_count,
+            "version": self.version,
+        }
+
+
+_content_rater: Optional[ContentRater] = None
+
+
+def get_content_rater() -> ContentRater:
+    """獲取內容分級器（單例，首次使用時編譯關鍵字）"""
+    global _content_rater
+    
+    if _content_rater is None:
+        _content_rater = ContentRater()
+    
+    return _content_rater
+
+
+def rebuild_content_rater() -> ContentRater:
+    """修改分級關鍵字列表後重新編譯（同時清空記憶表）"""
+    global _content_rater
+    
+    _content_rater = ContentRater()
+    return _content_rater
+
+
 def classify_content_level(tag_name: str) -> ContentLevel:
     """
     基於關鍵字分類內容等級
@@ -74,25 +263,36 @@ def classify_content_level(tag_name: str) -> ContentLevel:
         tag_name: 標籤名稱
     
     Returns:
-        "blocked" | "r18" | "r15" | "all-ages"
+        "blocked" | "r18" | "r15" | "all-ages"（同時命中多個等級時取最嚴格者）
     """
+    return get_content_rater().classify(tag_name)
+
+
+def classify_many(tags: Iterable[str]) -> List[ContentLevel]:
+    """
+    批次分類內容等級
     
-    tag_lower = tag_name.lower()
-    
-    # 優先級 1: 檢查封禁（最嚴格）
-    if any(kw in tag_lower for kw in BLOCKED_KEYWORDS):
-        return "blocked"
-    
-    # 優先級 2: 檢查 R18
-    if any(kw in tag_lower for kw in R18_KEYWORDS):
-        return "r18"
+    Args:
+        tags: 標籤名稱
     
-    # 優先級 3: 檢查 R15
-    if any(kw in tag_lower for kw in R15_KEYWORDS):
-        return "r15"
+    Returns:
+        與輸入順序相同的等級列表
+    """
+    return get_content_rater().classify_many(tags)
+
+
+def is_tag_allowed(tag_name: str, user_access_level: ContentLevel = "all-ages") -> bool:
+    """
+    檢查單一標籤是否符合使用者權限（封禁內容永不允許）
     
-    # 預設：全年齡
-    return "all-ages"
+    Args:
+        tag_name: 標籤名稱
+        user_access_level: 使用者權限
+    """
+    level = classify_content_level(tag_name)
+    if level == "blocked":
+        return False
+    return ACCESS_HIERARCHY[level] <= ACCESS_HIERARCHY.get(user_access_level, 0)
 
 
 def filter_tags_by_user_access(
@@ -114,14 +314,6 @@ def filter_tags_by_user_access(
         (allowed_tags, removed_tags, metadata)
     """
     
-    # 定義權限等級
-    ACCESS_HIERARCHY = {
-        "all-ages": 0,
-        "r15": 1,
-        "r18": 2,
-        "blocked": 999  # 永不允許
-    }
-    
     user_level = ACCESS_HIERARCHY.get(user_access_level, 0)
     
     allowed = []
@@ -133,8 +325,7 @@ def filter_tags_by_user_access(
         "reasons": []
     }
     
-    for tag in tags:
-        tag_level_name = classify_content_level(tag)
+    for tag, tag_level_name in zip(tags, classify_many(tags)):
         tag_level = ACCESS_HIERARCHY[tag_level_name]
         
         # 封禁內容永不允許
@@ -262,13 +262,16 @@ def resolve_alias(tag: str) -> str:
     """
     解析別名為標準標籤
     
+    使用統一的別名圖（TAG_ALIASES + tag_mappings.TAG_ALIAS_MAP + 外部別名檔，已計算傳遞閉包）
+    
     Args:
         tag: 可能是別名的標籤
     
     Returns:
         標準標籤名稱
     """
-    return TAG_ALIASES.get(tag.lower(), tag)
+    from .tag_aliases import get_alias_graph
+    return get_alias_graph().resolve(tag)
 
 
 # ============================================
@@ -0,0 +1,187 @@
+"""
+Tag Alias Graph
+統一的標籤別名圖 - 合併 database_mappings.TAG_ALIASES、tag_mappings.TAG_ALIAS_MAP
+與可選的外部別名檔（例如 Danbooru tag_aliases 匯出），預先計算傳遞閉包
+
+設計原則：
+1. 別名 → 標準標籤直接指向最終標準標籤（a → b → c 解析為 a → c），查詢 O(1)
+2. 同時維護標準標籤 → 全部別名的反向索引
+3. 同一別名有多個目標時以先出現者為準；形成循環的邊會被捨棄並記錄
+4. 冗餘檢查依標準標籤分組，整個標籤列表 O(n)
+"""
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+import csv
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AliasGraph:
+    """預先編譯的別名圖（別名 ↔ 標準標籤）"""
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]]):
+        edges: Dict[str, str] = {}
+        self.conflicts: List[Tuple[str, str, str]] = []
+        for alias, canonical in pairs:
+            alias, canonical = alias.strip().lower(), canonical.strip().lower()
+            if not alias or not canonical or alias == canonical:
+                continue
+            existing = edges.get(alias)
+            if existing is None:
+                edges[alias] = canonical
+            elif existing != canonical:
+                self.conflicts.append((alias, existing, canonical))
+
+        self.cycles: List[List[str]] = []
+        self._canonical: Dict[str, str] = {}
+        for alias in list(edges):
+            self._resolve_edge(alias, edges)
+
+        aliases: Dict[str, set] = {}
+        for alias, canonical in self._canonical.items():
+            aliases.setdefault(canonical, set()).add(alias)
+        self._aliases: Dict[str, FrozenSet[str]] = {k: frozenset(v) for k, v in aliases.items()}
+
+        if self.cycles:
+            logger.warning(f"⚠️ Tag alias cycles broken: {self.cycles[:5]}")
+        if self.conflicts:
+            logger.warning(f"⚠️ Tag aliases with conflicting targets (first kept): {self.conflicts[:5]}")
+
+    def _resolve_edge(self, start: str, edges: Dict[str, str]) -> None:
+        """沿別名鏈找到最終標準標籤，並把整條路徑直接指向它"""
+        path: List[str] = []
+        on_path = set()
+        node = start
+        while node in edges and node not in self._canonical:
+            if node in on_path:
+                # 循環：捨棄指回路徑的邊，讓該節點成為標準標籤
+                cycle = path[path.index(node):]
+                self.cycles.append(cycle)
+                root = cycle[-1]
+                del edges[root]
+                path = path[:path.index(root)]
+                break
+            path.append(node)
+            on_path.add(node)
+            node = edges[node]
+        else:
+            root = self._canonical.get(node, node)
+
+        for alias in path:
+            if alias != root:
+                self._canonical[alias] = root
+
+    def __len__(self) -> int:
+        return len(self._canonical)
+
+    def resolve(self, tag: str) -> str:
+        """解析別名為標準標籤（不是別名時原樣返回）"""
+        return self._canonical.get(tag.lower(), tag)
+
+    def is_alias(self, tag: str) -> bool:
+        return tag.lower() in self._canonical
+
+    def aliases_of(self, canonical: str) -> FrozenSet[str]:
+        """標準標籤的全部別名（含間接別名）"""
+        return self._aliases.get(canonical.lower(), frozenset())
+
+    def find_redundancies(self, tags: Iterable[str]) -> List[Tuple[str, str]]:
+        """
+        找出指向同一標準標籤的重複標籤
+
+        Returns:
+            [(redundant_tag, kept_tag), ...]；標準標籤在列表中時保留它，
+            否則保留最先出現的別名
+        """
+        groups: Dict[str, List[str]] = {}
+        for tag in dict.fromkeys(tags):
+            groups.setdefault(self._canonical.get(tag.lower(), tag.lower()), []).append(tag)
+
+        redundancies = []
+        for canonical, members in groups.items():
+            if len(members) < 2:
+                continue
+            kept = next((t for t in members if t.lower() == canonical), members[0])
+            redundancies.extend((tag, kept) for tag in members if tag != kept)
+        return redundancies
+
+    def get_stats(self) -> Dict[str, int]:
+        """別名圖統計"""
+        return {
+            "aliases": len(self._canonical),
+            "canonical_tags": len(self._aliases),
+            "cycles": len(self.cycles),
+            "conflicts": len(self.conflicts),
+        }
+
+
+def load_alias_file(path: str) -> List[Tuple[str, str]]:
+    """
+    讀取外部別名檔
+
+    支援：
+    - .csv：Danbooru tag_aliases 匯出（antecedent_name, consequent_name[, status]），只取 active
+    - .json：{alias: canonical} 或 [[alias, canonical], ...]
+    """
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return [
+                (row["antecedent_name"], row["consequent_name"])
+                for row in csv.DictReader(f)
+                if row.get("status", "active") in ("active", "")
+            ]
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return list(data.items())
+    return [(alias, canonical) for alias, canonical in data]
+
+
+def default_alias_pairs(path: Optional[str] = None) -> List[Tuple[str, str]]:
+    """內建別名表（database_mappings 優先於 tag_mappings）與外部別名檔"""
+    from .database_mappings import TAG_ALIASES
+    from .tag_mappings import TAG_ALIAS_MAP
+
+    pairs = list(TAG_ALIASES.items()) + list(TAG_ALIAS_MAP.items())
+    if path:
+        try:
+            pairs.extend(load_alias_file(path))
+        except Exception as e:
+            logger.warning(f"⚠️ Tag alias file not loaded ({path}): {e}")
+    return pairs
+
+
+# 全局單例
+_alias_graph: Optional[AliasGraph] = None
+
+
+def _alias_file_path() -> Optional[str]:
+    try:
+        try:
+            from ..config import settings
+        except Exception:
+            from src.api.config import settings
+        return settings.tag_alias_path
+    except Exception:
+        return None
+
+
+def get_alias_graph() -> AliasGraph:
+    """獲取別名圖（首次使用時建立）"""
+    global _alias_graph
+
+    if _alias_graph is None:
+        _alias_graph = AliasGraph(default_alias_pairs(_alias_file_path()))
+        logger.info(f"✅ Tag alias graph built: {_alias_graph.get_stats()}")
+
+    return _alias_graph
+
+
+def rebuild_alias_graph() -> AliasGraph:
+    """別名表變更後重建別名圖"""
+    global _alias_graph
+
+    _alias_graph = None
+    return get_alias_graph()
@@ -11,6 +11,8 @@ Tag 別名映射與快速調整控件配置
 3. 前端不顯示固定按鈕，改用自由文字輸入框
 """
 
+from typing import List, Tuple
+
 # ============================================
 # Tag 別名映射（教學詞 → 資料庫標準詞）
 # 用途：解析使用者或範例中的非標準詞彙
@@ -238,8 +240,9 @@ PARAMETER_PRESETS = {
 # ============================================
 
 def resolve_tag_alias(tag: str) -> str:
-    """解析別名為 canonical tag"""
-    return TAG_ALIAS_MAP.get(tag.lower(), tag)
+    """解析別名為 canonical tag（與 database_mappings.resolve_alias 共用別名圖）"""
+    from .tag_aliases import get_alias_graph
+    return get_alias_graph().resolve(tag)
 
 def apply_quick_adjustment(
     current_tags: List[str],
@@ -6,7 +6,7 @@ Prompt-Scribe API - Main Application
 """
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import time
 import logging
@@ -101,11 +101,94 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Cache initialization failed: {e}")
     
+    # 啟動記憶體快取的背景過期清理
+    try:
+        from src.api.services.cache_manager import start_cache_sweeper
+        start_cache_sweeper()
+    except Exception as e:
+        logger.warning(f"Cache sweeper initialization failed: {e}")
+    
+    # 選擇標籤儲存後端（本地 SQLite 無法開啟時退回 Supabase）
+    try:
+        from src.api.services.tag_storage import get_tag_storage
+        logger.info(f"Tag storage backend: {get_tag_storage().name}")
+    except Exception as e:
+        logger.warning(f"Tag storage initialization failed: {e}")
+    
+    # 載入標籤快照（背景執行並定期刷新，不阻塞啟動）
+    snapshot_store = None
+    if settings.tag_snapshot_enabled:
+        try:
+            from src.api.services.tag_snapshot import get_tag_snapshot_store
+            snapshot_store = get_tag_snapshot_store()
+            snapshot_store.start_refresh_loop()
+            logger.info("Tag snapshot loading started in background")
+        except Exception as e:
+            logger.warning(f"Tag snapshot initialization failed: {e}")
+    
+    # 標籤統計：快照未載入時從 tag_statistics 預先讀取並定期刷新
+    statistics_service = None
+    try:
+        from src.api.services.tag_statistics import get_tag_statistics_service
+        statistics_service = get_tag_statistics_service()
+        statistics_service.start_refresh_loop()
+    except Exception as e:
+        logger.warning(f"Tag statistics initialization failed: {e}")
+    
+    # Session 寫後快取：定時補寫未 flush 的變更
+    session_store = None
+    try:
+        from src.api.services.session_store import get_session_store
+        session_store = get_session_store()
+        if session_store is not None:
+            session_store.start_flush_loop()
+    except Exception as e:
+        logger.warning(f"Session write-behind store initialization failed: {e}")
+    
     yield
     
     # 關閉時執行
     logger.info("Shutting down API server")
     
+    if snapshot_store is not None:
+        await snapshot_store.stop_refresh_loop()
+    
+    if statistics_service is not None:
+        await statistics_service.stop_refresh_loop()
+    
+    try:
+        from src.api.services.cache_manager import stop_cache_sweeper
+        await stop_cache_sweeper()
+    except Exception as e:
+        logger.warning(f"Cache sweeper shutdown error: {e}")
+    
+    # 寫出佇列中的使用數據記錄（需在關閉連線池之前）
+    try:
+        from src.api.services.usage_logger import get_usage_logger
+        await get_usage_logger().close()
+    except Exception as e:
+        logger.warning(f"Usage logger shutdown error: {e}")
+    
+    # 寫出尚未 flush 的 Session 變更（需在關閉連線池之前）
+    if session_store is not None:
+        try:
+            await session_store.stop_flush_loop()
+        except Exception as e:
+            logger.warning(f"Session write-behind store shutdown error: {e}")
+    
+    try:
+        from src.api.services.tag_storage import close_tag_storage
+        await close_tag_storage()
+    except Exception as e:
+        logger.warning(f"Tag storage shutdown error: {e}")
+    
+    # 關閉非同步資料庫連線池
+    try:
+        from src.api.services.async_db import close_async_database
+        await close_async_database()
+    except Exception as e:
+        logger.warning(f"Async database shutdown error: {e}")
+    
     # 清理 Redis 連接
     if settings.cache_strategy in ['redis', 'hybrid']:
         try:
@@ -174,12 +257,24 @@ if MIDDLEWARE_AVAILABLE:
 # 請求計時中間件
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
-    """添加請求處理時間到回應標頭"""
-    start_time = time.time()
+    """添加請求處理時間到回應標頭，並記錄各階段耗時"""
+    from src.api.services.metrics import format_server_timing, record_duration, start_request_timing
+    
+    timings = start_request_timing()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = (time.time() - start_time) * 1000  # 轉換為毫秒
+    elapsed = time.perf_counter() - start_time
+    process_time = elapsed * 1000  # 轉換為毫秒
     response.headers["X-Process-Time-Ms"] = str(round(process_time, 2))
     
+    if settings.server_timing_enabled:
+        response.headers["Server-Timing"] = format_server_timing(timings, total_seconds=elapsed)
+    
+    # 以路由樣板記錄（避免路徑參數造成標籤爆量；未匹配的路由不記錄）
+    route = request.scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        record_duration(f"http {request.method} {route.path}", elapsed)
+    
     # 記錄慢請求
     if process_time > 1000:  # 超過 1 秒
         logger.warning(
@@ -253,6 +348,54 @@ async def cache_health():
     return await strategy_manager.health_check()
 
 
+# 標籤快照狀態端點
+@app.get("/cache/snapshot")
+async def tag_snapshot_status():
+    """標籤快照狀態端點"""
+    from src.api.services.tag_snapshot import get_tag_snapshot_store
+    
+    return get_tag_snapshot_store().get_stats()
+
+
+# 查詢嵌入快取狀態端點
+@app.get("/cache/embeddings")
+async def embedding_cache_status():
+    """查詢嵌入快取狀態端點"""
+    from src.api.services.embedding_cache import get_embedding_cache
+
+    return get_embedding_cache().get_stats()
+
+
+# Prometheus 指標端點
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """各處理階段耗時直方圖（Prometheus 文字格式）"""
+    from src.api.services.metrics import get_metrics_registry
+    
+    return PlainTextResponse(
+        get_metrics_registry().render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# 各階段耗時摘要端點
+@app.get("/metrics/stages")
+async def stage_metrics():
+    """各處理階段的 p50 / p95 / p99（毫秒）"""
+    from src.api.services.metrics import get_stage_summary
+    
+    return get_stage_summary()
+
+
+# 非同步資料庫連線池狀態端點
+@app.get("/health/db")
+async def async_db_status():
+    """非同步資料庫連線池狀態端點"""
+    from src.api.services.async_db import get_async_database
+
+    return get_async_database().get_stats()
+
+
 # 導入路由（相容不同啟動路徑；僅在缺少 src 套件時才退回）
 try:
     from src.api.routers.v1 import tags, search, statistics
@@ -88,6 +88,45 @@ class LLMRecommendRequest(BaseModel):
         return v.strip()
 
 
+class LLMBatchRecommendRequest(BaseModel):
+    """LLM 批次標籤推薦請求"""
+    descriptions: List[str] = Field(
+        ...,
+        min_items=1,
+        max_items=1000,
+        description="多筆自然語言描述（結果依相同順序以 NDJSON 串流返回）",
+        examples=[["a lonely girl in cyberpunk city at night", "a cat sleeping on a sofa"]]
+    )
+    max_tags: int = Field(
+        10,
+        ge=1,
+        le=50,
+        description="每筆描述最多返回的標籤數量"
+    )
+    min_popularity: int = Field(
+        100,
+        ge=0,
+        description="最低流行度閾值"
+    )
+    balance_categories: bool = Field(
+        True,
+        description="是否平衡不同分類的標籤"
+    )
+    
+    @validator('descriptions')
+    def validate_descriptions(cls, v):
+        """驗證每筆描述"""
+        cleaned = []
+        for description in v:
+            description = description.strip()
+            if not description:
+                raise ValueError('Description cannot be empty')
+            if len(description) > 500:
+                raise ValueError('Description must be at most 500 characters')
+            cleaned.append(description)
+        return cleaned
+
+
 class LLMValidateRequest(BaseModel):
     """LLM 標籤驗證請求"""
     tags: List[str] = Field(
@@ -162,9 +162,11 @@ class SearchByKeywordsResponse(BaseModel):
 class TagListResponse(BaseModel):
     """標籤列表回應"""
     data: List[TagResponse]
-    total: int
+    total: Optional[int] = Field(..., description="總數（游標分頁時為估計值，有名稱篩選時為 null）")
     limit: int
     offset: int
+    next_cursor: Optional[str] = Field(None, description="下一頁游標（游標分頁，最後一頁為 null）")
+    total_is_estimate: bool = Field(False, description="total 是否為估計值")
 
 
 class StatsResponse(BaseModel):
@@ -174,6 +176,10 @@ class StatsResponse(BaseModel):
     classified_count: int
     unclassified_count: int
     classification_rate: float
+    subcategory_distribution: Dict[str, Dict[str, int]] = Field(default_factory=dict, description="各主分類下的副分類分佈")
+    popularity_distribution: Dict[str, int] = Field(default_factory=dict, description="流行度等級分佈")
+    source: Optional[str] = Field(None, description="統計來源（snapshot / supabase / sqlite）")
+    computed_at: Optional[float] = Field(None, description="統計計算時間（Unix 時間戳）")
 
 
 class ErrorResponse(BaseModel):
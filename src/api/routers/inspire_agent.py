@@ -9,12 +9,13 @@ Date: 2025-10-22
 
 import os
 import uuid
+import asyncio
 import logging
 from typing import Annotated
 from datetime import datetime
 
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from openai import AsyncOpenAI
 
 from agents import Agent, Runner, function_tool, set_default_openai_key, ModelSettings
@@ -66,6 +67,8 @@ try:
     from src.api.services.content_safety_filter import ContentSafetyFilter, get_safety_filter
     from src.api.services.inspire_state_machine import InspireStateMachine, InspirePhase
     from src.api.services.inspire_tone_linter import InspireToneLinter
+    from src.api.services.inspire_events import InspireEventStream, emit_event, format_sse, has_event_stream
+    from src.api.services.metrics import timed
     from src.api.tools.inspire_tools import (
         understand_intent,
         search_examples,
@@ -80,6 +83,8 @@ except ImportError:
     from ..services.content_safety_filter import ContentSafetyFilter, get_safety_filter
     from ..services.inspire_state_machine import InspireStateMachine, InspirePhase
     from ..services.inspire_tone_linter import InspireToneLinter
+    from ..services.inspire_events import InspireEventStream, emit_event, format_sse, has_event_stream
+    from ..services.metrics import timed
     from ..tools.inspire_tools import (
     understand_intent,
     search_examples,
@@ -154,6 +159,118 @@ def prepare_tools_for_responses_api() -> typing_Any:
     return tools
 
 
+# 不會再產出文字的 Responses 狀態（提前結束等待）
+_TERMINAL_RESPONSE_STATUSES = {"failed", "cancelled", "incomplete"}
+
+
+def _has_text(text: typing_Any) -> bool:
+    return isinstance(text, str) and bool(text.strip())
+
+
+async def _wait_for_response_text(
+    retrieve,
+    response_id: str,
+    extract_text,
+    deadline: float,
+    all_responses: list,
+):
+    """
+    以指數退避輪詢 Responses API，直到產出文字、進入終止狀態或超過期限
+    
+    Args:
+        retrieve: client.responses.retrieve
+        response_id: 回應 ID
+        extract_text: 從回應提取文字的函數
+        deadline: 事件迴圈時間（loop.time()）的總期限
+        all_responses: 收集每次取得的回應
+        
+    Returns:
+        (最新回應, 是否已有文字)
+    """
+    loop = asyncio.get_running_loop()
+    delay = settings.inspire_poll_initial_delay_seconds
+    polls = 0
+    
+    while True:
+        response = await retrieve(response_id)
+        all_responses.append(response)
+        polls += 1
+        
+        if _has_text(extract_text(response)):
+            logger.info(f"📥 Response {response_id} produced text after {polls} poll(s)")
+            return response, True
+        
+        status = getattr(response, "status", None)
+        if status in _TERMINAL_RESPONSE_STATUSES:
+            logger.warning(f"⚠️ Response {response_id} ended with status '{status}' without text")
+            return response, False
+        
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            logger.warning(f"⏱️ Response {response_id} produced no text before deadline ({polls} polls)")
+            return response, False
+        
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, settings.inspire_poll_max_delay_seconds)
+
+
+async def _execute_function_calls(function_calls: list) -> List[Dict[str, typing_Any]]:
+    """
+    並行執行同一輪的 function_call 項目
+    
+    結果依 function_calls 的順序返回；參數解析失敗或逾時的工具以錯誤字典表示。
+    """
+    import json
+    try:
+        from src.api.tools.inspire_tools import execute_tools_concurrently
+    except ImportError:
+        from ..tools.inspire_tools import execute_tools_concurrently
+    
+    results: List[Optional[Dict[str, typing_Any]]] = [None] * len(function_calls)
+    calls = []
+    positions = []
+    for index, item in enumerate(function_calls):
+        try:
+            tool_args = json.loads(item.arguments) if isinstance(item.arguments, str) else item.arguments
+        except (TypeError, ValueError) as e:
+            logger.error(f"❌ Invalid arguments for tool {item.name}: {e}")
+            results[index] = {"error": f"Invalid tool arguments: {e}", "status": "failed"}
+            continue
+        calls.append((item.name, tool_args))
+        positions.append(index)
+    
+    executed = await execute_tools_concurrently(calls, timeout=settings.inspire_tool_turn_timeout_seconds)
+    for index, tool_result in zip(positions, executed):
+        results[index] = tool_result
+    
+    return results
+
+
+async def _create_response(client: AsyncOpenAI, **params) -> typing_Any:
+    """
+    建立 Responses API 回應
+    
+    串流請求時改用 stream=True，逐段推送模型文字，並返回完成事件中的完整回應；
+    非串流請求與原本的 create 完全相同。
+    """
+    emit_event("status", {"stage": "model_request", "model": params.get("model")})
+    if not has_event_stream():
+        return await client.responses.create(**params)
+    
+    final_response = None
+    stream = await client.responses.create(**params, stream=True)
+    async for event in stream:
+        if event.type == "response.output_text.delta":
+            emit_event("text", {"delta": event.delta})
+        elif event.type in ("response.completed", "response.incomplete", "response.failed"):
+            final_response = event.response
+    
+    if final_response is None:
+        raise RuntimeError("Response stream ended without a final response")
+    return final_response
+
+
+@timed("inspire.agent_run")
 async def run_inspire_with_responses_api(
     client: AsyncOpenAI,
     user_message: str,
@@ -265,7 +382,7 @@ async def run_inspire_with_responses_api(
             else:
                 logger.warning(f"Tool {force_tool_name} not found in available tools: {tool_names}")
 
-        response = await client.responses.create(**create_params)
+        response = await _create_response(client, **create_params)
         
         # 🔑 保存完整的 response.output 到 input_list
         input_list += response.output
@@ -274,43 +391,30 @@ async def run_inspire_with_responses_api(
         turn = 1
         
         # 🔑 關鍵修復：處理強制 tool call（使用 Responses 提交流程）
+        # 同一輪的多個工具呼叫並行執行，結果依原順序組裝
+        import json
         tool_outputs_payload = []
-        for item in response.output:
-            if item.type == "function_call":
-                logger.info(f"🔧 Processing forced tool call: {item.name}")
-                import json
-                tool_args = json.loads(item.arguments) if isinstance(item.arguments, str) else item.arguments
-                try:
-                    try:
-                        from src.api.tools.inspire_tools import execute_tool_by_name
-                    except ImportError:
-                        from ..tools.inspire_tools import execute_tool_by_name
-                    tool_result = execute_tool_by_name(item.name, tool_args)
+        function_calls = [item for item in response.output if item.type == "function_call"]
+        if function_calls:
+            logger.info(f"🔧 Processing {len(function_calls)} forced tool call(s): {[item.name for item in function_calls]}")
+            tool_results = await _execute_function_calls(function_calls)
+            total_tool_calls += len(function_calls)
+            for item, tool_result in zip(function_calls, tool_results):
+                if isinstance(tool_result, dict) and "error" in tool_result:
+                    logger.error(f"❌ Tool {item.name} failed: {tool_result['error']}")
+                    tool_summaries.append(f"{item.name}: error={str(tool_result['error'])[:100]}")
+                else:
                     logger.info(f"✅ Tool {item.name} executed successfully")
                     # 收集摘要（簡化為首層鍵與長度等資訊）
-                    try:
-                        import json as _json
-                        if isinstance(tool_result, dict):
-                            keys = ", ".join(list(tool_result.keys())[:6])
-                            tool_summaries.append(f"{item.name}: keys=[{keys}]")
-                        else:
-                            tool_summaries.append(f"{item.name}: {str(tool_result)[:120]}")
-                    except Exception:
-                        pass
-                    tool_outputs_payload.append({
-                        "tool_call_id": item.call_id,
-                        "output": json.dumps(tool_result, ensure_ascii=False),
-                    })
-                    total_tool_calls += 1
-                except Exception as e:
-                    logger.error(f"❌ Tool execution failed: {e}")
-                    import traceback
-                    logger.error(traceback.format_exc())
-                    tool_outputs_payload.append({
-                        "tool_call_id": item.call_id,
-                        "output": json.dumps({"error": str(e), "status": "failed"}),
-                    })
-                    tool_summaries.append(f"{item.name}: error={str(e)[:100]}")
+                    if isinstance(tool_result, dict):
+                        keys = ", ".join(list(tool_result.keys())[:6])
+                        tool_summaries.append(f"{item.name}: keys=[{keys}]")
+                    else:
+                        tool_summaries.append(f"{item.name}: {str(tool_result)[:120]}")
+                tool_outputs_payload.append({
+                    "tool_call_id": item.call_id,
+                    "output": json.dumps(tool_result, ensure_ascii=False),
+                })
 
         # 若本輪有工具呼叫，提交工具輸出給 Responses API 並拉取更新
         if tool_outputs_payload:
@@ -320,21 +424,15 @@ async def run_inspire_with_responses_api(
                 if _submit is None:
                     raise RuntimeError("responses.submit_tool_outputs not available on client")
                 await _submit(response_id=response.id, tool_outputs=tool_outputs_payload)
-                # 重新取得回應（輪詢直到模型產出文字或超時）
+                # 重新取得回應（指數退避輪詢，有文字即返回；兩段等待共用同一個總期限）
                 _retrieve = getattr(client.responses, "retrieve", None) or getattr(client.responses, "get", None)
                 if _retrieve:
-                    import asyncio as _asyncio
-                    max_checks = 24  # 約 12 秒（每 0.5s）
-                    for _i in range(max_checks):
-                        response = await _retrieve(response.id)
-                        all_responses.append(response)
-                        text_now = _extract_plain_text(response)
-                        if isinstance(text_now, str) and text_now.strip():
-                            break
-                        await _asyncio.sleep(0.5)
-                    # 若仍無文字，追加極短 follow-up 提示並再輪詢一次
-                    latest_text = _extract_plain_text(response)
-                    if not (isinstance(latest_text, str) and latest_text.strip()):
+                    deadline = asyncio.get_running_loop().time() + settings.inspire_followup_deadline_seconds
+                    response, has_text = await _wait_for_response_text(
+                        _retrieve, response.id, _extract_plain_text, deadline, all_responses
+                    )
+                    # 若仍無文字，追加極短 follow-up 提示並在剩餘期限內再等待
+                    if not has_text:
                         try:
                             logger.info("📝 Adding follow-up hint to encourage textual reply after tools")
                             hint_inputs = [
@@ -344,14 +442,13 @@ async def run_inspire_with_responses_api(
                             if _create:
                                 follow = await _create(model=model, input=hint_inputs, previous_response_id=response.id)
                                 all_responses.append(follow)
-                                for _j in range(16):  # 再等 8 秒
-                                    follow = await _retrieve(follow.id)
-                                    all_responses.append(follow)
-                                    txt2 = _extract_plain_text(follow)
-                                    if isinstance(txt2, str) and txt2.strip():
-                                        response = follow
-                                        break
-                                    await _asyncio.sleep(0.5)
+                                has_text = _has_text(_extract_plain_text(follow))
+                                if not has_text:
+                                    follow, has_text = await _wait_for_response_text(
+                                        _retrieve, follow.id, _extract_plain_text, deadline, all_responses
+                                    )
+                                if has_text:
+                                    response = follow
                         except Exception as _hint_err:
                             logger.warning(f"Follow-up hint path failed: {_hint_err}")
             except Exception as submit_err:
@@ -365,37 +462,22 @@ async def run_inspire_with_responses_api(
             if stop_on_first_tool and any(item.type == "function_call" for item in response.output):
                 logger.info("Stop on first tool enabled, implementing official 5-step tool calling flow")
                 
-                # 步驟 3-4: 執行工具並添加結果到 input_list
-                for item in response.output:
-                    if item.type == "function_call":
-                        try:
-                            import json
-                            try:
-                                from src.api.tools.inspire_tools import execute_tool_by_name
-                            except ImportError:
-                                from ..tools.inspire_tools import execute_tool_by_name
-                            tool_args = json.loads(item.arguments) if isinstance(item.arguments, str) else item.arguments
-                            tool_result = execute_tool_by_name(item.name, tool_args)
-                            
-                            # 基於官方文檔：添加 function_call_output
-                            input_list.append({
-                                "type": "function_call_output",
-                                "call_id": item.call_id,
-                                "output": json.dumps(tool_result, ensure_ascii=False)
-                            })
-                            
-                            total_tool_calls += 1
-                            
-                        except Exception as e:
-                            logger.error(f"Tool execution failed: {e}")
-                            input_list.append({
-                                "type": "function_call_output",
-                                "call_id": item.call_id,
-                                "output": json.dumps({"error": str(e)}, ensure_ascii=False)
-                            })
+                # 步驟 3-4: 並行執行工具並依原順序添加結果到 input_list
+                import json
+                function_calls = [item for item in response.output if item.type == "function_call"]
+                tool_results = await _execute_function_calls(function_calls)
+                for item, tool_result in zip(function_calls, tool_results):
+                    # 基於官方文檔：添加 function_call_output
+                    input_list.append({
+                        "type": "function_call_output",
+                        "call_id": item.call_id,
+                        "output": json.dumps(tool_result, ensure_ascii=False)
+                    })
+                total_tool_calls += len(function_calls)
                 
                 # 步驟 5: 發送工具結果給模型獲取最終響應
-                final_response = await client.responses.create(
+                final_response = await _create_response(
+                    client,
                     model=model,
                     input=input_list,
                     tools=tools,
@@ -454,73 +536,42 @@ async def run_inspire_with_responses_api(
             else:
                 # 循環處理工具調用
                 while (turn < max_turns) and (not first_turn_mode):
-                    # 檢查最後一個輸出是否是工具調用
-                    last_output = response.output[-1] if response.output else None
+                    # 檢查本輪輸出是否包含工具調用
+                    function_calls = [item for item in (response.output or []) if item.type == "function_call"]
                     
-                    if not last_output or last_output.type != "function_call":
+                    if not function_calls:
                         # 沒有工具調用，對話完成
                         logger.info(f"✅ Conversation completed after {turn} turns")
                         break
                     
-                    # 有工具調用
-                    function_call = last_output
-                    tool_name = function_call.name
-                    tool_args_raw = function_call.arguments
+                    logger.info(f"🔧 Turn {turn + 1}: Tool calls - {[item.name for item in function_calls]}")
+                    total_tool_calls += len(function_calls)
                     
-                    # 🔍 詳細日誌：打印完整的 function_call 對象
-                    logger.info(f"🔧 Turn {turn + 1}: Tool call - {tool_name}")
-                    logger.info(f"📋 Function call ID: {function_call.id}")
-                    logger.info(f"📋 Function call object: {function_call}")
+                    # 並行執行本輪所有工具（受本輪期限約束）
+                    tool_results = await _execute_function_calls(function_calls)
                     
-                    # 解析工具參數（Responses API 返回的是 JSON 字符串）
-                    import json
-                    if isinstance(tool_args_raw, str):
-                        tool_args = json.loads(tool_args_raw)
-                    else:
-                        tool_args = tool_args_raw
-                    
-                    logger.info(f"📋 Tool args (parsed): {tool_args}")
-                    total_tool_calls += 1
-                    
-                    # 執行工具
-                    try:
-                        try:
-                            from src.api.tools.inspire_tools import execute_tool_by_name
-                        except ImportError:
-                            from ..tools.inspire_tools import execute_tool_by_name
-                        
-                        tool_result = execute_tool_by_name(tool_name, tool_args)
-                        logger.info(f"✅ Tool {tool_name} executed successfully")
-                        logger.info(f"📤 Tool result: {tool_result}")
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Tool execution failed: {e}")
-                        import traceback
-                        logger.error(traceback.format_exc())
-                        tool_result = {"error": str(e)}
-                    
-                    # 下一輪：添加工具輸出到 input_list
+                    # 下一輪：依原順序添加工具輸出到 input_list
                     turn += 1
-                    logger.info(f"📤 Turn {turn}: Sending tool output")
+                    logger.info(f"📤 Turn {turn}: Sending {len(function_calls)} tool output(s)")
                     
-                    # 將工具結果轉換為 JSON 字符串
                     import json
-                    tool_output_str = json.dumps(tool_result, ensure_ascii=False)
-                    
-                    # 🔑 添加工具輸出到 input_list（官方推薦方式）
-                    input_list.append({
-                        "type": "function_call_output",
-                        "call_id": function_call.call_id,
-                        "output": tool_output_str  # JSON 字符串
-                    })
+                    for function_call, tool_result in zip(function_calls, tool_results):
+                        # 將工具結果轉換為 JSON 字符串
+                        tool_output_str = json.dumps(tool_result, ensure_ascii=False)
+                        
+                        # 🔑 添加工具輸出到 input_list（官方推薦方式）
+                        input_list.append({
+                            "type": "function_call_output",
+                            "call_id": function_call.call_id,
+                            "output": tool_output_str  # JSON 字符串
+                        })
+                        logger.info(f"   - {function_call.name} ({function_call.call_id}): {tool_output_str[:200]}...")
                     
-                    logger.info(f"📤 Sending function_call_output:")
-                    logger.info(f"   - call_id: {function_call.call_id}")
-                    logger.info(f"   - output (JSON string): {tool_output_str[:200]}...")
                     logger.info(f"   - input_list length: {len(input_list)}")
                     
                     # 🔑 第二次請求：傳遞完整的 input_list（不使用 previous_response_id）
-                    response = await client.responses.create(
+                    response = await _create_response(
+                        client,
                         model=model,
                         instructions=system_prompt,  # 保持 instructions
                         input=input_list,  # 🔑 完整的對話歷史
@@ -732,7 +783,7 @@ async def get_session_from_id(session_id: str) -> tuple:
     
     # 獲取業務 Session（從資料庫）
     db = get_db_wrapper()
-    business_session = db.get_session(session_id)
+    business_session = await db.get_session(session_id)
     
     if business_session is None:
         raise HTTPException(
@@ -763,9 +814,10 @@ async def create_and_persist_session(
     try:
         db = get_db_wrapper()
         # 先創建 session
-        db.create_session(session_id, user_access_level=user_access_level)
+        await db.create_session(session_id, user_access_level=user_access_level)
         # 再更新資料
-        db.update_session_data(session_id, **business_data)
+        await db.update_session_data(session_id, **business_data)
+        await db.flush_session(session_id)
         logger.info(f"✅ Session {session_id} created and persisted to database")
     except Exception as e:
         logger.error(f"❌ Failed to create/persist session {session_id}: {e}")
@@ -777,6 +829,7 @@ async def persist_session_to_db(
 ):
     """
     後台任務：將 Session 資料持久化到資料庫
+    本輪累積的所有 Session 變更（階段、完成狀態、業務資料）在這裡一次寫入
     
     Args:
         session_id: Session ID
@@ -784,7 +837,8 @@ async def persist_session_to_db(
     """
     try:
         db = get_db_wrapper()
-        db.update_session_data(session_id, **business_data)
+        await db.update_session_data(session_id, **business_data)
+        await db.flush_session(session_id)
         logger.info(f"✅ Session {session_id} persisted to database")
     except Exception as e:
         logger.error(f"❌ Failed to persist session {session_id}: {e}")
@@ -804,7 +858,7 @@ async def log_session_completion(
     """
     try:
         db = get_db_wrapper()
-        db.complete_session(
+        await db.complete_session(
             session_id=session_id,
             quality_score=quality_score,
             final_output=final_output or {}
@@ -849,30 +903,14 @@ async def start_inspire_conversation(
     ```
     """
     
+    moderation = None
     try:
         # P0: 內容安全檢查（API 層）
-        # safety_filter 由依賴注入提供
-        
-        is_safe, reason = await safety_filter.check_user_input(request.message)
-        if not is_safe:
-            logger.warning(f"🚫 Content safety check failed for session: {reason}")
-            # 提供安全替代方案
-            alternatives = await safety_filter.suggest_safe_alternative([])
-            
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": "content_unsafe",
-                    "message": "輸入包含不適當內容",
-                    "reason": reason,
-                    "suggestion": "請嘗試更具體的描述，例如：'夢幻場景'、'光影效果'、'自然元素'",
-                    "safe_alternatives": alternatives[:3]  # 提供前 3 個替代方向
-                }
-            )
+        # safety_filter 由依賴注入提供；與 Session 準備並行，執行 Agent 前取得判定
+        moderation = asyncio.create_task(safety_filter.check_user_input(request.message))
         
         # 1. 生成 Session ID
         session_id = str(uuid.uuid4())
-        logger.info(f"🚀 Starting new Inspire session: {session_id}")
         
         # 2. 創建狀態機
         state_machine = InspireStateMachine(
@@ -896,6 +934,26 @@ async def start_inspire_conversation(
         system_prompt = get_system_prompt(version="full")
         tools = prepare_tools_for_responses_api()
         
+        is_safe, reason = await moderation
+        if not is_safe:
+            logger.warning(f"🚫 Content safety check failed for session: {reason}")
+            # 提供安全替代方案
+            alternatives = await safety_filter.suggest_safe_alternative([])
+            
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": "content_unsafe",
+                    "message": "輸入包含不適當內容",
+                    "reason": reason,
+                    "suggestion": "請嘗試更具體的描述，例如：'夢幻場景'、'光影效果'、'自然元素'",
+                    "safe_alternatives": alternatives[:3]  # 提供前 3 個替代方向
+                }
+            )
+        
+        logger.info(f"🚀 Starting new Inspire session: {session_id}")
+        emit_event("session", {"session_id": session_id})
+        
         # 4. 運行 Agent（使用 Responses API 原生實現）
         logger.info(f"🤖 Running Inspire Agent with Responses API for session {session_id}")
         start_time = datetime.now()
@@ -998,6 +1056,9 @@ async def start_inspire_conversation(
                 directions = extracted_directions
                 phase = "exploring"
         
+        if phase != state_machine.phase.value:
+            emit_event("phase", {"from": state_machine.phase.value, "to": phase, "reason": "agent_run"})
+        
         # 6. 準備 Session 資料
         # 確保 directions 被正確序列化
         if directions:
@@ -1021,14 +1082,14 @@ async def start_inspire_conversation(
         try:
             logger.info(f"🔧 Creating session {session_id} with access level: {request.user_access_level}")
             # 先創建 session
-            create_result = db.create_session(session_id, user_access_level=request.user_access_level)
+            create_result = await db.create_session(session_id, user_access_level=request.user_access_level)
             logger.info(f"🔧 Create session result: {create_result}")
             # 再更新資料
-            update_result = db.update_session_data(session_id, **session_data)
+            update_result = await db.update_session_data(session_id, **session_data)
             logger.info(f"🔧 Update session result: {update_result}")
             
-            # 驗證 session 確實被保存
-            verify_session = db.get_session(session_id)
+            # 一次寫入本輪的所有變更，並驗證 session 確實被保存
+            verify_session = await db.flush_session(session_id)
             if verify_session:
                 logger.info(f"Session {session_id} verified in database")
             else:
@@ -1080,6 +1141,10 @@ async def start_inspire_conversation(
             status_code=500,
             detail=f"Failed to start Inspire session: {str(e)}"
         )
+    finally:
+        # 提前失敗時不再等待安全檢查
+        if moderation is not None and not moderation.done():
+            moderation.cancel()
 
 
 @router.post(
@@ -1115,23 +1180,11 @@ async def continue_inspire_conversation(
     ```
     """
     
+    moderation = None
     try:
         # P0: 內容安全檢查（API 層）
-        # safety_filter 與 client 由依賴注入提供
-        
-        is_safe, reason = await safety_filter.check_user_input(request.message)
-        if not is_safe:
-            logger.warning(f"🚫 Content safety check failed for continue session: {reason}")
-            
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": "content_unsafe",
-                    "message": "輸入包含不適當內容",
-                    "reason": reason,
-                    "suggestion": "請嘗試其他描述方式"
-                }
-            )
+        # safety_filter 與 client 由依賴注入提供；與狀態機恢復並行，有任何寫入前取得判定
+        moderation = asyncio.create_task(safety_filter.check_user_input(request.message))
         
         session_id = request.session_id
         logger.info(f"🔄 Continuing session: {session_id}")
@@ -1156,6 +1209,20 @@ async def continue_inspire_conversation(
                 detail=f"Session {session_id} not found or invalid"
             )
         
+        is_safe, reason = await moderation
+        if not is_safe:
+            logger.warning(f"🚫 Content safety check failed for continue session: {reason}")
+            
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": "content_unsafe",
+                    "message": "輸入包含不適當內容",
+                    "reason": reason,
+                    "suggestion": "請嘗試其他描述方式"
+                }
+            )
+        
         # 2. 檢查中止條件
         should_abort, abort_reason = state_machine.should_abort()
         if should_abort:
@@ -1305,13 +1372,7 @@ async def continue_inspire_conversation(
             "turn_count": result.get("turn_count", 0),
         }
         
-        background_tasks.add_task(
-            persist_session_to_db,
-            session_id,
-            session_data
-        )
-        
-        # 如果完成，記錄
+        # 如果完成，記錄（先於持久化任務，讓完成狀態與本輪變更一起寫入）
         if is_completed:
             # 若無品質分數，使用 0 作為預設
             qs = 0
@@ -1322,6 +1383,12 @@ async def continue_inspire_conversation(
                 final_output or {}
             )
         
+        background_tasks.add_task(
+            persist_session_to_db,
+            session_id,
+            session_data
+        )
+        
         # 7. 構建回應
         created_at_str = business_session.get("created_at")
         updated_at_str = business_session.get("updated_at")
@@ -1363,6 +1430,89 @@ async def continue_inspire_conversation(
             status_code=500,
             detail=f"Failed to continue session: {str(e)}"
         )
+    finally:
+        # 提前失敗時不再等待安全檢查
+        if moderation is not None and not moderation.done():
+            moderation.cancel()
+
+
+def _sse_response(run) -> StreamingResponse:
+    """
+    以 SSE 串流執行 Inspire 端點
+    
+    立即送出 started 事件，執行期間推送 phase / tool / text 事件，
+    最後以 final（完整回應）或 error 事件結束。
+    """
+    stream = InspireEventStream()
+    
+    async def runner():
+        stream.bind()
+        try:
+            result = await run()
+            stream.emit("final", result.model_dump(mode="json"))
+        except HTTPException as e:
+            stream.emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"❌ Streaming Inspire run failed: {e}", exc_info=True)
+            stream.emit("error", {"status_code": 500, "detail": str(e)})
+        finally:
+            stream.close()
+    
+    async def generate():
+        yield format_sse("status", {"stage": "started"})
+        task = asyncio.ensure_future(runner())
+        try:
+            async for message in stream.events():
+                yield message
+        finally:
+            # 客戶端中斷時停止 Agent 執行
+            if not task.done():
+                task.cancel()
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/start/stream",
+    response_class=StreamingResponse,
+    summary="開始 Inspire 對話（SSE 串流）",
+    description="與 /start 相同，但以 Server-Sent Events 即時推送階段、工具與模型文字，最後的 final 事件為完整回應"
+)
+async def start_inspire_conversation_stream(
+    request: InspireStartRequest,
+    background_tasks: BackgroundTasks,
+    client: Annotated[AsyncOpenAI, Depends(get_openai_client)],
+    db: Annotated[InspireDBWrapper, Depends(get_db_wrapper)],
+    safety_filter: Annotated[ContentSafetyFilter, Depends(get_safety_filter)],
+):
+    """開始 Inspire 對話（SSE 串流）"""
+    return _sse_response(
+        lambda: start_inspire_conversation(request, background_tasks, client, db, safety_filter)
+    )
+
+
+@router.post(
+    "/continue/stream",
+    response_class=StreamingResponse,
+    summary="繼續 Inspire 對話（SSE 串流）",
+    description="與 /continue 相同，但以 Server-Sent Events 即時推送階段、工具與模型文字，最後的 final 事件為完整回應"
+)
+async def continue_inspire_conversation_stream(
+    request: InspireContinueRequest,
+    background_tasks: BackgroundTasks,
+    agent: Annotated[Agent, Depends(get_inspire_agent)],
+    db: Annotated[InspireDBWrapper, Depends(get_db_wrapper)],
+    client: Annotated[AsyncOpenAI, Depends(get_openai_client)],
+    safety_filter: Annotated[ContentSafetyFilter, Depends(get_safety_filter)],
+):
+    """繼續 Inspire 對話（SSE 串流）"""
+    return _sse_response(
+        lambda: continue_inspire_conversation(request, background_tasks, agent, db, client, safety_filter)
+    )
 
 
 @router.get(
@@ -1390,7 +1540,7 @@ async def get_inspire_status(
         logger.info(f"📊 Getting status for session: {session_id}")
         
         # 獲取 Session
-        business_session = db.get_session(session_id)
+        business_session = await db.get_session(session_id)
         
         if business_session is None:
             raise HTTPException(
@@ -1469,7 +1619,8 @@ async def submit_inspire_feedback(
             "feedback_at": datetime.now().isoformat(),
         }
         
-        db.update_session_data(request.session_id, **feedback_data)
+        await db.update_session_data(request.session_id, **feedback_data)
+        await db.flush_session(request.session_id)
         
         logger.info(f"✅ Feedback submitted for session {request.session_id}")
         
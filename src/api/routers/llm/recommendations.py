@@ -3,11 +3,14 @@ LLM Recommendations Router
 LLM 智能標籤推薦端點
 """
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
 import logging
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
-from ...models.requests import LLMRecommendRequest
+from ...models.requests import LLMRecommendRequest, LLMBatchRecommendRequest
 from ...models.responses import (
     TagRecommendationResponse, 
     LLMTagRecommendation,
@@ -18,6 +21,10 @@ from ...models.responses import (
 from ...services.supabase_client import get_supabase_service, SupabaseService
 from ...services.keyword_expander import get_keyword_expander, KeywordExpander
 from ...services.keyword_analyzer import get_keyword_analyzer, KeywordAnalyzer
+from ...services.metrics import span
+from ...services.tag_snapshot import get_tag_snapshot
+from ...services.relevance_scorer import BatchRelevanceScorer, rank_tags_by_relevance
+from ...config import settings
 from ...services import get_gpt5_nano_client, GPT5NanoClient, GPT5_AVAILABLE
 
 logger = logging.getLogger(__name__)
@@ -50,7 +57,8 @@ async def convert_gpt5_result_to_response(
         # 從資料庫查詢標籤詳細資訊
         recommended_tags = []
         for tag_name in gpt5_tags:
-            tag_info = await db.get_tag_by_name(tag_name)
+            with span("recommend.gpt5_tag_lookup"):
+                tag_info = await db.get_tag_by_name(tag_name)
             if tag_info:
                 # 構建 LLMTagRecommendation 物件
                 llm_tag = LLMTagRecommendation(
@@ -176,6 +184,153 @@ def calculate_confidence(tag_name: str, keywords: List[str], expanded_keywords:
     return 0.70
 
 
+async def _fetch_stage1_candidates(
+    db: SupabaseService,
+    primary_keyword: str,
+    min_popularity: int
+) -> List[Dict]:
+    """STAGE 1 粗篩：以主要關鍵字取得候選標籤（只取原始數據，不排序）"""
+    snapshot = get_tag_snapshot()
+    if snapshot is not None:
+        # 本地子字串索引（語義同 name ILIKE '%kw%'，依流行度取前 N）
+        return [
+            entry.to_row() for entry in snapshot.search_index.search(
+                [primary_keyword], limit=settings.llm_candidate_limit, min_popularity=min_popularity
+            )
+        ]
+
+    return await db.storage.search_tags(
+        [primary_keyword],
+        limit=settings.llm_candidate_limit,  # 獲取大量候選
+        min_popularity=min_popularity,
+        columns='name, post_count, main_category, sub_category',
+    )
+
+
+async def _fetch_fallback_candidates(
+    db: SupabaseService,
+    expanded_keywords: List[str],
+    max_tags: int,
+    min_popularity: int
+) -> List[Dict]:
+    """主要關鍵字找不到候選時，降級使用所有擴展關鍵字搜尋"""
+    return await db.search_tags_by_keywords(
+        keywords=expanded_keywords,
+        limit=max_tags * 5,
+        min_popularity=min_popularity,
+        use_relevance_ranking=False # 在此階段不需排序
+    )
+
+
+def _build_two_stage_response(
+    query: str,
+    ranked_candidates: List[Dict],
+    total_candidates: int,
+    primary_keyword: str,
+    original_keywords: List[str],
+    expanded_keywords: List[str],
+    max_tags: int,
+    balance_categories: bool,
+    start_time: float
+) -> TagRecommendationResponse:
+    """由精排後的候選標籤構建推薦回應（單筆與批次端點共用）"""
+    # 分類平衡 (如果啟用)
+    if balance_categories:
+        selected_tags = []
+        categories_used = set()
+        for tag in ranked_candidates:
+            if len(selected_tags) >= max_tags:
+                break
+            # 添加到選擇列表，並記錄其分類
+            selected_tags.append(tag)
+            categories_used.add(tag.get('main_category'))
+
+        # 如果分類不夠多樣，嘗試從候選者中補足
+        if len(categories_used) < 3 and len(ranked_candidates) > max_tags:
+            for tag in ranked_candidates[max_tags:]:
+                if len(selected_tags) >= max_tags:
+                    break
+                if tag.get('main_category') not in categories_used:
+                    selected_tags.append(tag)
+                    categories_used.add(tag.get('main_category'))
+
+        final_tags = selected_tags
+    else:
+        final_tags = ranked_candidates[:max_tags]
+
+    logger.info(f"Stage 2 (Fine Grained Ranking) selected {len(final_tags)} tags.")
+
+    # 構建推薦列表
+    recommendations = []
+    for tag_data in final_tags:
+        # 'relevance_score' 來自 rank_tags_by_relevance 的回傳
+        confidence = tag_data.get('relevance_score', 0.7)
+
+        recommendations.append(
+            LLMTagRecommendation(
+                tag=tag_data['name'],
+                confidence=confidence,
+                popularity_tier=calculate_popularity_tier(tag_data.get('post_count', 0)),
+                post_count=tag_data.get('post_count', 0),
+                category=tag_data.get('main_category') or 'UNKNOWN',
+                subcategory=tag_data.get('sub_category'),
+                match_reason=f"匹配主要關鍵字: '{primary_keyword}'",
+                usage_context=get_usage_context(tag_data.get('main_category')),
+                weight=int(tag_data.get('final_score', 0.7) * 10),
+                related_tags=[]
+            )
+        )
+
+    # 計算分類分佈
+    category_distribution = {}
+    for rec in recommendations:
+        category_distribution[rec.category] = category_distribution.get(rec.category, 0) + 1
+
+    # 品質評估
+    overall_score = int(sum(r.confidence for r in recommendations) / len(recommendations) * 100) if recommendations else 0
+    balance_score = min(len(category_distribution) * 25, 100)  # 越多分類越好
+    popularity_score = int(sum(r.post_count for r in recommendations) / len(recommendations) / 10000) if recommendations else 0
+    popularity_score = min(popularity_score, 100)
+
+    quality_assessment = QualityAssessment(
+        overall_score=overall_score,
+        balance_score=balance_score,
+        popularity_score=popularity_score,
+        warnings=[]
+    )
+
+    # 添加警告
+    if len(recommendations) < max_tags:
+        quality_assessment.warnings.append(
+            f"僅找到 {len(recommendations)} 個標籤，少於請求的 {max_tags} 個"
+        )
+    if balance_score < 50:
+        quality_assessment.warnings.append("標籤分類較為單一，建議增加不同類型的關鍵字")
+
+    # 生成建議的 prompt
+    suggested_prompt = ", ".join([r.tag for r in recommendations])
+
+    # 元資料
+    processing_time = (time.time() - start_time) * 1000
+    metadata = RecommendationMetadata(
+        processing_time_ms=round(processing_time, 2),
+        total_candidates=total_candidates,
+        algorithm="keyword_matching_v1",
+        cache_hit=False,
+        keywords_extracted=original_keywords,
+        keywords_expanded=expanded_keywords
+    )
+
+    return TagRecommendationResponse(
+        query=query,
+        recommended_tags=recommendations,
+        category_distribution=category_distribution,
+        quality_assessment=quality_assessment,
+        suggested_prompt=suggested_prompt,
+        metadata=metadata
+    )
+
+
 @router.post(
     "/recommend-tags",
     response_model=TagRecommendationResponse,
@@ -207,161 +362,180 @@ async def recommend_tags(
             gpt5_client = get_gpt5_nano_client()
             if gpt5_client.is_available():
                 logger.info("Using GPT-5 Nano for tag recommendation")
-                gpt5_result = await gpt5_client.generate_tags(request.description)
+                with span("recommend.gpt5"):
+                    gpt5_result = await gpt5_client.generate_tags(request.description)
                 if gpt5_result:
-                    return await convert_gpt5_result_to_response(gpt5_result, db, request)
+                    with span("recommend.gpt5_convert"):
+                        return await convert_gpt5_result_to_response(gpt5_result, db, request)
                 else:
                     logger.warning("GPT-5 Nano failed, falling back to two-stage search")
 
         logger.info("Using two-stage search tag recommendation")
         
         # 1. 關鍵字提取、擴展與分析
-        original_keywords, expanded_keywords = expander.expand_query(request.description)
-        if not original_keywords:
-            raise HTTPException(status_code=400, detail="無法從描述中提取任何關鍵字")
+        with span("recommend.keyword_expansion"):
+            original_keywords, expanded_keywords = expander.expand_query(request.description)
+            if not original_keywords:
+                raise HTTPException(status_code=400, detail="無法從描述中提取任何關鍵字")
 
-        keyword_weights = analyzer.analyze_keyword_importance(original_keywords)
-        primary_keyword = max(keyword_weights, key=keyword_weights.get)
+            keyword_weights = analyzer.analyze_keyword_importance(original_keywords)
+            primary_keyword = max(keyword_weights, key=keyword_weights.get)
         logger.info(f"Keywords: {original_keywords} -> Expanded: {len(expanded_keywords)}")
         logger.info(f"Primary keyword: '{primary_keyword}'")
 
         # 2. STAGE 1: 粗篩 - 使用主要關鍵字獲取大量候選標籤
-        # 這裡我們直接呼叫 Supabase client 的方法，而不是 search_tags_by_keywords
-        # 因為 search_tags_by_keywords 內部已經包含了排序邏輯，而我們只需要原始數據
-        query = db.client.table('tags_final').select('name, post_count, main_category, sub_category') \
-                                             .ilike('name', f'%{primary_keyword}%') \
-                                             .gte('post_count', request.min_popularity) \
-                                             .limit(1000) # 獲取大量候選
-
-        result = await query.execute()
-        candidates = result.data
+        with span("recommend.stage1"):
+            candidates = await _fetch_stage1_candidates(db, primary_keyword, request.min_popularity)
 
         if not candidates:
             logger.warning(f"No candidates found for primary keyword '{primary_keyword}'")
             # 如果主要關鍵字找不到，可以考慮降級到使用所有關鍵字搜尋
-            candidates = await db.search_tags_by_keywords(
-                keywords=expanded_keywords,
-                limit=request.max_tags * 5,
-                min_popularity=request.min_popularity,
-                use_relevance_ranking=False # 在此階段不需排序
-            )
+            with span("recommend.fallback"):
+                candidates = await _fetch_fallback_candidates(db, expanded_keywords, request.max_tags, request.min_popularity)
             if not candidates:
                 raise HTTPException(status_code=404, detail="找不到與您的描述相關的標籤")
 
         logger.info(f"Stage 1 (Coarse Filtering) found {len(candidates)} candidates.")
 
-        # 3. STAGE 2: 精排 - 使用 relevance_scorer 對候選標籤進行排序
-        # 我們直接呼叫 relevance_scorer 中的 rank_tags_by_relevance
-        from services.relevance_scorer import rank_tags_by_relevance
-
-        ranked_candidates = rank_tags_by_relevance(
-            tags=candidates,
-            keywords=original_keywords, # 使用原始關鍵字進行精確排序
-            analyzer=analyzer,
-            relevance_weight=0.7
-        )
-        
-        # 4. 分類平衡 (如果啟用) - 這部分邏輯可以複用
-        if request.balance_categories:
-            selected_tags = []
-            categories_used = set()
-            for tag in ranked_candidates:
-                if len(selected_tags) >= request.max_tags:
-                    break
-                # 添加到選擇列表，並記錄其分類
-                selected_tags.append(tag)
-                categories_used.add(tag.get('main_category'))
-            
-            # 如果分類不夠多樣，嘗試從候選者中補足
-            if len(categories_used) < 3 and len(ranked_candidates) > request.max_tags:
-                for tag in ranked_candidates[request.max_tags:]:
-                    if len(selected_tags) >= request.max_tags:
-                        break
-                    if tag.get('main_category') not in categories_used:
-                        selected_tags.append(tag)
-                        categories_used.add(tag.get('main_category'))
-
-            final_tags = selected_tags
-        else:
-            final_tags = ranked_candidates[:request.max_tags]
-
-        logger.info(f"Stage 2 (Fine Grained Ranking) selected {len(final_tags)} tags.")
-        
-        # 5. 構建推薦列表
-        recommendations = []
-        for tag_data in final_tags:
-            # 'relevance_score' 來自 rank_tags_by_relevance 的回傳
-            confidence = tag_data.get('relevance_score', 0.7)
-
-            recommendations.append(
-                LLMTagRecommendation(
-                    tag=tag_data['name'],
-                    confidence=confidence,
-                    popularity_tier=calculate_popularity_tier(tag_data.get('post_count', 0)),
-                    post_count=tag_data.get('post_count', 0),
-                    category=tag_data.get('main_category') or 'UNKNOWN',
-                    subcategory=tag_data.get('sub_category'),
-                    match_reason=f"匹配主要關鍵字: '{primary_keyword}'",
-                    usage_context=get_usage_context(tag_data.get('main_category')),
-                    weight=int(tag_data.get('final_score', 0.7) * 10),
-                    related_tags=[]
-                )
+        # 3. STAGE 2: 精排 - 使用 relevance_scorer 對候選標籤進行批次排序
+        with span("recommend.stage2"):
+            ranked_candidates = rank_tags_by_relevance(
+                tags=candidates,
+                keywords=original_keywords, # 使用原始關鍵字進行精確排序
+                analyzer=analyzer,
+                relevance_weight=0.7
             )
         
-        # 6. 計算分類分佈
-        category_distribution = {}
-        for rec in recommendations:
-            category_distribution[rec.category] = category_distribution.get(rec.category, 0) + 1
-        
-        # 7. 品質評估
-        overall_score = int(sum(r.confidence for r in recommendations) / len(recommendations) * 100) if recommendations else 0
-        balance_score = min(len(category_distribution) * 25, 100)  # 越多分類越好
-        popularity_score = int(sum(r.post_count for r in recommendations) / len(recommendations) / 10000) if recommendations else 0
-        popularity_score = min(popularity_score, 100)
-        
-        quality_assessment = QualityAssessment(
-            overall_score=overall_score,
-            balance_score=balance_score,
-            popularity_score=popularity_score,
-            warnings=[]
-        )
-        
-        # 添加警告
-        if len(recommendations) < request.max_tags:
-            quality_assessment.warnings.append(
-                f"僅找到 {len(recommendations)} 個標籤，少於請求的 {request.max_tags} 個"
+        with span("recommend.build_response"):
+            return _build_two_stage_response(
+                query=request.description,
+                ranked_candidates=ranked_candidates,
+                total_candidates=len(candidates),
+                primary_keyword=primary_keyword,
+                original_keywords=original_keywords,
+                expanded_keywords=expanded_keywords,
+                max_tags=request.max_tags,
+                balance_categories=request.balance_categories,
+                start_time=start_time,
             )
-        if balance_score < 50:
-            quality_assessment.warnings.append("標籤分類較為單一，建議增加不同類型的關鍵字")
-        
-        # 8. 生成建議的 prompt
-        suggested_prompt = ", ".join([r.tag for r in recommendations])
-        
-        # 9. 元資料
-        processing_time = (time.time() - start_time) * 1000
-        metadata = RecommendationMetadata(
-            processing_time_ms=round(processing_time, 2),
-            total_candidates=len(candidates),
-            algorithm="keyword_matching_v1",
-            cache_hit=False,
-            keywords_extracted=original_keywords,
-            keywords_expanded=expanded_keywords
-        )
-        
-        return TagRecommendationResponse(
-            query=request.description,
-            recommended_tags=recommendations,
-            category_distribution=category_distribution,
-            quality_assessment=quality_assessment,
-            suggested_prompt=suggested_prompt,
-            metadata=metadata
-        )
         
     except Exception as e:
         logger.error(f"Error in recommend_tags: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post(
+    "/recommend-tags/batch",
+    response_class=StreamingResponse,
+    summary="📦 批次標籤推薦",
+    description="""
+    **一次推薦多筆描述的標籤（NDJSON 串流）**
+    
+    - 所有描述先完成關鍵字擴展，相同主要關鍵字的候選標籤只查詢一次
+    - 以批次評分器精排每筆描述的候選標籤
+    - 每行一筆結果（`index` 對應輸入順序），最後一行為 `summary`
+    - 使用兩階段搜尋，不經過 GPT-5 Nano
+    """
+)
+async def recommend_tags_batch(
+    request: LLMBatchRecommendRequest,
+    db: SupabaseService = Depends(get_supabase_service),
+    expander: KeywordExpander = Depends(get_keyword_expander),
+    analyzer: KeywordAnalyzer = Depends(get_keyword_analyzer),
+):
+    """批次標籤推薦（共用候選檢索，NDJSON 串流回應）"""
+    start_time = time.time()
+
+    # 1. 關鍵字擴展與主要關鍵字（每筆描述只做一次）
+    plans: List[Optional[Tuple[List[str], List[str], str]]] = []
+    for description in request.descriptions:
+        original_keywords, expanded_keywords = expander.expand_query(description)
+        if not original_keywords:
+            plans.append(None)
+            continue
+        keyword_weights = analyzer.analyze_keyword_importance(original_keywords)
+        primary_keyword = max(keyword_weights, key=keyword_weights.get)
+        plans.append((original_keywords, expanded_keywords, primary_keyword))
+
+    # 2. STAGE 1: 每個不重複的主要關鍵字只查詢一次（並行，受資料庫併發上限約束）
+    fetches: Dict[str, asyncio.Task] = {}
+    for plan in plans:
+        if plan is not None and plan[2] not in fetches:
+            fetches[plan[2]] = asyncio.ensure_future(
+                _fetch_stage1_candidates(db, plan[2], request.min_popularity)
+            )
+
+    logger.info(
+        f"Batch recommend: {len(request.descriptions)} descriptions, "
+        f"{len(fetches)} unique primary keywords"
+    )
+
+    fallback_candidates: Dict[Tuple[str, ...], List[Dict]] = {}
+    scorers: Dict[Tuple[str, ...], BatchRelevanceScorer] = {}
+
+    async def generate():
+        succeeded = 0
+        try:
+            for index, (description, plan) in enumerate(zip(request.descriptions, plans)):
+                item_start = time.time()
+                try:
+                    if plan is None:
+                        raise ValueError("無法從描述中提取任何關鍵字")
+                    original_keywords, expanded_keywords, primary_keyword = plan
+
+                    candidates = await fetches[primary_keyword]
+                    if not candidates:
+                        fallback_key = tuple(expanded_keywords)
+                        if fallback_key not in fallback_candidates:
+                            fallback_candidates[fallback_key] = await _fetch_fallback_candidates(
+                                db, expanded_keywords, request.max_tags, request.min_popularity
+                            )
+                        candidates = fallback_candidates[fallback_key]
+                        if not candidates:
+                            raise ValueError("找不到與您的描述相關的標籤")
+
+                    # 3. STAGE 2: 相同關鍵字組合共用同一個批次評分器
+                    scorer_key = tuple(original_keywords)
+                    if scorer_key not in scorers:
+                        scorers[scorer_key] = BatchRelevanceScorer(original_keywords, analyzer)
+                    ranked_candidates = scorers[scorer_key].rank(candidates, relevance_weight=0.7)
+
+                    response = _build_two_stage_response(
+                        query=description,
+                        ranked_candidates=ranked_candidates,
+                        total_candidates=len(candidates),
+                        primary_keyword=primary_keyword,
+                        original_keywords=original_keywords,
+                        expanded_keywords=expanded_keywords,
+                        max_tags=request.max_tags,
+                        balance_categories=request.balance_categories,
+                        start_time=item_start,
+                    )
+                    line = {"index": index, "result": response.model_dump(mode="json")}
+                    succeeded += 1
+                except Exception as e:
+                    logger.warning(f"Batch item {index} failed: {e}")
+                    line = {"index": index, "query": description, "error": str(e)}
+
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+
+            summary = {
+                "total": len(request.descriptions),
+                "succeeded": succeeded,
+                "failed": len(request.descriptions) - succeeded,
+                "unique_primary_keywords": len(fetches),
+                "processing_time_ms": round((time.time() - start_time) * 1000, 2),
+            }
+            yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+        finally:
+            # 客戶端中斷時取消尚未完成的查詢
+            for task in fetches.values():
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @router.get(
     "/test-openai-config",
     summary="🔧 測試 OpenAI 配置",
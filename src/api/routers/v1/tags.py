@@ -2,6 +2,8 @@
 Tags Router - 基礎標籤查詢端點
 """
 from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse
+from datetime import datetime
 from typing import Optional
 import logging
 
@@ -9,6 +11,8 @@ import logging
 from ...models.requests import TagQueryRequest, CategoryEnum
 from ...models.responses import TagResponse, TagListResponse, ErrorResponse
 from ...services.supabase_client import get_supabase_service, SupabaseService
+from ...services.tag_cursor import InvalidCursorError
+from ...services.tag_export import TagExport, normalize_since
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +33,11 @@ router = APIRouter()
     **排序選項**:
     - order_by: 排序欄位(預設: post_count)
     - order_desc: 是否降序(預設: true)
+    
+    **游標分頁**（建議用於走訪全表）:
+    - pagination=cursor 取得第一頁，之後帶上回應的 next_cursor
+    - 固定依 post_count 降序、名稱升序；不可與 offset 或其他排序同時使用
+    - total 為預先彙總的估計值（有名稱篩選時為 null），每頁不計算 COUNT
     """
 )
 async def get_tags(
@@ -38,10 +47,38 @@ async def get_tags(
     offset: int = Query(0, ge=0, description="偏移量"),
     order_by: str = Query("post_count", description="排序欄位"),
     order_desc: bool = Query(True, description="降序排序"),
+    pagination: str = Query("offset", pattern="^(offset|cursor)$", description="分頁方式（offset / cursor）"),
+    cursor: Optional[str] = Query(None, description="游標（上一頁的 next_cursor，隱含 pagination=cursor）"),
+    include_total: bool = Query(True, description="游標分頁時是否附上估計總數"),
     db: SupabaseService = Depends(get_supabase_service)
 ):
     """查詢標籤列表"""
     try:
+        if cursor is not None or pagination == "cursor":
+            if offset:
+                raise HTTPException(status_code=400, detail="offset cannot be combined with cursor pagination")
+            if order_by != "post_count" or not order_desc:
+                raise HTTPException(
+                    status_code=400,
+                    detail="cursor pagination is ordered by post_count desc, name asc"
+                )
+            
+            tags, next_cursor, total = await db.get_tags_page(
+                limit=limit,
+                cursor=cursor,
+                category=category.value if category else None,
+                name_filter=name,
+                include_total=include_total
+            )
+            return TagListResponse(
+                data=[TagResponse(**tag) for tag in tags],
+                total=total,
+                limit=limit,
+                offset=0,
+                next_cursor=next_cursor,
+                total_is_estimate=True
+            )
+        
         tags, total = await db.get_tags(
             limit=limit,
             offset=offset,
@@ -57,11 +94,65 @@ async def get_tags(
             limit=limit,
             offset=offset
         )
+    except HTTPException:
+        raise
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in get_tags: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get(
+    "/tags/export",
+    response_class=StreamingResponse,
+    summary="匯出標籤目錄",
+    description="""
+    **串流匯出篩選後的標籤目錄（NDJSON）**
+    
+    - format=ndjson：每行一個標籤；format=columnar：每行一批，欄位為陣列
+    - compression=gzip：以 Content-Encoding: gzip 串流壓縮
+    - since：只匯出 updated_at 晚於此時間的標籤（增量同步）
+    - 最後一行為 `summary`（count、watermark、complete）；下次同步以 since=watermark 取得變更
+    - watermark 比已匯出的最大 updated_at 早一段安全間隔，相鄰兩次同步會重疊，請依名稱 upsert 去重
+    - 伺服器以 keyset 分批讀取，記憶體用量與表大小無關
+    """
+)
+async def export_tags(
+    category: Optional[CategoryEnum] = Query(None, description="分類篩選"),
+    min_popularity: int = Query(0, ge=0, description="最低使用次數"),
+    content_level: Optional[str] = Query(
+        None, pattern="^(all-ages|r15|r18)$", description="最高內容等級（未指定則不過濾）"
+    ),
+    since: Optional[datetime] = Query(None, description="增量同步：只匯出此時間之後更新的標籤"),
+    format: str = Query("ndjson", pattern="^(ndjson|columnar)$", description="輸出格式"),
+    compression: str = Query("none", pattern="^(none|gzip)$", description="壓縮方式"),
+    batch_size: int = Query(1000, ge=100, le=5000, description="每批讀取筆數"),
+    db: SupabaseService = Depends(get_supabase_service)
+):
+    """串流匯出標籤目錄"""
+    export = TagExport(
+        db.storage,
+        batch_size=batch_size,
+        category=category.value if category else None,
+        min_popularity=min_popularity,
+        access_level=content_level,
+        since=normalize_since(since) if since else None,
+        output_format=format,
+        compression=compression,
+    )
+    try:
+        # 第一批在回應開始前讀取，錯誤可回傳正確的狀態碼
+        await export.start()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in export_tags: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return StreamingResponse(export.stream(), media_type=export.media_type, headers=export.headers)
+
+
 @router.get(
     "/tags/{tag_name}",
     response_model=TagResponse,
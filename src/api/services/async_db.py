@@ -0,0 +1,247 @@
+"""
+Async Database Access Layer
+非同步資料庫存取層 - 讓 FastAPI 處理器與工具不再以同步 .execute() 阻塞事件迴圈
+
+設計原則：
+1. 直接使用 postgrest 的非同步查詢建構器（與 supabase-py 相同的鏈式 API）
+2. 共用連線池的 httpx.AsyncClient（可用時啟用 HTTP/2 多工）
+3. 以 Semaphore 限制同時進行的查詢數，避免尖峰時壓垮 Supabase
+4. 每個查詢（含排隊時間）都有逾時上限
+
+用法：
+    adb = get_async_database()
+    result = await adb.execute(
+        adb.table('tags_final').select('name').eq('name', 'cat')
+    )
+"""
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import time
+
+import httpx
+from postgrest import AsyncPostgrestClient
+
+from .metrics import record_duration
+
+try:
+    from ..config import settings
+except Exception:
+    try:
+        from src.api.config import settings
+    except Exception:
+        from config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支援需要 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def get_proxy_config() -> Optional[Dict[str, str]]:
+    """依設定建立 httpx 代理設定（未設定代理時返回 None）"""
+    if not (settings.all_proxy or settings.http_proxy or settings.https_proxy):
+        return None
+    if settings.all_proxy:
+        return {"all://": settings.all_proxy}
+    proxies = {}
+    if settings.http_proxy:
+        proxies["http://"] = settings.http_proxy
+    if settings.https_proxy:
+        proxies["https://"] = settings.https_proxy
+    return proxies
+
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """使用自訂連線池 / HTTP/2 的 PostgREST 非同步客戶端"""
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        headers: Dict[str, str],
+        timeout: httpx.Timeout,
+        limits: httpx.Limits,
+        http2: bool = True,
+        proxies: Optional[Dict[str, str]] = None,
+    ):
+        # create_session 會在父類別 __init__ 中被呼叫，需先設定
+        self._limits = limits
+        self._http2 = http2
+        self._proxies = proxies
+        super().__init__(base_url, headers=headers, timeout=timeout)
+
+    def create_session(self, base_url, headers, timeout) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=self._limits,
+            http2=self._http2,
+            proxies=self._proxies,
+            trust_env=self._proxies is None,
+        )
+
+
+class AsyncDatabase:
+    """非同步資料庫存取（連線池 + 併發限制 + 逾時）"""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        key: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        http2: Optional[bool] = None,
+    ):
+        self.url = (url or settings.supabase_url).rstrip("/")
+        # 以 Service Key 優先，否則退回 Anon Key（寫入操作需要 service_role）
+        self.key = key or getattr(settings, "supabase_service_key", None) or settings.supabase_anon_key
+        self.max_connections = max_connections or settings.db_connection_pool_size
+        self.max_concurrency = max_concurrency or settings.db_max_concurrency
+        self.timeout_seconds = timeout_seconds or settings.db_timeout_seconds
+        http2 = settings.db_http2 if http2 is None else http2
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("⚠️ h2 not installed, async database client falls back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        # httpx 連線池與 Semaphore 綁定建立時的事件迴圈
+        self._client: Optional[PooledPostgrestClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.stats = {"queries": 0, "errors": 0, "timeouts": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def _create_client(self) -> PooledPostgrestClient:
+        return PooledPostgrestClient(
+            f"{self.url}/rest/v1",
+            headers={
+                "apiKey": self.key,
+                "Authorization": f"Bearer {self.key}",
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            timeout=httpx.Timeout(self.timeout_seconds, connect=min(5.0, self.timeout_seconds)),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            http2=self.http2,
+            proxies=get_proxy_config(),
+        )
+
+    @property
+    def client(self) -> PooledPostgrestClient:
+        """取得目前事件迴圈的客戶端"""
+        self._ensure_client()
+        return self._client
+
+    def _ensure_client(self) -> None:
+        """客戶端與 Semaphore 綁定事件迴圈，事件迴圈更換時重建"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if self._client is None or (loop is not None and loop is not self._loop):
+            self._client = self._create_client()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            logger.info(
+                f"✅ Async database client initialized "
+                f"(http2={self.http2}, pool={self.max_connections}, concurrency={self.max_concurrency})"
+            )
+
+    def table(self, name: str):
+        """建立資料表查詢（與 supabase-py 相同的鏈式 API）"""
+        return self.client.from_(name)
+
+    def rpc(self, func: str, params: Dict[str, Any]):
+        """建立預存程序呼叫"""
+        return self.client.rpc(func, params)
+
+    async def execute(self, query, timeout: Optional[float] = None):
+        """
+        執行查詢（受併發上限與逾時限制）
+
+        Raises:
+            TimeoutError: 排隊加執行超過逾時上限
+        """
+        self._ensure_client()
+        semaphore = self._semaphore
+        timeout = timeout or self.timeout_seconds
+
+        async def _run():
+            async with semaphore:
+                self.stats["in_flight"] += 1
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+                try:
+                    return await query.execute()
+                finally:
+                    self.stats["in_flight"] -= 1
+
+        self.stats["queries"] += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(_run(), timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise TimeoutError(f"Database query timed out after {timeout}s")
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            record_duration("db.query", elapsed)
+            elapsed_ms = elapsed * 1000
+            if elapsed_ms > 1000:
+                logger.warning(f"Slow database query: {elapsed_ms:.0f}ms")
+
+    async def aclose(self) -> None:
+        """關閉連線池"""
+        if self._client is not None:
+            try:
+                await self._client.aclose()
+            except Exception as e:
+                logger.warning(f"Async database close error: {e}")
+            self._client = None
+            self._semaphore = None
+            self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """連線池與查詢統計"""
+        return {
+            **self.stats,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout_seconds,
+        }
+
+
+# 全局單例
+_async_database: Optional[AsyncDatabase] = None
+
+
+def get_async_database() -> AsyncDatabase:
+    """獲取非同步資料庫存取層（單例）"""
+    global _async_database
+
+    if _async_database is None:
+        _async_database = AsyncDatabase()
+
+    return _async_database
+
+
+async def close_async_database() -> None:
+    """關閉非同步資料庫連線池（應用關閉時呼叫）"""
+    global _async_database
+
+    if _async_database is not None:
+        await _async_database.aclose()
+        _async_database = None
@@ -2,12 +2,30 @@
 Cache Manager Service
 快取管理服務 - 使用記憶體快取提升效能
 """
+from collections import OrderedDict
 from functools import lru_cache, wraps
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
 import hashlib
+import heapq
+import itertools
 import json
+import pickle
+import sys
+import threading
 import time
 import logging
+import weakref
+
+try:
+    from ..config import settings
+except Exception:
+    try:
+        from src.api.config import settings
+    except Exception:
+        from config import settings
+
+from .single_flight import MISSING, SingleFlight, cached_call
 
 logger = logging.getLogger(__name__)
 
@@ -76,61 +94,265 @@ def generate_cache_key(*args, **kwargs) -> str:
     return hashlib.md5(key_str.encode()).hexdigest()
 
 
-def cache_with_ttl(ttl_seconds: int = 3600):
+def estimate_size(value: Any) -> int:
+    """估算快取值佔用的位元組數（以序列化大小為準）"""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'expires_at', 'size')
+
+    def __init__(self, value: Any, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+# 所有有界快取實例（供背景清理使用）
+_live_caches: "weakref.WeakSet[BoundedTTLCache]" = weakref.WeakSet()
+
+
+class BoundedTTLCache:
+    """
+    有界 LRU + TTL 記憶體快取
+
+    - 每個項目有各自的過期時間
+    - 超過 max_entries 或 max_bytes 時以 O(1) 淘汰最久未使用的項目
+    - 過期時間存於最小堆，sweep() 只處理已到期的項目
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 0,
+        default_ttl: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes  # 0 表示不限制位元組數
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._data: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _live_caches.add(self)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, MISSING) is not MISSING
+
+    def _remove(self, key: str) -> _CacheEntry:
+        entry = self._data.pop(key)
+        self.total_bytes -= entry.size
+        return entry
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """獲取快取值（過期或不存在時返回 default）"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry.expires_at <= self._clock():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """設定快取值"""
+        ttl = self.default_ttl if ttl is None else ttl
+        size = estimate_size(value) if self.max_bytes else 0
+        if ttl <= 0 or (self.max_bytes and size > self.max_bytes):
+            # 不可快取的項目：同時移除舊值
+            self.delete(key)
+            return
+
+        expires_at = self._clock() + ttl
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = _CacheEntry(value, expires_at, size)
+            self.total_bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, next(self._sequence), key))
+            self._evict()
+            self._compact_heap()
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self.total_bytes > self.max_bytes)
+        ):
+            self.total_bytes -= self._data.popitem(last=False)[1].size
+            self.evictions += 1
+
+    def _compact_heap(self) -> None:
+        # 被覆寫或淘汰的項目會在堆中留下舊紀錄，累積過多時重建
+        if len(self._expiry_heap) > 2 * len(self._data) + 64:
+            self._expiry_heap = [
+                (entry.expires_at, next(self._sequence), key)
+                for key, entry in self._data.items()
+            ]
+            heapq.heapify(self._expiry_heap)
+
+    def delete(self, key: str) -> bool:
+        """刪除快取值"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                return True
+            return False
+
+    def clear(self) -> None:
+        """清空所有快取"""
+        with self._lock:
+            self._data.clear()
+            self._expiry_heap.clear()
+            self.total_bytes = 0
+
+    def sweep(self) -> int:
+        """移除所有已過期的項目，返回移除數量"""
+        removed = 0
+        now = self._clock()
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                expires_at, _, key = heapq.heappop(heap)
+                entry = self._data.get(key)
+                if entry is not None and entry.expires_at == expires_at:
+                    self._remove(key)
+                    removed += 1
+            self.expirations += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """快取統計"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_entries': self.max_entries,
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0.0,
+        }
+
+
+def sweep_expired_entries() -> int:
+    """清理所有有界快取中已過期的項目"""
+    return sum(cache.sweep() for cache in list(_live_caches))
+
+
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+async def _sweep_loop(interval_seconds: float) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        removed = sweep_expired_entries()
+        if removed:
+            logger.debug(f"Cache sweeper removed {removed} expired entries")
+
+
+def start_cache_sweeper(interval_seconds: Optional[float] = None) -> None:
+    """啟動背景過期清理"""
+    global _sweeper_task
+    interval_seconds = interval_seconds or settings.cache_sweep_interval_seconds
+    if interval_seconds > 0 and (_sweeper_task is None or _sweeper_task.done()):
+        _sweeper_task = asyncio.create_task(_sweep_loop(interval_seconds))
+
+
+async def stop_cache_sweeper() -> None:
+    """停止背景過期清理"""
+    global _sweeper_task
+    if _sweeper_task and not _sweeper_task.done():
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+    _sweeper_task = None
+
+
+def cache_with_ttl(ttl_seconds: int = 3600, stale_ttl: int = 0):
     """
     帶過期時間的快取裝飾器
     
+    同一鍵的並發未命中只會執行一次函數（single-flight）。
+    
     Args:
         ttl_seconds: 過期時間（秒）
+        stale_ttl: 過期後仍返回舊值並在背景刷新的寬限期（秒，0 表示停用）
     
     Usage:
         @cache_with_ttl(ttl_seconds=300)
         async def expensive_function(param):
             ...
     """
-    cache = {}
-    cache_timestamps = {}
-    
     def decorator(func: Callable) -> Callable:
+        # 每個被裝飾的函數各自擁有一個有界快取
+        cache = BoundedTTLCache(
+            max_entries=settings.cache_max_size,
+            max_bytes=settings.cache_max_bytes,
+            default_ttl=ttl_seconds + stale_ttl,
+        )
+        flight = SingleFlight()
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # 生成快取鍵
             cache_key = generate_cache_key(*args, **kwargs)
             
-            # 檢查快取
-            current_time = time.time()
-            if cache_key in cache:
-                timestamp = cache_timestamps.get(cache_key, 0)
-                
-                # 檢查是否過期
-                if current_time - timestamp < ttl_seconds:
+            # 檢查快取（過期項目在 get 時移除）
+            async def load():
+                cached = cache.get(cache_key, MISSING)
+                if cached is MISSING:
+                    cache_stats.record_miss()
+                    logger.debug(f"Cache miss for key: {cache_key[:8]}...")
+                else:
                     cache_stats.record_hit()
                     logger.debug(f"Cache hit for key: {cache_key[:8]}...")
-                    return cache[cache_key]
-                else:
-                    # 過期，刪除快取
-                    del cache[cache_key]
-                    del cache_timestamps[cache_key]
-                    logger.debug(f"Cache expired for key: {cache_key[:8]}...")
-            
-            # 未命中，執行函數
-            cache_stats.record_miss()
-            logger.debug(f"Cache miss for key: {cache_key[:8]}...")
-            
-            result = await func(*args, **kwargs)
+                return cached
             
-            # 儲存到快取
-            cache[cache_key] = result
-            cache_timestamps[cache_key] = current_time
+            async def store(value):
+                cache.set(cache_key, value)
             
-            return result
+            return await cached_call(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                load,
+                store,
+                flight,
+                ttl=ttl_seconds,
+                stale_ttl=stale_ttl,
+            )
         
         # 添加快取管理方法
-        wrapper.cache_clear = lambda: cache.clear() and cache_timestamps.clear()
+        wrapper.cache_clear = cache.clear
         wrapper.cache_info = lambda: {
             'size': len(cache),
             'ttl': ttl_seconds,
-            'stats': str(cache_stats)
+            'stale_ttl': stale_ttl,
+            'stats': str(cache_stats),
+            'single_flight': dict(flight.stats),
+            **cache.get_stats(),
         }
         
         return wrapper
@@ -161,53 +383,49 @@ def reset_cache_stats():
 
 
 class MemoryCacheManager:
-    """記憶體快取管理器"""
+    """記憶體快取管理器（有界 LRU + TTL）"""
     
-    def __init__(self):
-        self.cache = {}
-        self.cache_timestamps = {}
-        self.ttl = 3600  # 預設 1 小時
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[int] = None,
+    ):
+        self.ttl = ttl or settings.cache_ttl_seconds  # 預設 TTL
+        self.cache = BoundedTTLCache(
+            max_entries=max_entries or settings.cache_max_size,
+            max_bytes=settings.cache_max_bytes if max_bytes is None else max_bytes,
+            default_ttl=self.ttl,
+        )
     
     async def get(self, key: str) -> Optional[Any]:
         """獲取快取值"""
-        current_time = time.time()
-        if key in self.cache:
-            timestamp = self.cache_timestamps.get(key, 0)
-            if current_time - timestamp < self.ttl:
-                cache_stats.record_hit()
-                return self.cache[key]
-            else:
-                # 過期，刪除快取
-                del self.cache[key]
-                del self.cache_timestamps[key]
+        value = self.cache.get(key, MISSING)
+        if value is MISSING:
+            cache_stats.record_miss()
+            return None
         
-        cache_stats.record_miss()
-        return None
+        cache_stats.record_hit()
+        return value
     
-    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """設定快取值"""
-        current_time = time.time()
-        self.cache[key] = value
-        self.cache_timestamps[key] = current_time
+        self.cache.set(key, value, ttl=ttl)
+        return True
     
     async def delete(self, key: str) -> bool:
         """刪除快取值"""
-        if key in self.cache:
-            del self.cache[key]
-            del self.cache_timestamps[key]
-            return True
-        return False
+        return self.cache.delete(key)
     
     async def clear(self) -> None:
         """清空所有快取"""
         self.cache.clear()
-        self.cache_timestamps.clear()
     
     def get_stats(self) -> dict:
         """獲取快取統計"""
         return {
             'type': 'memory',
-            'size': len(self.cache),
+            **self.cache.get_stats(),
             'stats': get_cache_stats()
         }
 
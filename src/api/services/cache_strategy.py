@@ -9,6 +9,7 @@ from functools import wraps
 from config import settings
 from .cache_manager import get_cache_manager
 from .hybrid_cache_manager import get_hybrid_cache_manager
+from .single_flight import MISSING, SingleFlight, cached_call
 
 logger = logging.getLogger(__name__)
 
@@ -53,30 +54,17 @@ class CacheStrategyManager:
     async def get(self, key: str) -> Optional[Any]:
         """獲取快取值"""
         cache_manager = await self.get_cache_manager()
-        
-        if self.strategy == "memory":
-            return cache_manager.get(key)
-        else:
-            return await cache_manager.get(key)
+        return await cache_manager.get(key)
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """設置快取值"""
         cache_manager = await self.get_cache_manager()
-        
-        if self.strategy == "memory":
-            cache_manager.set(key, value, ttl=ttl or 3600)
-            return True
-        else:
-            return await cache_manager.set(key, value, ttl or 3600)
+        return await cache_manager.set(key, value, ttl or 3600)
     
     async def delete(self, key: str) -> bool:
         """刪除快取值"""
         cache_manager = await self.get_cache_manager()
-        
-        if self.strategy == "memory":
-            return cache_manager.delete(key)
-        else:
-            return await cache_manager.delete(key)
+        return await cache_manager.delete(key)
     
     async def get_stats(self) -> Dict[str, Any]:
         """獲取快取統計"""
@@ -138,13 +126,16 @@ async def get_cache_strategy_manager() -> CacheStrategyManager:
     return _strategy_manager
 
 
-def smart_cache_with_ttl(ttl_seconds: int = 3600, key_func=None):
+def smart_cache_with_ttl(ttl_seconds: int = 3600, key_func=None, stale_ttl: int = 0):
     """
     智能快取裝飾器
     
-    根據配置自動選擇最佳快取策略
+    根據配置自動選擇最佳快取策略；同鍵並發未命中只執行一次原函數，
+    stale_ttl > 0 時過期值在寬限期內直接返回並於背景刷新
     """
     def decorator(func):
+        flight = SingleFlight()
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # 生成快取鍵
@@ -165,19 +156,27 @@ def smart_cache_with_ttl(ttl_seconds: int = 3600, key_func=None):
             strategy_manager = await get_cache_strategy_manager()
             
             # 嘗試從快取獲取
-            cached_result = await strategy_manager.get(cache_key)
-            if cached_result is not None:
+            async def load():
+                cached_result = await strategy_manager.get(cache_key)
+                if cached_result is None:
+                    return MISSING
                 logger.debug(f"Cache hit ({strategy_manager.strategy}): {func.__name__}")
                 return cached_result
             
-            # 執行原函數
-            result = await func(*args, **kwargs)
-            
             # 存入快取
-            await strategy_manager.set(cache_key, result, ttl=ttl_seconds)
-            logger.debug(f"Cached result ({strategy_manager.strategy}): {func.__name__}")
+            async def store(value):
+                await strategy_manager.set(cache_key, value, ttl=ttl_seconds + stale_ttl)
+                logger.debug(f"Cached result ({strategy_manager.strategy}): {func.__name__}")
             
-            return result
+            return await cached_call(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                load,
+                store,
+                flight,
+                ttl=ttl_seconds,
+                stale_ttl=stale_ttl,
+            )
         
         return wrapper
     return decorator
@@ -0,0 +1,166 @@
+"""
+Precomputed Content Levels
+預先計算的內容等級欄位 - 讓查詢在資料庫端依使用者權限過濾
+
+設計原則：
+1. tags_final.content_level 存放 ACCESS_HIERARCHY 的等級值（0 / 1 / 2 / 999），
+   content_rating_version 記錄計算時的分級規則版本
+2. 批次工作（scripts/compute_content_levels.py）只更新等級或版本不符的標籤
+3. 執行期定期確認全表版本與目前規則一致，一致時才用欄位做伺服器端過濾；
+   否則退回原本的多取 + Python 過濾
+"""
+from typing import Any, Dict, List, Optional
+import logging
+import time
+
+from ..inspire_config.content_rating import (
+    ACCESS_HIERARCHY,
+    get_content_rater,
+    max_allowed_level,
+)
+
+try:
+    from ..config import settings
+except Exception:
+    try:
+        from src.api.config import settings
+    except Exception:
+        from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def compute_content_levels(
+    client,
+    table: str = "tags_final",
+    page_size: int = 1000,
+    update_batch_size: int = 500,
+    force: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    依 content_rating.py 的規則重新計算並寫回每個標籤的內容等級
+
+    Args:
+        client: Supabase 客戶端（需 service_role 才能寫入）
+        page_size: 讀取分頁大小
+        update_batch_size: 單次 UPDATE ... WHERE name IN (...) 的名稱數量
+        force: 忽略版本，全部重新寫入
+        dry_run: 只統計不寫入
+
+    Returns:
+        統計摘要
+    """
+    rater = get_content_rater()
+    version = rater.version
+    start = time.time()
+
+    pending: Dict[int, List[str]] = {}
+    scanned = 0
+    offset = 0
+    while True:
+        response = client.table(table)\
+            .select('name, content_level, content_rating_version')\
+            .order('name')\
+            .range(offset, offset + page_size - 1)\
+            .execute()
+        batch = response.data or []
+        levels = rater.classify_many(row['name'] for row in batch)
+        for row, level_name in zip(batch, levels):
+            level = ACCESS_HIERARCHY[level_name]
+            if force or row.get('content_level') != level or row.get('content_rating_version') != version:
+                pending.setdefault(level, []).append(row['name'])
+        scanned += len(batch)
+        if len(batch) < page_size:
+            break
+        offset += page_size
+
+    updated = 0
+    for level, names in pending.items():
+        for i in range(0, len(names), update_batch_size):
+            chunk = names[i:i + update_batch_size]
+            if not dry_run:
+                client.table(table)\
+                    .update({'content_level': level, 'content_rating_version': version})\
+                    .in_('name', chunk)\
+                    .execute()
+            updated += len(chunk)
+
+    summary = {
+        "version": version,
+        "scanned": scanned,
+        "updated": updated,
+        "by_level": {level: len(names) for level, names in pending.items()},
+        "dry_run": dry_run,
+        "elapsed_seconds": round(time.time() - start, 1),
+    }
+    logger.info(f"✅ Content levels computed: {summary}")
+    return summary
+
+
+class ContentLevelColumn:
+    """
+    content_level 欄位的可用狀態
+
+    欄位不存在、或仍有標籤的版本與目前規則不符時，不可用於過濾。
+    檢查結果快取 content_level_recheck_seconds 秒。
+    """
+
+    def __init__(self, recheck_seconds: Optional[int] = None):
+        self.recheck_seconds = recheck_seconds if recheck_seconds is not None else settings.content_level_recheck_seconds
+        self._current = False
+        self._checked_at: Optional[float] = None
+        self.version = get_content_rater().version
+
+    async def is_current(self, adb) -> bool:
+        """欄位是否存在且全表已依目前規則計算"""
+        if not settings.content_level_column_enabled:
+            return False
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.recheck_seconds:
+            return self._current
+
+        self._checked_at = now
+        try:
+            response = await adb.execute(
+                adb.table('tags_final')
+                .select('name')
+                .or_(f'content_rating_version.is.null,content_rating_version.neq.{self.version}')
+                .limit(1)
+            )
+            current = not response.data
+            if not current:
+                logger.warning("⚠️ content_level column is stale, run scripts/compute_content_levels.py")
+        except Exception as e:
+            logger.warning(f"⚠️ content_level column not available: {e}")
+            current = False
+
+        self._current = current
+        return current
+
+    @staticmethod
+    def apply(query, user_access_level: str):
+        """在查詢上加入權限過濾（content_level <= 使用者可見的最高等級）"""
+        return query.lte('content_level', max_allowed_level(user_access_level))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.content_level_column_enabled,
+            "current": self._current,
+            "version": self.version,
+            "checked_at": self._checked_at,
+        }
+
+
+# 全局單例
+_content_level_column: Optional[ContentLevelColumn] = None
+
+
+def get_content_level_column() -> ContentLevelColumn:
+    """獲取 content_level 欄位狀態（單例）"""
+    global _content_level_column
+
+    if _content_level_column is None:
+        _content_level_column = ContentLevelColumn()
+
+    return _content_level_column
@@ -11,7 +11,7 @@ Date: 2025-01-27
 """
 
 import logging
-from typing import List, Dict, Tuple, Optional, Set
+from typing import List, Dict, Tuple, Optional, FrozenSet
 from openai import AsyncOpenAI
 
 from ..inspire_config.content_rating import (
@@ -22,6 +22,8 @@ from ..inspire_config.content_rating import (
     filter_tags_by_user_access,
     ContentLevel,
 )
+from .metrics import span
+from .moderation_cache import ModerationCache, get_moderation_cache
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +42,7 @@ class ContentSafetyFilter:
         self,
         openai_client: Optional[AsyncOpenAI] = None,
         enable_moderation: bool = True,
+        verdict_cache: Optional[ModerationCache] = None,
     ):
         """
         初始化安全過濾器
@@ -47,12 +50,11 @@ class ContentSafetyFilter:
         Args:
             openai_client: OpenAI 客戶端（用於 Moderation API）
             enable_moderation: 是否啟用 Moderation API（預設啟用）
+            verdict_cache: Moderation 判定快取（None 表示每次都呼叫 API）
         """
         self.openai_client = openai_client
         self.enable_moderation = enable_moderation
-
-        # 封禁清單（從 content_rating 導入，擴充以確保完整性）
-        self.blocked_keywords: Set[str] = set(BLOCKED_KEYWORDS)
+        self.verdict_cache = verdict_cache
 
         # 記錄統計
         self.stats = {
@@ -63,6 +65,16 @@ class ContentSafetyFilter:
 
         logger.info("✅ ContentSafetyFilter initialized")
 
+    @property
+    def blocked_keywords(self) -> FrozenSet[str]:
+        """
+        封禁關鍵字（唯讀）
+        
+        判定使用已編譯的內容分級自動機，修改此集合不會生效；
+        擴充請修改 BLOCKED_KEYWORDS 後呼叫 rebuild_content_rater。
+        """
+        return frozenset(BLOCKED_KEYWORDS)
+
     def is_blocked(self, tag: str) -> bool:
         """
         檢查標籤是否被封禁（本地檢測）
@@ -73,16 +85,8 @@ class ContentSafetyFilter:
         Returns:
             True 如果被封禁，False 否則
         """
-        tag_lower = tag.lower()
-        
-        # 檢查封禁關鍵字
-        for keyword in self.blocked_keywords:
-            if keyword in tag_lower:
-                return True
-        
-        # 使用內容分級系統檢查
-        content_level = classify_content_level(tag)
-        return content_level == "blocked"
+        # 封禁關鍵字已編譯進內容分級自動機，一次掃描即可判定
+        return classify_content_level(tag) == "blocked"
 
     async def filter_tags(
         self,
@@ -155,33 +159,40 @@ class ContentSafetyFilter:
             return True, ""
 
         try:
-            self.stats["moderation_checks"] += 1
+            if self.verdict_cache is not None:
+                return await self.verdict_cache.get_or_check(text, lambda: self._moderate(text))
+            return await self._moderate(text)
 
-            # 呼叫 OpenAI Moderation API
-            response = await self.openai_client.moderations.create(input=text)
-            result = response.results[0]
+        except Exception as e:
+            logger.error(f"❌ Moderation API 錯誤：{e}")
+            # 失敗時保守處理：允許但記錄警告（不寫入快取）
+            # 這是為了避免 Moderation API 故障影響使用者體驗
+            return True, ""
 
-            if result.flagged:
-                # 找出被標記的類別
-                flagged_categories = []
-                for category, flagged in result.categories.model_dump().items():
-                    if flagged:
-                        # 將 snake_case 轉換為可讀的文字
-                        category_readable = category.replace("_", " ").title()
-                        flagged_categories.append(category_readable)
+    async def _moderate(self, text: str) -> Tuple[bool, str]:
+        """呼叫 OpenAI Moderation API 取得判定（錯誤時拋出例外）"""
+        self.stats["moderation_checks"] += 1
 
-                reason = f"輸入包含不適當內容：{', '.join(flagged_categories)}"
-                logger.warning(f"🚫 Moderation API flagged: {reason}")
+        # 呼叫 OpenAI Moderation API
+        with span("moderation.api"):
+            response = await self.openai_client.moderations.create(input=text)
+        result = response.results[0]
 
-                return False, reason
+        if result.flagged:
+            # 找出被標記的類別
+            flagged_categories = []
+            for category, flagged in result.categories.model_dump().items():
+                if flagged:
+                    # 將 snake_case 轉換為可讀的文字
+                    category_readable = category.replace("_", " ").title()
+                    flagged_categories.append(category_readable)
 
-            return True, ""
+            reason = f"輸入包含不適當內容：{', '.join(flagged_categories)}"
+            logger.warning(f"🚫 Moderation API flagged: {reason}")
 
-        except Exception as e:
-            logger.error(f"❌ Moderation API 錯誤：{e}")
-            # 失敗時保守處理：允許但記錄警告
-            # 這是為了避免 Moderation API 故障影響使用者體驗
-            return True, ""
+            return False, reason
+
+        return True, ""
 
     async def suggest_safe_alternative(
         self, blocked_tags: List[str]
@@ -290,5 +301,6 @@ def get_safety_filter() -> ContentSafetyFilter:
     return ContentSafetyFilter(
         openai_client=openai_client,
         enable_moderation=settings.openai_api_key is not None,
+        verdict_cache=get_moderation_cache() if settings.moderation_cache_enabled else None,
     )
 
@@ -0,0 +1,255 @@
+"""
+Query Embedding Cache
+查詢嵌入向量快取 - 重複或正規化後相同的查詢不再呼叫 embeddings API
+
+設計原則：
+1. 內容定址：鍵 = sha256(模型 + 正規化查詢)
+2. 兩層：行程內 LRU（L1）+ 可選持久層（SQLite 或 Redis，L2）
+3. 向量以 float32 位元組儲存（1536 維約 6KB），不使用 JSON
+4. 快取失敗不影響搜尋：任何錯誤都退回呼叫 API
+"""
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Any
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+try:
+    from ..config import settings
+except Exception:
+    try:
+        from src.api.config import settings
+    except Exception:
+        from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """正規化查詢：NFKC、忽略大小寫、合併空白"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def make_embedding_key(model: str, query: str) -> str:
+    """生成內容定址的快取鍵"""
+    return hashlib.sha256(f"{model}\n{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+
+class SQLiteEmbeddingStore:
+    """
+    SQLite 持久層（向量以 float32 BLOB 儲存）
+
+    查詢在執行緒中執行，不阻塞事件迴圈；過期的列在讀取時刪除，
+    並於啟動及每個 TTL 週期內的第一次寫入時批次清除。
+    """
+
+    def __init__(self, path: str, ttl_seconds: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_query_embeddings_created_at ON query_embeddings (created_at)"
+        )
+        self._conn.commit()
+        self._last_purge = 0.0
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """刪除過期的列，返回刪除筆數"""
+        if not self.ttl_seconds:
+            return 0
+        now = time.time()
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM query_embeddings WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            self._conn.commit()
+            self._last_purge = now
+        if deleted:
+            logger.info(f"🧹 Purged {deleted} expired query embeddings")
+        return deleted
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and time.time() - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return row[0]
+
+    def _set(self, key: str, model: str, data: bytes) -> None:
+        if self.ttl_seconds and time.time() - self._last_purge > self.ttl_seconds:
+            self.purge_expired()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                (key, model, data, time.time()),
+            )
+            self._conn.commit()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, model: str, data: bytes) -> None:
+        await asyncio.to_thread(self._set, key, model, data)
+
+
+class RedisEmbeddingStore:
+    """Redis 持久層（透過既有的 RedisCacheManager）"""
+
+    KEY_PREFIX = "qemb:"
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    async def _manager(self):
+        from .redis_cache_manager import get_redis_cache_manager
+        manager = await get_redis_cache_manager()
+        return manager if manager.is_available else None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        manager = await self._manager()
+        if manager is None:
+            return None
+        return await manager.get_bytes(self.KEY_PREFIX + key)
+
+    async def set(self, key: str, model: str, data: bytes) -> None:
+        manager = await self._manager()
+        if manager is not None:
+            await manager.set_bytes(self.KEY_PREFIX + key, data, self.ttl_seconds)
+
+
+class EmbeddingCache:
+    """查詢嵌入向量快取（LRU + 可選持久層）"""
+
+    def __init__(self, max_entries: int = 2048, store: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.store = store
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "store_hits": 0, "misses": 0, "errors": 0}
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    async def get(self, model: str, query: str) -> Optional[List[float]]:
+        """查詢快取（L1 → L2），未命中返回 None"""
+        key = make_embedding_key(model, query)
+
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+        if vector is not None:
+            self.stats["memory_hits"] += 1
+            return vector.tolist()
+
+        if self.store is not None:
+            try:
+                data = await self.store.get(key)
+                if data:
+                    vector = np.frombuffer(data, dtype=np.float32)
+                    self._remember(key, vector)
+                    self.stats["store_hits"] += 1
+                    return vector.tolist()
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ Embedding cache store read failed: {e}")
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, model: str, query: str, embedding: List[float]) -> List[float]:
+        """寫入快取，返回以 float32 表示的向量（命中與未命中結果一致）"""
+        key = make_embedding_key(model, query)
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._remember(key, vector)
+
+        if self.store is not None:
+            try:
+                await self.store.set(key, model, vector.tobytes())
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ Embedding cache store write failed: {e}")
+
+        return vector.tolist()
+
+    async def get_or_create(
+        self,
+        model: str,
+        query: str,
+        create: Callable[[], Awaitable[List[float]]],
+    ) -> List[float]:
+        """查詢快取，未命中時呼叫 create 生成並寫入"""
+        cached = await self.get(model, query)
+        if cached is not None:
+            return cached
+
+        embedding = await create()
+        if not embedding:
+            return embedding
+        return await self.set(model, query, embedding)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """快取統計"""
+        hits = self.stats["memory_hits"] + self.stats["store_hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._lru),
+            "max_entries": self.max_entries,
+            "hit_rate": round(hits / total, 3) if total else 0,
+            "store": type(self.store).__name__ if self.store else None,
+        }
+
+
+# 全局單例
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """獲取查詢嵌入快取（單例）"""
+    global _embedding_cache
+
+    if _embedding_cache is None:
+        store = None
+        backend = settings.embedding_cache_backend
+        try:
+            if backend == "sqlite":
+                store = SQLiteEmbeddingStore(settings.embedding_cache_path, settings.embedding_cache_ttl)
+            elif backend == "redis" and settings.redis_enabled:
+                store = RedisEmbeddingStore(settings.embedding_cache_ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache store '{backend}' unavailable: {e}")
+
+        _embedding_cache = EmbeddingCache(max_entries=settings.embedding_cache_size, store=store)
+
+    return _embedding_cache
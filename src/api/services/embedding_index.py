@@ -0,0 +1,357 @@
+"""
+Embedding Index Service
+本地嵌入向量索引 - 語義搜尋在 RPC 不可用時的全庫退回方案
+
+檔案格式（以 base_path 為前綴）：
+- {base}.npy       float32 矩陣，每列已正規化為單位向量，依 IVF 分桶順序排列（可 memory-map）
+- {base}.ivf.npz   IVF 中心點（centroids）與各桶在矩陣中的起訖位置（offsets）
+- {base}.meta.json 模型、維度與每列對應的標籤資訊（name / post_count / 分類）
+
+查詢時只掃描與查詢向量最接近的 nprobe 個桶；每個桶在矩陣中是連續區段，
+memory-map 讀取時不需要隨機存取。
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from ..inspire_config.content_rating import ACCESS_HIERARCHY, classify_many
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """將每列正規化為單位向量（零向量保持為零）"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _normalize_rows_inplace(matrix: np.ndarray, chunk_size: int = 8192) -> None:
+    """分段就地正規化（大型矩陣或 memmap 不產生完整副本）"""
+    for start in range(0, matrix.shape[0], chunk_size):
+        matrix[start:start + chunk_size] = _normalize_rows(matrix[start:start + chunk_size])
+
+
+def _train_ivf_centroids(
+    matrix: np.ndarray,
+    n_lists: int,
+    iterations: int = 10,
+    sample_size: int = 50000,
+    seed: int = 0,
+) -> np.ndarray:
+    """以球面 k-means 訓練 IVF 中心點（在抽樣資料上）"""
+    rng = np.random.default_rng(seed)
+    n_rows = matrix.shape[0]
+    sample = matrix[rng.choice(n_rows, size=min(sample_size, n_rows), replace=False)]
+    centroids = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=n_lists)
+        empty = counts == 0
+        # 空桶重新以隨機樣本初始化
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()), replace=False)]
+        centroids = _normalize_rows(sums)
+
+    return centroids
+
+
+def _assign_lists(matrix: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """將每列分配到最接近的中心點"""
+    assignments = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], chunk_size):
+        chunk = matrix[start:start + chunk_size]
+        assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def write_embedding_matrix(
+    base_path: str,
+    rows: Sequence[Dict[str, Any]],
+    embeddings: Union[Sequence[Sequence[float]], np.ndarray],
+    model: str = "text-embedding-3-small",
+    n_lists: Optional[int] = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    匯出嵌入矩陣與 IVF 索引
+
+    Args:
+        base_path: 輸出檔案前綴
+        rows: 每列對應的標籤資訊（name, post_count, main_category, sub_category）
+        embeddings: 嵌入向量（與 rows 同順序；float32 ndarray / memmap 會就地正規化）
+        model: 嵌入模型名稱
+        n_lists: IVF 桶數（預設 sqrt(N)）
+        seed: 隨機種子
+
+    Returns:
+        匯出摘要
+    """
+    if len(rows) != len(embeddings):
+        raise ValueError("rows and embeddings must have the same length")
+    if not rows:
+        raise ValueError("no embeddings to export")
+
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    _normalize_rows_inplace(matrix)
+    n_rows = matrix.shape[0]
+    if n_lists is None:
+        n_lists = int(np.sqrt(n_rows))
+    n_lists = max(1, min(n_lists, n_rows, 4096))
+
+    centroids = _train_ivf_centroids(matrix, n_lists, seed=seed)
+    assignments = _assign_lists(matrix, centroids)
+    order = np.argsort(assignments, kind="stable")
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=n_lists)))).astype(np.int64)
+
+    directory = os.path.dirname(base_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # 依分桶順序分段寫出，不建立重新排列後的完整副本
+    output = np.lib.format.open_memmap(f"{base_path}.npy", mode="w+", dtype=np.float32, shape=matrix.shape)
+    for start in range(0, n_rows, 8192):
+        output[start:start + 8192] = matrix[order[start:start + 8192]]
+    output.flush()
+    del output
+    np.savez(f"{base_path}.ivf.npz", centroids=centroids, offsets=offsets)
+
+    ordered_rows = [rows[i] for i in order.tolist()]
+    meta = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "model": model,
+        "dimension": int(matrix.shape[1]),
+        "count": n_rows,
+        "n_lists": n_lists,
+        "created_at": time.time(),
+        "names": [row["name"] for row in ordered_rows],
+        "post_counts": [int(row.get("post_count") or 0) for row in ordered_rows],
+        "main_categories": [row.get("main_category") for row in ordered_rows],
+        "sub_categories": [row.get("sub_category") for row in ordered_rows],
+    }
+    with open(f"{base_path}.meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    return {"count": n_rows, "dimension": meta["dimension"], "n_lists": n_lists, "path": base_path}
+
+
+def export_embeddings_from_database(
+    client,
+    base_path: str,
+    table: str = "tags_final",
+    page_size: int = 1000,
+    model: str = "text-embedding-3-small",
+) -> Dict[str, Any]:
+    """
+    從資料庫分頁讀取所有嵌入向量並匯出本地索引
+
+    以名稱做 keyset 分頁；每頁轉為 float32 後寫入暫存的 memmap 矩陣，
+    記憶體用量與 Python 浮點數列表無關（列數由 count='exact' 預先取得）。
+
+    Args:
+        client: Supabase 客戶端
+        base_path: 輸出檔案前綴
+    """
+    total = client.table(table)\
+        .select('name', count='exact')\
+        .not_.is_('embedding', 'null')\
+        .limit(1)\
+        .execute().count or 0
+    if not total:
+        raise ValueError("no embeddings to export")
+
+    directory = os.path.dirname(base_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{base_path}.export.tmp.npy"
+
+    rows: List[Dict[str, Any]] = []
+    matrix: Optional[np.memmap] = None
+    last_name: Optional[str] = None
+    try:
+        while len(rows) < total:
+            query = client.table(table)\
+                .select('name, post_count, main_category, sub_category, embedding')\
+                .not_.is_('embedding', 'null')
+            if last_name is not None:
+                query = query.gt('name', last_name)
+            batch = query.order('name').limit(page_size).execute().data or []
+            if not batch:
+                break
+            last_name = batch[-1]['name']
+
+            # 匯出期間新增的列超出預先配置的大小時略過
+            batch = batch[:total - len(rows)]
+            vectors = np.asarray(
+                [json.loads(e) if isinstance(e, str) else e for e in (row.pop('embedding') for row in batch)],
+                dtype=np.float32,
+            )
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    tmp_path, mode="w+", dtype=np.float32, shape=(total, vectors.shape[1])
+                )
+            matrix[len(rows):len(rows) + len(batch)] = vectors
+            rows.extend(batch)
+            if len(batch) < page_size:
+                break
+
+        if matrix is None:
+            raise ValueError("no embeddings to export")
+        if len(rows) < total:
+            logger.warning(f"⚠️ Expected {total} embeddings, exported {len(rows)}")
+        return write_embedding_matrix(base_path, rows, matrix[:len(rows)], model=model)
+    finally:
+        del matrix
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class EmbeddingIndex:
+    """記憶體映射的 IVF 嵌入索引"""
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        meta: Dict[str, Any],
+        centroids: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+        nprobe: int = 8,
+    ):
+        self.matrix = matrix
+        self.model: str = meta.get("model", "")
+        self.names: List[str] = meta["names"]
+        self.post_counts: List[int] = meta["post_counts"]
+        self.main_categories: List[Optional[str]] = meta["main_categories"]
+        self.sub_categories: List[Optional[str]] = meta["sub_categories"]
+        self.centroids = centroids
+        self.offsets = offsets
+        self.nprobe = nprobe
+        self._content_levels: Optional[np.ndarray] = None
+
+    @classmethod
+    def load(cls, base_path: str, nprobe: int = 8) -> "EmbeddingIndex":
+        """載入索引（矩陣以唯讀 memory-map 開啟）"""
+        matrix = np.load(f"{base_path}.npy", mmap_mode="r")
+        with open(f"{base_path}.meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("count") != matrix.shape[0]:
+            raise ValueError(f"embedding index metadata mismatch: {base_path}")
+
+        centroids = offsets = None
+        ivf_path = f"{base_path}.ivf.npz"
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                centroids = ivf["centroids"]
+                offsets = ivf["offsets"]
+
+        logger.info(
+            f"✅ Embedding index loaded: {matrix.shape[0]} vectors × {matrix.shape[1]} dims "
+            f"({0 if centroids is None else len(centroids)} lists)"
+        )
+        return cls(matrix, meta, centroids, offsets, nprobe=nprobe)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def content_levels(self) -> np.ndarray:
+        """每列標籤的內容等級（ACCESS_HIERARCHY 值，首次使用時計算）"""
+        if self._content_levels is None:
+            self._content_levels = np.fromiter(
+                (ACCESS_HIERARCHY[level] for level in classify_many(self.names)),
+                dtype=np.int16,
+                count=len(self.names),
+            )
+        return self._content_levels
+
+    def _candidate_ranges(self, query: np.ndarray, nprobe: int) -> List[Tuple[int, int]]:
+        """最接近查詢向量的 nprobe 個桶（矩陣中的區段）"""
+        if self.centroids is None or self.offsets is None:
+            return [(0, len(self))]
+        nprobe = min(nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return [(int(self.offsets[i]), int(self.offsets[i + 1])) for i in probe]
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        top_k: int = 10,
+        min_similarity: float = 0.0,
+        nprobe: Optional[int] = None,
+        max_content_level: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        查詢最相似的向量
+
+        max_content_level 不為 None 時，在取 top_k 之前排除內容等級超過上限的列，
+        呼叫端不必多取再過濾。
+
+        Returns:
+            [(列索引, 餘弦相似度), ...]，依相似度由高到低
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or top_k <= 0:
+            return []
+        query = query / norm
+
+        index_parts = []
+        score_parts = []
+        for start, end in self._candidate_ranges(query, nprobe or self.nprobe):
+            if end <= start:
+                continue
+            index_parts.append(np.arange(start, end))
+            score_parts.append(np.asarray(self.matrix[start:end]) @ query)
+        if not score_parts:
+            return []
+
+        indices = np.concatenate(index_parts)
+        scores = np.clip(np.concatenate(score_parts), -1.0, 1.0)  # float32 捨入可能略超過 1
+        mask = scores >= min_similarity
+        if max_content_level is not None:
+            mask &= self.content_levels()[indices] <= max_content_level
+        indices, scores = indices[mask], scores[mask]
+
+        if len(scores) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            indices, scores = indices[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(indices[i]), float(scores[i])) for i in order]
+
+
+# 全局單例
+_embedding_index: Optional[EmbeddingIndex] = None
+_embedding_index_loaded = False
+
+
+def get_embedding_index() -> Optional[EmbeddingIndex]:
+    """獲取本地嵌入索引（未設定或載入失敗時返回 None）"""
+    global _embedding_index, _embedding_index_loaded
+
+    if not _embedding_index_loaded:
+        _embedding_index_loaded = True
+        try:
+            try:
+                from ..config import settings
+            except Exception:
+                from src.api.config import settings
+
+            if settings.embedding_index_path:
+                _embedding_index = EmbeddingIndex.load(
+                    settings.embedding_index_path,
+                    nprobe=settings.embedding_index_nprobe,
+                )
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding index not available: {e}")
+            _embedding_index = None
+
+    return _embedding_index
@@ -10,6 +10,7 @@ import asyncio
 
 from .cache_manager import get_cache_manager
 from .redis_cache_manager import get_redis_cache_manager
+from .single_flight import MISSING, SingleFlight, cached_call
 
 logger = logging.getLogger(__name__)
 
@@ -57,7 +58,7 @@ class HybridCacheManager:
         # L1: 記憶體快取
         try:
             memory_cache = get_cache_manager()
-            l1_result = memory_cache.get(key)
+            l1_result = await memory_cache.get(key)
             
             if l1_result is not None:
                 self.stats['l1_hits'] += 1
@@ -107,7 +108,7 @@ class HybridCacheManager:
         # 寫入 L1
         try:
             memory_cache = get_cache_manager()
-            memory_cache.set(key, value, ttl=l1_ttl)
+            await memory_cache.set(key, value, ttl=l1_ttl)
             success_count += 1
             logger.debug(f"Set L1 cache: {key}")
         except Exception as e:
@@ -131,7 +132,7 @@ class HybridCacheManager:
         # 刪除 L1
         try:
             memory_cache = get_cache_manager()
-            if memory_cache.delete(key):
+            if await memory_cache.delete(key):
                 success_count += 1
         except Exception as e:
             logger.warning(f"L1 delete error: {e}")
@@ -150,7 +151,7 @@ class HybridCacheManager:
         """將資料從 L2 提升到 L1"""
         try:
             memory_cache = get_cache_manager()
-            memory_cache.set(key, value, ttl=self.l1_ttl)
+            await memory_cache.set(key, value, ttl=self.l1_ttl)
             self.stats['promotions'] += 1
             logger.debug(f"Promoted to L1: {key}")
         except Exception as e:
@@ -160,7 +161,7 @@ class HybridCacheManager:
         """將資料從 L1 降級（僅保留在 L2）"""
         try:
             memory_cache = get_cache_manager()
-            memory_cache.delete(key)
+            await memory_cache.delete(key)
             self.stats['demotions'] += 1
             logger.debug(f"Demoted from L1: {key}")
         except Exception as e:
@@ -196,9 +197,9 @@ class HybridCacheManager:
         # 檢查 L1
         try:
             memory_cache = get_cache_manager()
-            # 同步調用，不需要 await
-            l1_value = memory_cache.cache.get("health_check")
-            l1_status = "healthy" if l1_value is not None else "empty"
+            await memory_cache.set("health_check", True, ttl=10)
+            l1_value = await memory_cache.get("health_check")
+            l1_status = "healthy" if l1_value is not None else "error: read-back failed"
         except Exception as e:
             l1_status = f"error: {e}"
         
@@ -233,14 +234,18 @@ def get_hybrid_cache_manager() -> HybridCacheManager:
 def hybrid_cache_with_ttl(
     l1_ttl: int = 300,
     l2_ttl: int = 3600,
-    key_func=None
+    key_func=None,
+    stale_ttl: int = 0
 ):
     """
     混合快取裝飾器
     
-    自動使用雙層快取策略
+    自動使用雙層快取策略；同鍵並發未命中只執行一次原函數，
+    stale_ttl > 0 時過期值在寬限期內直接返回並於背景刷新
     """
     def decorator(func):
+        flight = SingleFlight()
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # 生成快取鍵
@@ -257,20 +262,30 @@ def hybrid_cache_with_ttl(
                 key_str = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
                 cache_key = hashlib.md5(key_str.encode()).hexdigest()
             
-            # 嘗試從快取獲取
             cache_manager = get_hybrid_cache_manager()
-            cached_result = await cache_manager.get(cache_key)
             
-            if cached_result is not None:
-                return cached_result
-            
-            # 執行原函數
-            result = await func(*args, **kwargs)
+            # 嘗試從快取獲取
+            async def load():
+                cached_result = await cache_manager.get(cache_key)
+                return MISSING if cached_result is None else cached_result
             
             # 存入快取
-            await cache_manager.set(cache_key, result, l1_ttl=l1_ttl, l2_ttl=l2_ttl)
+            async def store(value):
+                await cache_manager.set(
+                    cache_key, value,
+                    l1_ttl=l1_ttl + stale_ttl,
+                    l2_ttl=l2_ttl + stale_ttl
+                )
             
-            return result
+            return await cached_call(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                load,
+                store,
+                flight,
+                ttl=l2_ttl,
+                stale_ttl=stale_ttl,
+            )
         
         return wrapper
     return decorator
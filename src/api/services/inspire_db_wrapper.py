@@ -13,10 +13,13 @@ from typing import Dict, List, Tuple, Optional, Any
 from datetime import datetime
 import logging
 
+from .session_store import get_session_store
 from .supabase_client import get_supabase_service
+from .tag_snapshot import get_tag_snapshot
 from ..inspire_config.content_rating import (
-    classify_content_level,
-    filter_tags_by_user_access
+    classify_many,
+    filter_tags_by_user_access,
+    max_allowed_level
 )
 from ..inspire_config.database_mappings import (
     categorize_tag_by_rules,
@@ -35,13 +38,21 @@ class InspireDBWrapper:
     
     def __init__(self):
         self.db = get_supabase_service()
-        self.client = self.db.client
+        self.adb = self.db.async_db
+        self.storage = self.db.storage  # 標籤查詢（Supabase 或本地 SQLite）
+        # Session 變更先累積在寫後快取，每輪結束時以 flush_session 一次寫入（未啟用時為 None）
+        self.session_store = get_session_store()
+    
+    @property
+    def client(self):
+        """同步 Supabase 客戶端（僅供離線腳本使用，API 路徑請使用 self.adb）"""
+        return self.db.client
     
     # ============================================
     # Session 管理（inspire_sessions 表）
     # ============================================
     
-    def create_session(
+    async def create_session(
         self,
         session_id: str,
         user_id: Optional[str] = None,
@@ -58,16 +69,27 @@ class InspireDBWrapper:
         Returns:
             創建的 Session 資料
         """
+        if self.session_store is not None:
+            self.session_store.create(
+                session_id,
+                user_id=user_id,
+                user_access_level=user_access_level,
+                current_phase="understanding"
+            )
+            return self.session_store.overlay(session_id, None)
+        
         try:
-            result = self.client.table('inspire_sessions').insert({
-                "session_id": session_id,
-                "user_id": user_id,
-                "user_access_level": user_access_level,
-                "current_phase": "understanding",
-                "total_cost": 0.0,
-                "total_tokens": 0,
-                "tool_call_count": {}
-            }).execute()
+            result = await self.adb.execute(
+                self.adb.table('inspire_sessions').insert({
+                    "session_id": session_id,
+                    "user_id": user_id,
+                    "user_access_level": user_access_level,
+                    "current_phase": "understanding",
+                    "total_cost": 0.0,
+                    "total_tokens": 0,
+                    "tool_call_count": {}
+                })
+            )
             
             logger.info(f"✅ Session created: {session_id}")
             return result.data[0] if result.data else {}
@@ -76,7 +98,7 @@ class InspireDBWrapper:
             logger.error(f"❌ Failed to create session {session_id}: {e}")
             return {"error": str(e)}
     
-    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
         獲取 Session 資料
         
@@ -87,22 +109,25 @@ class InspireDBWrapper:
             Session 資料，如果不存在則返回 None
         """
         try:
-            result = self.client.table('inspire_sessions')\
-                .select('*')\
-                .eq('session_id', session_id)\
-                .execute()
+            result = await self.adb.execute(
+                self.adb.table('inspire_sessions')
+                .select('*')
+                .eq('session_id', session_id)
+            )
             
-            if result.data:
-                return result.data[0]
-            else:
+            session = result.data[0] if result.data else None
+            if self.session_store is not None:
+                session = self.session_store.overlay(session_id, session)
+            
+            if session is None:
                 logger.warning(f"⚠️ Session not found: {session_id}")
-                return None
+            return session
         
         except Exception as e:
             logger.error(f"❌ Failed to get session {session_id}: {e}")
             return None
     
-    def update_session_phase(
+    async def update_session_phase(
         self,
         session_id: str,
         phase: str
@@ -117,14 +142,19 @@ class InspireDBWrapper:
         Returns:
             是否成功
         """
+        if self.session_store is not None:
+            self.session_store.set_fields(session_id, current_phase=phase)
+            return True
+        
         try:
-            self.client.table('inspire_sessions')\
+            await self.adb.execute(
+                self.adb.table('inspire_sessions')
                 .update({
                     "current_phase": phase,
                     "updated_at": datetime.now().isoformat()
-                })\
-                .eq('session_id', session_id)\
-                .execute()
+                })
+                .eq('session_id', session_id)
+            )
             
             logger.info(f"✅ Session {session_id} phase updated: {phase}")
             return True
@@ -133,7 +163,7 @@ class InspireDBWrapper:
             logger.error(f"❌ Failed to update session phase: {e}")
             return False
     
-    def update_session_cost(
+    async def update_session_cost(
         self,
         session_id: str,
         cost: float,
@@ -159,8 +189,26 @@ class InspireDBWrapper:
         COST_LIMIT = 0.015  # $0.015 上限
         
         try:
+            if self.session_store is not None:
+                # 增量由資料庫端累加；這裡只讀取一次用於上限檢查
+                session = await self.get_session(session_id)
+                if not session:
+                    return {"success": False, "error": "Session not found"}
+                self.session_store.add_cost(session_id, cost, tokens)
+                new_cost = session["total_cost"] + cost
+                new_tokens = session["total_tokens"] + tokens
+                over_limit = new_cost >= COST_LIMIT
+                if over_limit:
+                    logger.warning(f"⚠️ Session {session_id} cost limit reached: ${new_cost:.6f}")
+                return {
+                    "success": True,
+                    "over_limit": over_limit,
+                    "current_cost": new_cost,
+                    "current_tokens": new_tokens
+                }
+            
             # 獲取當前值
-            session = self.get_session(session_id)
+            session = await self.get_session(session_id)
             if not session:
                 return {"success": False, "error": "Session not found"}
             
@@ -168,14 +216,15 @@ class InspireDBWrapper:
             new_tokens = session["total_tokens"] + tokens
             
             # 更新
-            self.client.table('inspire_sessions')\
+            await self.adb.execute(
+                self.adb.table('inspire_sessions')
                 .update({
                     "total_cost": new_cost,
                     "total_tokens": new_tokens,
                     "updated_at": datetime.now().isoformat()
-                })\
-                .eq('session_id', session_id)\
-                .execute()
+                })
+                .eq('session_id', session_id)
+            )
             
             over_limit = new_cost >= COST_LIMIT
             
@@ -193,7 +242,7 @@ class InspireDBWrapper:
             logger.error(f"❌ Failed to update session cost: {e}")
             return {"success": False, "error": str(e)}
     
-    def update_session_data(
+    async def update_session_data(
         self,
         session_id: str,
         **kwargs
@@ -209,12 +258,17 @@ class InspireDBWrapper:
             是否成功
         """
         try:
+            if self.session_store is not None:
+                self.session_store.set_fields(session_id, **kwargs)
+                return True
+            
             update_data = {**kwargs, "updated_at": datetime.now().isoformat()}
             
-            self.client.table('inspire_sessions')\
-                .update(update_data)\
-                .eq('session_id', session_id)\
-                .execute()
+            await self.adb.execute(
+                self.adb.table('inspire_sessions')
+                .update(update_data)
+                .eq('session_id', session_id)
+            )
             
             logger.info(f"Session {session_id} data updated: {list(kwargs.keys())}")
             return True
@@ -223,7 +277,7 @@ class InspireDBWrapper:
             logger.error(f"❌ Failed to update session data: {e}")
             return False
     
-    def complete_session(
+    async def complete_session(
         self,
         session_id: str,
         quality_score: int,
@@ -240,17 +294,28 @@ class InspireDBWrapper:
         Returns:
             是否成功
         """
+        if self.session_store is not None:
+            self.session_store.set_fields(
+                session_id,
+                current_phase="completed",
+                quality_score=quality_score,
+                final_output=final_output,
+                completed_at=datetime.now().isoformat()
+            )
+            return True
+        
         try:
-            self.client.table('inspire_sessions')\
+            await self.adb.execute(
+                self.adb.table('inspire_sessions')
                 .update({
                     "current_phase": "completed",
                     "quality_score": quality_score,
                     "final_output": final_output,
                     "completed_at": datetime.now().isoformat(),
                     "updated_at": datetime.now().isoformat()
-                })\
-                .eq('session_id', session_id)\
-                .execute()
+                })
+                .eq('session_id', session_id)
+            )
             
             logger.info(f"✅ Session {session_id} completed (score: {quality_score})")
             return True
@@ -259,11 +324,33 @@ class InspireDBWrapper:
             logger.error(f"❌ Failed to complete session: {e}")
             return False
     
+    async def flush_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        把 Session 本輪累積的變更一次寫入資料庫（每輪對話結束時呼叫）
+        
+        Args:
+            session_id: Session ID
+        
+        Returns:
+            寫入後的 Session 資料；寫入失敗或 Session 不存在時返回 None
+            （未啟用寫後快取時變更已即時寫入，直接返回目前資料）
+        """
+        if self.session_store is None:
+            return await self.get_session(session_id)
+        
+        try:
+            session = await self.session_store.flush(session_id)
+        except Exception as e:
+            logger.error(f"❌ Failed to flush session {session_id}: {e}")
+            return None
+        
+        return session if session is not None else await self.get_session(session_id)
+    
     # ============================================
     # 標籤查詢（tags_final 表）
     # ============================================
     
-    def search_tags_by_keywords(
+    async def search_tags_by_keywords(
         self,
         keywords: List[str],
         user_access: str = "all-ages",
@@ -289,28 +376,40 @@ class InspireDBWrapper:
             標籤列表（標準格式）
         """
         try:
-            # 構建查詢
-            query = self.client.table('tags_final')\
-                .select('name, post_count, main_category')\
-                .gte('post_count', min_popularity)
-            
-            # 關鍵字匹配（OR 條件）
-            if keywords:
-                conditions = [f'name.ilike.%{kw}%' for kw in keywords[:5]]
-                query = query.or_(','.join(conditions))
-            
-            # 執行查詢（多查一些，過濾後可能不夠）
-            query = query.order('post_count', desc=True).limit(max_results * 3)
-            result = query.execute()
+            snapshot = get_tag_snapshot()
+            if snapshot is not None:
+                # 本地子字串索引（語義同 name ILIKE '%kw%'），索引內依權限過濾
+                rows = [
+                    entry.to_row() for entry in snapshot.search_index.search(
+                        keywords[:5],
+                        limit=max_results,
+                        min_popularity=min_popularity,
+                        max_content_level=max_allowed_level(user_access)
+                    )
+                ]
+            else:
+                # content_level 欄位可用時在儲存後端過濾，否則多查一些（過濾後可能不夠）
+                max_level = None
+                limit = max_results * 3
+                if await self.storage.content_level_current():
+                    max_level = max_allowed_level(user_access)
+                    limit = max_results
+                
+                # 關鍵字匹配（OR 條件）
+                rows = await self.storage.search_tags(
+                    keywords[:5],
+                    limit=limit,
+                    min_popularity=min_popularity,
+                    max_content_level=max_level,
+                    columns='name, post_count, main_category',
+                )
             
-            # 過濾 NSFW + 格式化
+            # 過濾 NSFW + 格式化（欄位或索引已過濾時僅為保險）
             examples = []
-            for row in result.data:
+            content_levels = classify_many(row["name"] for row in rows)
+            for row, content_level in zip(rows, content_levels):
                 tag_name = row["name"]
                 
-                # 檢測內容等級
-                content_level = classify_content_level(tag_name)
-                
                 # 封禁內容跳過
                 if content_level == "blocked":
                     continue
@@ -340,7 +439,7 @@ class InspireDBWrapper:
             logger.error(f"❌ Search failed: {e}")
             return []  # 契約保證：不拋異常，返回空列表
     
-    def validate_tags_exist(
+    async def validate_tags_exist(
         self,
         tags: List[str],
         user_access: str = "all-ages"
@@ -365,13 +464,16 @@ class InspireDBWrapper:
             # 解析別名
             resolved_tags = [resolve_alias(t) for t in tags]
             
-            # 查詢資料庫
-            result = self.client.table('tags_final')\
-                .select('name')\
-                .in_('name', resolved_tags)\
-                .execute()
+            # 先查快照，僅未命中的標籤查詢資料庫
+            valid_tags_set = set()
+            missing = resolved_tags
+            snapshot = get_tag_snapshot()
+            if snapshot is not None:
+                found, missing = snapshot.lookup_many(resolved_tags)
+                valid_tags_set.update(found)
             
-            valid_tags_set = {row["name"] for row in result.data}
+            if missing:
+                valid_tags_set.update(await self.storage.get_tags_by_names(missing, columns='name'))
             
             # 分離有效和無效
             db_valid = [t for t in resolved_tags if t in valid_tags_set]
@@ -390,7 +492,7 @@ class InspireDBWrapper:
             logger.error(f"❌ Validation failed: {e}")
             return ([], tags)  # 契約保證：失敗時全部算無效
     
-    def get_tags_details(
+    async def get_tags_details(
         self,
         tags: List[str]
     ) -> List[Dict[str, Any]]:
@@ -404,18 +506,27 @@ class InspireDBWrapper:
             標籤資訊列表
         """
         try:
-            result = self.client.table('tags_final')\
-                .select('name, main_category, post_count')\
-                .in_('name', tags)\
-                .execute()
+            details = []
+            missing = tags
+            snapshot = get_tag_snapshot()
+            if snapshot is not None:
+                found, missing = snapshot.lookup_many(tags)
+                details = [
+                    {"name": e.name, "main_category": e.main_category, "post_count": e.post_count}
+                    for e in found.values()
+                ]
+            
+            if missing:
+                rows = await self.storage.get_tags_by_names(missing, columns='name, main_category, post_count')
+                details.extend(rows.values())
             
-            return result.data
+            return details
         
         except Exception as e:
             logger.error(f"❌ Failed to get tag details: {e}")
             return []
     
-    def get_popular_tags(
+    async def get_popular_tags(
         self,
         user_access: str = "all-ages",
         min_popularity: int = 10000,
@@ -433,18 +544,34 @@ class InspireDBWrapper:
             熱門標籤列表
         """
         try:
-            result = self.client.table('tags_final')\
-                .select('name, post_count, main_category')\
-                .gte('post_count', min_popularity)\
-                .order('post_count', desc=True)\
-                .limit(max_results * 2)\
-                .execute()
+            snapshot = get_tag_snapshot()
+            if snapshot is not None:
+                rows = [
+                    entry.to_row() for entry in snapshot.search_index.search(
+                        [],
+                        limit=max_results,
+                        min_popularity=min_popularity,
+                        max_content_level=max_allowed_level(user_access)
+                    )
+                ]
+            else:
+                max_level = None
+                limit = max_results * 2
+                if await self.storage.content_level_current():
+                    max_level = max_allowed_level(user_access)
+                    limit = max_results
+                rows = await self.storage.search_tags(
+                    [],
+                    limit=limit,
+                    min_popularity=min_popularity,
+                    max_content_level=max_level,
+                    columns='name, post_count, main_category',
+                )
             
             # 過濾 NSFW
             popular = []
-            for row in result.data:
-                content_level = classify_content_level(row["name"])
-                
+            content_levels = classify_many(row["name"] for row in rows)
+            for row, content_level in zip(rows, content_levels):
                 if content_level == "blocked":
                     continue
                 
@@ -474,7 +601,7 @@ class InspireDBWrapper:
     # 工具統計（用於監控）
     # ============================================
     
-    def increment_tool_call(
+    async def increment_tool_call(
         self,
         session_id: str,
         tool_name: str
@@ -489,18 +616,23 @@ class InspireDBWrapper:
         Returns:
             是否成功
         """
+        if self.session_store is not None:
+            self.session_store.add_tool_call(session_id, tool_name)
+            return True
+        
         try:
-            session = self.get_session(session_id)
+            session = await self.get_session(session_id)
             if not session:
                 return False
             
             tool_call_count = session.get("tool_call_count", {})
             tool_call_count[tool_name] = tool_call_count.get(tool_name, 0) + 1
             
-            self.client.table('inspire_sessions')\
-                .update({"tool_call_count": tool_call_count})\
-                .eq('session_id', session_id)\
-                .execute()
+            await self.adb.execute(
+                self.adb.table('inspire_sessions')
+                .update({"tool_call_count": tool_call_count})
+                .eq('session_id', session_id)
+            )
             
             return True
         
@@ -0,0 +1,81 @@
+"""
+Inspire Event Stream
+Inspire 對話事件串流 - 將階段轉換、工具執行與模型文字即時推送給 SSE 端點
+
+設計原則：
+1. 事件串流綁定在 ContextVar 上，深層程式碼（狀態機、工具）不必層層傳參
+2. 非串流請求沒有事件串流，emit_event() 為無操作
+3. asyncio 任務建立時會複製 Context，並行執行的工具也能推送事件
+
+事件類型：
+- status: 處理進度（started / model_request）
+- session: Session 建立
+- phase: 階段轉換
+- tool_start / tool_end: 工具開始 / 結束
+- text: 模型文字增量
+- final: 完整結構化回應（最後一個事件）
+- error: 錯誤（最後一個事件）
+"""
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Optional, Tuple
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+_current_stream: ContextVar[Optional["InspireEventStream"]] = ContextVar("inspire_event_stream", default=None)
+
+# 保持連線的心跳間隔（秒）
+HEARTBEAT_SECONDS = 15.0
+
+
+def format_sse(event: str, data: Any = None) -> str:
+    """格式化為一則 SSE 訊息"""
+    payload = json.dumps(data if data is not None else {}, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class InspireEventStream:
+    """單一請求的事件佇列"""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._closed = False
+
+    def emit(self, event: str, data: Any = None) -> None:
+        if not self._closed:
+            self._queue.put_nowait((event, data))
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queue.put_nowait(None)
+
+    def bind(self) -> None:
+        """將此串流綁定到目前的 Context（在執行對話的任務內呼叫）"""
+        _current_stream.set(self)
+
+    async def events(self, heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+        """依序產出 SSE 訊息直到串流關閉；閒置時送出心跳註解"""
+        while True:
+            try:
+                item: Optional[Tuple[str, Any]] = await asyncio.wait_for(self._queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                return
+            yield format_sse(*item)
+
+
+def emit_event(event: str, data: Any = None) -> None:
+    """推送事件到目前請求的串流（非串流請求時不做任何事）"""
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.emit(event, data)
+
+
+def has_event_stream() -> bool:
+    """目前請求是否為串流模式"""
+    return _current_stream.get() is not None
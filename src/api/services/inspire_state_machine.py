@@ -13,6 +13,8 @@ from enum import Enum
 from typing import Dict, List, Tuple, Optional, Any
 from datetime import datetime
 
+from .inspire_events import emit_event
+
 logger = logging.getLogger(__name__)
 
 
@@ -167,10 +169,11 @@ class InspireStateMachine:
         self.phase = to_phase
         
         logger.info(f"🔄 State transition: {old_phase.value} → {to_phase.value} ({reason})")
+        emit_event("phase", {"from": old_phase.value, "to": to_phase.value, "reason": reason})
         
         # 更新資料庫
         try:
-            self.db.update_session_phase(self.session_id, to_phase.value)
+            await self.db.update_session_phase(self.session_id, to_phase.value)
         except Exception as e:
             logger.error(f"❌ Failed to update phase in database: {e}")
     
@@ -227,7 +230,7 @@ class InspireStateMachine:
         """
         try:
             # 從資料庫獲取 Session 資訊
-            session_data = db.get_session(session_id)
+            session_data = await db.get_session(session_id)
             
             if not session_data:
                 raise ValueError(f"Session {session_id} not found")
@@ -0,0 +1,235 @@
+"""
+Stage Metrics
+輕量的階段計時 - span / timed 記錄各處理階段的耗時，彙總為行程內直方圖
+
+設計原則：
+1. span("recommend.stage1") 同時支援 with 與 async with，結束時記錄耗時
+2. 每個階段一個直方圖：固定桶（Prometheus histogram）+ 最近 N 筆樣本（p50/p95/p99）
+3. 請求期間的 span 記錄在 ContextVar 上，中間件可輸出為 Server-Timing 標頭
+4. render_prometheus() 產生 Prometheus 文字格式（/metrics 端點）
+"""
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import math
+import threading
+import time
+
+METRIC_NAME = "prompt_scribe_stage_duration_seconds"
+
+# 秒；涵蓋記憶體查詢（< 1ms）到 LLM 呼叫（數十秒）
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+class StageHistogram:
+    """單一階段的耗時分佈"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, reservoir_size: int = 1024):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # 最後一格為 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._recent: deque = deque(maxlen=reservoir_size)
+
+    def observe(self, seconds: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        """最近樣本的百分位數（nearest-rank）"""
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        rank = max(math.ceil(q / 100 * len(ordered)), 1)
+        return ordered[rank - 1]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class MetricsRegistry:
+    """各階段直方圖的集合"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, reservoir_size: int = 1024):
+        self.buckets = buckets
+        self.reservoir_size = reservoir_size
+        self._histograms: Dict[str, StageHistogram] = {}
+        self._lock = threading.Lock()  # 工具與離線腳本可能在執行緒中記錄
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = StageHistogram(self.buckets, self.reservoir_size)
+            histogram.observe(seconds)
+
+    def get(self, stage: str) -> Optional[StageHistogram]:
+        return self._histograms.get(stage)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def get_summary(self) -> Dict[str, Dict[str, float]]:
+        """{階段: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}"""
+        with self._lock:
+            return {stage: h.summary() for stage, h in sorted(self._histograms.items())}
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文字格式（histogram + 最近樣本的分位數）"""
+        lines = [
+            f"# HELP {METRIC_NAME} Processing time per pipeline stage.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        quantile_lines = [
+            f"# HELP {METRIC_NAME}_recent Quantiles over the most recent samples per stage.",
+            f"# TYPE {METRIC_NAME}_recent summary",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                label = _escape_label(stage)
+                cumulative = 0
+                for bound, count in zip(self.buckets, h.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="+Inf"}} {h.count}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{label}"}} {h.sum:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{label}"}} {h.count}')
+                for q in (0.5, 0.95, 0.99):
+                    quantile_lines.append(
+                        f'{METRIC_NAME}_recent{{stage="{label}",quantile="{q:g}"}} {h.percentile(q * 100):.6f}'
+                    )
+                quantile_lines.append(f'{METRIC_NAME}_recent_sum{{stage="{label}"}} {sum(h._recent):.6f}')
+                quantile_lines.append(f'{METRIC_NAME}_recent_count{{stage="{label}"}} {len(h._recent)}')
+        return "\n".join(lines + quantile_lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# 全局單例
+_registry: Optional[MetricsRegistry] = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """獲取全局指標登錄（單例）"""
+    global _registry
+
+    if _registry is None:
+        try:
+            from ..config import settings
+        except ImportError:
+            from src.api.config import settings
+        _registry = MetricsRegistry(reservoir_size=settings.metrics_reservoir_size)
+
+    return _registry
+
+
+def record_duration(stage: str, seconds: float) -> None:
+    """記錄一次階段耗時（同時加入目前請求的 Server-Timing）"""
+    get_metrics_registry().observe(stage, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+class span:
+    """
+    階段計時
+
+    用法：
+        with span("recommend.stage1"):
+            ...
+        async with span("llm.gpt5"):
+            ...
+    """
+
+    __slots__ = ("stage", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start = 0.0
+
+    def __enter__(self) -> "span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        record_duration(self.stage, time.perf_counter() - self._start)
+
+    async def __aenter__(self) -> "span":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc) -> None:
+        self.__exit__(*exc)
+
+
+def timed(stage: str) -> Callable:
+    """以 span 包裝整個函式（支援同步與 async 函式）"""
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_timing() -> List[Tuple[str, float]]:
+    """開始收集目前請求的 span（中間件呼叫；子任務共用同一個列表）"""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def format_server_timing(timings: List[Tuple[str, float]], total_seconds: Optional[float] = None) -> str:
+    """
+    產生 Server-Timing 標頭值
+
+    同名 span 合併（耗時相加，保留首次出現的順序），例如：
+        recommend.stage1;dur=12.4, db.query;dur=30.1, total;dur=48.0
+    """
+    merged: Dict[str, float] = {}
+    for stage, seconds in timings:
+        merged[stage] = merged.get(stage, 0.0) + seconds
+    parts = [f"{_timing_token(stage)};dur={seconds * 1000:.1f}" for stage, seconds in merged.items()]
+    if total_seconds is not None:
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _timing_token(stage: str) -> str:
+    """Server-Timing 名稱只能是 token 字元"""
+    return "".join(c if c.isalnum() or c in "!#$%&'*+-.^_`|~" else "_" for c in stage)
+
+
+def get_stage_summary() -> Dict[str, Any]:
+    """各階段 p50/p95/p99 摘要"""
+    return get_metrics_registry().get_summary()
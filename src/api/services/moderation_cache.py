@@ -0,0 +1,193 @@
+"""
+Moderation Verdict Cache
+Moderation API 判定快取 - 重試、重複提示與模板化輸入不再重複呼叫 Moderation API
+
+設計原則：
+1. 內容定址：鍵 = sha256(命名空間 + 正規化文字)，不保存原文
+2. 兩層：行程內 LRU（L1，含 TTL）+ 可選 Redis（L2，跨實例共用）
+3. 同一文字的並發檢查合併為一次 API 呼叫（SingleFlight）
+4. 只快取 API 的實際判定；呼叫失敗不寫入快取
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+
+from .single_flight import SingleFlight
+
+try:
+    from ..config import settings
+except Exception:
+    try:
+        from src.api.config import settings
+    except Exception:
+        from config import settings
+
+logger = logging.getLogger(__name__)
+
+# (is_safe, reason)
+Verdict = Tuple[bool, str]
+
+# 判定依據的模型變更時調整命名空間，舊判定自然失效
+MODERATION_NAMESPACE = "openai-moderation:v1"
+
+
+def normalize_moderation_text(text: str) -> str:
+    """正規化輸入：NFKC、合併空白（保留大小寫，避免改變判定語義）"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def make_moderation_key(text: str) -> str:
+    """生成內容定址的快取鍵"""
+    payload = f"{MODERATION_NAMESPACE}\n{normalize_moderation_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RedisVerdictStore:
+    """Redis 持久層（透過既有的 RedisCacheManager）"""
+
+    KEY_PREFIX = "moderation:"
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    async def _manager(self):
+        from .redis_cache_manager import get_redis_cache_manager
+        manager = await get_redis_cache_manager()
+        return manager if manager.is_available else None
+
+    async def get(self, key: str) -> Optional[Verdict]:
+        manager = await self._manager()
+        if manager is None:
+            return None
+        value = await manager.get(self.KEY_PREFIX + key)
+        if not value:
+            return None
+        return bool(value[0]), str(value[1])
+
+    async def set(self, key: str, verdict: Verdict) -> None:
+        manager = await self._manager()
+        if manager is not None:
+            await manager.set(self.KEY_PREFIX + key, list(verdict), self.ttl_seconds)
+
+
+class ModerationCache:
+    """Moderation 判定快取（TTL LRU + 可選持久層 + 並發合併）"""
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: int = 86400, store: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._lru: "OrderedDict[str, Tuple[float, Verdict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.stats = {"memory_hits": 0, "store_hits": 0, "misses": 0, "errors": 0}
+
+    def _remember(self, key: str, verdict: Verdict) -> None:
+        with self._lock:
+            self._lru[key] = (time.monotonic() + self.ttl_seconds, verdict)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _lookup_memory(self, key: str) -> Optional[Verdict]:
+        with self._lock:
+            item = self._lru.get(key)
+            if item is None:
+                return None
+            expires_at, verdict = item
+            if expires_at <= time.monotonic():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return verdict
+
+    async def get(self, text: str) -> Optional[Verdict]:
+        """查詢快取（L1 → L2），未命中返回 None"""
+        key = make_moderation_key(text)
+
+        verdict = self._lookup_memory(key)
+        if verdict is not None:
+            self.stats["memory_hits"] += 1
+            return verdict
+
+        if self.store is not None:
+            try:
+                verdict = await self.store.get(key)
+                if verdict is not None:
+                    self._remember(key, verdict)
+                    self.stats["store_hits"] += 1
+                    return verdict
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ Moderation cache store read failed: {e}")
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, text: str, verdict: Verdict) -> None:
+        """寫入快取"""
+        key = make_moderation_key(text)
+        self._remember(key, verdict)
+
+        if self.store is not None:
+            try:
+                await self.store.set(key, verdict)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ Moderation cache store write failed: {e}")
+
+    async def get_or_check(self, text: str, check: Callable[[], Awaitable[Verdict]]) -> Verdict:
+        """
+        查詢快取，未命中時呼叫 check 取得判定並寫入
+
+        同一文字的並發請求只呼叫一次 check；check 拋出的例外會傳給所有等待者且不寫入快取。
+        """
+        cached = await self.get(text)
+        if cached is not None:
+            return cached
+
+        async def _check_and_store() -> Verdict:
+            verdict = await check()
+            await self.set(text, verdict)
+            return verdict
+
+        return await self._flight.do(make_moderation_key(text), _check_and_store)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """快取統計"""
+        hits = self.stats["memory_hits"] + self.stats["store_hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "coalesced": self._flight.stats["coalesced"],
+            "size": len(self._lru),
+            "max_entries": self.max_entries,
+            "hit_rate": round(hits / total, 3) if total else 0,
+            "store": type(self.store).__name__ if self.store else None,
+        }
+
+
+# 全局單例
+_moderation_cache: Optional[ModerationCache] = None
+
+
+def get_moderation_cache() -> ModerationCache:
+    """獲取 Moderation 判定快取（單例）"""
+    global _moderation_cache
+
+    if _moderation_cache is None:
+        store = None
+        if settings.moderation_cache_backend == "redis" and settings.redis_enabled:
+            store = RedisVerdictStore(settings.moderation_cache_ttl)
+
+        _moderation_cache = ModerationCache(
+            max_entries=settings.moderation_cache_size,
+            ttl_seconds=settings.moderation_cache_ttl,
+            store=store,
+        )
+
+    return _moderation_cache
@@ -15,6 +15,8 @@ import hashlib
 import pickle
 import os
 
+from .single_flight import MISSING, SingleFlight, cached_call
+
 logger = logging.getLogger(__name__)
 
 
@@ -175,6 +177,38 @@ class RedisCacheManager:
             logger.error(f"Redis set error for key {key}: {e}")
             return False
     
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """獲取原始位元組（不經序列化，如嵌入向量）"""
+        if not self.is_available:
+            return None
+
+        self.stats['total_requests'] += 1
+
+        try:
+            data = await self._redis.get(self._make_key(key))
+            self.stats['misses' if data is None else 'hits'] += 1
+            return data
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Redis get error for key {key}: {e}")
+            return None
+
+    async def set_bytes(self, key: str, data: bytes, ttl: Optional[int] = None) -> bool:
+        """設置原始位元組（不經序列化）"""
+        if not self.is_available:
+            return False
+
+        try:
+            await self._redis.setex(self._make_key(key), ttl or self.default_ttl, data)
+            self.stats['sets'] += 1
+            return True
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Redis set error for key {key}: {e}")
+            return False
+
     async def delete(self, key: str) -> bool:
         """刪除快取值"""
         if not self.is_available:
@@ -313,15 +347,18 @@ async def get_redis_cache_manager() -> RedisCacheManager:
     return _redis_cache_manager
 
 
-def redis_cache_with_ttl(ttl_seconds: int = 3600, key_func=None):
+def redis_cache_with_ttl(ttl_seconds: int = 3600, key_func=None, stale_ttl: int = 0):
     """
     Redis 快取裝飾器
     
     Args:
         ttl_seconds: 快取過期時間（秒）
         key_func: 自定義鍵生成函數
+        stale_ttl: 過期後仍返回舊值並在背景刷新的寬限期（秒，0 表示停用）
     """
     def decorator(func):
+        flight = SingleFlight()
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # 生成快取鍵
@@ -338,30 +375,30 @@ def redis_cache_with_ttl(ttl_seconds: int = 3600, key_func=None):
                 cache_key = hashlib.md5(key_str.encode()).hexdigest()
             
             # 嘗試從快取獲取
-            try:
+            async def load():
                 cache_manager = await get_redis_cache_manager()
                 cached_result = await cache_manager.get(cache_key)
-                
-                if cached_result is not None:
-                    logger.debug(f"Cache hit for {func.__name__}: {cache_key}")
-                    return cached_result
-                
-            except Exception as e:
-                logger.warning(f"Cache get failed: {e}")
-            
-            # 執行原函數
-            result = await func(*args, **kwargs)
+                if cached_result is None:
+                    return MISSING
+                logger.debug(f"Cache hit for {func.__name__}: {cache_key}")
+                return cached_result
             
             # 存入快取
-            try:
+            async def store(value):
                 cache_manager = await get_redis_cache_manager()
-                await cache_manager.set(cache_key, result, ttl_seconds)
+                await cache_manager.set(cache_key, value, ttl_seconds + stale_ttl)
                 logger.debug(f"Cached result for {func.__name__}: {cache_key}")
-                
-            except Exception as e:
-                logger.warning(f"Cache set failed: {e}")
             
-            return result
+            # 未命中時同鍵並發請求只執行一次原函數
+            return await cached_call(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                load,
+                store,
+                flight,
+                ttl=ttl_seconds,
+                stale_ttl=stale_ttl,
+            )
         
         return wrapper
     return decorator
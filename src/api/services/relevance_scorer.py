@@ -6,8 +6,11 @@ Relevance Scoring Service
 - N-gram 複合詞匹配
 - 加權相關性評分
 """
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import logging
+import math
+
+import numpy as np
 
 try:
     from .keyword_analyzer import (
@@ -171,6 +174,170 @@ def calculate_final_score(
     }
 
 
+class BatchRelevanceScorer:
+    """
+    批次相關性評分器
+    
+    查詢相關的預處理（N-gram 集合、關鍵字權重、小寫化）只做一次，
+    再以單次迴圈評分所有候選標籤；流行度正規化與分數混合使用 NumPy 陣列。
+    分數與 calculate_final_score 逐一計算的結果完全相同。
+    """
+    
+    def __init__(
+        self,
+        keywords: List[str],
+        analyzer: KeywordAnalyzer,
+        use_ngram: bool = True,
+        use_weighted: bool = True,
+    ):
+        self.keywords = list(keywords)
+        self.use_ngram = use_ngram
+        self.use_weighted = use_weighted
+        
+        # N-gram 集合（保留集合迭代順序，與 calculate_ngram_match_score 一致）
+        self._ngrams = extract_all_ngrams(' '.join(self.keywords), max_n=3) if use_ngram and self.keywords else set()
+        self._ngram_lengths = [(ngram, len(ngram)) for ngram in self._ngrams]
+        self._words_lower = [k.lower() for k in self.keywords]
+        
+        # 加權匹配所需的 (小寫關鍵字, 權重)
+        keyword_weights = analyzer.analyze_keyword_importance(self.keywords) if use_weighted and self.keywords else {}
+        self._weighted_terms = [(k.lower(), keyword_weights.get(k, 0.7)) for k in self.keywords]
+        self._total_weight = 0.0
+        for _, weight in self._weighted_terms:
+            self._total_weight += weight
+    
+    def _ngram_score(self, tag_lower: str) -> float:
+        """與 calculate_ngram_match_score 相同的匹配階梯（僅返回分數）"""
+        if tag_lower in self._ngrams:
+            gram_size = len(tag_lower.split('_'))
+            return min(0.95 + (gram_size * 0.05), 1.0)
+        
+        tag_len = len(tag_lower)
+        for ngram, ngram_len in self._ngram_lengths:
+            if ngram in tag_lower:
+                return 0.8 + ((ngram_len / tag_len) * 0.15)
+        
+        for word_lower in self._words_lower:
+            if tag_lower == word_lower:
+                return 0.95
+        
+        for word_lower in self._words_lower:
+            if tag_lower.startswith(word_lower):
+                return 0.7 + ((len(word_lower) / tag_len) * 0.2)
+            if word_lower.startswith(tag_lower):
+                return 0.65 + ((tag_len / len(word_lower)) * 0.2)
+        
+        for word_lower in self._words_lower:
+            if word_lower in tag_lower:
+                return 0.5 + ((len(word_lower) / tag_len) * 0.2)
+            if tag_lower in word_lower:
+                return 0.45 + ((tag_len / len(word_lower)) * 0.2)
+        
+        return 0.0
+    
+    def _weighted_score(self, tag_lower: str) -> float:
+        """與 calculate_weighted_relevance 相同的加權匹配"""
+        matched_weight = 0.0
+        for keyword_lower, weight in self._weighted_terms:
+            if tag_lower == keyword_lower:
+                match_score = 1.0
+            elif tag_lower.startswith(keyword_lower):
+                match_score = 0.9
+            elif keyword_lower.startswith(tag_lower):
+                match_score = 0.85
+            elif keyword_lower in tag_lower:
+                match_score = 0.7
+            elif tag_lower in keyword_lower:
+                match_score = 0.6
+            else:
+                continue
+            matched_weight += match_score * weight
+        
+        if self._total_weight == 0:
+            return 0.0
+        return min(matched_weight / self._total_weight, 1.0)
+    
+    def relevance(self, tag_name: str) -> float:
+        """計算單一標籤的相關性（同 calculate_relevance_score）"""
+        if not self.keywords:
+            return 0.0
+        
+        tag_lower = tag_name.lower()
+        
+        if self.use_ngram:
+            ngram_score = self._ngram_score(tag_lower)
+            if ngram_score >= 0.8:
+                return ngram_score
+        
+        if self.use_weighted:
+            weighted_score = self._weighted_score(tag_lower)
+            if weighted_score > 0:
+                return weighted_score
+        
+        # 基礎匹配（後備）
+        if tag_lower in self._words_lower:
+            return 1.0
+        
+        max_score = 0.0
+        for keyword in self._words_lower:
+            if tag_lower.startswith(keyword):
+                score = 0.8 + ((len(keyword) / len(tag_lower)) * 0.1)
+                max_score = max(max_score, score)
+            elif keyword in tag_lower:
+                score = 0.5 + ((len(keyword) / len(tag_lower)) * 0.2)
+                max_score = max(max_score, score)
+        
+        return max(max_score, 0.1)
+    
+    def score(
+        self,
+        tags: List[Dict],
+        relevance_weight: float = 0.7,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        批次計算分數
+        
+        Returns:
+            (相關性, 流行度, 最終分數) 三個 float64 陣列
+        """
+        relevance = np.fromiter(
+            (self.relevance(tag['name']) for tag in tags), dtype=np.float64, count=len(tags)
+        )
+        
+        # log10 逐一以 math.log10 計算（np.log10 在部分數值上與其有 1 ulp 差異），其餘向量化
+        post_counts = np.fromiter((tag['post_count'] for tag in tags), dtype=np.int64, count=len(tags))
+        log_counts = np.fromiter(
+            (math.log10(pc) if pc > 0 else 0.0 for pc in post_counts.tolist()),
+            dtype=np.float64,
+            count=len(tags),
+        )
+        popularity = np.minimum(log_counts / 8, 1.0)
+        
+        final = relevance * relevance_weight + popularity * (1.0 - relevance_weight)
+        return relevance, popularity, final
+    
+    def rank(self, tags: List[Dict], relevance_weight: float = 0.7) -> List[Dict]:
+        """評分並依最終分數由高到低排序（同分保持原順序）"""
+        if not tags:
+            return []
+        
+        relevance, popularity, final = self.score(tags, relevance_weight)
+        order = np.argsort(-final, kind='stable')
+        
+        relevance_list = relevance.tolist()
+        popularity_list = popularity.tolist()
+        final_list = final.tolist()
+        return [
+            {
+                **tags[i],
+                'relevance_score': relevance_list[i],
+                'popularity_score': popularity_list[i],
+                'final_score': final_list[i],
+            }
+            for i in order.tolist()
+        ]
+
+
 def rank_tags_by_relevance(
     tags: List[Dict],
     keywords: List[str],
@@ -178,7 +345,7 @@ def rank_tags_by_relevance(
     relevance_weight: float = 0.7,
 ) -> List[Dict]:
     """
-    根據相關性對標籤進行排序
+    根據相關性對標籤進行排序（批次評分）
     
     Args:
         tags: 標籤列表（包含 name 和 post_count）
@@ -188,29 +355,7 @@ def rank_tags_by_relevance(
     Returns:
         排序後的標籤列表（添加了 relevance_score 欄位）
     """
-    scored_tags = []
-    
-    for tag in tags:
-        scores = calculate_final_score(
-            tag['name'],
-            keywords,
-            tag['post_count'],
-            analyzer,
-            relevance_weight=relevance_weight,
-            popularity_weight=1.0 - relevance_weight,
-        )
-        
-        tag_with_score = {
-            **tag,
-            'relevance_score': scores['relevance'],
-            'popularity_score': scores['popularity'],
-            'final_score': scores['final']
-        }
-        
-        scored_tags.append(tag_with_score)
-    
-    # 按最終分數排序
-    scored_tags.sort(key=lambda x: x['final_score'], reverse=True)
+    scored_tags = BatchRelevanceScorer(keywords, analyzer).rank(tags, relevance_weight)
     
     logger.info(
         f"Ranked {len(scored_tags)} tags by relevance "
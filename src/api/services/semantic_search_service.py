@@ -14,20 +14,26 @@ import logging
 from typing import List, Dict, Optional
 import numpy as np
 from openai import AsyncOpenAI
-from supabase import Client
 
+from .content_levels import get_content_level_column
 from .inspire_db_wrapper import InspireDBWrapper
+from .embedding_index import get_embedding_index, EmbeddingIndex
+from .embedding_cache import get_embedding_cache
+from .metrics import span
+from ..inspire_config.content_rating import is_tag_allowed, max_allowed_level
 from ..models.inspire_models import SemanticSearchRequest, SemanticSearchResponse, SemanticSearchResult
 
 logger = logging.getLogger(__name__)
 
 class SemanticSearchService:
     """語義搜尋服務"""
+
+    EMBEDDING_MODEL = "text-embedding-3-small"
     
     def __init__(self, db_wrapper: InspireDBWrapper, openai_client: AsyncOpenAI):
         self.db_wrapper = db_wrapper
         self.openai_client = openai_client
-        self.supabase: Client = db_wrapper.client
+        self.adb = db_wrapper.adb
     
     async def search(self, request: SemanticSearchRequest) -> SemanticSearchResponse:
         """
@@ -57,7 +63,7 @@ class SemanticSearchService:
                 user_access_level=request.user_access_level
             )
 
-            # 若 RPC 不可用，退回應用端本地計算（最多取 1000 筆）
+            # 若 RPC 不可用，退回應用端本地計算（本地 IVF 索引，無索引時最多取 1000 筆）
             if not results:
                 results = await self._search_similar_tags(
                     query_embedding=query_embedding,
@@ -102,8 +108,15 @@ class SemanticSearchService:
                 "min_similarity": max(min_similarity, 0.0),
             }
 
-            # Supabase Python Client 的 RPC 調用
-            resp = self.supabase.rpc("semantic_tag_search", payload).execute()
+            # content_level 欄位可用時由資料庫依權限過濾（semantic_tag_search_rated）
+            rpc_name = "semantic_tag_search"
+            level_column = get_content_level_column()
+            if await level_column.is_current(self.adb):
+                rpc_name = "semantic_tag_search_rated"
+                payload["max_content_level"] = max_allowed_level(user_access_level)
+
+            # 非同步 PostgREST RPC 調用
+            resp = await self.adb.execute(self.adb.rpc(rpc_name, payload))
             rows = resp.data or []
             if rows:
                 logger.info("Using pgvector RPC for semantic search results")
@@ -149,12 +162,29 @@ class SemanticSearchService:
             return []
     
     async def _generate_query_embedding(self, query: str) -> List[float]:
-        """生成查詢嵌入向量"""
+        """生成查詢嵌入向量（先查詢嵌入快取）"""
         try:
-            response = await self.openai_client.embeddings.create(
-                model="text-embedding-3-small",
-                input=query
-            )
+            from ..config import settings
+        except Exception:
+            from config import settings
+
+        if not settings.embedding_cache_enabled:
+            return await self._create_query_embedding(query)
+
+        return await get_embedding_cache().get_or_create(
+            self.EMBEDDING_MODEL,
+            query,
+            lambda: self._create_query_embedding(query)
+        )
+
+    async def _create_query_embedding(self, query: str) -> List[float]:
+        """呼叫 OpenAI 生成查詢嵌入向量"""
+        try:
+            with span("embedding.api"):
+                response = await self.openai_client.embeddings.create(
+                    model=self.EMBEDDING_MODEL,
+                    input=query
+                )
             return response.data[0].embedding
             
         except Exception as e:
@@ -169,50 +199,108 @@ class SemanticSearchService:
         user_access_level: str
     ) -> List[SemanticSearchResult]:
         """搜尋相似標籤"""
+        index = get_embedding_index()
+        if index is not None:
+            return self._search_local_index(index, query_embedding, top_k, min_similarity, user_access_level)
+        
         try:
-            # 獲取所有有嵌入向量的標籤（限制數量以提高性能）
-            response = self.supabase.table('tags_final').select(
+            # 沒有本地索引時只能取部分嵌入向量（限制數量以提高性能）
+            logger.warning("⚠️ No local embedding index, semantic fallback limited to 1000 tags")
+            query = self.adb.table('tags_final').select(
                 'id, name, post_count, main_category, sub_category, embedding'
-            ).not_.is_('embedding', 'null').limit(1000).execute()
+            ).not_.is_('embedding', 'null')
+            level_column = get_content_level_column()
+            if await level_column.is_current(self.adb):
+                query = level_column.apply(query, user_access_level)
+            response = await self.adb.execute(query.limit(1000))
             
             if not response.data:
                 return []
             
-            # 計算相似度
-            similarities = []
+            # 處理嵌入向量格式（JSON 字符串或直接數組），再一次性計算相似度
+            tags = []
+            vectors = []
             for tag in response.data:
-                if tag['embedding']:
-                    embedding_value = tag['embedding']
-                    
-                    # 處理嵌入向量格式（JSON 字符串或直接數組）
-                    if isinstance(embedding_value, str):
-                        try:
-                            embedding_value = json.loads(embedding_value)
-                        except Exception:
-                            continue
-                    
-                    similarity = self._cosine_similarity(query_embedding, embedding_value)
-                    
-                    # 應用相似度閾值
-                    if similarity >= min_similarity:
-                        # 檢查內容分級
-                        if self._is_content_allowed(tag['name'], user_access_level):
-                            similarities.append(SemanticSearchResult(
-                                name=tag['name'],
-                                post_count=tag['post_count'],
-                                similarity=similarity,
-                                main_category=tag.get('main_category'),
-                                sub_category=tag.get('sub_category')
-                            ))
+                embedding_value = tag['embedding']
+                if not embedding_value:
+                    continue
+                if isinstance(embedding_value, str):
+                    try:
+                        embedding_value = json.loads(embedding_value)
+                    except Exception:
+                        continue
+                tags.append(tag)
+                vectors.append(embedding_value)
+            
+            if not vectors:
+                return []
             
-            # 按相似度排序並返回前 k 個
-            similarities.sort(key=lambda x: x.similarity, reverse=True)
-            return similarities[:top_k]
+            matrix = np.asarray(vectors, dtype=float)
+            query = np.asarray(query_embedding, dtype=float)
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+            norms[norms == 0] = np.inf  # 零向量相似度視為 0
+            scores = (matrix @ query) / norms
+            
+            similarities = []
+            for i in np.argsort(-scores, kind='stable'):
+                similarity = float(scores[i])
+                # 應用相似度閾值（已排序，之後都更低）
+                if similarity < min_similarity:
+                    break
+                tag = tags[i]
+                # 檢查內容分級
+                if self._is_content_allowed(tag['name'], user_access_level):
+                    similarities.append(SemanticSearchResult(
+                        name=tag['name'],
+                        post_count=tag['post_count'],
+                        similarity=similarity,
+                        main_category=tag.get('main_category'),
+                        sub_category=tag.get('sub_category')
+                    ))
+                    if len(similarities) >= top_k:
+                        break
+            
+            return similarities
             
         except Exception as e:
             logger.error(f"❌ Failed to search similar tags: {e}")
             return []
     
+    def _search_local_index(
+        self,
+        index: EmbeddingIndex,
+        query_embedding: List[float],
+        top_k: int,
+        min_similarity: float,
+        user_access_level: str
+    ) -> List[SemanticSearchResult]:
+        """使用本地 IVF 索引搜尋全庫（在索引內依內容等級過濾後取 top_k）"""
+        try:
+            hits = index.search(
+                query_embedding,
+                top_k=top_k,
+                min_similarity=min_similarity,
+                max_content_level=max_allowed_level(user_access_level)
+            )
+            
+            results = []
+            for row, similarity in hits:
+                name = index.names[row]
+                results.append(SemanticSearchResult(
+                    name=name,
+                    post_count=index.post_counts[row],
+                    similarity=similarity,
+                    main_category=index.main_categories[row],
+                    sub_category=index.sub_categories[row]
+                ))
+            
+            logger.info(f"Using local embedding index for semantic search ({len(index)} vectors)")
+            return results
+            
+        except Exception as e:
+            logger.error(f"❌ Local embedding index search failed: {e}")
+            return []
+    
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """計算餘弦相似度"""
         try:
@@ -234,21 +322,15 @@ class SemanticSearchService:
             return 0
     
     def _is_content_allowed(self, tag_name: str, user_access_level: str) -> bool:
-        """檢查內容是否允許（基於使用者權限）"""
-        # 簡單的內容分級檢查
-        nsfw_keywords = ['nude', 'sex', 'explicit', 'adult']
-        
-        if user_access_level == "all-ages":
-            return not any(keyword in tag_name.lower() for keyword in nsfw_keywords)
-        
-        return True  # r15 和 r18 允許所有內容
+        """檢查內容是否允許（基於使用者權限，與關鍵字搜尋使用同一套內容分級）"""
+        return is_tag_allowed(tag_name, user_access_level)
     
     async def _get_embedding_count(self) -> int:
         """獲取可用嵌入向量數量"""
         try:
-            response = self.supabase.table('tags_final').select(
+            response = await self.adb.execute(self.adb.table('tags_final').select(
                 'id', count='exact'
-            ).not_.is_('embedding', 'null').execute()
+            ).not_.is_('embedding', 'null').limit(1))
             
             return response.count or 0
             
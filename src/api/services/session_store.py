@@ -0,0 +1,314 @@
+"""
+Session Write-Behind Store
+Inspire Session 的寫後快取 - 一輪對話中的所有變更先累積在記憶體，結束時一次寫入
+
+設計原則：
+1. 欄位覆寫（current_phase、last_response_id 等）以最後寫入者為準
+2. total_cost / total_tokens / tool_call_count / total_tool_calls 只記錄增量，
+   由 apply_inspire_session_delta RPC 在資料庫端累加（scripts/15_session_write_behind.sql），
+   重疊的請求不會再因讀取 → 修改 → 寫回而遺失更新
+3. 每輪結束時 flush；背景計時器補寫遺漏或寫入失敗的變更，關閉時全部寫出
+4. 尚未套用 migration 15 時退回直接寫表（非原子，與原本行為相同）
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+RPC_NAME = "apply_inspire_session_delta"
+
+# 由 RPC 累加、不能直接覆寫的欄位
+COUNTER_FIELDS = ("total_cost", "total_tokens", "tool_call_count")
+
+
+class PendingSession:
+    """單一 Session 尚未寫入的變更"""
+
+    __slots__ = ("session_id", "create", "fields", "cost_delta", "tokens_delta", "tool_calls", "mutations", "since")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.create = False
+        self.fields: Dict[str, Any] = {}
+        self.cost_delta = 0.0
+        self.tokens_delta = 0
+        self.tool_calls: Dict[str, int] = {}
+        self.mutations = 0
+        self.since = time.monotonic()
+
+    @property
+    def tool_calls_delta(self) -> int:
+        return sum(self.tool_calls.values())
+
+    def merge_older(self, older: "PendingSession") -> None:
+        """把寫入失敗的舊變更併回（較新的欄位覆寫優先）"""
+        self.create = self.create or older.create
+        self.fields = {**older.fields, **self.fields}
+        self.cost_delta += older.cost_delta
+        self.tokens_delta += older.tokens_delta
+        for tool_name, count in older.tool_calls.items():
+            self.tool_calls[tool_name] = self.tool_calls.get(tool_name, 0) + count
+        self.mutations += older.mutations
+        self.since = min(self.since, older.since)
+
+    def apply_to(self, row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """在資料庫資料上疊加尚未寫入的變更（讀取自己的寫入）"""
+        if row is None:
+            if not self.create:
+                return None
+            row = {
+                "session_id": self.session_id,
+                "current_phase": "understanding",
+                "total_cost": 0.0,
+                "total_tokens": 0,
+                "total_tool_calls": 0,
+                "tool_call_count": {},
+            }
+        merged = {**row, **self.fields}
+        merged["total_cost"] = (row.get("total_cost") or 0.0) + self.cost_delta
+        merged["total_tokens"] = (row.get("total_tokens") or 0) + self.tokens_delta
+        merged["total_tool_calls"] = (merged.get("total_tool_calls") or 0) + self.tool_calls_delta
+        tool_call_count = dict(row.get("tool_call_count") or {})
+        for tool_name, count in self.tool_calls.items():
+            tool_call_count[tool_name] = tool_call_count.get(tool_name, 0) + count
+        merged["tool_call_count"] = tool_call_count
+        return merged
+
+
+class SessionWriteBehindStore:
+    """
+    Session 寫後快取
+
+    記錄變更的方法都是同步的（只改記憶體），只有 flush 會存取資料庫。
+    """
+
+    def __init__(self, adb, flush_interval_seconds: float = 5.0):
+        self.adb = adb
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending: Dict[str, PendingSession] = {}
+        self._flush_locks: Dict[str, List[Any]] = {}  # session_id → [Lock, 等待中的 flush 數]
+        self._flush_task: Optional[asyncio.Task] = None
+        self._rpc_available = True
+        self.stats = {
+            "mutations": 0,
+            "flushes": 0,
+            "rpc_writes": 0,
+            "direct_writes": 0,
+            "failed_flushes": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # 記錄變更
+    # ------------------------------------------------------------------
+
+    def _pending_for(self, session_id: str) -> PendingSession:
+        pending = self._pending.get(session_id)
+        if pending is None:
+            pending = self._pending[session_id] = PendingSession(session_id)
+        pending.mutations += 1
+        self.stats["mutations"] += 1
+        return pending
+
+    def create(self, session_id: str, **fields) -> None:
+        """新建 Session（flush 時以 upsert 建立）"""
+        pending = self._pending_for(session_id)
+        pending.create = True
+        pending.fields.update(fields)
+
+    def set_fields(self, session_id: str, **fields) -> None:
+        """覆寫欄位；計數欄位請使用 add_cost / add_tool_call"""
+        for name in COUNTER_FIELDS:
+            if name in fields:
+                raise ValueError(f"{name} is a counter, use add_cost/add_tool_call")
+        fields.pop("updated_at", None)  # 由資料庫在寫入時設定
+        self._pending_for(session_id).fields.update(fields)
+
+    def add_cost(self, session_id: str, cost: float, tokens: int) -> None:
+        pending = self._pending_for(session_id)
+        pending.cost_delta += cost
+        pending.tokens_delta += tokens
+
+    def add_tool_call(self, session_id: str, tool_name: str, count: int = 1) -> None:
+        pending = self._pending_for(session_id)
+        pending.tool_calls[tool_name] = pending.tool_calls.get(tool_name, 0) + count
+
+    def pending(self, session_id: str) -> Optional[PendingSession]:
+        return self._pending.get(session_id)
+
+    def overlay(self, session_id: str, row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """資料庫資料 + 尚未寫入的變更"""
+        pending = self._pending.get(session_id)
+        return pending.apply_to(row) if pending else row
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+
+    async def flush(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        把 Session 累積的變更一次寫入
+
+        Returns:
+            寫入後的 Session 資料；沒有待寫變更時返回 None，
+            寫入失敗時變更會保留到下次 flush 並重新拋出例外
+        """
+        # 同一 Session 的 flush 依序執行，避免較舊的欄位覆寫晚於較新的寫入
+        entry = self._flush_locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                pending = self._pending.pop(session_id, None)
+                if pending is None:
+                    return None
+                try:
+                    row = await self._write(pending)
+                except Exception:
+                    self.stats["failed_flushes"] += 1
+                    newer = self._pending.get(session_id)
+                    if newer is None:
+                        self._pending[session_id] = pending
+                    else:
+                        newer.merge_older(pending)
+                    raise
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._flush_locks.pop(session_id, None)
+
+        self.stats["flushes"] += 1
+        logger.debug(f"Session {session_id} flushed ({pending.mutations} mutations)")
+        return row
+
+    async def flush_all(self, min_age_seconds: float = 0.0) -> int:
+        """寫出所有（或累積超過 min_age_seconds 的）Session，返回成功寫入數"""
+        now = time.monotonic()
+        session_ids = [
+            session_id for session_id, pending in list(self._pending.items())
+            if now - pending.since >= min_age_seconds
+        ]
+        flushed = 0
+        for session_id in session_ids:
+            try:
+                await self.flush(session_id)
+                flushed += 1
+            except Exception as e:
+                logger.error(f"❌ Failed to flush session {session_id}: {e}")
+        return flushed
+
+    async def _write(self, pending: PendingSession) -> Optional[Dict[str, Any]]:
+        if self._rpc_available:
+            try:
+                result = await self.adb.execute(self.adb.rpc(RPC_NAME, {
+                    "p_session_id": pending.session_id,
+                    "p_fields": pending.fields,
+                    "p_cost_delta": pending.cost_delta,
+                    "p_tokens_delta": pending.tokens_delta,
+                    "p_tool_calls": pending.tool_calls,
+                    "p_create": pending.create,
+                }))
+                self.stats["rpc_writes"] += 1
+                return result.data[0] if result.data else None
+            except Exception as e:
+                if "PGRST202" not in str(e) and "Could not find the function" not in str(e):
+                    raise
+                self._rpc_available = False
+                logger.warning(
+                    f"⚠️ {RPC_NAME} not available, falling back to direct writes "
+                    f"(apply scripts/15_session_write_behind.sql): {e}"
+                )
+        return await self._write_direct(pending)
+
+    async def _write_direct(self, pending: PendingSession) -> Optional[Dict[str, Any]]:
+        """未套用 migration 15 時的寫入方式（讀取 → 修改 → 寫回）"""
+        table = "inspire_sessions"
+        if pending.create:
+            await self.adb.execute(
+                self.adb.table(table).upsert({"session_id": pending.session_id}, ignore_duplicates=True)
+            )
+
+        update = dict(pending.fields)
+        if pending.cost_delta or pending.tokens_delta or pending.tool_calls:
+            result = await self.adb.execute(
+                self.adb.table(table).select('*').eq('session_id', pending.session_id)
+            )
+            if not result.data:
+                return None
+            row = result.data[0]
+            update["total_cost"] = (row.get("total_cost") or 0.0) + pending.cost_delta
+            update["total_tokens"] = (row.get("total_tokens") or 0) + pending.tokens_delta
+            if pending.tool_calls:
+                tool_call_count = dict(row.get("tool_call_count") or {})
+                for tool_name, count in pending.tool_calls.items():
+                    tool_call_count[tool_name] = tool_call_count.get(tool_name, 0) + count
+                update["tool_call_count"] = tool_call_count
+                base = update.get("total_tool_calls", row.get("total_tool_calls"))
+                update["total_tool_calls"] = (base or 0) + pending.tool_calls_delta
+
+        update["updated_at"] = datetime.now().isoformat()
+        result = await self.adb.execute(
+            self.adb.table(table).update(update).eq('session_id', pending.session_id)
+        )
+        self.stats["direct_writes"] += 1
+        return result.data[0] if result.data else None
+
+    # ------------------------------------------------------------------
+    # 背景計時器
+    # ------------------------------------------------------------------
+
+    def start_flush_loop(self) -> None:
+        """啟動背景定時 flush"""
+        if self.flush_interval_seconds > 0 and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop_flush_loop(self) -> None:
+        """停止背景 flush 並寫出所有剩餘變更"""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+        await self.flush_all()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush_all(min_age_seconds=self.flush_interval_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """寫後快取統計"""
+        return {
+            **self.stats,
+            "pending_sessions": len(self._pending),
+            "rpc_available": self._rpc_available,
+        }
+
+
+# 全局單例
+_session_store: Optional[SessionWriteBehindStore] = None
+
+
+def get_session_store() -> Optional[SessionWriteBehindStore]:
+    """獲取 Session 寫後快取（未啟用時返回 None）"""
+    global _session_store
+
+    if _session_store is None:
+        try:
+            from ..config import settings
+        except ImportError:
+            from src.api.config import settings
+
+        if not settings.session_write_behind_enabled:
+            return None
+
+        from .async_db import get_async_database
+        _session_store = SessionWriteBehindStore(
+            get_async_database(),
+            flush_interval_seconds=settings.session_flush_interval_seconds,
+        )
+
+    return _session_store
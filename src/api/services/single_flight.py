@@ -0,0 +1,118 @@
+"""
+Single-Flight Request Coalescing
+快取未命中合併 - 同一鍵的並發未命中只執行一次計算
+
+設計原則：
+1. 同一鍵同時只有一個進行中的計算，其他呼叫者等待同一結果
+2. 呼叫者被取消不會取消共享的計算（asyncio.shield）
+3. 可選 stale-while-revalidate：過期但仍在寬限期的值立即返回，背景刷新一次
+"""
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 快取未命中標記（與快取值 None 區分）
+MISSING = object()
+
+_ENVELOPE_KEY = "__swr__"
+
+
+class SingleFlight:
+    """同鍵並發計算合併"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"executions": 0, "coalesced": 0, "background_refreshes": 0}
+
+    def _start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        self.stats["executions"] += 1
+
+        def _done(t: asyncio.Task) -> None:
+            if self._inflight.get(key) is t:
+                del self._inflight[key]
+
+        task.add_done_callback(_done)
+        return task
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """執行 fn；若同鍵已有進行中的計算則等待其結果"""
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.stats["coalesced"] += 1
+        else:
+            task = self._start(key, fn)
+        return await asyncio.shield(task)
+
+    def refresh(self, key: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        """背景刷新（同鍵已有進行中的計算時不重複啟動）"""
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            return
+
+        self.stats["background_refreshes"] += 1
+        task = self._start(key, fn)
+        task.add_done_callback(_log_refresh_error)
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+
+def _log_refresh_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"⚠️ Background cache refresh failed: {task.exception()}")
+
+
+def wrap_stale(value: Any, fresh_seconds: float) -> Dict[str, Any]:
+    """包裝快取值並記錄新鮮期限（牆鐘時間，可跨行程共用）"""
+    return {_ENVELOPE_KEY: 1, "value": value, "fresh_until": time.time() + fresh_seconds}
+
+
+async def cached_call(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    load: Callable[[], Awaitable[Any]],
+    store: Callable[[Any], Awaitable[Any]],
+    flight: SingleFlight,
+    ttl: float,
+    stale_ttl: float = 0,
+) -> Any:
+    """
+    帶合併與 stale-while-revalidate 的快取讀取
+
+    Args:
+        key: 快取鍵
+        compute: 未命中時的計算函數
+        load: 讀取快取（未命中返回 MISSING）
+        store: 寫入快取（stale_ttl > 0 時寫入的是包裝後的值，保存時間應為 ttl + stale_ttl）
+        flight: 合併群組
+        ttl: 新鮮期限
+        stale_ttl: 過期後仍可返回舊值的寬限期（0 表示停用）
+    """
+    async def compute_and_store():
+        result = await compute()
+        try:
+            await store(wrap_stale(result, ttl) if stale_ttl > 0 else result)
+        except Exception as e:
+            logger.warning(f"Cache set failed: {e}")
+        return result
+
+    try:
+        cached = await load()
+    except Exception as e:
+        logger.warning(f"Cache get failed: {e}")
+        cached = MISSING
+
+    if cached is not MISSING:
+        if stale_ttl <= 0:
+            return cached
+        if isinstance(cached, dict) and cached.get(_ENVELOPE_KEY) == 1:
+            if cached["fresh_until"] <= time.time():
+                flight.refresh(key, compute_and_store)
+            return cached["value"]
+
+    return await flight.do(key, compute_and_store)
@@ -1,10 +1,13 @@
 """
 Supabase Client Service
 提供資料庫連接和查詢功能
+
+標籤查詢經由 tag_storage 後端（Supabase 或本地 SQLite）；
+Inspire Session 等寫入仍使用 Supabase（client / async_db）。
 """
 from supabase import create_client, Client
 import httpx
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import logging
 from functools import lru_cache
 
@@ -22,17 +25,32 @@ try:
     from .cache_manager import cache_short, cache_medium
     from .relevance_scorer import rank_tags_by_relevance
     from .keyword_analyzer import get_keyword_analyzer
+    from .tag_snapshot import get_tag_snapshot
+    from .async_db import AsyncDatabase, get_async_database, get_proxy_config
+    from .tag_storage import TagStorageBackend, get_tag_storage
+    from .tag_statistics import get_tag_statistics_service
+    from .tag_cursor import cursor_scope, decode_tag_cursor, encode_tag_cursor
 except Exception:
     try:
         # 優先再嘗試套件內相對匯入（部分執行環境第一次可能未建構套件上下文）
         from .cache_manager import cache_short, cache_medium
         from .relevance_scorer import rank_tags_by_relevance
         from .keyword_analyzer import get_keyword_analyzer
+        from .tag_snapshot import get_tag_snapshot
+        from .async_db import AsyncDatabase, get_async_database, get_proxy_config
+        from .tag_storage import TagStorageBackend, get_tag_storage
+        from .tag_statistics import get_tag_statistics_service
+        from .tag_cursor import cursor_scope, decode_tag_cursor, encode_tag_cursor
     except Exception:
         # 專案根絕對路徑
         from src.api.services.cache_manager import cache_short, cache_medium
         from src.api.services.relevance_scorer import rank_tags_by_relevance
         from src.api.services.keyword_analyzer import get_keyword_analyzer
+        from src.api.services.tag_snapshot import get_tag_snapshot
+        from src.api.services.async_db import AsyncDatabase, get_async_database, get_proxy_config
+        from src.api.services.tag_storage import TagStorageBackend, get_tag_storage
+        from src.api.services.tag_statistics import get_tag_statistics_service
+        from src.api.services.tag_cursor import cursor_scope, decode_tag_cursor, encode_tag_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -50,16 +68,7 @@ class SupabaseService:
         """獲取 Supabase 客戶端實例"""
         if not self._initialized:
             # 建立 httpx 客戶端，支援代理
-            proxies: dict | None = None
-            if settings.all_proxy or settings.http_proxy or settings.https_proxy:
-                proxies = {}
-                if settings.all_proxy:
-                    proxies = {"all://": settings.all_proxy}
-                else:
-                    if settings.http_proxy:
-                        proxies["http://"] = settings.http_proxy
-                    if settings.https_proxy:
-                        proxies["https://"] = settings.https_proxy
+            proxies = get_proxy_config()
 
             # 以 Service Key 優先，否則退回 Anon Key（寫入操作需要 service_role）
             supabase_key = getattr(settings, 'supabase_service_key', None) or settings.supabase_anon_key
@@ -85,12 +94,21 @@ class SupabaseService:
             logger.info("✅ Supabase client initialized")
         return self._client
     
+    @property
+    def async_db(self) -> AsyncDatabase:
+        """非同步資料庫存取層（API 處理器內的查詢應使用此層，避免阻塞事件迴圈）"""
+        return get_async_database()
+    
+    @property
+    def storage(self) -> TagStorageBackend:
+        """標籤儲存後端（依 tag_storage_backend 設定）"""
+        return get_tag_storage()
+    
     async def test_connection(self) -> bool:
         """測試資料庫連接"""
         try:
-            # 簡單查詢測試連接
-            result = self.client.table('tags_final').select('count').limit(1).execute()
-            logger.info("✅ Database connection successful")
+            await self.storage.test_connection()
+            logger.info(f"✅ Database connection successful ({self.storage.name})")
             return True
         except Exception as e:
             logger.error(f"❌ Database connection failed: {e}")
@@ -98,21 +116,15 @@ class SupabaseService:
     
     @cache_short
     async def get_tag_by_name(self, name: str) -> Optional[Dict[str, Any]]:
-        """根據名稱查詢單一標籤（帶快取）"""
+        """根據名稱查詢單一標籤（優先查快照，帶快取）"""
+        snapshot = get_tag_snapshot()
+        if snapshot is not None:
+            entry = snapshot.get(name)
+            if entry is not None:
+                return entry.to_row()
+        
         try:
-            result = self.client.table('tags_final')\
-                .select('*')\
-                .eq('name', name)\
-                .limit(1)\
-                .execute()
-            
-            if result.data:
-                tag = result.data[0]
-                # 統一輸出型別
-                if 'id' in tag and not isinstance(tag['id'], str):
-                    tag['id'] = str(tag['id'])
-                return tag
-            return None
+            return await self.storage.get_tag_by_name(name)
         except Exception as e:
             logger.error(f"Error fetching tag '{name}': {e}")
             raise
@@ -132,26 +144,24 @@ class SupabaseService:
             if not names:
                 return {}
             
-            # 使用 IN 查詢一次性獲取所有標籤
-            result = self.client.table('tags_final')\
-                .select('*')\
-                .in_('name', names)\
-                .execute()
-            
-            # 建立名稱到資料的映射
+            # 先從快照取得，僅未命中的名稱查詢資料庫
             tag_map = {}
-            for tag in result.data:
-                # 統一輸出型別
-                if 'id' in tag and not isinstance(tag['id'], str):
-                    tag['id'] = str(tag['id'])
-                tag_map[tag['name']] = tag
+            missing = list(names)
+            snapshot = get_tag_snapshot()
+            if snapshot is not None:
+                found, missing = snapshot.lookup_many(names)
+                tag_map = {name: entry.to_row() for name, entry in found.items()}
+            
+            if missing:
+                tag_map.update(await self.storage.get_tags_by_names(missing))
             
             # 確保所有請求的標籤都有對應條目（即使不存在）
             result_dict = {}
             for name in names:
                 result_dict[name] = tag_map.get(name, None)
             
-            logger.info(f"✅ Batch fetched {len(result.data)}/{len(names)} tags")
+            found_count = sum(1 for tag in result_dict.values() if tag is not None)
+            logger.info(f"✅ Batch fetched {found_count}/{len(names)} tags ({len(missing)} from database)")
             return result_dict
             
         except Exception as e:
@@ -174,35 +184,67 @@ class SupabaseService:
             (標籤列表, 總數)
         """
         try:
-            # 建立查詢
-            query = self.client.table('tags_final').select('*', count='exact')
-            
-            # 應用篩選
-            if category:
-                query = query.eq('main_category', category)
-            if name_filter:
-                query = query.ilike('name', f'%{name_filter}%')
-            
-            # 排序
-            query = query.order(order_by, desc=order_desc)
-            
-            # 分頁
-            query = query.range(offset, offset + limit - 1)
-            
-            result = query.execute()
-            
-            total = result.count if result.count else 0
-            # 統一輸出型別
-            rows = result.data or []
-            for row in rows:
-                if 'id' in row and not isinstance(row['id'], str):
-                    row['id'] = str(row['id'])
-            return rows, total
-            
+            return await self.storage.list_tags(
+                limit=limit,
+                offset=offset,
+                category=category,
+                name_filter=name_filter,
+                order_by=order_by,
+                order_desc=order_desc,
+            )
         except Exception as e:
             logger.error(f"Error fetching tags: {e}")
             raise
     
+    async def get_tags_page(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        category: Optional[str] = None,
+        name_filter: Optional[str] = None,
+        include_total: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        游標分頁查詢標籤列表（post_count DESC, name ASC）
+        
+        Args:
+            cursor: 上一頁返回的 next_cursor；None 表示第一頁
+            include_total: 是否附上估計總數（取自預先彙總的統計，不計算 COUNT）
+        
+        Returns:
+            (標籤列表, 下一頁游標（最後一頁為 None）, 估計總數（有名稱篩選時為 None）)
+        
+        Raises:
+            InvalidCursorError: 游標無效或與篩選條件不一致
+        """
+        scope = cursor_scope(category, name_filter)
+        after = decode_tag_cursor(cursor, scope) if cursor else None
+        
+        try:
+            # 多取一筆判斷是否還有下一頁
+            rows = await self.storage.list_tags_after(
+                limit + 1, after=after, category=category, name_filter=name_filter
+            )
+        except Exception as e:
+            logger.error(f"Error fetching tags page: {e}")
+            raise
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_tag_cursor(last.get('post_count') or 0, last['name'], scope)
+        
+        total = None
+        if include_total and not name_filter:
+            try:
+                statistics = await get_tag_statistics_service().get()
+                total = statistics.category_distribution.get(category, 0) if category else statistics.total_tags
+            except Exception as e:
+                logger.warning(f"⚠️ Approximate total unavailable: {e}")
+        
+        return rows, next_cursor, total
+    
     @cache_short
     async def search_tags_by_keywords(
         self,
@@ -223,35 +265,27 @@ class SupabaseService:
             use_relevance_ranking: 使用相關性排序（預設 True）
         """
         try:
-            # 使用 OR 查詢多個關鍵字
-            query = self.client.table('tags_final').select('*')
-            
-            # 基本篩選
-            query = query.gte('post_count', min_popularity)
-            if category:
-                query = query.eq('main_category', category)
-            
-            # 關鍵字匹配 (任一關鍵字)
-            # 使用 OR 條件匹配任何關鍵字
-            if keywords:
-                # 限制 OR 條件數量避免查詢過長
-                conditions = []
-                for keyword in keywords[:20]:  # 最多 20 個關鍵字
-                    conditions.append(f'name.ilike.%{keyword}%')
-                
-                # 應用 OR 條件
-                if conditions:
-                    query = query.or_(','.join(conditions))
-            
-            # 執行查詢（獲取更多候選以便排序）
+            # 獲取更多候選以便排序
             candidate_limit = limit * 3 if use_relevance_ranking else limit
-            query = query.order('post_count', desc=True).limit(candidate_limit)
-            result = query.execute()
             
-            rows = result.data or []
-            for row in rows:
-                if 'id' in row and not isinstance(row['id'], str):
-                    row['id'] = str(row['id'])
+            snapshot = get_tag_snapshot()
+            if snapshot is not None:
+                # 使用本地子字串索引（語義同 name ILIKE '%kw%' 的 OR 條件）
+                entries = snapshot.search_index.search(
+                    keywords[:20],  # 最多 20 個關鍵字
+                    limit=candidate_limit,
+                    min_popularity=min_popularity,
+                    category=category,
+                )
+                rows = [entry.to_row() for entry in entries]
+            else:
+                # 快照未載入時查詢儲存後端（限制 OR 條件數量避免查詢過長，最多 20 個關鍵字）
+                rows = await self.storage.search_tags(
+                    keywords[:20],
+                    limit=candidate_limit,
+                    category=category,
+                    min_popularity=min_popularity,
+                )
             
             # 如果啟用相關性排序，重新排序結果
             if use_relevance_ranking and keywords and rows:
@@ -272,35 +306,18 @@ class SupabaseService:
             raise
     
     async def get_category_stats(self) -> Dict[str, int]:
-        """獲取分類統計"""
+        """獲取分類統計（預先彙總，見 tag_statistics）"""
         try:
-            # 注意: 這需要建立 RPC 函數或使用聚合查詢
-            # 暫時返回模擬資料
-            result = self.client.table('tags_final')\
-                .select('main_category')\
-                .not_.is_('main_category', 'null')\
-                .execute()
-            
-            # 統計分類
-            stats = {}
-            for row in result.data:
-                cat = row['main_category']
-                stats[cat] = stats.get(cat, 0) + 1
-            
-            return stats
-            
+            statistics = await get_tag_statistics_service().get()
+            return dict(statistics.category_distribution)
         except Exception as e:
             logger.error(f"Error fetching category stats: {e}")
             raise
     
     async def get_total_tags_count(self) -> int:
-        """獲取標籤總數"""
+        """獲取標籤總數（預先彙總，見 tag_statistics）"""
         try:
-            result = self.client.table('tags_final')\
-                .select('*', count='exact')\
-                .limit(1)\
-                .execute()
-            return result.count if result.count else 0
+            return (await get_tag_statistics_service().get()).total_tags
         except Exception as e:
             logger.error(f"Error counting tags: {e}")
             raise
@@ -0,0 +1,65 @@
+"""
+Tag Listing Cursors
+/api/v1/tags 的游標分頁 - 以 (post_count DESC, name ASC) 為 keyset
+
+設計原則：
+1. 游標記錄上一頁最後一筆的 (post_count, name)，下一頁從其之後開始，不需 OFFSET
+2. 對客戶端不透明：base64url(JSON)，格式可在 v 欄位變更
+3. 游標綁定篩選條件（category / name），換條件重用游標時拒絕，避免跳頁或重複
+"""
+from typing import Optional, Tuple
+import base64
+import binascii
+import hashlib
+import json
+
+CURSOR_VERSION = 1
+
+# keyset 排序：post_count 由高到低，同數量時依名稱（唯一）
+KEYSET_ORDER = (("post_count", True), ("name", False))
+
+
+class InvalidCursorError(ValueError):
+    """游標格式錯誤、版本不符或與目前篩選條件不一致"""
+
+
+def cursor_scope(category: Optional[str] = None, name_filter: Optional[str] = None) -> str:
+    """篩選條件指紋"""
+    raw = json.dumps([category, name_filter], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_tag_cursor(post_count: int, name: str, scope: str) -> str:
+    """將上一頁最後一筆的排序鍵編碼為游標"""
+    payload = json.dumps(
+        {"v": CURSOR_VERSION, "p": int(post_count or 0), "n": name, "s": scope},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_tag_cursor(token: str, scope: str) -> Tuple[int, str]:
+    """
+    解碼游標
+
+    Returns:
+        (post_count, name)
+
+    Raises:
+        InvalidCursorError: 游標無法解析或與 scope 不一致
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        version, post_count, name, token_scope = payload["v"], payload["p"], payload["n"], payload["s"]
+    except (ValueError, KeyError, TypeError, UnicodeError, binascii.Error) as e:
+        raise InvalidCursorError(f"Malformed cursor: {e}") from e
+
+    if version != CURSOR_VERSION:
+        raise InvalidCursorError(f"Unsupported cursor version: {version}")
+    if not isinstance(post_count, int) or not isinstance(name, str):
+        raise InvalidCursorError("Malformed cursor")
+    if token_scope != scope:
+        raise InvalidCursorError("Cursor does not match the current filters")
+    return post_count, name
@@ -0,0 +1,218 @@
+"""
+Tag Catalog Export
+標籤目錄串流匯出 - 鏡像標籤字典的客戶端一次取得全表（或自上次同步後的變更）
+
+設計原則：
+1. 從標籤儲存後端以 keyset 分批讀取，讀一批寫一批，伺服器記憶體與表大小無關
+2. 格式：ndjson（每行一個標籤）或 columnar（每行一批，欄位為陣列，重複的鍵只出現一次）
+3. 可選 gzip（Content-Encoding，串流壓縮）
+4. 最後一行為 summary：count、watermark、max_updated_at、complete；
+   下次以 since=watermark 取得增量，沒有 summary 或 complete=false 表示匯出中斷
+5. updated_at 由觸發器設為 NOW()（交易開始時間），匯出後才提交的交易可能帶有較早的時間戳；
+   因此 watermark = max_updated_at - tag_export_watermark_margin_seconds，
+   下次同步會重疊這段時間，重複的標籤由客戶端依名稱 upsert 去重。
+   交易時間超過此間隔的更新仍可能遺漏，需定期全量匯出
+6. 依內容等級過濾：content_level 欄位與目前規則一致時在資料庫過濾，否則以 content_rater 過濾
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import json
+import logging
+import time
+import zlib
+
+from ..inspire_config.content_rating import ACCESS_HIERARCHY, get_content_rater, max_allowed_level
+from .tag_storage import EXPORT_COLUMNS, TagStorageBackend
+
+try:
+    from ..config import settings
+except Exception:
+    try:
+        from src.api.config import settings
+    except Exception:
+        from config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "columnar")
+EXPORT_COMPRESSIONS = ("none", "gzip")
+
+
+def normalize_since(value: datetime) -> str:
+    """since 轉為 UTC ISO 字串（未帶時區時視為 UTC）"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """資料庫的 updated_at 字串轉為 UTC datetime（無法解析時回傳 None）"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class TagExport:
+    """
+    單次匯出
+
+    start() 先讀取第一批，篩選條件無效時在回應開始前拋出 ValueError；
+    之後以 stream() 產生回應內容。
+    """
+
+    def __init__(
+        self,
+        storage: TagStorageBackend,
+        batch_size: int = 1000,
+        category: Optional[str] = None,
+        min_popularity: int = 0,
+        access_level: Optional[str] = None,
+        since: Optional[str] = None,
+        output_format: str = "ndjson",
+        compression: str = "none",
+        watermark_margin_seconds: Optional[int] = None,
+    ):
+        if output_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {output_format}")
+        if compression not in EXPORT_COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+
+        self.storage = storage
+        self.batch_size = batch_size
+        self.category = category
+        self.min_popularity = min_popularity
+        self.max_level = max_allowed_level(access_level) if access_level else None
+        self.since = since
+        self.output_format = output_format
+        self.compression = compression
+        if watermark_margin_seconds is None:
+            watermark_margin_seconds = settings.tag_export_watermark_margin_seconds
+        self.watermark_margin = timedelta(seconds=watermark_margin_seconds)
+
+        self._filter_in_database = False
+        self._first_batch: Optional[List[Dict[str, Any]]] = None
+        self.stats = {"batches": 0, "scanned": 0, "exported": 0, "filtered": 0}
+
+    @property
+    def media_type(self) -> str:
+        return "application/x-ndjson"
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"X-Export-Format": self.output_format}
+        if self.compression == "gzip":
+            headers["Content-Encoding"] = "gzip"
+        return headers
+
+    async def start(self) -> None:
+        """確認過濾方式並讀取第一批"""
+        if self.max_level is not None:
+            self._filter_in_database = await self.storage.content_level_current()
+        self._first_batch = await self._fetch(None)
+
+    async def _fetch(self, after: Optional[Tuple[Optional[str], str]]) -> List[Dict[str, Any]]:
+        return await self.storage.export_tags(
+            self.batch_size,
+            after=after,
+            category=self.category,
+            min_popularity=self.min_popularity,
+            max_content_level=self.max_level if self._filter_in_database else None,
+            since=self.since,
+        )
+
+    def _filter(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """content_level 欄位不可用時以分級規則過濾"""
+        if self.max_level is None or self._filter_in_database:
+            return rows
+        levels = get_content_rater().classify_many(row["name"] for row in rows)
+        kept = [row for row, level in zip(rows, levels) if ACCESS_HIERARCHY[level] <= self.max_level]
+        self.stats["filtered"] += len(rows) - len(kept)
+        return kept
+
+    async def batches(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        """依 keyset 逐批讀取（已過濾）"""
+        if self._first_batch is None:
+            await self.start()
+        rows, self._first_batch = self._first_batch, []
+        while rows:
+            self.stats["batches"] += 1
+            self.stats["scanned"] += len(rows)
+            yield self._filter(rows)
+            if len(rows) < self.batch_size:
+                return
+            last = rows[-1]
+            rows = await self._fetch((last.get("updated_at") if self.since else None, last["name"]))
+
+    def _encode_batch(self, rows: List[Dict[str, Any]]) -> str:
+        if not rows:
+            return ""
+        if self.output_format == "columnar":
+            columns = [c for c in EXPORT_COLUMNS if c in rows[0]]
+            batch = {
+                "columns": columns,
+                "rows": len(rows),
+                "values": [[row.get(c) for row in rows] for c in columns],
+            }
+            return json.dumps(batch, ensure_ascii=False, separators=(",", ":")) + "\n"
+        return "".join(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n" for row in rows)
+
+    def _watermark(self, max_updated_at: Optional[datetime]) -> Optional[str]:
+        """下次同步的 since：最大 updated_at 往前 watermark_margin，且不早於本次的 since"""
+        since = parse_timestamp(self.since)
+        if max_updated_at is None:
+            return self.since
+        watermark = max_updated_at - self.watermark_margin
+        if since is not None and watermark <= since:
+            return self.since
+        return normalize_since(watermark)
+
+    async def _lines(self) -> AsyncIterator[str]:
+        start_time = time.time()
+        max_updated_at: Optional[datetime] = None
+        complete = False
+        error = None
+        try:
+            async for rows in self.batches():
+                for row in rows:
+                    updated_at = parse_timestamp(row.get("updated_at"))
+                    if updated_at and (max_updated_at is None or updated_at > max_updated_at):
+                        max_updated_at = updated_at
+                self.stats["exported"] += len(rows)
+                chunk = self._encode_batch(rows)
+                if chunk:
+                    yield chunk
+            complete = True
+        except Exception as e:
+            logger.error(f"❌ Tag export failed after {self.stats['exported']} tags: {e}")
+            error = str(e)
+
+        summary = {
+            "count": self.stats["exported"],
+            "scanned": self.stats["scanned"],
+            "watermark": self._watermark(max_updated_at),
+            "max_updated_at": normalize_since(max_updated_at) if max_updated_at else None,
+            "complete": complete,
+            "processing_time_ms": round((time.time() - start_time) * 1000, 2),
+        }
+        if error:
+            summary["error"] = error
+        logger.info(f"Tag export finished: {summary}")
+        yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """回應內容（gzip 時逐批壓縮並 flush，客戶端可邊收邊解）"""
+        compressor = zlib.compressobj(wbits=31) if self.compression == "gzip" else None
+        async for text in self._lines():
+            data = text.encode("utf-8")
+            if compressor is None:
+                yield data
+            else:
+                yield compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressor is not None:
+            yield compressor.flush()
@@ -0,0 +1,235 @@
+"""
+Tag Search Index
+標籤子字串倒排索引 - 取代 name ILIKE '%kw%' 的全表掃描
+
+索引結構：
+1. 字元三元組（trigram）→ 標籤排名列表
+2. 底線切分的 token → 標籤排名列表
+排名即快照中依 post_count 由高到低的位置，因此每條倒排列表天然有序，
+取前 N 個結果時可以提早結束。
+
+匹配語義與 PostgreSQL ILIKE '%kw%' 相同：不分大小寫，
+關鍵字中的 '_' 代表任意單一字元、'%'（PostgREST 中亦可寫作 '*'）代表任意長度字串。
+"""
+from array import array
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import heapq
+import logging
+import re
+import time
+
+from ..inspire_config.content_rating import ACCESS_HIERARCHY, classify_many
+
+logger = logging.getLogger(__name__)
+
+# ILIKE 萬用字元
+_SINGLE_WILDCARD = "_"
+_MULTI_WILDCARDS = ("%", "*")
+_WILDCARD_SPLIT = re.compile(r"[_%*]")
+
+# 短片段的 token 聯集超過此大小時，改用依排名順序掃描（常見片段很快就能湊滿結果）
+_SHORT_SEGMENT_UNION_LIMIT = 5000
+
+
+def _trigrams(text: str) -> set:
+    """取得字串的所有字元三元組"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def compile_ilike_matcher(keyword: str) -> Tuple[Callable[[str], bool], List[str]]:
+    """
+    將關鍵字編譯為 ILIKE '%keyword%' 的匹配函數
+
+    Returns:
+        (匹配函數（輸入已小寫的名稱）, 關鍵字中的字面片段列表)
+    """
+    kw = keyword.lower()
+    if not any(ch in kw for ch in (_SINGLE_WILDCARD, *_MULTI_WILDCARDS)):
+        return (lambda name: kw in name), [kw] if kw else []
+
+    parts = []
+    for ch in kw:
+        if ch == _SINGLE_WILDCARD:
+            parts.append(".")
+        elif ch in _MULTI_WILDCARDS:
+            parts.append(".*")
+        else:
+            parts.append(re.escape(ch))
+    pattern = re.compile("".join(parts), re.DOTALL)
+    segments = [seg for seg in _WILDCARD_SPLIT.split(kw) if seg]
+    return (lambda name: pattern.search(name) is not None), segments
+
+
+class TagSearchIndex:
+    """
+    標籤子字串倒排索引
+
+    entries 需已依 post_count 由高到低排序（TagSnapshot.entries 即是如此），
+    並具備 name / post_count / main_category 屬性。
+    """
+
+    def __init__(self, entries: Sequence):
+        start = time.time()
+        self.entries = entries
+        self._names: List[str] = [e.name.lower() for e in entries]
+        self._trigram_postings: Dict[str, array] = {}
+        self._token_postings: Dict[str, array] = {}
+
+        for rank, name in enumerate(self._names):
+            for gram in _trigrams(name):
+                postings = self._trigram_postings.get(gram)
+                if postings is None:
+                    postings = self._trigram_postings[gram] = array("I")
+                postings.append(rank)
+            for token in set(name.split("_")):
+                if not token:
+                    continue
+                postings = self._token_postings.get(token)
+                if postings is None:
+                    postings = self._token_postings[token] = array("I")
+                postings.append(rank)
+
+        self._short_segment_memo: Dict[str, Optional[List[int]]] = {}
+        self._content_levels: Optional[array] = None
+        logger.info(
+            f"✅ Tag search index built: {len(self._names)} tags, "
+            f"{len(self._trigram_postings)} trigrams, {len(self._token_postings)} tokens "
+            f"({(time.time() - start) * 1000:.0f}ms)"
+        )
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    # ============================================
+    # 候選生成
+    # ============================================
+
+    def _short_segment_candidates(self, segment: str) -> Optional[List[int]]:
+        """
+        1-2 字元片段的候選排名（透過 token 索引）
+
+        片段不含底線，必定落在某個 token 內，因此 token 聯集是完整的候選集合。
+        聯集過大時返回 None，由呼叫端改為依序掃描。
+        """
+        if segment in self._short_segment_memo:
+            return self._short_segment_memo[segment]
+
+        matched = [postings for token, postings in self._token_postings.items() if segment in token]
+        if sum(len(p) for p in matched) > _SHORT_SEGMENT_UNION_LIMIT:
+            candidates = None
+        else:
+            merged = set()
+            for postings in matched:
+                merged.update(postings)
+            candidates = sorted(merged)
+
+        if len(self._short_segment_memo) < 4096:
+            self._short_segment_memo[segment] = candidates
+        return candidates
+
+    def _candidate_ranks(self, segments: List[str]):
+        """
+        取得候選排名序列（依排名遞增）；返回 None 代表需要全表依序掃描
+
+        名稱必須包含所有字面片段，因此任一片段的任一 trigram 倒排列表都是候選超集，
+        選擇最短的那一條。
+        """
+        best = None
+        for segment in segments:
+            if len(segment) < 3:
+                continue
+            for gram in _trigrams(segment):
+                postings = self._trigram_postings.get(gram)
+                if postings is None:
+                    return ()
+                if best is None or len(postings) < len(best):
+                    best = postings
+        if best is not None:
+            return best
+
+        for segment in segments:
+            candidates = self._short_segment_candidates(segment)
+            if candidates is not None and (best is None or len(candidates) < len(best)):
+                best = candidates
+        return best
+
+    def _iter_matches(self, keyword: str) -> Iterator[int]:
+        """依排名順序產生符合單一關鍵字的標籤"""
+        matcher, segments = compile_ilike_matcher(keyword)
+        candidates = self._candidate_ranks(segments)
+        names = self._names
+        if candidates is None:
+            candidates = range(len(names))
+        for rank in candidates:
+            if matcher(names[rank]):
+                yield rank
+
+    def content_levels(self) -> array:
+        """每個標籤的內容等級（ACCESS_HIERARCHY 值，首次使用時計算）"""
+        if self._content_levels is None:
+            self._content_levels = array(
+                "H", (ACCESS_HIERARCHY[level] for level in classify_many(self._names))
+            )
+        return self._content_levels
+
+    # ============================================
+    # 查詢
+    # ============================================
+
+    def search(
+        self,
+        keywords: Sequence[str],
+        limit: int = 20,
+        min_popularity: int = 0,
+        category: Optional[str] = None,
+        max_content_level: Optional[int] = None,
+    ) -> List:
+        """
+        搜尋名稱包含任一關鍵字的標籤（等同 OR 串接的 name ILIKE '%kw%'）
+
+        Args:
+            keywords: 關鍵字列表（空列表代表不限關鍵字）
+            limit: 最多返回數量
+            min_popularity: 最低 post_count
+            category: main_category 篩選
+            max_content_level: 內容等級上限（見 content_rating.max_allowed_level），None 表示不過濾
+
+        Returns:
+            依 post_count 由高到低排序的標籤列表
+        """
+        if limit <= 0:
+            return []
+
+        if keywords:
+            streams = [self._iter_matches(kw) for kw in dict.fromkeys(keywords)]
+            ranks = streams[0] if len(streams) == 1 else heapq.merge(*streams)
+        else:
+            ranks = iter(range(len(self._names)))
+
+        levels = self.content_levels() if max_content_level is not None else None
+
+        results = []
+        last_rank = -1
+        for rank in ranks:
+            if rank == last_rank:
+                continue  # 多個關鍵字命中同一標籤
+            last_rank = rank
+            entry = self.entries[rank]
+            if entry.post_count < min_popularity:
+                break  # 之後的標籤流行度只會更低
+            if category and entry.main_category != category:
+                continue
+            if levels is not None and levels[rank] > max_content_level:
+                continue
+            results.append(entry)
+            if len(results) >= limit:
+                break
+        return results
+
+    def get_stats(self) -> Dict[str, int]:
+        """索引統計"""
+        return {
+            "tags": len(self._names),
+            "trigrams": len(self._trigram_postings),
+            "tokens": len(self._token_postings),
+        }
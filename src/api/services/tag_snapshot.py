@@ -0,0 +1,362 @@
+"""
+Tag Snapshot Service
+行程內標籤字典快照 - 讓熱路徑的標籤查詢不必每次往返資料庫
+
+設計原則：
+1. 快照不可變：重新載入時建立新快照後整體替換，讀取端不需加鎖
+2. 版本化：以「筆數 + 最後更新時間」（或本地檔案 mtime）作為版本，未變更時跳過重建
+3. 資料來源：tags_final 分頁讀取，或本地傾印（.jsonl / .json / SQLite tags.db）
+4. 查無資料時由呼叫端退回資料庫查詢
+"""
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, NamedTuple, Iterable
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .tag_search_index import TagSearchIndex
+from .tag_suggester import TagSuggester
+
+try:
+    from ..config import settings
+except Exception:
+    try:
+        from src.api.config import settings
+    except Exception:
+        from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 快照需要的欄位（不含 embedding 與時間戳）
+SNAPSHOT_COLUMNS = (
+    "id, name, danbooru_cat, post_count, main_category, "
+    "sub_category, confidence, classification_source"
+)
+
+
+class TagEntry(NamedTuple):
+    """快照中的單一標籤（tuple 結構，比 dict 節省記憶體）"""
+    id: str
+    name: str
+    danbooru_cat: int
+    post_count: int
+    main_category: Optional[str]
+    sub_category: Optional[str]
+    confidence: Optional[float]
+    classification_source: Optional[str]
+
+    def to_row(self) -> Dict[str, Any]:
+        """轉換為與 tags_final 查詢結果相同格式的字典"""
+        return self._asdict()
+
+
+def _entry_from_row(row: Dict[str, Any], intern_cache: Dict[str, str]) -> TagEntry:
+    """將資料列轉換為 TagEntry（分類字串共用同一物件）"""
+    def _shared(value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        return intern_cache.setdefault(value, value)
+
+    confidence = row.get("confidence", row.get("classification_confidence"))
+    return TagEntry(
+        id=str(row.get("id") or row["name"]),
+        name=row["name"],
+        danbooru_cat=int(row.get("danbooru_cat") or 0),
+        post_count=int(row.get("post_count") or 0),
+        main_category=_shared(row.get("main_category")),
+        sub_category=_shared(row.get("sub_category")),
+        confidence=float(confidence) if confidence is not None else None,
+        classification_source=_shared(row.get("classification_source")),
+    )
+
+
+class TagSnapshot:
+    """不可變的標籤字典快照（依 post_count 由高到低排序）"""
+
+    def __init__(self, entries: List[TagEntry], version: str, source: str):
+        entries.sort(key=lambda e: (-e.post_count, e.name))
+        self.entries: List[TagEntry] = entries
+        self.by_name: Dict[str, TagEntry] = {e.name: e for e in entries}
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+        self._search_index: Optional[TagSearchIndex] = None
+        self._suggester: Optional[TagSuggester] = None
+        self._statistics = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], version: str, source: str) -> "TagSnapshot":
+        """從資料列建立快照"""
+        intern_cache: Dict[str, str] = {}
+        entries = [_entry_from_row(row, intern_cache) for row in rows if row.get("name")]
+        return cls(entries, version=version, source=source)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.by_name
+
+    @property
+    def search_index(self) -> TagSearchIndex:
+        """子字串倒排索引（首次使用時建立）"""
+        if self._search_index is None:
+            self._search_index = TagSearchIndex(self.entries)
+        return self._search_index
+
+    @property
+    def suggester(self) -> TagSuggester:
+        """拼字建議索引（首次使用時建立）"""
+        if self._suggester is None:
+            self._suggester = TagSuggester(self.entries)
+        return self._suggester
+
+    @property
+    def statistics(self):
+        """分類 / 熱門度統計（首次使用時計算，型別為 TagStatistics）"""
+        if self._statistics is None:
+            from .tag_statistics import TagStatistics
+            self._statistics = TagStatistics.from_tags(
+                self.entries, source=f"snapshot:{self.source}", version=self.version
+            )
+        return self._statistics
+
+    def get(self, name: str) -> Optional[TagEntry]:
+        """依名稱查詢標籤"""
+        return self.by_name.get(name)
+
+    def lookup_many(self, names: Iterable[str]) -> Tuple[Dict[str, TagEntry], List[str]]:
+        """
+        批量查詢標籤
+
+        Returns:
+            (命中的 {name: TagEntry}, 未命中的名稱列表)
+        """
+        found: Dict[str, TagEntry] = {}
+        missing: List[str] = []
+        # dict.fromkeys 去重並保留輸入順序
+        for name in dict.fromkeys(names):
+            entry = self.by_name.get(name)
+            if entry is not None:
+                found[name] = entry
+            else:
+                missing.append(name)
+        return found, missing
+
+    def get_info(self) -> Dict[str, Any]:
+        """快照摘要（用於健康檢查）"""
+        return {
+            "version": self.version,
+            "source": self.source,
+            "tags": len(self.entries),
+            "loaded_at": self.loaded_at,
+            "age_seconds": round(time.time() - self.loaded_at, 1),
+        }
+
+
+class TagSnapshotStore:
+    """
+    標籤快照管理器
+    負責載入、版本比對與背景定期刷新
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        refresh_seconds: int = 3600,
+        page_size: int = 1000,
+    ):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.page_size = page_size
+        self._snapshot: Optional[TagSnapshot] = None
+        self._load_lock = threading.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.stats = {"loads": 0, "skipped": 0, "errors": 0}
+
+    @property
+    def snapshot(self) -> Optional[TagSnapshot]:
+        """目前的快照（尚未載入時為 None）"""
+        return self._snapshot
+
+    # ============================================
+    # 載入
+    # ============================================
+
+    def load(self, force: bool = False) -> Optional[TagSnapshot]:
+        """
+        同步載入快照；版本未變更時沿用現有快照
+
+        Args:
+            force: 忽略版本比對強制重建
+        """
+        with self._load_lock:
+            try:
+                version = self._probe_version()
+                current = self._snapshot
+                if not force and current is not None and version and current.version == version:
+                    self.stats["skipped"] += 1
+                    logger.debug(f"Tag snapshot unchanged (version {version})")
+                    return current
+
+                start = time.time()
+                if self.path:
+                    rows = self._read_local_dump(self.path)
+                    source = f"file:{self.path}"
+                else:
+                    rows = self._read_database()
+                    source = "database"
+
+                snapshot = TagSnapshot.from_rows(rows, version=version or str(int(start)), source=source)
+                snapshot.search_index  # 替換前先建好索引，避免首個請求承擔建置成本
+                snapshot.suggester
+                snapshot.statistics
+                self._snapshot = snapshot
+                self.stats["loads"] += 1
+                logger.info(
+                    f"✅ Tag snapshot loaded: {len(snapshot)} tags from {source} "
+                    f"(version {snapshot.version}, {(time.time() - start) * 1000:.0f}ms)"
+                )
+                return snapshot
+
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"❌ Tag snapshot load failed: {e}")
+                return self._snapshot
+
+    def _probe_version(self) -> Optional[str]:
+        """取得資料來源的版本指紋"""
+        if self.path:
+            stat = os.stat(self.path)
+            return f"{int(stat.st_mtime)}:{stat.st_size}"
+
+        from .supabase_client import get_supabase_service
+
+        result = get_supabase_service().client.table('tags_final')\
+            .select('updated_at', count='exact')\
+            .order('updated_at', desc=True)\
+            .limit(1)\
+            .execute()
+        latest = result.data[0].get('updated_at') if result.data else None
+        return f"{result.count or 0}:{latest}"
+
+    def _read_database(self) -> List[Dict[str, Any]]:
+        """分頁讀取 tags_final 全表"""
+        from .supabase_client import get_supabase_service
+
+        client = get_supabase_service().client
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            result = client.table('tags_final')\
+                .select(SNAPSHOT_COLUMNS)\
+                .order('name')\
+                .range(offset, offset + self.page_size - 1)\
+                .execute()
+            batch = result.data or []
+            rows.extend(batch)
+            if len(batch) < self.page_size:
+                break
+            offset += self.page_size
+        return rows
+
+    @staticmethod
+    def _read_local_dump(path: str) -> List[Dict[str, Any]]:
+        """讀取本地傾印（.jsonl / .json / SQLite）"""
+        if path.endswith((".db", ".sqlite", ".sqlite3")):
+            conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+            conn.row_factory = sqlite3.Row
+            try:
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(tags_final)")}
+                confidence_col = "confidence" if "confidence" in columns else "classification_confidence"
+                id_col = "id" if "id" in columns else "name"
+                cursor = conn.execute(f"""
+                    SELECT {id_col} AS id, name, danbooru_cat, post_count,
+                           main_category, sub_category,
+                           {confidence_col} AS confidence, classification_source
+                    FROM tags_final
+                """)
+                return [dict(row) for row in cursor]
+            finally:
+                conn.close()
+
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                return [json.loads(line) for line in f if line.strip()]
+            data = json.load(f)
+            return data.get("data", []) if isinstance(data, dict) else data
+
+    # ============================================
+    # 背景刷新
+    # ============================================
+
+    async def refresh(self, force: bool = False) -> Optional[TagSnapshot]:
+        """在執行緒中載入快照，不阻塞事件迴圈"""
+        return await asyncio.to_thread(self.load, force)
+
+    def start_refresh_loop(self) -> None:
+        """啟動背景載入與定期刷新"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop_refresh_loop(self) -> None:
+        """停止背景刷新"""
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+        self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh()
+            if self.refresh_seconds <= 0:
+                break
+            await asyncio.sleep(self.refresh_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """快照統計"""
+        snapshot = self._snapshot
+        return {
+            **self.stats,
+            "loaded": snapshot is not None,
+            **(snapshot.get_info() if snapshot else {}),
+        }
+
+
+# 全局單例
+_tag_snapshot_store: Optional[TagSnapshotStore] = None
+
+
+def get_tag_snapshot_store() -> TagSnapshotStore:
+    """獲取標籤快照管理器（單例）"""
+    global _tag_snapshot_store
+
+    if _tag_snapshot_store is None:
+        path = settings.tag_snapshot_path
+        if path is None:
+            # 本地標籤庫可用時直接從檔案載入，不經網路
+            from .tag_storage import SQLiteTagBackend, get_tag_storage
+            storage = get_tag_storage()
+            if isinstance(storage, SQLiteTagBackend):
+                path = storage.path
+        _tag_snapshot_store = TagSnapshotStore(
+            path=path,
+            refresh_seconds=settings.tag_snapshot_refresh_seconds,
+            page_size=settings.tag_snapshot_page_size,
+        )
+
+    return _tag_snapshot_store
+
+
+def get_tag_snapshot() -> Optional[TagSnapshot]:
+    """獲取目前的標籤快照（停用或尚未載入時返回 None）"""
+    if not settings.tag_snapshot_enabled:
+        return None
+    return get_tag_snapshot_store().snapshot
@@ -0,0 +1,278 @@
+"""
+Tag Statistics Service
+預先彙總的標籤統計 - /api/v1/stats 不再每次掃描 tags_final
+
+設計原則：
+1. 統計以 (dimension, bucket) 計數表示：total / main_category / sub_category / popularity_tier
+2. 資料來源依序：
+   - 已載入的標籤快照（每個快照版本只計算一次，快照刷新即反映資料變更）
+   - 標籤儲存後端：Supabase 讀取 trigger 增量維護的 tag_statistics（scripts/17_tag_statistics.sql），
+     本地 SQLite 以 GROUP BY 彙總（唯讀檔案，結果不變）
+3. 讀取只取記憶體中的結果；超過 tag_statistics_refresh_seconds 後返回舊值並在背景刷新一次
+4. 熱門度等級門檻與 calculate_popularity_tier 相同
+"""
+from typing import Any, Dict, Iterable, Optional
+import asyncio
+import logging
+import time
+
+from .metrics import record_duration
+from .single_flight import SingleFlight
+
+try:
+    from ..config import settings
+except Exception:
+    try:
+        from src.api.config import settings
+    except Exception:
+        from config import settings
+
+logger = logging.getLogger(__name__)
+
+# (下限（不含）, 等級)，由高到低；未達任何下限為 niche
+POPULARITY_TIER_THRESHOLDS = (
+    (100000, "very_popular"),
+    (10000, "popular"),
+    (1000, "moderate"),
+)
+NICHE_TIER = "niche"
+
+
+def popularity_tier(post_count: Optional[int]) -> str:
+    """熱門度等級（與 calculate_popularity_tier 相同門檻）"""
+    count = post_count or 0
+    for threshold, tier in POPULARITY_TIER_THRESHOLDS:
+        if count > threshold:
+            return tier
+    return NICHE_TIER
+
+
+def popularity_tier_sql(column: str = "post_count") -> str:
+    """熱門度等級的 SQL CASE 運算式（本地 SQLite 彙總使用）"""
+    cases = " ".join(
+        f"WHEN COALESCE({column}, 0) > {threshold} THEN '{tier}'"
+        for threshold, tier in POPULARITY_TIER_THRESHOLDS
+    )
+    return f"CASE {cases} ELSE '{NICHE_TIER}' END"
+
+
+class TagStatistics:
+    """不可變的統計結果"""
+
+    def __init__(
+        self,
+        total_tags: int,
+        category_distribution: Dict[str, int],
+        subcategory_distribution: Dict[str, Dict[str, int]],
+        popularity_distribution: Dict[str, int],
+        source: str,
+        version: Optional[str] = None,
+    ):
+        self.total_tags = total_tags
+        self.category_distribution = category_distribution
+        self.subcategory_distribution = subcategory_distribution
+        self.popularity_distribution = popularity_distribution
+        self.source = source
+        self.version = version
+        self.computed_at = time.time()
+
+    @classmethod
+    def from_buckets(
+        cls, rows: Iterable[Dict[str, Any]], source: str, version: Optional[str] = None
+    ) -> "TagStatistics":
+        """從 (dimension, bucket, tag_count) 計數列建立"""
+        total = 0
+        categories: Dict[str, int] = {}
+        subcategories: Dict[str, Dict[str, int]] = {}
+        tiers: Dict[str, int] = {}
+        for row in rows:
+            dimension, bucket, count = row["dimension"], row["bucket"], int(row["tag_count"] or 0)
+            if count <= 0:
+                continue
+            if dimension == "total":
+                total += count
+            elif dimension == "main_category":
+                categories[bucket] = categories.get(bucket, 0) + count
+            elif dimension == "sub_category":
+                main, _, sub = bucket.partition("/")
+                subcategories.setdefault(main, {})[sub] = count
+            elif dimension == "popularity_tier":
+                tiers[bucket] = tiers.get(bucket, 0) + count
+        return cls(total, categories, subcategories, tiers, source=source, version=version)
+
+    @classmethod
+    def from_tags(cls, tags: Iterable[Any], source: str, version: Optional[str] = None) -> "TagStatistics":
+        """從標籤（含 main_category / sub_category / post_count 屬性）計算"""
+        total = 0
+        categories: Dict[str, int] = {}
+        subcategories: Dict[str, Dict[str, int]] = {}
+        tiers: Dict[str, int] = {}
+        for tag in tags:
+            total += 1
+            tier = popularity_tier(tag.post_count)
+            tiers[tier] = tiers.get(tier, 0) + 1
+            main = tag.main_category
+            if main is None:
+                continue
+            categories[main] = categories.get(main, 0) + 1
+            if tag.sub_category is not None:
+                subs = subcategories.setdefault(main, {})
+                subs[tag.sub_category] = subs.get(tag.sub_category, 0) + 1
+        return cls(total, categories, subcategories, tiers, source=source, version=version)
+
+    @property
+    def classified_count(self) -> int:
+        return sum(self.category_distribution.values())
+
+    @property
+    def unclassified_count(self) -> int:
+        return max(self.total_tags - self.classified_count, 0)
+
+    @property
+    def classification_rate(self) -> float:
+        """已分類比例（百分比）"""
+        if self.total_tags <= 0:
+            return 0.0
+        return round(self.classified_count / self.total_tags * 100, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_tags": self.total_tags,
+            "category_distribution": dict(self.category_distribution),
+            "subcategory_distribution": {k: dict(v) for k, v in self.subcategory_distribution.items()},
+            "popularity_distribution": dict(self.popularity_distribution),
+            "classified_count": self.classified_count,
+            "unclassified_count": self.unclassified_count,
+            "classification_rate": self.classification_rate,
+            "source": self.source,
+            "computed_at": self.computed_at,
+        }
+
+
+class TagStatisticsService:
+    """統計快取（讀取 O(1)，過期時背景刷新）"""
+
+    def __init__(self, refresh_seconds: float = 300):
+        self.refresh_seconds = refresh_seconds
+        self._statistics: Optional[TagStatistics] = None
+        self._flight = SingleFlight()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._stale = False
+        self.stats = {"refreshes": 0, "errors": 0, "stale_served": 0}
+
+    @property
+    def statistics(self) -> Optional[TagStatistics]:
+        return self._statistics
+
+    async def get(self) -> TagStatistics:
+        """
+        取得統計
+
+        快照版本與快取不同時改用快照結果（每個快照只計算一次）；
+        其餘情況返回快取，過期時背景刷新。首次呼叫會等待計算完成。
+        """
+        snapshot_statistics = self._snapshot_statistics()
+        if snapshot_statistics is not None:
+            self._statistics = snapshot_statistics
+            return snapshot_statistics
+
+        current = self._statistics
+        if current is None:
+            return await self._flight.do("statistics", self._refresh)
+
+        expired = self.refresh_seconds > 0 and time.time() - current.computed_at > self.refresh_seconds
+        if expired or self._stale:
+            self.stats["stale_served"] += 1
+            self._flight.refresh("statistics", self._refresh)
+        return current
+
+    async def refresh(self) -> TagStatistics:
+        """立即重新計算（合併並發呼叫）"""
+        return await self._flight.do("statistics", self._refresh)
+
+    def invalidate(self) -> None:
+        """標記快取過期（下次讀取時背景刷新）"""
+        self._stale = True
+
+    @staticmethod
+    def _snapshot_statistics() -> Optional[TagStatistics]:
+        from .tag_snapshot import get_tag_snapshot
+
+        snapshot = get_tag_snapshot()
+        return snapshot.statistics if snapshot is not None else None
+
+    async def _refresh(self) -> TagStatistics:
+        from .tag_storage import get_tag_storage
+
+        start = time.perf_counter()
+        try:
+            storage = get_tag_storage()
+            rows = await storage.get_statistic_buckets()
+            statistics = TagStatistics.from_buckets(rows, source=storage.name)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"❌ Failed to refresh tag statistics: {e}")
+            raise
+        finally:
+            record_duration("db.tag_statistics", time.perf_counter() - start)
+
+        self._statistics = statistics
+        self._stale = False
+        self.stats["refreshes"] += 1
+        logger.info(
+            f"✅ Tag statistics refreshed from {statistics.source}: {statistics.total_tags} tags "
+            f"({(time.perf_counter() - start) * 1000:.0f}ms)"
+        )
+        return statistics
+
+    # ============================================
+    # 背景刷新
+    # ============================================
+
+    def start_refresh_loop(self) -> None:
+        """啟動背景計算與定期刷新"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop_refresh_loop(self) -> None:
+        """停止背景刷新"""
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+        self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            if self._snapshot_statistics() is None:
+                try:
+                    await self.refresh()
+                except Exception:
+                    pass  # 已記錄，下次讀取或下一輪再試
+            if self.refresh_seconds <= 0:
+                break
+            await asyncio.sleep(self.refresh_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        current = self._statistics
+        return {
+            **self.stats,
+            "loaded": current is not None,
+            "source": current.source if current else None,
+            "age_seconds": round(time.time() - current.computed_at, 1) if current else None,
+        }
+
+
+# 全局單例
+_tag_statistics_service: Optional[TagStatisticsService] = None
+
+
+def get_tag_statistics_service() -> TagStatisticsService:
+    """獲取標籤統計服務（單例）"""
+    global _tag_statistics_service
+
+    if _tag_statistics_service is None:
+        _tag_statistics_service = TagStatisticsService(settings.tag_statistics_refresh_seconds)
+    return _tag_statistics_service
@@ -0,0 +1,881 @@
+"""
+Tag Storage Backends
+標籤查詢的儲存後端 - Supabase（PostgREST）或本地唯讀 SQLite 檔案
+
+設計原則：
+1. TagStorageBackend 定義標籤讀取介面；SupabaseService 與工具只透過此介面查詢 tags_final
+2. supabase：原本的 PostgREST 查詢（預設）
+3. sqlite：唯讀開啟本地檔案（如舊管線產出的 tags.db），memory-map 讀取，
+   名稱子字串查詢使用 FTS5 trigram 索引，不經網路
+4. 以 tag_storage_backend 設定選擇；本地檔案無法開啟時記錄警告並退回 supabase
+5. prepare_local_tag_database() 為本地檔案建立索引與 FTS 表（scripts/build_local_tag_db.py）
+
+匹配語義與 PostgREST 的 name ILIKE '%kw%' 相同：不分大小寫，'_' 為單一字元萬用字元、'%' / '*' 為任意長度。
+"""
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from .metrics import record_duration
+
+try:
+    from ..config import settings
+except Exception:
+    try:
+        from src.api.config import settings
+    except Exception:
+        from config import settings
+
+logger = logging.getLogger(__name__)
+
+# tags_final 的標準欄位（輸出的字典使用這些名稱）
+TAG_COLUMNS = (
+    "id", "name", "danbooru_cat", "post_count", "main_category", "sub_category",
+    "confidence", "classification_source", "nsfw_level", "content_level",
+    "content_rating_version", "created_at", "updated_at",
+)
+
+# 舊管線 tags.db 的欄位名稱差異
+LEGACY_COLUMN_ALIASES = {
+    "confidence": ("classification_confidence",),
+    "id": ("name",),  # 舊檔沒有 id，與快照相同以名稱代替
+}
+
+# 匯出欄位（不含嵌入向量與分級規則版本）
+EXPORT_COLUMNS = (
+    "id", "name", "danbooru_cat", "post_count", "main_category", "sub_category",
+    "confidence", "classification_source", "nsfw_level", "content_level", "updated_at",
+)
+
+FTS_TABLE = "tags_fts"
+
+# FTS5 trigram 需要至少 3 個連續的非萬用字元才能使用索引
+_INDEXABLE_RUN = re.compile(r"[^_%*]{3}")
+
+# SQLite 單一查詢的參數上限（舊版為 999）
+_IN_CHUNK_SIZE = 500
+
+
+def _normalize_id(row: Dict[str, Any]) -> Dict[str, Any]:
+    """統一輸出型別（id 一律為字串）"""
+    if 'id' in row and row['id'] is not None and not isinstance(row['id'], str):
+        row['id'] = str(row['id'])
+    return row
+
+
+def _quote_filter_value(value: str) -> str:
+    """PostgREST 邏輯過濾（or=/and=）中的值：以雙引號包住，避免名稱中的 , . ( ) 被當成語法"""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _parse_columns(columns: str) -> Optional[List[str]]:
+    """PostgREST 欄位列表（'name, post_count'）→ 欄位名稱；'*' 返回 None"""
+    if columns.strip() == "*":
+        return None
+    return [c.strip() for c in columns.split(",") if c.strip()]
+
+
+class TagStorageBackend(ABC):
+    """標籤讀取介面（所有方法返回與 tags_final 查詢結果相同格式的字典）"""
+
+    name = "abstract"
+
+    @abstractmethod
+    async def test_connection(self) -> bool:
+        ...
+
+    @abstractmethod
+    async def get_tag_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get_tags_by_names(self, names: Sequence[str], columns: str = "*") -> Dict[str, Dict[str, Any]]:
+        """批量查詢；只包含存在的標籤"""
+
+    @abstractmethod
+    async def list_tags(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        category: Optional[str] = None,
+        name_filter: Optional[str] = None,
+        order_by: str = 'post_count',
+        order_desc: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """分頁列表，返回 (標籤列表, 總數)"""
+
+    @abstractmethod
+    async def list_tags_after(
+        self,
+        limit: int,
+        after: Optional[Tuple[int, str]] = None,
+        category: Optional[str] = None,
+        name_filter: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        keyset 分頁（post_count DESC, name ASC），不計算總數
+
+        Args:
+            after: 上一頁最後一筆的 (post_count, name)；None 表示第一頁
+        """
+
+    @abstractmethod
+    async def export_tags(
+        self,
+        limit: int,
+        after: Optional[Tuple[Optional[str], str]] = None,
+        category: Optional[str] = None,
+        min_popularity: int = 0,
+        max_content_level: Optional[int] = None,
+        since: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        匯出用 keyset 分頁（EXPORT_COLUMNS）
+
+        未指定 since 時依 name 排序，after 為 (None, 上一批最後的 name)；
+        指定 since 時只取 updated_at > since，依 (updated_at, name) 排序，after 為上一批最後的 (updated_at, name)。
+        """
+
+    @abstractmethod
+    async def search_tags(
+        self,
+        keywords: Sequence[str],
+        limit: int,
+        category: Optional[str] = None,
+        min_popularity: int = 0,
+        max_content_level: Optional[int] = None,
+        columns: str = "*",
+    ) -> List[Dict[str, Any]]:
+        """名稱包含任一關鍵字（ILIKE '%kw%'）的標籤，依 post_count 由高到低"""
+
+    @abstractmethod
+    async def search_prefix(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        """名稱以 prefix 開頭（不分大小寫）的標籤，依 post_count 由高到低"""
+
+    @abstractmethod
+    async def get_category_stats(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    async def count_tags(self) -> int:
+        ...
+
+    @abstractmethod
+    async def get_statistic_buckets(self) -> List[Dict[str, Any]]:
+        """預先彙總的 (dimension, bucket, tag_count) 計數列（見 tag_statistics.TagStatistics.from_buckets）"""
+
+    @abstractmethod
+    async def content_level_current(self) -> bool:
+        """content_level 欄位是否可用於過濾（見 content_levels.ContentLevelColumn）"""
+
+    async def close(self) -> None:
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+# ============================================
+# Supabase（PostgREST）
+# ============================================
+
+class SupabaseTagBackend(TagStorageBackend):
+    """經由 AsyncDatabase 查詢 Supabase 的 tags_final"""
+
+    name = "supabase"
+
+    def __init__(self):
+        self._statistics_rpc_available = True
+        self._export_columns: Optional[List[str]] = None
+
+    @property
+    def adb(self):
+        from .async_db import get_async_database
+        return get_async_database()
+
+    async def test_connection(self) -> bool:
+        adb = self.adb
+        await adb.execute(adb.table('tags_final').select('count').limit(1))
+        return True
+
+    async def get_tag_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        adb = self.adb
+        result = await adb.execute(
+            adb.table('tags_final')
+            .select('*')
+            .eq('name', name)
+            .limit(1)
+        )
+        return _normalize_id(result.data[0]) if result.data else None
+
+    async def get_tags_by_names(self, names: Sequence[str], columns: str = "*") -> Dict[str, Dict[str, Any]]:
+        if not names:
+            return {}
+        # 使用 IN 查詢一次性獲取所有標籤
+        adb = self.adb
+        result = await adb.execute(
+            adb.table('tags_final').select(columns).in_('name', list(names))
+        )
+        return {row['name']: _normalize_id(row) for row in result.data or []}
+
+    async def list_tags(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        category: Optional[str] = None,
+        name_filter: Optional[str] = None,
+        order_by: str = 'post_count',
+        order_desc: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        adb = self.adb
+        query = adb.table('tags_final').select('*', count='exact')
+
+        # 應用篩選
+        if category:
+            query = query.eq('main_category', category)
+        if name_filter:
+            query = query.ilike('name', f'%{name_filter}%')
+
+        query = query.order(order_by, desc=order_desc)
+        query = query.range(offset, offset + limit - 1)
+
+        result = await adb.execute(query)
+        rows = [_normalize_id(row) for row in result.data or []]
+        return rows, result.count if result.count else 0
+
+    async def list_tags_after(
+        self,
+        limit: int,
+        after: Optional[Tuple[int, str]] = None,
+        category: Optional[str] = None,
+        name_filter: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        adb = self.adb
+        query = adb.table('tags_final').select('*')
+        if category:
+            query = query.eq('main_category', category)
+        if name_filter:
+            query = query.ilike('name', f'%{name_filter}%')
+        if after is not None:
+            post_count, name = after
+            # lte 讓索引掃描從游標位置開始；or 排除同數量中已返回的名稱
+            query = query.lte('post_count', int(post_count)).or_(
+                f"post_count.lt.{int(post_count)},"
+                f"and(post_count.eq.{int(post_count)},name.gt.{_quote_filter_value(name)})"
+            )
+
+        # 多欄排序需放在同一個 order 參數（idx_tags_final_keyset 索引）
+        query = query.order('post_count.desc,name').limit(limit)
+        result = await adb.execute(query)
+        return [_normalize_id(row) for row in result.data or []]
+
+    async def export_tags(
+        self,
+        limit: int,
+        after: Optional[Tuple[Optional[str], str]] = None,
+        category: Optional[str] = None,
+        min_popularity: int = 0,
+        max_content_level: Optional[int] = None,
+        since: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        adb = self.adb
+        columns = await self._get_export_columns()
+        if columns is None:
+            return []
+        if since is not None and "updated_at" not in columns:
+            raise ValueError("tags_final has no updated_at column, incremental export is not available")
+        if max_content_level is not None and "content_level" not in columns:
+            raise ValueError("tags_final has no content_level column")
+
+        query = adb.table('tags_final').select(', '.join(columns))
+        if category:
+            query = query.eq('main_category', category)
+        if min_popularity:
+            query = query.gte('post_count', min_popularity)
+        if max_content_level is not None:
+            query = query.lte('content_level', max_content_level)
+
+        if since is None:
+            if after is not None:
+                query = query.gt('name', after[1])
+            query = query.order('name')
+        else:
+            query = query.gt('updated_at', since)
+            if after is not None:
+                updated_at, name = after
+                query = query.gte('updated_at', updated_at).or_(
+                    f"updated_at.gt.{_quote_filter_value(updated_at)},"
+                    f"and(updated_at.eq.{_quote_filter_value(updated_at)},name.gt.{_quote_filter_value(name)})"
+                )
+            # idx_tags_final_updated_at（scripts/19_tags_export_index.sql）
+            query = query.order('updated_at,name')
+
+        result = await adb.execute(query.limit(limit))
+        return [_normalize_id(row) for row in result.data or []]
+
+    async def _get_export_columns(self) -> Optional[List[str]]:
+        """
+        tags_final 實際存在的匯出欄位（未套用 08 / 14 遷移時沒有 nsfw_level、content_level）
+
+        以 select('*') 取一列判斷，結果快取；表為空時回傳 None
+        """
+        if self._export_columns is None:
+            adb = self.adb
+            result = await adb.execute(adb.table('tags_final').select('*').limit(1))
+            if not result.data:
+                return None
+            self._export_columns = [c for c in EXPORT_COLUMNS if c in result.data[0]]
+        return self._export_columns
+
+    async def search_tags(
+        self,
+        keywords: Sequence[str],
+        limit: int,
+        category: Optional[str] = None,
+        min_popularity: int = 0,
+        max_content_level: Optional[int] = None,
+        columns: str = "*",
+    ) -> List[Dict[str, Any]]:
+        adb = self.adb
+        query = adb.table('tags_final').select(columns)
+
+        # 基本篩選
+        if min_popularity:
+            query = query.gte('post_count', min_popularity)
+        if category:
+            query = query.eq('main_category', category)
+        if max_content_level is not None:
+            query = query.lte('content_level', max_content_level)
+
+        # 關鍵字匹配 (任一關鍵字)
+        if keywords:
+            conditions = [f'name.ilike.%{keyword}%' for keyword in keywords]
+            query = query.or_(','.join(conditions))
+
+        query = query.order('post_count', desc=True).limit(limit)
+        result = await adb.execute(query)
+        return [_normalize_id(row) for row in result.data or []]
+
+    async def search_prefix(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        adb = self.adb
+        result = await adb.execute(
+            adb.table('tags_final')
+            .select('name, post_count')
+            .ilike('name', f"{prefix.lower()}%")
+            .order('post_count', desc=True)
+            .limit(limit)
+        )
+        return result.data or []
+
+    async def get_category_stats(self) -> Dict[str, int]:
+        adb = self.adb
+        result = await adb.execute(
+            adb.table('tags_final')
+            .select('main_category')
+            .not_.is_('main_category', 'null')
+        )
+
+        stats: Dict[str, int] = {}
+        for row in result.data:
+            cat = row['main_category']
+            stats[cat] = stats.get(cat, 0) + 1
+        return stats
+
+    async def count_tags(self) -> int:
+        adb = self.adb
+        result = await adb.execute(
+            adb.table('tags_final').select('*', count='exact').limit(1)
+        )
+        return result.count if result.count else 0
+
+    async def get_statistic_buckets(self) -> List[Dict[str, Any]]:
+        if self._statistics_rpc_available:
+            try:
+                result = await self.adb.execute(self.adb.rpc('get_tag_statistics', {}))
+                return result.data or []
+            except Exception as e:
+                if "PGRST202" not in str(e) and "Could not find the function" not in str(e):
+                    raise
+                self._statistics_rpc_available = False
+                logger.warning(
+                    f"⚠️ get_tag_statistics not available, falling back to full-table counts "
+                    f"(apply scripts/17_tag_statistics.sql): {e}"
+                )
+
+        # 未套用 migration 17：只有總數與主分類
+        total = await self.count_tags()
+        categories = await self.get_category_stats()
+        return [{"dimension": "total", "bucket": "", "tag_count": total}] + [
+            {"dimension": "main_category", "bucket": category, "tag_count": count}
+            for category, count in categories.items()
+        ]
+
+    async def content_level_current(self) -> bool:
+        from .content_levels import get_content_level_column
+        return await get_content_level_column().is_current(self.adb)
+
+
+# ============================================
+# 本地 SQLite（唯讀）
+# ============================================
+
+class SQLiteTagBackend(TagStorageBackend):
+    """
+    唯讀 SQLite 標籤庫
+
+    每個執行緒一條唯讀連線（查詢在 asyncio.to_thread 中執行），
+    以 PRAGMA mmap_size 讓頁面直接映射到記憶體，重複查詢不需要 read() 系統呼叫。
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, mmap_bytes: int = 256 * 1024 * 1024):
+        self.path = str(Path(path).resolve())
+        if not Path(self.path).is_file():
+            raise FileNotFoundError(f"Local tag database not found: {self.path}")
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self.stats = {"queries": 0}
+        self._statistic_buckets: Optional[List[Dict[str, Any]]] = None
+
+        conn = self._connection()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tags_final)")}
+        if "name" not in columns:
+            raise ValueError(f"{self.path} has no tags_final table")
+        self.columns = self._column_expressions(columns)
+        self.has_fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)
+        ).fetchone() is not None
+        self._content_level_current = self._check_content_level(conn, columns)
+        if not self.has_fts:
+            logger.warning(f"⚠️ {self.path} has no {FTS_TABLE} index, run scripts/build_local_tag_db.py")
+
+    @staticmethod
+    def _column_expressions(available: set) -> Dict[str, str]:
+        """標準欄位 → SQL 運算式（舊欄位名稱以別名對應，不存在的欄位不輸出）"""
+        expressions = {}
+        for column in TAG_COLUMNS:
+            if column in available:
+                expressions[column] = f'"{column}"'
+                continue
+            for alias in LEGACY_COLUMN_ALIASES.get(column, ()):
+                if alias in available:
+                    expressions[column] = f'"{alias}"'
+                    break
+        return expressions
+
+    def _check_content_level(self, conn: sqlite3.Connection, columns: set) -> bool:
+        if not settings.content_level_column_enabled:
+            return False
+        if not {"content_level", "content_rating_version"} <= columns:
+            return False
+        from .content_levels import get_content_level_column
+        stale = conn.execute(
+            "SELECT 1 FROM tags_final WHERE content_rating_version IS NULL OR content_rating_version != ? LIMIT 1",
+            (get_content_level_column().version,),
+        ).fetchone()
+        return stale is None
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"{Path(self.path).as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _select_list(self, columns: str = "*") -> str:
+        names = _parse_columns(columns) or list(self.columns)
+        parts = []
+        for name in names:
+            expression = self.columns.get(name)
+            if expression is None:
+                raise ValueError(f"Unknown tags_final column: {name}")
+            parts.append(f'{expression} AS "{name}"')
+        return ", ".join(parts)
+
+    def _name_match(self, patterns: Sequence[str]) -> Tuple[str, List[Any]]:
+        """
+        名稱 LIKE 條件（任一 pattern）
+
+        所有 pattern 都有 3 個以上連續字元時以 FTS5 trigram 取得 rowid；
+        否則直接 LIKE，搭配 post_count 索引依序掃描，湊滿 LIMIT 即停止。
+        """
+        patterns = [p.replace("*", "%") for p in patterns]
+        if self.has_fts and all(_INDEXABLE_RUN.search(p) for p in patterns):
+            union = " UNION ".join(f"SELECT rowid FROM {FTS_TABLE} WHERE name LIKE ?" for _ in patterns)
+            return f"rowid IN ({union})", list(patterns)
+        return "(" + " OR ".join("name LIKE ?" for _ in patterns) + ")", list(patterns)
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        start = time.perf_counter()
+        try:
+            return self._connection().execute(sql, params).fetchall()
+        finally:
+            self.stats["queries"] += 1
+            record_duration("db.local_query", time.perf_counter() - start)
+
+    async def _fetch(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        rows = await asyncio.to_thread(self._query, sql, params)
+        return [_normalize_id(dict(row)) for row in rows]
+
+    async def test_connection(self) -> bool:
+        await asyncio.to_thread(self._query, "SELECT 1 FROM tags_final LIMIT 1")
+        return True
+
+    async def get_tag_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        rows = await self._fetch(f"SELECT {self._select_list()} FROM tags_final WHERE name = ? LIMIT 1", (name,))
+        return rows[0] if rows else None
+
+    async def get_tags_by_names(self, names: Sequence[str], columns: str = "*") -> Dict[str, Dict[str, Any]]:
+        names = list(dict.fromkeys(names))
+        found: Dict[str, Dict[str, Any]] = {}
+        select = self._select_list(columns)
+        for i in range(0, len(names), _IN_CHUNK_SIZE):
+            chunk = names[i:i + _IN_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            for row in await self._fetch(f"SELECT {select} FROM tags_final WHERE name IN ({placeholders})", chunk):
+                found[row["name"]] = row
+        return found
+
+    async def list_tags(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        category: Optional[str] = None,
+        name_filter: Optional[str] = None,
+        order_by: str = 'post_count',
+        order_desc: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        order_expression = self.columns.get(order_by)
+        if order_expression is None:
+            raise ValueError(f"Unknown tags_final column: {order_by}")
+
+        clauses, params = [], []
+        if category:
+            clauses.append("main_category = ?")
+            params.append(category)
+        if name_filter:
+            sql, match_params = self._name_match([f"%{name_filter}%"])
+            clauses.append(sql)
+            params.extend(match_params)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        # NULL 排序與 PostgreSQL 相同（DESC 時 NULL 在前）
+        direction = "DESC NULLS FIRST" if order_desc else "ASC NULLS LAST"
+        rows = await self._fetch(
+            f"SELECT {self._select_list()} FROM tags_final{where} "
+            f"ORDER BY {order_expression} {direction} LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        )
+        total = (await asyncio.to_thread(self._query, f"SELECT COUNT(*) FROM tags_final{where}", params))[0][0]
+        return rows, total
+
+    async def list_tags_after(
+        self,
+        limit: int,
+        after: Optional[Tuple[int, str]] = None,
+        category: Optional[str] = None,
+        name_filter: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if category:
+            clauses.append("main_category = ?")
+            params.append(category)
+        if name_filter:
+            sql, match_params = self._name_match([f"%{name_filter}%"])
+            clauses.append(sql)
+            params.extend(match_params)
+        if after is not None:
+            clauses.append("post_count <= ? AND (post_count < ? OR name > ?)")
+            params.extend([after[0], after[0], after[1]])
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        return await self._fetch(
+            f"SELECT {self._select_list()} FROM tags_final{where} ORDER BY post_count DESC, name LIMIT ?",
+            params + [limit],
+        )
+
+    async def export_tags(
+        self,
+        limit: int,
+        after: Optional[Tuple[Optional[str], str]] = None,
+        category: Optional[str] = None,
+        min_popularity: int = 0,
+        max_content_level: Optional[int] = None,
+        since: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        if since is not None and "updated_at" not in self.columns:
+            raise ValueError(f"{self.path} has no updated_at column, incremental export is not available")
+        if max_content_level is not None and "content_level" not in self.columns:
+            raise ValueError(f"{self.path} has no content_level column")
+
+        clauses, params = [], []
+        if category:
+            clauses.append("main_category = ?")
+            params.append(category)
+        if min_popularity:
+            clauses.append("post_count >= ?")
+            params.append(min_popularity)
+        if max_content_level is not None:
+            clauses.append("content_level <= ?")
+            params.append(max_content_level)
+
+        if since is None:
+            if after is not None:
+                clauses.append("name > ?")
+                params.append(after[1])
+            order = "name"
+        else:
+            clauses.append(f"{self.columns['updated_at']} > ?")
+            params.append(since)
+            if after is not None:
+                clauses.append(
+                    f"{self.columns['updated_at']} >= ? AND ({self.columns['updated_at']} > ? OR name > ?)"
+                )
+                params.extend([after[0], after[0], after[1]])
+            order = f"{self.columns['updated_at']}, name"
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        columns = ", ".join(c for c in EXPORT_COLUMNS if c in self.columns)
+        return await self._fetch(
+            f"SELECT {self._select_list(columns)} FROM tags_final{where} ORDER BY {order} LIMIT ?",
+            params + [limit],
+        )
+
+    async def search_tags(
+        self,
+        keywords: Sequence[str],
+        limit: int,
+        category: Optional[str] = None,
+        min_popularity: int = 0,
+        max_content_level: Optional[int] = None,
+        columns: str = "*",
+    ) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if keywords:
+            sql, match_params = self._name_match([f"%{keyword}%" for keyword in keywords])
+            clauses.append(sql)
+            params.extend(match_params)
+        if min_popularity:
+            clauses.append("post_count >= ?")
+            params.append(min_popularity)
+        if category:
+            clauses.append("main_category = ?")
+            params.append(category)
+        if max_content_level is not None:
+            clauses.append("content_level <= ?")
+            params.append(max_content_level)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        return await self._fetch(
+            f"SELECT {self._select_list(columns)} FROM tags_final{where} ORDER BY post_count DESC LIMIT ?",
+            params + [limit],
+        )
+
+    async def search_prefix(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        sql, params = self._name_match([f"{prefix}%"])
+        return await self._fetch(
+            f"SELECT {self._select_list('name, post_count')} FROM tags_final WHERE {sql} "
+            f"ORDER BY post_count DESC LIMIT ?",
+            params + [limit],
+        )
+
+    async def get_category_stats(self) -> Dict[str, int]:
+        rows = await asyncio.to_thread(
+            self._query,
+            "SELECT main_category, COUNT(*) FROM tags_final WHERE main_category IS NOT NULL GROUP BY main_category",
+        )
+        return {row[0]: row[1] for row in rows}
+
+    async def count_tags(self) -> int:
+        return (await asyncio.to_thread(self._query, "SELECT COUNT(*) FROM tags_final"))[0][0]
+
+    async def get_statistic_buckets(self) -> List[Dict[str, Any]]:
+        # 唯讀檔案：彙總一次即可
+        if self._statistic_buckets is None:
+            from .tag_statistics import popularity_tier_sql
+
+            parts = [
+                "SELECT 'total' AS dimension, '' AS bucket, COUNT(*) AS tag_count FROM tags_final",
+                f"SELECT 'popularity_tier', {popularity_tier_sql()}, COUNT(*) FROM tags_final GROUP BY 2",
+            ]
+            if "main_category" in self.columns:
+                parts.append(
+                    "SELECT 'main_category', main_category, COUNT(*) FROM tags_final "
+                    "WHERE main_category IS NOT NULL GROUP BY main_category"
+                )
+                if "sub_category" in self.columns:
+                    parts.append(
+                        "SELECT 'sub_category', main_category || '/' || sub_category, COUNT(*) FROM tags_final "
+                        "WHERE main_category IS NOT NULL AND sub_category IS NOT NULL "
+                        "GROUP BY main_category, sub_category"
+                    )
+            rows = await asyncio.to_thread(self._query, " UNION ALL ".join(parts))
+            self._statistic_buckets = [dict(row) for row in rows]
+        return self._statistic_buckets
+
+    async def content_level_current(self) -> bool:
+        return self._content_level_current
+
+    async def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "fts": self.has_fts,
+            "content_level_current": self._content_level_current,
+            **self.stats,
+        }
+
+
+def prepare_local_tag_database(path: str) -> Dict[str, Any]:
+    """
+    為本地 tags_final 建立查詢所需的索引（可重複執行）
+
+    - name / (post_count, name) / (main_category, post_count) / (updated_at, name) 索引
+    - FTS5 trigram 外部內容表（名稱子字串查詢）
+    - ANALYZE + VACUUM（更新查詢規劃統計、整理頁面以利 memory-map 讀取）
+    """
+    conn = sqlite3.connect(path)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tags_final)")}
+        if "name" not in columns:
+            raise ValueError(f"{path} has no tags_final table")
+
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_local_tags_name ON tags_final (name)")
+        if "updated_at" in columns:
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_local_tags_updated_at ON tags_final (updated_at, name)")
+        # (post_count DESC, name) 同時服務熱門排序與 keyset 分頁
+        conn.execute("DROP INDEX IF EXISTS idx_local_tags_post_count")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_local_tags_keyset ON tags_final (post_count DESC, name)")
+        if "main_category" in columns:
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_local_tags_category ON tags_final (main_category, post_count DESC)"
+            )
+        if "content_level" in columns:
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_local_tags_content_level ON tags_final (content_level, post_count DESC)"
+            )
+
+        conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        conn.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"name, content='tags_final', content_rowid='rowid', tokenize='trigram')"
+        )
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("VACUUM")
+
+        count = conn.execute("SELECT COUNT(*) FROM tags_final").fetchone()[0]
+        return {"path": path, "tags": count}
+    finally:
+        conn.close()
+
+
+def export_tags_to_local_database(client, path: str, page_size: int = 1000) -> Dict[str, Any]:
+    """
+    從資料庫分頁讀取 tags_final 並寫成本地 SQLite 檔案（不含嵌入向量）
+
+    以名稱做 keyset 分頁；先寫入暫存檔，完成並建立索引後才取代目標檔，
+    執行中的 API 不會讀到寫到一半的檔案。
+
+    Args:
+        client: Supabase 客戶端
+        path: 輸出檔案路徑
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        conn.execute(
+            "CREATE TABLE tags_final ("
+            "id TEXT, name TEXT PRIMARY KEY, danbooru_cat INTEGER, post_count INTEGER, "
+            "main_category TEXT, sub_category TEXT, confidence REAL, classification_source TEXT, "
+            "nsfw_level TEXT, content_level INTEGER, content_rating_version TEXT, "
+            "created_at TEXT, updated_at TEXT)"
+        )
+        # 依來源實際存在的欄位取值（未套用 08 / 14 遷移時沒有 nsfw_level、content_level）
+        probe = client.table("tags_final").select("*").limit(1).execute().data or []
+        columns = [c for c in TAG_COLUMNS if probe and c in probe[0]] or ["name"]
+        placeholders = ", ".join("?" for _ in columns)
+        insert_sql = f"INSERT INTO tags_final ({', '.join(columns)}) VALUES ({placeholders})"
+
+        last_name: Optional[str] = None
+        while True:
+            query = client.table("tags_final").select(", ".join(columns)).order("name").limit(page_size)
+            if last_name is not None:
+                query = query.gt("name", last_name)
+            batch = query.execute().data or []
+            conn.executemany(
+                insert_sql,
+                [tuple(row.get(column) for column in columns) for row in batch],
+            )
+            if len(batch) < page_size:
+                break
+            last_name = batch[-1]["name"]
+        conn.commit()
+    finally:
+        conn.close()
+
+    summary = prepare_local_tag_database(str(tmp_path))
+    tmp_path.replace(target)
+    summary["path"] = str(target)
+    return summary
+
+
+# 全局單例
+_tag_storage: Optional[TagStorageBackend] = None
+
+
+def get_tag_storage() -> TagStorageBackend:
+    """獲取標籤儲存後端（單例，依 tag_storage_backend 設定）"""
+    global _tag_storage
+
+    if _tag_storage is None:
+        backend = settings.tag_storage_backend
+        if backend == "sqlite":
+            try:
+                _tag_storage = SQLiteTagBackend(settings.tag_storage_path, settings.tag_storage_mmap_bytes)
+                logger.info(f"✅ Tag storage: local SQLite {settings.tag_storage_path}")
+            except Exception as e:
+                logger.warning(f"⚠️ Tag storage '{backend}' unavailable, falling back to supabase: {e}")
+        elif backend != "supabase":
+            logger.warning(f"⚠️ Unknown tag storage backend '{backend}', using supabase")
+
+        if _tag_storage is None:
+            _tag_storage = SupabaseTagBackend()
+
+    return _tag_storage
+
+
+async def close_tag_storage() -> None:
+    """關閉標籤儲存後端（應用關閉時呼叫）"""
+    global _tag_storage
+
+    if _tag_storage is not None:
+        await _tag_storage.close()
+        _tag_storage = None
@@ -0,0 +1,200 @@
+"""
+Tag Suggester
+標籤拼字建議 - SymSpell 刪除索引，取代逐一標籤的 ILIKE 'prefix%' 查詢
+
+索引結構：
+1. 只對名稱前 prefix_length 個字元產生刪除變體（最多刪 max_distance 個字元）
+2. 刪除變體 → 標籤排名；排名即快照中依 post_count 由高到低的位置
+查詢時對輸入做同樣的刪除，命中的候選再以 Damerau-Levenshtein（OSA）距離驗證。
+
+結果依（編輯距離, -post_count）排序：同距離時優先建議較熱門的標籤。
+沒有拼字建議時退回前綴補全（原本 ILIKE 'prefix%' 的語義），取最熱門的補全結果。
+"""
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+import heapq
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DISTANCE = 2
+DEFAULT_PREFIX_LENGTH = 6
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """word 本身與刪除至多 max_distance 個字元的所有變體"""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for item in frontier:
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        next_frontier -= results
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Damerau-Levenshtein（OSA）距離：插入、刪除、替換、相鄰交換各計 1
+
+    超過 max_distance 時提早結束並返回 max_distance + 1。
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous: Optional[List[int]] = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                previous_previous is not None and j > 1
+                and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]
+            ):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+class TagSuggester:
+    """
+    標籤拼字建議索引
+
+    entries 需已依 post_count 由高到低排序（TagSnapshot.entries 即是如此），
+    並具備 name / post_count 屬性。
+    """
+
+    def __init__(
+        self,
+        entries: Sequence,
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        prefix_length: int = DEFAULT_PREFIX_LENGTH,
+    ):
+        start = time.time()
+        self.entries = entries
+        self.max_distance = max_distance
+        self.prefix_length = max(prefix_length, max_distance + 1)
+        self._names: List[str] = [e.name.lower() for e in entries]
+        # 大多數刪除變體只對應一個標籤，單一排名直接存 int 以節省記憶體
+        self._deletes: Dict[str, Union[int, array]] = {}
+
+        for rank, name in enumerate(self._names):
+            for variant in _deletes(name[:self.prefix_length], max_distance):
+                postings = self._deletes.get(variant)
+                if postings is None:
+                    self._deletes[variant] = rank
+                elif isinstance(postings, int):
+                    self._deletes[variant] = array("I", (postings, rank))
+                else:
+                    postings.append(rank)
+
+        # 前綴補全：依名稱排序的排名，前綴對應連續區段
+        order = sorted(range(len(self._names)), key=self._names.__getitem__)
+        self._sorted_names: List[str] = [self._names[rank] for rank in order]
+        self._sorted_ranks = array("I", order)
+
+        logger.info(
+            f"✅ Tag suggester built: {len(self._names)} tags, {len(self._deletes)} delete variants "
+            f"({(time.time() - start) * 1000:.0f}ms)"
+        )
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _candidate_ranks(self, word: str, max_distance: int) -> Set[int]:
+        candidates: Set[int] = set()
+        for variant in _deletes(word[:self.prefix_length], max_distance):
+            postings = self._deletes.get(variant)
+            if postings is None:
+                continue
+            if isinstance(postings, int):
+                candidates.add(postings)
+            else:
+                candidates.update(postings)
+        return candidates
+
+    def lookup(
+        self,
+        word: str,
+        limit: int = 3,
+        max_distance: Optional[int] = None,
+    ) -> List[Tuple[object, int]]:
+        """
+        查詢單一輸入的拼字建議（不含輸入本身）
+
+        Returns:
+            [(標籤, 編輯距離), ...]，依距離由小到大、post_count 由高到低
+        """
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        word = word.lower()
+        if limit <= 0 or not word:
+            return []
+
+        matches = []
+        for rank in self._candidate_ranks(word, max_distance):
+            name = self._names[rank]
+            if name == word:
+                continue
+            distance = edit_distance(word, name, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, rank))
+
+        matches.sort()
+        return [(self.entries[rank], distance) for distance, rank in matches[:limit]]
+
+    def complete(self, prefix: str, limit: int = 1) -> List[object]:
+        """以 prefix 開頭的標籤（不含 prefix 本身），依 post_count 由高到低"""
+        prefix = prefix.lower()
+        if limit <= 0 or not prefix:
+            return []
+        lo = bisect_left(self._sorted_names, prefix)
+        hi = bisect_left(self._sorted_names, prefix + "\U0010ffff", lo)
+        if lo < hi and self._sorted_names[lo] == prefix:
+            lo += 1
+        return [self.entries[rank] for rank in heapq.nsmallest(limit, self._sorted_ranks[lo:hi])]
+
+    def suggest(
+        self,
+        words: Iterable[str],
+        limit: int = 1,
+        max_distance: Optional[int] = None,
+    ) -> Dict[str, List[object]]:
+        """
+        批量拼字建議
+
+        拼字建議優先；沒有拼字建議時退回前綴補全。
+
+        Returns:
+            {輸入: [建議標籤, ...]}，沒有建議的輸入不包含在結果中
+        """
+        suggestions: Dict[str, List[object]] = {}
+        for word in dict.fromkeys(words):
+            matches = [entry for entry, _ in self.lookup(word, limit=limit, max_distance=max_distance)]
+            if not matches:
+                matches = self.complete(word, limit=limit)
+            if matches:
+                suggestions[word] = matches
+        return suggestions
+
+    def get_stats(self) -> Dict[str, int]:
+        """索引統計"""
+        return {
+            "tags": len(self._names),
+            "delete_variants": len(self._deletes),
+            "max_distance": self.max_distance,
+            "prefix_length": self.prefix_length,
+        }
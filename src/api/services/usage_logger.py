@@ -1,25 +1,149 @@
 """
 Usage Logger Service
 使用數據記錄服務 - 收集 API 使用數據用於分析和優化
+
+寫入流程（不在請求路徑上做任何 I/O）：
+1. log_api_call 只把記錄放進有上限的佇列，立即返回
+2. 背景寫入任務在累積 batch_size 筆或每 flush_interval 秒時批次寫入
+3. 佇列已滿時依 overflow_policy 處理：drop_newest / drop_oldest / block（等待空位，逾時後丟棄）
+4. 資料庫寫入失敗時批次改寫入本地 append-only spool 檔，之後定期重播
 """
 from typing import Optional, Dict, Any, List
+from collections import deque
 from datetime import datetime
+import asyncio
 import logging
 import json
-
-from .supabase_client import get_supabase_service
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+
+class LogUsageSink:
+    """寫入應用程式日誌（預設）"""
+
+    async def write(self, entries: List[Dict[str, Any]]) -> None:
+        for entry in entries:
+            logger.info(
+                f"API_USAGE: {entry['endpoint']} | "
+                f"{entry['response_time_ms']}ms | "
+                f"cache={entry['cache_hit']} | "
+                f"status={entry['status_code']}"
+            )
+
+
+class DatabaseUsageSink:
+    """批次寫入 api_usage_logs 表（scripts/16_api_usage_logs.sql）"""
+
+    def __init__(self, adb, table: str = "api_usage_logs"):
+        self.adb = adb
+        self.table = table
+
+    async def write(self, entries: List[Dict[str, Any]]) -> None:
+        await self.adb.execute(self.adb.table(self.table).insert(entries))
+
+
+class UsageSpool:
+    """
+    本地 append-only spool 檔（JSON Lines）
+
+    資料庫無法連線時保存批次，恢復後依寫入順序重播；超過 max_bytes 時不再追加。
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def append(self, entries: List[Dict[str, Any]]) -> int:
+        """追加記錄，返回實際寫入筆數"""
+        lines = "".join(json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in entries)
+        if self.size() + len(lines.encode("utf-8")) > self.max_bytes:
+            return 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(entries)
+
+    def read(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue  # 崩潰時寫了一半的行
+        return entries
+
+    def rewrite(self, entries: List[Dict[str, Any]]) -> None:
+        """以尚未重播的記錄取代 spool 內容"""
+        if not entries:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        os.replace(tmp_path, self.path)
+
 
 class UsageLogger:
     """使用數據記錄器"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        sink=None,
+        spool: Optional[UsageSpool] = None,
+        max_queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        overflow_policy: str = "drop_newest",
+        block_timeout: float = 0.05,
+        replay_interval: float = 60.0,
+        enabled: bool = True
+    ):
         """初始化記錄器"""
-        self.enabled = True  # 可通過配置控制
-        self._buffer = []  # 緩衝區（批量寫入）
-        self._buffer_size = 10  # 每 10 條記錄批量寫入
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}")
+        self.enabled = enabled
+        self.sink = sink or LogUsageSink()
+        self.spool = spool
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.replay_interval = replay_interval
+        
+        self._queue: deque = deque()
+        self._writer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._last_replay = 0.0
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "spooled": 0,
+            "replayed": 0,
+            "write_errors": 0,
+        }
     
     async def log_api_call(
         self,
@@ -34,7 +158,7 @@ class UsageLogger:
         error_message: Optional[str] = None
     ):
         """
-        記錄 API 調用
+        記錄 API 調用（只放入佇列，由背景任務寫入）
         
         Args:
             endpoint: API 端點
@@ -70,16 +194,141 @@ class UsageLogger:
                     response_data
                 )
             
-            # 添加到緩衝區
-            self._buffer.append(log_entry)
-            
-            # 批量寫入
-            if len(self._buffer) >= self._buffer_size:
-                await self._flush_buffer()
+            await self._enqueue(log_entry)
             
         except Exception as e:
             logger.error(f"Failed to log API call: {e}")
     
+    # ------------------------------------------------------------------
+    # 佇列與背景寫入
+    # ------------------------------------------------------------------
+    
+    def _ensure_writer(self) -> None:
+        """在目前的事件迴圈啟動背景寫入任務（換了事件迴圈時重新建立）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._space = asyncio.Event()
+            self._writer = None
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._run())
+    
+    async def _enqueue(self, entry: Dict[str, Any]) -> None:
+        self._ensure_writer()
+        
+        if len(self._queue) >= self.max_queue_size:
+            if self.overflow_policy == "drop_oldest":
+                self._queue.popleft()
+                self.stats["dropped"] += 1
+            elif self.overflow_policy == "block":
+                deadline = time.monotonic() + self.block_timeout
+                while len(self._queue) >= self.max_queue_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["dropped"] += 1
+                        return
+                    self._wakeup.set()
+                    self._space.clear()
+                    try:
+                        await asyncio.wait_for(self._space.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+            else:
+                self.stats["dropped"] += 1
+                return
+        
+        self._queue.append(entry)
+        self.stats["enqueued"] += 1
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+    
+    async def _run(self) -> None:
+        while True:
+            if len(self._queue) < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.flush()
+                if self.spool is not None and time.monotonic() - self._last_replay >= self.replay_interval:
+                    await self.replay_spool()
+            except Exception as e:
+                logger.error(f"Usage log writer error: {e}")
+    
+    async def flush(self) -> None:
+        """寫出佇列中目前所有的記錄"""
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if self._space is not None:
+                self._space.set()
+            try:
+                await self._write_batch(batch)
+            except asyncio.CancelledError:
+                # 關閉時被取消：放回佇列，由 close() 寫出
+                self._queue.extendleft(reversed(batch))
+                raise
+    
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            await self.sink.write(batch)
+            self.stats["written"] += len(batch)
+            return
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            logger.warning(f"⚠️ Usage log write failed ({len(batch)} entries): {e}")
+        
+        if self.spool is None:
+            self.stats["dropped"] += len(batch)
+            return
+        spooled = await asyncio.to_thread(self.spool.append, batch)
+        self.stats["spooled"] += spooled
+        self.stats["dropped"] += len(batch) - spooled
+    
+    async def replay_spool(self) -> int:
+        """重播 spool 中的記錄，返回成功寫入筆數"""
+        self._last_replay = time.monotonic()
+        if self.spool is None or self.spool.size() == 0:
+            return 0
+        
+        entries = await asyncio.to_thread(self.spool.read)
+        replayed = 0
+        for i in range(0, len(entries), self.batch_size):
+            batch = entries[i:i + self.batch_size]
+            try:
+                await self.sink.write(batch)
+            except Exception as e:
+                logger.warning(f"⚠️ Usage spool replay paused: {e}")
+                break
+            replayed += len(batch)
+        
+        await asyncio.to_thread(self.spool.rewrite, entries[replayed:])
+        if replayed:
+            self.stats["replayed"] += replayed
+            logger.info(f"✅ Replayed {replayed} spooled usage log entries")
+        return replayed
+    
+    async def close(self) -> None:
+        """停止背景寫入並寫出剩餘記錄（應用關閉時呼叫）"""
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        self._writer = None
+        await self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """記錄器統計"""
+        return {
+            **self.stats,
+            "queue_size": len(self._queue),
+            "spool_bytes": self.spool.size() if self.spool else 0,
+        }
+    
     def _summarize_response(self, endpoint: str, data: Dict) -> Dict:
         """
         摘要回應數據（只保留關鍵資訊）
@@ -106,28 +355,6 @@ class UsageLogger:
         
         return summary
     
-    async def _flush_buffer(self):
-        """批量寫入緩衝區數據到資料庫"""
-        if not self._buffer:
-            return
-        
-        try:
-            # 這裡可以選擇寫入 Supabase 或本地文件
-            # 為了簡單，先寫入本地日誌
-            for entry in self._buffer:
-                logger.info(
-                    f"API_USAGE: {entry['endpoint']} | "
-                    f"{entry['response_time_ms']}ms | "
-                    f"cache={entry['cache_hit']} | "
-                    f"status={entry['status_code']}"
-                )
-            
-            # 清空緩衝區
-            self._buffer = []
-            
-        except Exception as e:
-            logger.error(f"Failed to flush usage log buffer: {e}")
-    
     async def log_recommendation(
         self,
         query: str,
@@ -175,11 +402,36 @@ class UsageLogger:
 _usage_logger: Optional[UsageLogger] = None
 
 
+def _create_usage_logger() -> UsageLogger:
+    try:
+        from ..config import settings
+    except ImportError:
+        from src.api.config import settings
+    
+    sink = None
+    spool = None
+    if settings.usage_log_backend == "database":
+        from .async_db import get_async_database
+        sink = DatabaseUsageSink(get_async_database())
+        spool = UsageSpool(settings.usage_log_spool_path, settings.usage_log_spool_max_bytes)
+    
+    return UsageLogger(
+        sink=sink,
+        spool=spool,
+        max_queue_size=settings.usage_log_queue_size,
+        batch_size=settings.usage_log_batch_size,
+        flush_interval=settings.usage_log_flush_interval,
+        overflow_policy=settings.usage_log_overflow_policy,
+        replay_interval=settings.usage_log_replay_interval,
+        enabled=settings.usage_log_enabled
+    )
+
+
 def get_usage_logger() -> UsageLogger:
     """獲取使用數據記錄器單例"""
     global _usage_logger
     if _usage_logger is None:
-        _usage_logger = UsageLogger()
+        _usage_logger = _create_usage_logger()
     return _usage_logger
 
 
@@ -1,23 +1,33 @@
 """
 Inspire Agent 工具定義
-所有工具都是同步函數（避免 asyncio.run 問題）
+存取資料庫的工具為非同步函數（經由標籤儲存後端，不阻塞事件迴圈），其餘為同步函數
 """
 
 from agents import function_tool
 try:
     from src.api.services.supabase_client import get_supabase_service
+    from src.api.services.tag_snapshot import get_tag_snapshot
+    from src.api.services.inspire_events import emit_event
+    from src.api.services.metrics import record_duration
 except ImportError:
     from services.supabase_client import get_supabase_service
+    from services.tag_snapshot import get_tag_snapshot
+    from services.inspire_events import emit_event
+    from services.metrics import record_duration
 from ..inspire_config.database_mappings import (
     categorize_tag_by_rules,
     detect_conflicts,
     resolve_alias
 )
 from ..inspire_config.content_rating import (
-    classify_content_level,
-    filter_tags_by_user_access
+    classify_many,
+    filter_tags_by_user_access,
+    max_allowed_level
 )
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import inspect
+import time
 from pydantic import BaseModel, Field, ConfigDict
 import logging
 
@@ -84,7 +94,7 @@ class FinalOutputData(BaseModel):
     structure_json: str = Field(default="{}", description="標籤結構（JSON 字串）")
     parameters_json: str = Field(default="{}", description="推薦參數（JSON 字串）")
 
-# 全局資料庫服務（同步客戶端）
+# 全局資料庫服務（標籤查詢經由 db.storage）
 db = get_supabase_service()
 
 # Session Context（工具間共享）
@@ -92,6 +102,49 @@ from contextvars import ContextVar
 session_context = ContextVar('inspire_session', default={})
 
 
+
+async def _search_tag_rows(
+    db,
+    keywords: list[str],
+    min_popularity: int,
+    limit: int,
+    user_access: Optional[str] = None
+) -> list[dict]:
+    """
+    依關鍵字取得候選標籤（依 post_count 排序）
+    
+    優先使用本地子字串索引，快照未載入時退回儲存後端的 ILIKE 查詢。
+    指定 user_access 時在索引或儲存後端（content_level 欄位）依權限過濾；
+    欄位尚未依目前分級規則計算時改為多取兩倍，由呼叫端過濾。
+    """
+    snapshot = get_tag_snapshot()
+    if snapshot is not None:
+        entries = snapshot.search_index.search(
+            keywords[:5],
+            limit=limit,
+            min_popularity=min_popularity,
+            max_content_level=max_allowed_level(user_access) if user_access else None
+        )
+        return [entry.to_row() for entry in entries]
+    
+    # 權限過濾
+    max_level = None
+    if user_access:
+        if await db.storage.content_level_current():
+            max_level = max_allowed_level(user_access)
+        else:
+            limit *= 2
+    
+    # 關鍵字匹配（OR 條件），依 post_count 排序
+    return await db.storage.search_tags(
+        keywords[:5],
+        limit=limit,
+        min_popularity=min_popularity,
+        max_content_level=max_level,
+        columns='name, post_count, main_category',
+    )
+
+
 # ============================================
 # 工具 1: understand_intent
 # ============================================
@@ -162,7 +215,7 @@ def understand_intent(
 # ============================================
 
 @function_tool
-def search_examples(
+async def search_examples(
     search_keywords: list[str],
     search_purpose: str,
     search_strategy: str = "auto",
@@ -186,27 +239,13 @@ def search_examples(
     ctx = session_context.get()
     user_access = ctx.get("user_access_level", "all-ages")
     
-    # 同步查詢 Supabase（關鍵：直接調用，不用 asyncio.run）✅
-    query = db.client.table('tags_final').select('name, post_count, main_category')
-    
-    # 應用篩選
-    query = query.gte('post_count', min_popularity)
+    # 非同步查詢（不阻塞事件迴圈）
+    rows = await _search_tag_rows(db, search_keywords, min_popularity, max_results, user_access)
     
-    # 關鍵字匹配（OR 條件）
-    if search_keywords:
-        conditions = [f'name.ilike.%{kw}%' for kw in search_keywords[:5]]
-        query = query.or_(','.join(conditions))
-    
-    # 執行查詢（同步）
-    query = query.order('post_count', desc=True).limit(max_results * 2)
-    result = query.execute()  # 同步執行 ✅
-    
-    # 過濾 NSFW（基於使用者權限）
+    # 過濾 NSFW（基於使用者權限；索引或欄位已過濾時僅為保險）
     examples = []
-    for row in result.data:
-        # 檢測內容等級
-        content_level = classify_content_level(row["name"])
-        
+    content_levels = classify_many(row["name"] for row in rows)
+    for row, content_level in zip(rows, content_levels):
         # 封禁內容跳過
         if content_level == "blocked":
             continue
@@ -335,30 +374,20 @@ def _check_redundancy(tags: list[str]) -> list[tuple[str, str]]:
     """
     檢查冗餘標籤（別名關係）
     
+    依別名圖的標準標籤分組，整個列表一次掃描（O(n)，與別名表大小無關）
+    
     Args:
         tags: 標籤列表（已正規化）
         
     Returns:
         [(redundant_tag, canonical_tag), ...] 冗餘對列表
     """
-    from ..inspire_config.database_mappings import TAG_ALIASES
-    
-    redundancies = []
-    tag_set = set(tags)
+    from ..inspire_config.tag_aliases import get_alias_graph
     
-    # 檢查是否有別名和標準形式同時存在
-    for tag in tags:
-        # 檢查是否有其他標籤是這個標籤的別名
-        for alias, canonical in TAG_ALIASES.items():
-            if tag == canonical and alias in tag_set and alias != tag:
-                redundancies.append((alias, canonical))
-            elif tag == alias and canonical in tag_set and canonical != tag:
-                redundancies.append((tag, canonical))
-    
-    return redundancies
+    return get_alias_graph().find_redundancies(tags)
 
 
-def _check_popularity(tags: list[str], db) -> tuple[list[str], int]:
+async def _check_popularity(tags: list[str], db) -> tuple[list[str], int]:
     """
     檢查標籤流行度（冷門比例）
     
@@ -373,17 +402,22 @@ def _check_popularity(tags: list[str], db) -> tuple[list[str], int]:
         return [], 0
     
     try:
-        # 批量查詢 post_count
-        result = db.client.table('tags_final')\
-            .select('name, post_count')\
-            .in_('name', tags)\
-            .execute()
+        # 先從快照取得 post_count，僅未命中的標籤批量查詢
+        tag_counts = {}
+        missing = tags
+        snapshot = get_tag_snapshot()
+        if snapshot is not None:
+            found, missing = snapshot.lookup_many(tags)
+            tag_counts = {name: entry.post_count for name, entry in found.items()}
+        
+        if missing:
+            rows = await db.storage.get_tags_by_names(missing, columns='name, post_count')
+            tag_counts.update({name: row.get("post_count", 0) for name, row in rows.items()})
         
         # 定義冷門標籤閾值（post_count < 1000）
         POPULARITY_THRESHOLD = 1000
         
         unpopular_tags = []
-        tag_counts = {row["name"]: row.get("post_count", 0) for row in result.data}
         
         for tag in tags:
             post_count = tag_counts.get(tag, 0)
@@ -397,10 +431,13 @@ def _check_popularity(tags: list[str], db) -> tuple[list[str], int]:
         return [], 0
 
 
-def _suggest_similar_tags(invalid_tags: list[str], db, limit: int = 3) -> dict[str, str]:
+async def _suggest_similar_tags(invalid_tags: list[str], db, limit: int = 3) -> dict[str, str]:
     """
     為無效標籤建議相似標籤
     
+    優先使用快照的拼字建議索引（編輯距離，可修正 "scool_uniform" 這類拼字錯誤），
+    一次批量處理所有標籤；快照未載入時退回逐一標籤的前綴查詢。
+    
     Args:
         invalid_tags: 無效標籤列表
         db: 資料庫實例
@@ -415,21 +452,23 @@ def _suggest_similar_tags(invalid_tags: list[str], db, limit: int = 3) -> dict[s
         return suggestions
     
     try:
-        # 使用模糊搜尋（LIKE 查詢）
-        for invalid_tag in invalid_tags:
-            invalid_lower = invalid_tag.lower()
-            
-            # 嘗試部分匹配查詢（前綴匹配）
-            result = db.client.table('tags_final')\
-                .select('name, post_count')\
-                .ilike('name', f"{invalid_lower}%")\
-                .order('post_count', desc=True)\
-                .limit(limit)\
-                .execute()
-            
-            if result.data:
+        snapshot = get_tag_snapshot()
+        if snapshot is not None:
+            for invalid_tag, entries in snapshot.suggester.suggest(invalid_tags, limit=limit).items():
+                # 選擇最接近（同距離時最受歡迎）的標籤
+                suggestions[invalid_tag] = entries[0].name
+            return suggestions
+        
+        # 使用前綴查詢，各標籤的查詢並行執行
+        results = await asyncio.gather(*[
+            db.storage.search_prefix(invalid_tag, limit)
+            for invalid_tag in invalid_tags
+        ])
+        
+        for invalid_tag, rows in zip(invalid_tags, results):
+            if rows:
                 # 選擇最受歡迎的匹配標籤
-                suggestions[invalid_tag] = result.data[0]["name"]
+                suggestions[invalid_tag] = rows[0]["name"]
     
     except Exception as e:
         logger.warning(f"⚠️ Similar tag suggestion failed: {e}")
@@ -438,7 +477,7 @@ def _suggest_similar_tags(invalid_tags: list[str], db, limit: int = 3) -> dict[s
 
 
 @function_tool
-def validate_quality(
+async def validate_quality(
     tags_to_validate: list[str],
     check_aspects: list[str],
     strictness: str = "moderate"
@@ -467,14 +506,18 @@ def validate_quality(
     normalized_tags = _normalize_tags(tags_to_validate)
     resolved_tags = normalized_tags  # 已包含別名解析
     
-    # 檢查 1: 有效性（同步查詢資料庫）
+    # 檢查 1: 有效性（非同步查詢資料庫）
     if "validity" in check_aspects:
-        result = db.client.table('tags_final')\
-            .select('name')\
-            .in_('name', resolved_tags)\
-            .execute()  # 同步執行 ✅
+        # 先查快照，僅未命中的標籤查詢資料庫
+        valid_tags_set = set()
+        missing = resolved_tags
+        snapshot = get_tag_snapshot()
+        if snapshot is not None:
+            found, missing = snapshot.lookup_many(resolved_tags)
+            valid_tags_set.update(found)
         
-        valid_tags_set = {row["name"] for row in result.data}
+        if missing:
+            valid_tags_set.update(await db.storage.get_tags_by_names(missing, columns='name'))
         invalid_tags = [t for t in resolved_tags if t not in valid_tags_set]
         
         if invalid_tags:
@@ -488,7 +531,7 @@ def validate_quality(
             quick_fixes["remove"].extend(invalid_tags)
             
             # 建議相似標籤
-            similar_suggestions = _suggest_similar_tags(invalid_tags, db)
+            similar_suggestions = await _suggest_similar_tags(invalid_tags, db)
             if similar_suggestions:
                 for invalid_tag, suggested_tag in similar_suggestions.items():
                     quick_fixes["replace"][invalid_tag] = suggested_tag
@@ -512,19 +555,16 @@ def validate_quality(
             enable_moderation=False  # 工具層不需要 Moderation API（已在 API 層檢查）
         )
         
-        # 使用安全過濾器（異步需要同步調用）
-        import asyncio
-        safe_tags_list, removed_tags_list, safety_meta = asyncio.run(
-            safety_filter.filter_tags(resolved_tags, user_access)
+        # 使用安全過濾器（工具本身為非同步，直接 await）
+        safe_tags_list, removed_tags_list, safety_meta = await safety_filter.filter_tags(
+            resolved_tags, user_access
         )
         safe_tags = safe_tags_list
         removed = removed_tags_list
         
         # 如果被封禁標籤，建議替代方案
         if removed and safety_meta.get("blocked_count", 0) > 0:
-            alternatives = asyncio.run(
-                safety_filter.suggest_safe_alternative(removed)
-            )
+            alternatives = await safety_filter.suggest_safe_alternative(removed)
             if alternatives:
                 quick_fixes["add"].extend(alternatives[:5])  # 添加前 5 個替代標籤
         
@@ -582,14 +622,20 @@ def validate_quality(
     
     # 檢查 5: 類別平衡
     if "balance" in check_aspects:
-        # 批量查詢取得分類（同步）
-        result = db.client.table('tags_final')\
-            .select('name, main_category')\
-            .in_('name', safe_tags)\
-            .execute()  # 同步 ✅
+        # 批量取得分類（快照優先，未命中再查詢資料庫）
+        rows = []
+        missing = safe_tags
+        snapshot = get_tag_snapshot()
+        if snapshot is not None:
+            found, missing = snapshot.lookup_many(safe_tags)
+            rows = [{"name": e.name, "main_category": e.main_category} for e in found.values()]
+        
+        if missing:
+            found_rows = await db.storage.get_tags_by_names(missing, columns='name, main_category')
+            rows.extend(found_rows.values())
         
         categories = set()
-        for row in result.data:
+        for row in rows:
             cat = categorize_tag_by_rules(row["name"], row.get("main_category"))
             if cat != "META":
                 categories.add(cat)
@@ -605,7 +651,7 @@ def validate_quality(
     
     # 檢查 6: 流行度檢查
     if "popularity" in check_aspects and safe_tags:
-        unpopular_tags, unpopular_count = _check_popularity(safe_tags, db)
+        unpopular_tags, unpopular_count = await _check_popularity(safe_tags, db)
         
         if unpopular_count > 0:
             # 計算冷門比例
@@ -762,7 +808,7 @@ def _understand_intent_impl(
         "confidence": confidence
     }
 
-def _search_examples_impl(
+async def _search_examples_impl(
     search_keywords: list[str],
     search_purpose: str,
     search_strategy: str = "auto",
@@ -776,28 +822,16 @@ def _search_examples_impl(
     ctx = session_context.get()
     user_access = ctx.get("user_access_level", "all-ages")
     
-    # 同步查詢 Supabase
+    # 非同步查詢 Supabase
     from services.supabase_client import get_supabase_service
     db = get_supabase_service()
     
-    query = db.client.table('tags_final').select('name, post_count, main_category')
-    
-    # 應用篩選
-    query = query.gte('post_count', min_popularity)
-    
-    # 關鍵字匹配（OR 條件）
-    if search_keywords:
-        conditions = [f'name.ilike.%{kw}%' for kw in search_keywords[:5]]
-        query = query.or_(','.join(conditions))
-    
-    # 執行查詢（同步）
-    query = query.order('post_count', desc=True).limit(max_results * 2)
-    result = query.execute()
+    rows = await _search_tag_rows(db, search_keywords, min_popularity, max_results, user_access)
     
     # 過濾和格式化
     examples = []
-    for row in result.data:
-        # 簡化版：不檢查 NSFW（避免導入問題）
+    for row in rows:
+        # 快照或 content_level 欄位可用時，已在 _search_tag_rows 依權限過濾
         examples.append({
             "tag": row["name"],
             "category": row.get("main_category", "unknown"),
@@ -930,7 +964,7 @@ def _finalize_prompt_impl(
         "ready_to_use": quality_score >= 70
     }
 
-def execute_tool_by_name(tool_name: str, tool_args: dict) -> dict:
+async def execute_tool_by_name(tool_name: str, tool_args: dict) -> dict:
     """
     通過工具名稱執行工具
     
@@ -959,6 +993,8 @@ def execute_tool_by_name(tool_name: str, tool_args: dict) -> dict:
         
         tool_func = tool_map[tool_name]
         result = tool_func(**tool_args)
+        if inspect.isawaitable(result):
+            result = await result
         
         # 🔑 確保返回字典格式
         if not isinstance(result, dict):
@@ -970,3 +1006,54 @@ def execute_tool_by_name(tool_name: str, tool_args: dict) -> dict:
         logger.error(f"❌ Tool execution failed: {e}")
         return {"error": str(e), "status": "failed"}
 
+
+async def execute_tools_concurrently(
+    calls: List[Tuple[str, dict]],
+    timeout: Optional[float] = None
+) -> List[dict]:
+    """
+    並行執行同一輪的多個工具呼叫
+    
+    存取資料庫的工具為原生非同步函數，同輪呼叫的查詢可同時進行；
+    超過本輪期限仍未完成的工具會被取消並返回逾時錯誤。
+    
+    Args:
+        calls: (工具名稱, 工具參數) 列表
+        timeout: 本輪總期限（秒），None 表示不限制
+        
+    Returns:
+        與 calls 相同順序的工具執行結果
+    """
+    if not calls:
+        return []
+    
+    async def run_tool(tool_name: str, tool_args: dict) -> dict:
+        emit_event("tool_start", {"tool": tool_name})
+        started = time.perf_counter()
+        result = await execute_tool_by_name(tool_name, tool_args)
+        elapsed = time.perf_counter() - started
+        record_duration(f"tool.{tool_name}", elapsed)
+        emit_event("tool_end", {
+            "tool": tool_name,
+            "status": result.get("status", "failed") if "error" in result else "ok",
+            "duration_ms": round(elapsed * 1000, 2),
+        })
+        return result
+    
+    tasks = [asyncio.ensure_future(run_tool(name, args)) for name, args in calls]
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    
+    results = []
+    for (tool_name, _), task in zip(calls, tasks):
+        if task in pending:
+            logger.warning(f"⏱️ Tool {tool_name} exceeded turn deadline ({timeout}s)")
+            emit_event("tool_end", {"tool": tool_name, "status": "timeout"})
+            results.append({"error": f"Tool {tool_name} timed out after {timeout}s", "status": "timeout"})
+        elif task.exception() is not None:
+            results.append({"error": str(task.exception()), "status": "failed"})
+        else:
+            results.append(task.result())
+    
+    return results
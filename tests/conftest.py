@@ -0,0 +1,73 @@
+"""
+共用測試夾具
+
+標籤儲存後端：
+- make_sqlite_backend：由標籤列建立本地 SQLite 檔案（含 FTS 與 keyset 索引）
+- make_supabase_backend：經由 PostgREST stub（ASGITransport，不開連接埠）查詢的 SupabaseTagBackend
+
+API 模組在夾具內匯入，未設定 SUPABASE_URL 時其他測試仍可收集。
+"""
+
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+async def make_sqlite_backend(tmp_path):
+    """建立 SQLiteTagBackend 的工廠（測試結束時關閉）"""
+    from benchmarks.fixtures import create_fixture_database
+    from src.api.services.tag_storage import SQLiteTagBackend, prepare_local_tag_database
+
+    backends = []
+
+    def make(rows, name="tags.db"):
+        path = str(tmp_path / name)
+        create_fixture_database(rows, path=path).close()
+        prepare_local_tag_database(path)
+        backend = SQLiteTagBackend(path)
+        backends.append(backend)
+        return backend
+
+    yield make
+    for backend in backends:
+        await backend.close()
+
+
+@pytest.fixture
+def make_supabase_backend(monkeypatch):
+    """建立連到 PostgREST stub 的 SupabaseTagBackend 的工廠（rows 或已建立的 SQLite 連線）"""
+    import httpx
+    from benchmarks.fixtures import create_fixture_database
+    from benchmarks.postgrest_stub import PostgrestStub
+    from src.api.services.async_db import AsyncDatabase, PooledPostgrestClient
+    from src.api.services.tag_storage import SupabaseTagBackend
+
+    class StubAsyncDatabase(AsyncDatabase):
+        """連到 PostgREST stub 的 AsyncDatabase"""
+
+        def __init__(self, app):
+            self._app = app
+            super().__init__(url="http://stub", key="test", http2=False)
+
+        def _create_client(self):
+            app = self._app
+
+            class Client(PooledPostgrestClient):
+                def create_session(self, base_url, headers, timeout):
+                    return httpx.AsyncClient(
+                        base_url=base_url, headers=headers, timeout=timeout, transport=httpx.ASGITransport(app=app)
+                    )
+
+            return Client(
+                f"{self.url}/rest/v1", headers={"apiKey": self.key}, timeout=httpx.Timeout(5.0),
+                limits=httpx.Limits(), http2=False,
+            )
+
+    def make(rows):
+        conn = rows if isinstance(rows, sqlite3.Connection) else create_fixture_database(rows)
+        adb = StubAsyncDatabase(PostgrestStub(conn).app)
+        monkeypatch.setattr("src.api.services.async_db.get_async_database", lambda: adb)
+        return SupabaseTagBackend()
+
+    return make
@@ -0,0 +1,72 @@
+"""
+非同步資料庫存取層測試
+
+測試 AsyncDatabase.execute（不連線 Supabase）：
+1. Semaphore 限制同時進行的查詢數
+2. 逾時轉為 TimeoutError 並記錄統計
+3. 查詢例外向上傳遞並記錄統計
+"""
+
+import asyncio
+
+import pytest
+from src.api.services.async_db import AsyncDatabase
+
+
+class FakeQuery:
+    """模擬 postgrest 非同步查詢建構器"""
+
+    def __init__(self, delay=0.01, error=None):
+        self.delay = delay
+        self.error = error
+
+    async def execute(self):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return "ok"
+
+
+def make_db(**kwargs):
+    return AsyncDatabase(url="http://localhost:54321", key="test-key", http2=False, **kwargs)
+
+
+class TestAsyncDatabase:
+    """AsyncDatabase 單元測試"""
+
+    def test_concurrency_limited(self):
+        db = make_db(max_concurrency=3)
+
+        async def scenario():
+            return await asyncio.gather(*[db.execute(FakeQuery()) for _ in range(10)])
+
+        assert asyncio.run(scenario()) == ["ok"] * 10
+        stats = db.get_stats()
+        assert stats["queries"] == 10
+        assert stats["max_in_flight"] == 3
+        assert stats["in_flight"] == 0
+
+    def test_timeout_raises(self):
+        db = make_db()
+
+        with pytest.raises(TimeoutError):
+            asyncio.run(db.execute(FakeQuery(delay=1), timeout=0.02))
+        assert db.get_stats()["timeouts"] == 1
+
+    def test_errors_propagate(self):
+        db = make_db()
+
+        with pytest.raises(ValueError):
+            asyncio.run(db.execute(FakeQuery(error=ValueError("bad"))))
+        assert db.get_stats()["errors"] == 1
+
+    def test_client_rebuilt_per_event_loop(self):
+        db = make_db()
+
+        async def current_client():
+            await db.execute(FakeQuery())
+            return db.client
+
+        first = asyncio.run(current_client())
+        second = asyncio.run(current_client())
+        assert first is not second
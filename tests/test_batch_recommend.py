@@ -0,0 +1,93 @@
+"""
+批次標籤推薦端點測試
+
+以假資料庫測試 POST /api/llm/recommend-tags/batch（不連線 Supabase）：
+1. 相同主要關鍵字的描述只查詢一次候選標籤
+2. 結果依輸入順序以 NDJSON 串流返回，最後一行為 summary
+3. 單筆失敗不影響其他描述
+"""
+
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api.routers.llm import recommendations
+from src.api.services.supabase_client import get_supabase_service
+
+TAGS = [
+    {"name": "cat", "post_count": 500000, "main_category": "CHARACTER", "sub_category": None},
+    {"name": "cat_ears", "post_count": 300000, "main_category": "CHARACTER_RELATED", "sub_category": None},
+    {"name": "black_cat", "post_count": 20000, "main_category": "CHARACTER", "sub_category": None},
+    {"name": "girl", "post_count": 900000, "main_category": "CHARACTER", "sub_category": None},
+    {"name": "1girl", "post_count": 4000000, "main_category": "CHARACTER", "sub_category": None},
+]
+
+
+class FakeTagStorage:
+    """記錄查詢關鍵字的假標籤儲存後端"""
+
+    def __init__(self):
+        self.patterns = []
+
+    async def search_tags(self, keywords, limit, min_popularity=0, columns="*", **filters):
+        self.patterns.extend(keywords)
+        return [t for t in TAGS if any(kw in t["name"] for kw in keywords)]
+
+
+class FakeSupabaseService:
+    def __init__(self):
+        self.storage = FakeTagStorage()
+
+    async def search_tags_by_keywords(self, keywords, limit, min_popularity, use_relevance_ranking):
+        return []
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    monkeypatch.setattr(recommendations, "get_tag_snapshot", lambda: None)
+    return FakeSupabaseService()
+
+
+@pytest.fixture
+def client(fake_db):
+    app = FastAPI()
+    app.include_router(recommendations.router, prefix="/api/llm")
+    app.dependency_overrides[get_supabase_service] = lambda: fake_db
+    return TestClient(app)
+
+
+def post_batch(client, descriptions, **options):
+    response = client.post(
+        "/api/llm/recommend-tags/batch",
+        json={"descriptions": descriptions, "max_tags": 3, **options},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class TestBatchRecommend:
+    """批次推薦端點"""
+
+    def test_shared_candidate_retrieval(self, client, fake_db):
+        lines = post_batch(client, ["cat", "cat", "girl"])
+
+        assert [line["index"] for line in lines[:-1]] == [0, 1, 2]
+        assert sorted(fake_db.storage.patterns) == ["cat", "girl"]
+        assert lines[0]["result"]["recommended_tags"] == lines[1]["result"]["recommended_tags"]
+        assert lines[0]["result"]["recommended_tags"][0]["tag"] == "cat"
+        assert lines[-1]["summary"]["unique_primary_keywords"] == 2
+        assert lines[-1]["summary"]["succeeded"] == 3
+
+    def test_failed_item_does_not_abort_batch(self, client):
+        lines = post_batch(client, ["zzzqqq", "cat"])
+
+        assert "error" in lines[0] and lines[0]["query"] == "zzzqqq"
+        assert lines[1]["result"]["recommended_tags"]
+        assert lines[-1]["summary"]["succeeded"] == 1
+        assert lines[-1]["summary"]["failed"] == 1
+
+    def test_rejects_empty_description(self, client):
+        response = client.post("/api/llm/recommend-tags/batch", json={"descriptions": ["cat", "  "]})
+        assert response.status_code == 422
@@ -0,0 +1,160 @@
+"""
+離線基準測試工具測試
+
+測試 benchmarks 套件：
+1. PostgREST stub 與真正的 postgrest 客戶端相容（過濾、排序、計數、寫入、RPC、錯誤代碼）
+2. OpenAI stub 的結構化輸出與固定嵌入向量
+3. 工作負載序列固定、百分位數與基準線比較
+"""
+
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+from postgrest import AsyncPostgrestClient
+from postgrest.exceptions import APIError
+
+from benchmarks.fixtures import create_fixture_database, generate_tag_rows
+from benchmarks.harness import build_schedule, compare_results, percentile
+from benchmarks.openai_stub import OpenAIStub
+from benchmarks.postgrest_stub import PostgrestStub
+
+
+class StubPostgrestClient(AsyncPostgrestClient):
+    """透過 ASGITransport 直接呼叫 stub（不開連接埠）"""
+
+    def __init__(self, app):
+        self._app = app
+        super().__init__("http://stub/rest/v1")
+
+    def create_session(self, base_url, headers, timeout):
+        return httpx.AsyncClient(
+            base_url=base_url, headers=headers, timeout=timeout, transport=httpx.ASGITransport(app=self._app)
+        )
+
+
+@pytest.fixture
+def stub():
+    return PostgrestStub(create_fixture_database(generate_tag_rows(500, seed=7)))
+
+
+class TestPostgrestStub:
+    """PostgREST stub 與 postgrest-py 的相容性"""
+
+    async def test_select_filters_order_and_count(self, stub):
+        async with StubPostgrestClient(stub.app) as client:
+            top = await (
+                client.table("tags_final")
+                .select("name, post_count", count="exact")
+                .ilike("name", "%CAT%")
+                .order("post_count", desc=True)
+                .limit(2)
+                .execute()
+            )
+            in_filter = await (
+                client.table("tags_final").select("name").in_("name", ["1girl", "solo", "missing"])
+                .order("name").execute()
+            )
+            either = await (
+                client.table("tags_final").select("name")
+                .or_("name.eq.city,name.eq.rain").order("name").execute()
+            )
+            ordered = await client.table("tags_final").select("id").order("post_count", desc=True).execute()
+            paged = await client.table("tags_final").select("id").order("post_count", desc=True).range(10, 20).execute()
+
+        assert [r["name"] for r in top.data] == ["cat_ears", "cat"]
+        assert top.count is not None and top.count >= 2
+        assert [r["name"] for r in in_filter.data] == ["1girl", "solo"]
+        assert [r["name"] for r in either.data] == ["city", "rain"]
+        # postgrest-py 0.15 的 range(a, b) 送出 Range: a-(b-1)，stub 與 PostgREST 一樣以閉區間處理
+        assert paged.data == ordered.data[10:20]
+
+    async def test_writes_and_error_codes(self, stub):
+        async with StubPostgrestClient(stub.app) as client:
+            await client.table("inspire_sessions").insert({"session_id": "s1", "extracted_intent": {"mood": "calm"}}).execute()
+            await client.table("inspire_sessions").upsert({"session_id": "s1", "turn_count": 2}).execute()
+            updated = await client.table("inspire_sessions").update({"would_use_again": True}).eq("session_id", "s1").execute()
+
+            with pytest.raises(APIError) as unknown_column:
+                await client.table("inspire_sessions").insert({"session_id": "s2", "nope": 1}).execute()
+            with pytest.raises(APIError) as duplicate:
+                await client.table("inspire_sessions").insert({"session_id": "s1"}).execute()
+            with pytest.raises(APIError) as bad_select:
+                await client.table("tags_final").select("nope").execute()
+
+        row = updated.data[0]
+        assert row["extracted_intent"] == {"mood": "calm"}  # merge-duplicates 保留未提供的欄位
+        assert row["turn_count"] == 2 and row["would_use_again"] is True
+        assert unknown_column.value.code == "PGRST204"
+        assert duplicate.value.code == "23505"
+        assert bad_select.value.code == "42703"
+
+    async def test_rpc(self, stub):
+        async with StubPostgrestClient(stub.app) as client:
+            params = {
+                "p_session_id": "s1", "p_fields": {"current_phase": "exploring"}, "p_cost_delta": 0.5,
+                "p_tokens_delta": 10, "p_tool_calls": {"search_examples": 2}, "p_create": True,
+            }
+            await client.rpc("apply_inspire_session_delta", params).execute()
+            second = await client.rpc("apply_inspire_session_delta", {**params, "p_create": False}).execute()
+            with pytest.raises(APIError) as missing:
+                await client.rpc("does_not_exist", {}).execute()
+
+        data = second.data
+        assert data[0]["current_phase"] == "exploring"
+        assert data[0]["total_cost"] == 1.0 and data[0]["total_tokens"] == 20
+        assert data[0]["tool_call_count"] == {"search_examples": 4} and data[0]["total_tool_calls"] == 4
+        assert missing.value.code == "PGRST202"
+
+
+class TestOpenAIStub:
+    """OpenAI stub 與 openai 客戶端的相容性"""
+
+    async def test_structured_output_and_embeddings(self):
+        stub = OpenAIStub()
+
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub.app))
+        client = AsyncOpenAI(api_key="sk-test", base_url="http://stub/v1", http_client=http_client)
+        response = await client.responses.create(
+            model="gpt-5-nano",
+            input=[{"role": "user", "content": "a cyberpunk cat"}],
+            text={"format": {"type": "json_schema", "name": "tags", "schema": {"type": "object"}}},
+        )
+        first = await client.embeddings.create(model="text-embedding-3-small", input=["櫻花", "cat"])
+        second = await client.embeddings.create(model="text-embedding-3-small", input="櫻花")
+        await http_client.aclose()
+
+        result = json.loads(response.output_text)
+        assert {"cyberpunk", "neon_lights", "cat_ears"} <= set(result["tags"])
+        assert len(first.data[0].embedding) == 1536
+        assert first.data[0].embedding == second.data[0].embedding
+        assert first.data[0].embedding != first.data[1].embedding
+        assert stub.stats == {"responses": 1, "embeddings": 2}
+
+
+class TestHarness:
+    """工作負載與結果比較"""
+
+    def test_schedule_is_deterministic(self):
+        schedule = build_schedule(1000, seed=42)
+        assert [w.name for w in schedule] == [w.name for w in build_schedule(1000, seed=42)]
+        counts = {}
+        for item in schedule:
+            counts[item.name] = counts.get(item.name, 0) + 1
+        assert 250 < counts["search"] < 350 and 50 < counts["inspire_continue"] < 150
+        assert {w.name for w in build_schedule(50, 1, endpoints=["search"])} == {"search"}
+        with pytest.raises(ValueError):
+            build_schedule(10, 1, endpoints=["nope"])
+
+    def test_percentile_and_compare(self):
+        assert percentile(list(range(1, 101)), 95) == 95
+        assert percentile([], 50) == 0.0
+
+        baseline = {"endpoints": {"search": {"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "throughput_rps": 100.0, "error_rate": 0.0}}}
+        current = {"endpoints": {"search": {"p50_ms": 10.5, "p95_ms": 30.0, "p99_ms": 31.0, "throughput_rps": 70.0, "error_rate": 0.1}}}
+        regressions = compare_results(baseline, current, threshold=0.2)
+        assert [(r["metric"], r["change"]) for r in regressions] == [
+            ("p95_ms", 0.5), ("throughput_rps", -0.3), ("error_rate", None),
+        ]
+        assert compare_results(baseline, baseline) == []
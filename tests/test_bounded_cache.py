@@ -0,0 +1,106 @@
+"""
+有界記憶體快取測試
+
+測試 BoundedTTLCache / MemoryCacheManager：
+1. 每個項目的 TTL（含 set 傳入的 ttl）
+2. 項目數與位元組數上限的 LRU 淘汰
+3. sweep() 清理過期項目
+4. 命中 / 未命中 / 淘汰統計
+"""
+
+import asyncio
+
+import pytest
+from src.api.services.cache_manager import BoundedTTLCache, MemoryCacheManager, estimate_size
+
+
+class FakeClock:
+    """可手動推進的時鐘"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestBoundedTTLCache:
+    """BoundedTTLCache 單元測試"""
+
+    def test_per_entry_ttl(self, clock):
+        cache = BoundedTTLCache(max_entries=10, default_ttl=60, clock=clock)
+        cache.set("short", 1, ttl=5)
+        cache.set("long", 2)
+
+        clock.now += 10
+        assert cache.get("short") is None
+        assert cache.get("long") == 2
+        assert cache.get_stats()["expirations"] == 1
+
+    def test_lru_eviction_by_entries(self, clock):
+        cache = BoundedTTLCache(max_entries=2, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "b" not in cache
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_eviction_by_bytes(self, clock):
+        value = "x" * 1000
+        cache = BoundedTTLCache(max_entries=100, max_bytes=3 * estimate_size(value), clock=clock)
+        for i in range(5):
+            cache.set(str(i), value)
+
+        stats = cache.get_stats()
+        assert stats["size"] == 3
+        assert stats["bytes"] <= stats["max_bytes"]
+        assert cache.get("0") is None and cache.get("4") == value
+
+    def test_oversized_value_not_cached(self, clock):
+        cache = BoundedTTLCache(max_entries=10, max_bytes=100, clock=clock)
+        cache.set("big", "y" * 1000)
+        assert len(cache) == 0
+
+    def test_sweep_removes_only_expired(self, clock):
+        cache = BoundedTTLCache(max_entries=100, default_ttl=60, clock=clock)
+        for i in range(10):
+            cache.set(f"k{i}", i, ttl=10 if i % 2 else 100)
+        cache.set("k1", "refreshed", ttl=100)  # 覆寫後舊的過期紀錄不應生效
+
+        clock.now += 50
+        assert cache.sweep() == 4
+        assert len(cache) == 6
+        assert cache.get("k1") == "refreshed"
+
+    def test_none_values_are_cached(self, clock):
+        cache = BoundedTTLCache(clock=clock)
+        cache.set("empty", None)
+        assert "empty" in cache
+
+
+class TestMemoryCacheManager:
+    """MemoryCacheManager 單元測試"""
+
+    def test_async_interface_honours_ttl(self):
+        manager = MemoryCacheManager(max_entries=2, ttl=60)
+
+        async def scenario():
+            await manager.set("a", 1, ttl=0.05)
+            await manager.set("b", 2)
+            await manager.set("c", 3)
+            assert await manager.get("a") is None  # 已被 LRU 淘汰
+            assert await manager.get("b") == 2
+            assert await manager.delete("c") is True
+
+        asyncio.run(scenario())
+        stats = manager.get_stats()
+        assert stats["size"] == 1
+        assert stats["evictions"] == 1
@@ -0,0 +1,208 @@
+"""
+預先計算內容等級測試
+
+測試 content_levels / 本地索引的權限過濾：
+1. 分級規則版本隨關鍵字列表變動
+2. 批次工作只更新等級或版本不符的標籤，並依等級分組寫入
+3. 欄位版本檢查（含快取與錯誤時退回）
+4. TagSearchIndex / EmbeddingIndex 在索引內依內容等級過濾
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+from src.api.inspire_config.content_rating import (
+    ACCESS_HIERARCHY,
+    classify_content_level,
+    compute_rating_version,
+    get_content_rater,
+    max_allowed_level,
+)
+from src.api.services.content_levels import ContentLevelColumn, compute_content_levels
+from src.api.services.embedding_index import EmbeddingIndex
+from src.api.services.tag_snapshot import TagSnapshot
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeTable:
+    """記錄鏈式呼叫的同步查詢建構器"""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+        return method
+
+    def execute(self):
+        calls = dict(self.calls)
+        if "update" in calls:
+            self.client.updates.append((calls["update"][0], list(calls["in_"][1])))
+            return _Response([])
+        start, end = calls["range"]
+        return _Response(self.client.rows[start:end + 1])
+
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = []
+
+    def table(self, name):
+        return FakeTable(self)
+
+
+class FakeAsyncDatabase:
+    def __init__(self, data=None, error=None):
+        self.data = data or []
+        self.error = error
+        self.queries = 0
+
+    def table(self, name):
+        return FakeTable(None)
+
+    async def execute(self, query):
+        self.queries += 1
+        if self.error:
+            raise self.error
+        return _Response(self.data)
+
+
+class TestRatingVersion:
+    """分級規則版本與權限上限"""
+
+    def test_version_changes_with_keywords(self):
+        base = [("blocked", ["loli"]), ("r18", ["nude"]), ("r15", ["cleavage"])]
+        assert compute_rating_version(base) == compute_rating_version(
+            [("blocked", ["LOLI"]), ("r18", ["nude"]), ("r15", ["cleavage"])]
+        )
+        assert compute_rating_version(base) != compute_rating_version(
+            [("blocked", ["loli"]), ("r18", ["nude", "cum"]), ("r15", ["cleavage"])]
+        )
+        assert len(get_content_rater().version) == 16
+
+    def test_max_allowed_level(self):
+        assert max_allowed_level("all-ages") == ACCESS_HIERARCHY["all-ages"]
+        assert max_allowed_level("r15") == ACCESS_HIERARCHY["r15"]
+        assert max_allowed_level("r18") == ACCESS_HIERARCHY["r18"]
+        assert max_allowed_level("unknown") == ACCESS_HIERARCHY["all-ages"]
+
+
+class TestComputeContentLevels:
+    """批次計算工作"""
+
+    def test_updates_only_stale_rows_grouped_by_level(self):
+        version = get_content_rater().version
+        rows = [
+            {"name": "1girl", "content_level": 0, "content_rating_version": version},
+            {"name": "nude", "content_level": None, "content_rating_version": None},
+            {"name": "cleavage", "content_level": 1, "content_rating_version": "old"},
+            {"name": "smile", "content_level": 2, "content_rating_version": version},
+            {"name": "loli", "content_level": None, "content_rating_version": None},
+        ]
+        client = FakeClient(rows)
+
+        summary = compute_content_levels(client, page_size=2)
+
+        assert summary["scanned"] == 5
+        assert summary["updated"] == 4
+        expected = {}
+        for name in ["nude", "cleavage", "smile", "loli"]:
+            expected.setdefault(ACCESS_HIERARCHY[classify_content_level(name)], []).append(name)
+        written = {
+            payload["content_level"]: names for payload, names in client.updates
+        }
+        assert written == expected
+        assert all(payload["content_rating_version"] == version for payload, _ in client.updates)
+
+    def test_dry_run_and_force(self):
+        version = get_content_rater().version
+        rows = [{"name": "1girl", "content_level": 0, "content_rating_version": version}]
+
+        client = FakeClient(rows)
+        assert compute_content_levels(client)["updated"] == 0
+
+        summary = compute_content_levels(client, force=True, dry_run=True)
+        assert summary["updated"] == 1
+        assert client.updates == []
+
+
+class TestContentLevelColumn:
+    """欄位版本檢查"""
+
+    def test_current_when_no_stale_rows(self):
+        column = ContentLevelColumn(recheck_seconds=60)
+        adb = FakeAsyncDatabase(data=[])
+
+        assert asyncio.run(column.is_current(adb)) is True
+        assert asyncio.run(column.is_current(adb)) is True
+        assert adb.queries == 1  # 快取檢查結果
+
+    def test_stale_or_missing_column_disables_filter(self):
+        assert asyncio.run(ContentLevelColumn(0).is_current(FakeAsyncDatabase(data=[{"name": "x"}]))) is False
+        assert asyncio.run(ContentLevelColumn(0).is_current(FakeAsyncDatabase(error=RuntimeError("42703")))) is False
+
+
+NAMES = [
+    ("1girl", 5000000),
+    ("cleavage", 3000000),
+    ("nude", 2000000),
+    ("loli", 1500000),
+    ("long_hair", 1000000),
+    ("solo", 900000),
+]
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    rows = [
+        {"id": str(i), "name": name, "post_count": count, "main_category": None}
+        for i, (name, count) in enumerate(NAMES)
+    ]
+    return TagSnapshot.from_rows(rows, version="test", source="test")
+
+
+def allowed(name, user_access):
+    return ACCESS_HIERARCHY[classify_content_level(name)] <= max_allowed_level(user_access)
+
+
+class TestIndexFiltering:
+    """本地索引的權限過濾"""
+
+    @pytest.mark.parametrize("user_access", ["all-ages", "r15", "r18"])
+    def test_tag_search_index(self, snapshot, user_access):
+        entries = snapshot.search_index.search(
+            [], limit=3, max_content_level=max_allowed_level(user_access)
+        )
+        expected = [name for name, _ in NAMES if allowed(name, user_access)][:3]
+        assert [e.name for e in entries] == expected
+        assert len(snapshot.search_index.search([], limit=100)) == len(NAMES)
+
+    @pytest.mark.parametrize("user_access", ["all-ages", "r18"])
+    def test_embedding_index(self, user_access):
+        rng = np.random.default_rng(0)
+        matrix = rng.normal(size=(len(NAMES), 8)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        meta = {
+            "names": [name for name, _ in NAMES],
+            "post_counts": [count for _, count in NAMES],
+            "main_categories": [None] * len(NAMES),
+            "sub_categories": [None] * len(NAMES),
+        }
+        index = EmbeddingIndex(matrix, meta)
+
+        hits = index.search(
+            matrix[2], top_k=2, min_similarity=-1.0, max_content_level=max_allowed_level(user_access)
+        )
+        names = [index.names[row] for row, _ in hits]
+        assert len(names) == 2
+        assert all(allowed(name, user_access) for name in names)
+        assert ("nude" in names) == (user_access == "r18")
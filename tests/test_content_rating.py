@@ -0,0 +1,95 @@
+"""
+內容分級自動機測試
+
+測試 ContentRatingAutomaton / ContentRater：
+1. 與逐一關鍵字子字串掃描的結果完全相同
+2. 同時命中多個等級時取最嚴格者
+3. classify_many 保持輸入順序並使用記憶表
+"""
+
+import random
+
+import pytest
+from src.api.inspire_config.content_rating import (
+    BLOCKED_KEYWORDS,
+    R15_KEYWORDS,
+    R18_KEYWORDS,
+    ContentRater,
+    ContentRatingAutomaton,
+    classify_content_level,
+    filter_tags_by_user_access,
+    is_tag_allowed,
+)
+
+
+def naive_classify(tag_name):
+    """原本的三段式子字串掃描"""
+    tag_lower = tag_name.lower()
+    if any(kw in tag_lower for kw in BLOCKED_KEYWORDS):
+        return "blocked"
+    if any(kw in tag_lower for kw in R18_KEYWORDS):
+        return "r18"
+    if any(kw in tag_lower for kw in R15_KEYWORDS):
+        return "r15"
+    return "all-ages"
+
+
+class TestContentRatingAutomaton:
+    """自動機單元測試"""
+
+    def test_matches_naive_scan(self):
+        rng = random.Random(7)
+        words = BLOCKED_KEYWORDS + R18_KEYWORDS + R15_KEYWORDS + ["1girl", "sakura", "Assassin", "cocktail", "kidney"]
+        tags = ["_".join(rng.sample(words, rng.randint(1, 3))) for _ in range(2000)]
+        tags += ["".join(rng.choice("abcdeiklnoprst_") for _ in range(rng.randint(1, 16))) for _ in range(2000)]
+
+        rater = ContentRater()
+        assert rater.classify_many(tags) == [naive_classify(tag) for tag in tags]
+
+    @pytest.mark.parametrize("tag,expected", [
+        ("1girl", "all-ages"),
+        ("large_breasts", "r15"),
+        ("nipple_slip", "r15"),
+        ("nipples", "r18"),
+        ("nude_loli", "blocked"),
+        ("NSFW", "r18"),
+        ("assassin", "r15"),  # 子字串語義與原本相同
+    ])
+    def test_strictest_level_wins(self, tag, expected):
+        assert classify_content_level(tag) == expected
+
+    def test_overlapping_suffix_patterns(self):
+        automaton = ContentRatingAutomaton([("blocked", ["bcd"]), ("r18", ["abce"]), ("r15", ["c"])])
+        assert automaton.classify("xabcd") == "blocked"
+        assert automaton.classify("abce") == "r18"
+        assert automaton.classify("ac") == "r15"
+        assert automaton.classify("xyz") is None
+
+
+class TestContentRater:
+    """分級器記憶表與批次 API"""
+
+    def test_classify_many_uses_memo(self):
+        rater = ContentRater()
+        levels = rater.classify_many(["cat", "nude", "cat", "loli"])
+        assert levels == ["all-ages", "r18", "all-ages", "blocked"]
+
+        rater.classify_many(["cat", "nude"])
+        stats = rater.get_stats()
+        assert stats["misses"] == 3
+        assert stats["hits"] == 2
+
+    def test_memo_bounded(self):
+        rater = ContentRater(memo_size=2)
+        rater.classify_many(["a", "b", "c"])
+        assert rater.get_stats()["memo_size"] <= 2
+
+    def test_access_filtering_unchanged(self):
+        tags = ["1girl", "breasts", "nipples", "loli"]
+        allowed, removed, meta = filter_tags_by_user_access(tags, "r15")
+        assert allowed == ["1girl", "breasts"]
+        assert removed == ["nipples", "loli"]
+        assert meta["blocked_count"] == 1 and meta["r18_filtered"] == 1
+
+        assert is_tag_allowed("nipples", "r18")
+        assert not is_tag_allowed("loli", "r18")
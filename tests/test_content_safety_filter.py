@@ -35,6 +35,17 @@ class TestContentSafetyFilter:
         assert filter.is_blocked("sakura") == False
         assert filter.is_blocked("cute") == False
 
+    def test_blocked_keywords_read_only(self):
+        """封禁清單為唯讀（判定使用已編譯的自動機）"""
+        filter = ContentSafetyFilter(enable_moderation=False)
+        
+        assert "loli" in filter.blocked_keywords
+        with pytest.raises(AttributeError):
+            filter.blocked_keywords.add("sakura")
+        with pytest.raises(AttributeError):
+            filter.blocked_keywords = {"sakura"}
+        assert filter.is_blocked("sakura") == False
+
     @pytest.mark.asyncio
     async def test_filter_tags_blocked(self):
         """測試標籤過濾（封禁詞）"""
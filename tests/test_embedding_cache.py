@@ -0,0 +1,101 @@
+"""
+查詢嵌入快取測試
+
+測試 EmbeddingCache：
+1. 正規化後相同的查詢共用同一鍵，不同模型不共用
+2. 命中與未命中返回相同的 float32 向量
+3. LRU 容量限制
+4. SQLite 持久層可跨實例讀回，過期的列會被刪除
+"""
+
+import numpy as np
+from src.api.services.embedding_cache import (
+    EmbeddingCache,
+    SQLiteEmbeddingStore,
+    make_embedding_key,
+)
+
+
+MODEL = "text-embedding-3-small"
+
+
+class CountingFactory:
+    """記錄呼叫次數的嵌入生成函式"""
+
+    def __init__(self, dim: int = 8):
+        self.calls = 0
+        self.dim = dim
+
+    async def __call__(self):
+        self.calls += 1
+        return np.random.default_rng(self.calls).normal(size=self.dim).tolist()
+
+
+class TestEmbeddingCache:
+    """EmbeddingCache 單元測試"""
+
+    def test_key_normalization(self):
+        assert make_embedding_key(MODEL, "  Cute   Girl ") == make_embedding_key(MODEL, "cute girl")
+        assert make_embedding_key(MODEL, "ｃｕｔｅ") == make_embedding_key(MODEL, "cute")
+        assert make_embedding_key(MODEL, "cute") != make_embedding_key("other-model", "cute")
+
+    async def test_hit_returns_same_vector_as_miss(self):
+        cache = EmbeddingCache(max_entries=10)
+        factory = CountingFactory()
+
+        first = await cache.get_or_create(MODEL, "Cute Girl", factory)
+        second = await cache.get_or_create(MODEL, "cute  girl", factory)
+
+        assert factory.calls == 1
+        assert first == second
+        assert cache.get_stats()["memory_hits"] == 1
+
+    async def test_failed_embedding_not_cached(self):
+        cache = EmbeddingCache(max_entries=10)
+
+        async def failing():
+            return []
+
+        assert await cache.get_or_create(MODEL, "query", failing) == []
+        assert cache.get_stats()["size"] == 0
+
+    async def test_lru_eviction(self):
+        cache = EmbeddingCache(max_entries=2)
+        factory = CountingFactory()
+
+        for query in ["a", "b", "a", "c"]:
+            await cache.get_or_create(MODEL, query, factory)
+
+        assert factory.calls == 3
+        assert await cache.get(MODEL, "a") is not None
+        assert await cache.get(MODEL, "b") is None
+
+    async def test_sqlite_store_persists(self, tmp_path):
+        path = str(tmp_path / "embeddings.db")
+        factory = CountingFactory(dim=1536)
+
+        first = await EmbeddingCache(store=SQLiteEmbeddingStore(path, 0)).get_or_create(MODEL, "sky", factory)
+        reloaded = EmbeddingCache(store=SQLiteEmbeddingStore(path, 0))
+        second = await reloaded.get_or_create(MODEL, "sky", factory)
+
+        assert factory.calls == 1
+        assert first == second
+        assert reloaded.get_stats()["store_hits"] == 1
+
+    async def test_sqlite_store_deletes_expired_rows(self, tmp_path):
+        path = str(tmp_path / "embeddings.db")
+        store = SQLiteEmbeddingStore(path, ttl_seconds=60)
+        await store.set("old", MODEL, b"\x00" * 4)
+        await store.set("older", MODEL, b"\x00" * 4)
+        await store.set("fresh", MODEL, b"\x01" * 4)
+        store._conn.execute("UPDATE query_embeddings SET created_at = created_at - 120 WHERE key != 'fresh'")
+        store._conn.commit()
+
+        def count():
+            return store._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+        # 讀取時刪除該筆
+        assert await store.get("old") is None and count() == 2
+        # 批次清除其餘過期列
+        assert store.purge_expired() == 1 and count() == 1
+        assert await store.get("fresh") == b"\x01" * 4
@@ -0,0 +1,157 @@
+"""
+本地嵌入索引測試
+
+測試 write_embedding_matrix / EmbeddingIndex：
+1. 匯出檔案可 memory-map 載入，列已正規化
+2. IVF 搜尋結果與暴力搜尋一致（探測全部桶時）且召回率足夠
+3. 相似度閾值與 top_k
+4. export_embeddings_from_database 以名稱 keyset 分頁寫入 float32 矩陣
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+from src.api.services.embedding_index import EmbeddingIndex, export_embeddings_from_database, write_embedding_matrix
+
+
+DIM = 32
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(20, DIM))
+    vectors = np.concatenate([c + 0.3 * rng.normal(size=(100, DIM)) for c in centers])
+    rows = [
+        {"name": f"tag_{i}", "post_count": i, "main_category": "CHARACTER", "sub_category": None}
+        for i in range(len(vectors))
+    ]
+    base_path = str(tmp_path_factory.mktemp("embeddings") / "tags")
+    summary = write_embedding_matrix(base_path, rows, vectors.tolist(), n_lists=16)
+    return base_path, vectors, summary
+
+
+def brute_force(vectors, query, top_k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    return [f"tag_{i}" for i in np.argsort(-scores)[:top_k]]
+
+
+class TestEmbeddingIndex:
+    """EmbeddingIndex 單元測試"""
+
+    def test_load_memory_mapped(self, exported):
+        base_path, vectors, summary = exported
+        index = EmbeddingIndex.load(base_path)
+
+        assert summary["count"] == len(vectors) == len(index)
+        assert isinstance(index.matrix, np.memmap)
+        assert index.matrix.dtype == np.float32
+        np.testing.assert_allclose(np.linalg.norm(index.matrix, axis=1), 1.0, rtol=1e-5)
+
+    def test_full_probe_matches_brute_force(self, exported):
+        base_path, vectors, _ = exported
+        index = EmbeddingIndex.load(base_path)
+        query = vectors[123]
+
+        hits = index.search(query, top_k=10, nprobe=16)
+        assert [index.names[row] for row, _ in hits] == brute_force(vectors, query, 10)
+        similarities = [s for _, s in hits]
+        assert similarities == sorted(similarities, reverse=True)
+
+    def test_partial_probe_recall(self, exported):
+        base_path, vectors, _ = exported
+        index = EmbeddingIndex.load(base_path, nprobe=4)
+        rng = np.random.default_rng(7)
+
+        recalls = []
+        for i in rng.choice(len(vectors), size=20, replace=False):
+            expected = set(brute_force(vectors, vectors[i], 10))
+            found = {index.names[row] for row, _ in index.search(vectors[i], top_k=10)}
+            recalls.append(len(expected & found) / 10)
+        assert np.mean(recalls) >= 0.9
+
+    def test_min_similarity_and_metadata(self, exported):
+        base_path, vectors, _ = exported
+        index = EmbeddingIndex.load(base_path)
+
+        hits = index.search(vectors[0], top_k=5, min_similarity=0.999)
+        assert [index.names[row] for row, _ in hits] == ["tag_0"]
+        assert index.post_counts[hits[0][0]] == 0
+        assert index.search(np.zeros(DIM), top_k=5) == []
+
+
+class FakeEmbeddingTable:
+    """支援 count / not_.is_ / gt / order / limit 的 tags_final 查詢（記錄分頁參數）"""
+
+    def __init__(self, rows, log):
+        self.rows = rows
+        self.log = log
+        self.count = None
+        self.bound = None
+        self.size = None
+        self.not_ = self
+
+    def select(self, columns, count=None):
+        self.count = count
+        return self
+
+    def is_(self, column, value):
+        return self
+
+    def gt(self, column, value):
+        self.bound = value
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, size):
+        self.size = size
+        return self
+
+    def range(self, start, end):
+        raise AssertionError("offset pagination is not used")
+
+    def execute(self):
+        rows = sorted((r for r in self.rows if r["embedding"] is not None), key=lambda r: r["name"])
+        total = len(rows)
+        rows = [r for r in rows if self.bound is None or r["name"] > self.bound][: self.size]
+        if self.count is None:
+            self.log.append(self.bound)
+        data = [dict(r) for r in rows]
+        return type("Result", (), {"data": data, "count": total if self.count else None})()
+
+
+class TestExportFromDatabase:
+    """export_embeddings_from_database"""
+
+    def test_keyset_pages_into_float32_matrix(self, tmp_path):
+        rng = np.random.default_rng(3)
+        vectors = rng.normal(size=(25, DIM))
+        rows = [
+            {"name": f"tag_{i:02d}", "post_count": i, "main_category": None, "sub_category": None,
+             # PostgREST 以字串返回 vector 欄位
+             "embedding": json.dumps(v.tolist()) if i % 2 else v.tolist()}
+            for i, v in enumerate(vectors)
+        ]
+        rows.append({"name": "no_embedding", "post_count": 0, "main_category": None, "sub_category": None,
+                     "embedding": None})
+        log = []
+
+        class Client:
+            def table(self, name):
+                return FakeEmbeddingTable(rows, log)
+
+        base_path = str(tmp_path / "tags")
+        summary = export_embeddings_from_database(Client(), base_path, page_size=10)
+
+        assert summary["count"] == 25
+        assert log == [None, "tag_09", "tag_19"]
+        assert not os.path.exists(f"{base_path}.export.tmp.npy")
+
+        index = EmbeddingIndex.load(base_path)
+        hits = index.search(vectors[7], top_k=1, nprobe=summary["n_lists"])
+        assert index.names[hits[0][0]] == "tag_07" and hits[0][1] == pytest.approx(1.0, abs=1e-5)
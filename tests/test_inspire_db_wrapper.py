@@ -3,6 +3,7 @@
 驗證所有契約方法是否正常工作
 """
 
+import asyncio
 import sys
 import os
 
@@ -33,11 +34,11 @@ def test_session_operations():
     try:
         # 1. 創建 Session
         print("\n[1] Creating session...")
-        result = wrapper.create_session(
+        result = asyncio.run(wrapper.create_session(
             session_id=test_session_id,
             user_id="test_user_123",
             user_access_level="all-ages"
-        )
+        ))
         
         if "error" in result:
             print(f"[FAIL] Failed to create session: {result['error']}")
@@ -47,7 +48,7 @@ def test_session_operations():
         
         # 2. 獲取 Session
         print("\n[2] Getting session...")
-        session = wrapper.get_session(test_session_id)
+        session = asyncio.run(wrapper.get_session(test_session_id))
         
         if not session:
             print("[FAIL] Session not found")
@@ -57,7 +58,7 @@ def test_session_operations():
         
         # 3. 更新狀態
         print("\n[3] Updating phase...")
-        success = wrapper.update_session_phase(test_session_id, "exploring")
+        success = asyncio.run(wrapper.update_session_phase(test_session_id, "exploring"))
         
         if not success:
             print("[FAIL] Failed to update phase")
@@ -67,7 +68,7 @@ def test_session_operations():
         
         # 4. 更新成本
         print("\n[4] Updating cost...")
-        cost_result = wrapper.update_session_cost(test_session_id, 0.005, 1000)
+        cost_result = asyncio.run(wrapper.update_session_cost(test_session_id, 0.005, 1000))
         
         if not cost_result["success"]:
             print("[FAIL] Failed to update cost")
@@ -77,11 +78,11 @@ def test_session_operations():
         
         # 5. 完成 Session
         print("\n[5] Completing session...")
-        success = wrapper.complete_session(
+        success = asyncio.run(wrapper.complete_session(
             test_session_id,
             quality_score=85,
             final_output={"test": "data"}
-        )
+        ))
         
         if not success:
             print("[FAIL] Failed to complete session")
@@ -110,12 +111,12 @@ def test_tag_search():
     try:
         # 搜尋標籤
         print("\n[1] Searching tags with keywords: ['moonlight', 'night']")
-        results = wrapper.search_tags_by_keywords(
+        results = asyncio.run(wrapper.search_tags_by_keywords(
             keywords=["moonlight", "night"],
             user_access="all-ages",
             min_popularity=5000,
             max_results=5
-        )
+        ))
         
         if not results:
             print("[WARN] No results found (might be expected)")
@@ -148,10 +149,10 @@ def test_tag_validation():
         test_tags = ["1girl", "solo", "invalid_tag_xyz", "smile"]
         
         print(f"\n[1] Validating tags: {test_tags}")
-        valid, invalid = wrapper.validate_tags_exist(
+        valid, invalid = asyncio.run(wrapper.validate_tags_exist(
             tags=test_tags,
             user_access="all-ages"
-        )
+        ))
         
         print(f"\n[PASS] Validation complete:")
         print(f"  Valid: {valid}")
@@ -181,11 +182,11 @@ def test_popular_tags():
     
     try:
         print("\n[1] Getting popular tags...")
-        popular = wrapper.get_popular_tags(
+        popular = asyncio.run(wrapper.get_popular_tags(
             user_access="all-ages",
             min_popularity=50000,
             max_results=10
-        )
+        ))
         
         if not popular:
             print("[WARN] No popular tags found")
@@ -0,0 +1,91 @@
+"""
+Inspire 事件串流測試
+
+測試 InspireEventStream / emit_event：
+1. 非串流請求時 emit_event 不做任何事
+2. 綁定串流後，子任務（並行工具）推送的事件依序送出
+3. 狀態機轉換推送 phase 事件
+4. 閒置時送出心跳
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+from src.api.services.inspire_events import InspireEventStream, emit_event, format_sse, has_event_stream
+from src.api.services.inspire_state_machine import InspireStateMachine, InspirePhase
+
+
+def parse_sse(messages):
+    events = []
+    for message in messages:
+        if message.startswith(":"):
+            events.append(("heartbeat", None))
+            continue
+        event_line, data_line = message.strip().split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+async def collect(stream, heartbeat=15.0):
+    return [message async for message in stream.events(heartbeat)]
+
+
+class TestInspireEventStream:
+    """事件串流單元測試"""
+
+    def test_emit_without_stream_is_noop(self):
+        assert not has_event_stream()
+        emit_event("phase", {"to": "exploring"})
+
+    def test_events_from_child_tasks_in_order(self):
+        stream = InspireEventStream()
+
+        async def tool(name):
+            emit_event("tool_start", {"tool": name})
+            await asyncio.sleep(0)
+            emit_event("tool_end", {"tool": name})
+
+        async def run():
+            stream.bind()
+            await asyncio.gather(tool("a"), tool("b"))
+            emit_event("final", {"ok": True})
+            stream.close()
+
+        async def scenario():
+            task = asyncio.ensure_future(run())
+            messages = await collect(stream)
+            await task
+            return messages
+
+        events = parse_sse(asyncio.run(scenario()))
+        assert [e for e, _ in events] == ["tool_start", "tool_start", "tool_end", "tool_end", "final"]
+        assert not has_event_stream()  # 綁定只影響執行對話的任務
+
+    def test_state_machine_transition_emits_phase(self):
+        stream = InspireEventStream()
+        db = MagicMock()
+        db.update_session_phase = AsyncMock(return_value=True)
+
+        async def scenario():
+            stream.bind()
+            machine = InspireStateMachine("s1", db)
+            await machine.transition(InspirePhase.EXPLORING, "directions ready")
+            stream.close()
+            return await collect(stream)
+
+        events = parse_sse(asyncio.run(scenario()))
+        assert events == [("phase", {"from": "understanding", "to": "exploring", "reason": "directions ready"})]
+
+    def test_heartbeat_when_idle(self):
+        stream = InspireEventStream()
+
+        async def scenario():
+            asyncio.get_running_loop().call_later(0.05, stream.close)
+            return await collect(stream, heartbeat=0.02)
+
+        messages = asyncio.run(scenario())
+        assert messages and all(m == ": keep-alive\n\n" for m in messages)
+
+    def test_format_sse(self):
+        assert format_sse("text", {"delta": "櫻花"}) == 'event: text\ndata: {"delta": "櫻花"}\n\n'
@@ -0,0 +1,124 @@
+"""
+Responses API 輪詢退避測試
+
+測試 _wait_for_response_text：
+1. 已有文字時立即返回，不再等待
+2. failed / cancelled 等終止狀態提前結束
+3. 退避間隔倍增並受上限限制
+4. 共用期限用盡時返回最後的回應
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("agents")
+
+from src.api.routers import inspire_agent
+
+
+class FakeResponses:
+    """依序回傳預設回應的 client.responses.retrieve"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    async def retrieve(self, response_id):
+        self.calls.append(response_id)
+        if len(self.responses) > 1:
+            return self.responses.pop(0)
+        return self.responses[0]
+
+
+def response(status="in_progress", text=""):
+    return SimpleNamespace(status=status, text=text)
+
+
+def extract_text(resp):
+    return resp.text
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """記錄等待間隔（不實際等待）"""
+    recorded = []
+    original_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        recorded.append(round(delay, 6))
+        await original_sleep(0)
+
+    monkeypatch.setattr(inspire_agent.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(inspire_agent.settings, "inspire_poll_initial_delay_seconds", 0.1)
+    monkeypatch.setattr(inspire_agent.settings, "inspire_poll_max_delay_seconds", 0.5)
+    return recorded
+
+
+async def wait(responses, deadline_offset=60.0):
+    all_responses = []
+    deadline = asyncio.get_running_loop().time() + deadline_offset
+    result = await inspire_agent._wait_for_response_text(
+        responses.retrieve, "resp_1", extract_text, deadline, all_responses
+    )
+    return result, all_responses
+
+
+class TestWaitForResponseText:
+    """_wait_for_response_text 單元測試"""
+
+    def test_returns_immediately_when_text_present(self, sleeps):
+        fake = FakeResponses([response("completed", "一張貓咪的插畫")])
+        (resp, has_text), all_responses = asyncio.run(wait(fake))
+
+        assert has_text is True and resp.text == "一張貓咪的插畫"
+        assert fake.calls == ["resp_1"] and len(all_responses) == 1
+        assert sleeps == []
+
+    def test_whitespace_text_keeps_polling(self, sleeps):
+        fake = FakeResponses([response(text="  \n"), response("completed", "ok")])
+        (_, has_text), _ = asyncio.run(wait(fake))
+
+        assert has_text is True and len(fake.calls) == 2
+        assert sleeps == [0.1]
+
+    @pytest.mark.parametrize("status", ["failed", "cancelled", "incomplete"])
+    def test_terminal_status_stops_polling(self, sleeps, status):
+        fake = FakeResponses([response(), response(status)])
+        (resp, has_text), all_responses = asyncio.run(wait(fake))
+
+        assert has_text is False and resp.status == status
+        assert len(fake.calls) == 2 and len(all_responses) == 2
+        assert sleeps == [0.1]
+
+    def test_backoff_doubles_up_to_cap(self, sleeps):
+        fake = FakeResponses([response()] * 6 + [response("completed", "done")])
+        (_, has_text), all_responses = asyncio.run(wait(fake))
+
+        assert has_text is True and len(all_responses) == 7
+        assert sleeps == [0.1, 0.2, 0.4, 0.5, 0.5, 0.5]
+
+    def test_deadline_already_passed(self, sleeps):
+        fake = FakeResponses([response()])
+        (resp, has_text), _ = asyncio.run(wait(fake, deadline_offset=-1))
+
+        assert has_text is False and resp.status == "in_progress"
+        assert fake.calls == ["resp_1"] and sleeps == []
+
+    def test_sleep_truncated_to_shared_deadline(self, monkeypatch):
+        # 實際等待：最後一次等待不超過剩餘時間
+        monkeypatch.setattr(inspire_agent.settings, "inspire_poll_initial_delay_seconds", 0.02)
+        monkeypatch.setattr(inspire_agent.settings, "inspire_poll_max_delay_seconds", 1.0)
+        fake = FakeResponses([response()])
+
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            result = await wait(fake, deadline_offset=0.1)
+            return result, loop.time() - start
+
+        ((_, has_text), _), elapsed = asyncio.run(scenario())
+        assert has_text is False
+        assert 0.1 <= elapsed < 0.3
+        assert 3 <= len(fake.calls) <= 5  # 0.02 + 0.04 + 剩餘時間
@@ -14,7 +14,7 @@ Date: 2025-01-27
 
 import pytest
 import time
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from src.api.services.inspire_state_machine import (
     InspireStateMachine,
     InspirePhase,
@@ -170,14 +170,14 @@ class TestInspireStateMachine:
     async def test_transition(self):
         """測試狀態轉換"""
         mock_db = MagicMock()
-        mock_db.update_session_phase = MagicMock()
+        mock_db.update_session_phase = AsyncMock()
         
         state_machine = InspireStateMachine("test-123", mock_db)
         
         await state_machine.transition(InspirePhase.EXPLORING, "清晰度足夠")
         
         assert state_machine.phase == InspirePhase.EXPLORING
-        mock_db.update_session_phase.assert_called_once()
+        mock_db.update_session_phase.assert_awaited_once()
 
     def test_update_best_result(self):
         """測試更新最佳結果"""
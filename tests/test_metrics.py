@@ -0,0 +1,125 @@
+"""
+階段耗時指標測試
+
+測試 metrics 模組：
+1. 直方圖分桶與 p50/p95/p99
+2. span / timed 記錄同步與 async 區塊，並收集到目前請求的 Server-Timing
+3. Prometheus 文字格式與 /metrics 端點
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from src.api.services.metrics import (
+    MetricsRegistry,
+    StageHistogram,
+    format_server_timing,
+    get_metrics_registry,
+    span,
+    start_request_timing,
+    timed,
+)
+
+
+class TestStageHistogram:
+    """StageHistogram / MetricsRegistry 單元測試"""
+
+    def test_percentiles(self):
+        histogram = StageHistogram(reservoir_size=1000)
+        for ms in range(1, 101):
+            histogram.observe(ms / 1000)
+
+        summary = histogram.summary()
+        assert summary["count"] == 100
+        assert summary["p50_ms"] == 50.0
+        assert summary["p95_ms"] == 95.0
+        assert summary["p99_ms"] == 99.0
+        assert summary["max_ms"] == 100.0
+
+    def test_reservoir_keeps_recent_samples(self):
+        histogram = StageHistogram(reservoir_size=10)
+        for _ in range(100):
+            histogram.observe(1.0)
+        for _ in range(10):
+            histogram.observe(0.001)
+
+        assert histogram.count == 110
+        assert histogram.percentile(99) == 0.001
+
+    def test_prometheus_format(self):
+        registry = MetricsRegistry(buckets=(0.01, 0.1))
+        registry.observe("recommend.stage1", 0.005)
+        registry.observe("recommend.stage1", 0.05)
+        registry.observe('odd"stage', 1.0)
+
+        text = registry.render_prometheus()
+        assert "# TYPE prompt_scribe_stage_duration_seconds histogram" in text
+        assert 'prompt_scribe_stage_duration_seconds_bucket{stage="recommend.stage1",le="0.01"} 1' in text
+        assert 'prompt_scribe_stage_duration_seconds_bucket{stage="recommend.stage1",le="0.1"} 2' in text
+        assert 'prompt_scribe_stage_duration_seconds_bucket{stage="recommend.stage1",le="+Inf"} 2' in text
+        assert 'prompt_scribe_stage_duration_seconds_count{stage="recommend.stage1"} 2' in text
+        assert 'prompt_scribe_stage_duration_seconds_recent{stage="recommend.stage1",quantile="0.5"} 0.005000' in text
+        assert 'stage="odd\\"stage"' in text
+
+
+class TestSpans:
+    """span / timed 與 Server-Timing"""
+
+    def test_span_and_timed_record_into_request(self):
+        registry = get_metrics_registry()
+        registry.reset()
+
+        @timed("test.async_stage")
+        async def async_stage():
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        @timed("test.sync_stage")
+        def sync_stage():
+            return 1
+
+        async def scenario():
+            timings = start_request_timing()
+            with span("test.block"):
+                sync_stage()
+            async with span("test.block"):
+                # 子任務複製 Context，共用同一個請求列表
+                assert await asyncio.create_task(async_stage()) == "ok"
+            return timings
+
+        timings = asyncio.run(scenario())
+        assert [stage for stage, _ in timings] == ["test.sync_stage", "test.block", "test.async_stage", "test.block"]
+        assert registry.get("test.block").count == 2
+        assert registry.get("test.async_stage").summary()["p50_ms"] >= 10
+
+        header = format_server_timing(timings, total_seconds=0.5)
+        assert header.startswith("test.sync_stage;dur=")
+        assert header.count("test.block;dur=") == 1  # 同名 span 合併
+        assert header.endswith("total;dur=500.0")
+
+    def test_span_records_on_error(self):
+        registry = get_metrics_registry()
+        registry.reset()
+        with pytest.raises(ValueError):
+            with span("test.failing"):
+                raise ValueError("boom")
+        assert registry.get("test.failing").count == 1
+
+    def test_server_timing_token(self):
+        assert format_server_timing([("http GET /api/v1/tags", 0.001)]) == "http_GET__api_v1_tags;dur=1.0"
+
+
+class TestMetricsEndpoint:
+    """/metrics 端點"""
+
+    def test_metrics_endpoint(self):
+        from src.api.main import app
+
+        with TestClient(app) as client:
+            client.get("/metrics/stages")
+            response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'stage="http GET /metrics/stages"' in response.text
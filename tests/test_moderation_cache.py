@@ -0,0 +1,91 @@
+"""
+Moderation 判定快取測試
+
+測試 ModerationCache 與 ContentSafetyFilter 的整合：
+1. 相同（正規化後）輸入只呼叫一次 Moderation API
+2. 並發的相同輸入合併為一次呼叫
+3. API 失敗不寫入快取；TTL 到期與 LRU 淘汰
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from openai import AsyncOpenAI
+from src.api.services.content_safety_filter import ContentSafetyFilter
+from src.api.services.moderation_cache import ModerationCache, make_moderation_key
+
+
+def make_client(flagged=False, delay=0.0, error=None):
+    result = MagicMock()
+    result.flagged = flagged
+    result.categories.model_dump.return_value = {"sexual": flagged, "violence": False}
+    response = MagicMock()
+    response.results = [result]
+
+    async def create(input):
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return response
+
+    client = MagicMock(spec=AsyncOpenAI)
+    client.moderations.create = AsyncMock(side_effect=create)
+    return client
+
+
+class TestModerationCache:
+    """ModerationCache 單元測試"""
+
+    def test_key_normalizes_whitespace_only(self):
+        assert make_moderation_key("櫻花  少女\n") == make_moderation_key("櫻花 少女")
+        assert make_moderation_key("Cat") != make_moderation_key("cat")
+
+    async def test_ttl_and_lru_eviction(self):
+        cache = ModerationCache(max_entries=2, ttl_seconds=60)
+
+        await cache.set("a", (True, ""))
+        await cache.set("b", (False, "flagged"))
+        assert await cache.get("a") == (True, "")  # a 變為最近使用
+        await cache.set("c", (True, ""))
+        assert await cache.get("a") == (True, "")
+        assert await cache.get("b") is None
+        assert await cache.get("c") == (True, "")
+
+        expired = ModerationCache(ttl_seconds=0)
+        await expired.set("a", (True, ""))
+        assert await expired.get("a") is None
+
+
+class TestSafetyFilterWithCache:
+    """ContentSafetyFilter.check_user_input 使用判定快取"""
+
+    async def test_repeated_input_hits_cache(self):
+        client = make_client(flagged=True)
+        cache = ModerationCache()
+        first = ContentSafetyFilter(openai_client=client, verdict_cache=cache)
+        second = ContentSafetyFilter(openai_client=client, verdict_cache=cache)  # 每個請求一個實例
+
+        verdict = await first.check_user_input("不當內容")
+        cached = await second.check_user_input("不當內容 ")
+        assert verdict == cached
+        assert verdict[0] is False and "Sexual" in verdict[1]
+        assert client.moderations.create.await_count == 1
+        assert cache.get_stats()["memory_hits"] == 1
+
+    async def test_concurrent_inputs_coalesced(self):
+        client = make_client(delay=0.02)
+        cache = ModerationCache()
+        safety_filter = ContentSafetyFilter(openai_client=client, verdict_cache=cache)
+
+        assert await asyncio.gather(*[safety_filter.check_user_input("櫻花") for _ in range(5)]) == [(True, "")] * 5
+        assert client.moderations.create.await_count == 1
+
+    async def test_errors_are_not_cached(self):
+        cache = ModerationCache()
+        failing = ContentSafetyFilter(openai_client=make_client(error=RuntimeError("down")), verdict_cache=cache)
+        assert await failing.check_user_input("櫻花") == (True, "")
+
+        client = make_client(flagged=True)
+        working = ContentSafetyFilter(openai_client=client, verdict_cache=cache)
+        assert (await working.check_user_input("櫻花"))[0] is False
+        assert client.moderations.create.await_count == 1
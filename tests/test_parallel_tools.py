@@ -0,0 +1,51 @@
+"""
+同輪工具並行執行測試
+
+測試 execute_tools_concurrently：
+1. 同輪工具並行執行，結果依輸入順序返回
+2. 超過本輪期限的工具被取消並返回逾時錯誤
+"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("agents")
+
+from src.api.tools import inspire_tools
+
+
+@pytest.fixture
+def fake_tools(monkeypatch):
+    """以延遲模擬資料庫查詢的假工具"""
+    async def fake_execute(tool_name, tool_args):
+        await asyncio.sleep(tool_args["delay"])
+        return {"tool": tool_name}
+
+    monkeypatch.setattr(inspire_tools, "execute_tool_by_name", fake_execute)
+
+
+class TestExecuteToolsConcurrently:
+    """execute_tools_concurrently 單元測試"""
+
+    def test_runs_concurrently_in_order(self, fake_tools):
+        calls = [("search_examples", {"delay": 0.1}), ("validate_quality", {"delay": 0.05}), ("understand_intent", {"delay": 0})]
+
+        start = time.perf_counter()
+        results = asyncio.run(inspire_tools.execute_tools_concurrently(calls, timeout=5))
+        elapsed = time.perf_counter() - start
+
+        assert [r["tool"] for r in results] == ["search_examples", "validate_quality", "understand_intent"]
+        assert elapsed < 0.2
+
+    def test_turn_deadline(self, fake_tools):
+        calls = [("search_examples", {"delay": 5}), ("understand_intent", {"delay": 0})]
+
+        results = asyncio.run(inspire_tools.execute_tools_concurrently(calls, timeout=0.05))
+
+        assert results[0]["status"] == "timeout"
+        assert results[1] == {"tool": "understand_intent"}
+
+    def test_empty_turn(self):
+        assert asyncio.run(inspire_tools.execute_tools_concurrently([])) == []
@@ -0,0 +1,75 @@
+"""
+批次相關性評分測試
+
+驗證 BatchRelevanceScorer 與逐一計算的 calculate_final_score 結果完全一致
+"""
+
+import random
+
+import pytest
+from src.api.services.keyword_analyzer import KeywordAnalyzer
+from src.api.services.relevance_scorer import (
+    BatchRelevanceScorer,
+    calculate_final_score,
+    rank_tags_by_relevance,
+)
+
+
+WORDS = ["school", "uniform", "girl", "cute", "long", "hair", "blue", "sky", "1girl", "cat", "in"]
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return KeywordAnalyzer({
+        "word_categories": {"nouns": ["girl", "cat", "hair", "sky"], "adjectives": ["cute", "blue", "long"]},
+        "word_type_weights": {"nouns": 1.0, "adjectives": 0.8, "unknown": 0.7},
+    })
+
+
+def reference_rank(tags, keywords, analyzer, relevance_weight):
+    """逐一計算的舊版排序（基準）"""
+    scored = []
+    for tag in tags:
+        scores = calculate_final_score(
+            tag["name"], keywords, tag["post_count"], analyzer,
+            relevance_weight=relevance_weight,
+            popularity_weight=1.0 - relevance_weight,
+        )
+        scored.append({
+            **tag,
+            "relevance_score": scores["relevance"],
+            "popularity_score": scores["popularity"],
+            "final_score": scores["final"],
+        })
+    scored.sort(key=lambda x: x["final_score"], reverse=True)
+    return scored
+
+
+class TestBatchRelevanceScorer:
+    """BatchRelevanceScorer 單元測試"""
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_identical_to_reference(self, analyzer, seed):
+        rng = random.Random(seed)
+        keywords = rng.sample(WORDS, rng.randint(1, 4))
+        tags = [
+            {
+                "name": "_".join(rng.sample(WORDS, rng.randint(1, 3))),
+                "post_count": rng.choice([0, 1, 999, rng.randint(0, 10 ** 8)]),
+            }
+            for _ in range(200)
+        ]
+        weight = rng.choice([0.7, 0.5])
+
+        assert rank_tags_by_relevance(tags, keywords, analyzer, weight) == \
+            reference_rank(tags, keywords, analyzer, weight)
+
+    def test_empty_inputs(self, analyzer):
+        assert rank_tags_by_relevance([], ["girl"], analyzer) == []
+
+        ranked = rank_tags_by_relevance([{"name": "1girl", "post_count": 10}], [], analyzer)
+        assert ranked[0]["relevance_score"] == 0.0
+
+    def test_scores_are_python_floats(self, analyzer):
+        ranked = BatchRelevanceScorer(["girl"], analyzer).rank([{"name": "1girl", "post_count": 100}])
+        assert type(ranked[0]["final_score"]) is float
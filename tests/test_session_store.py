@@ -0,0 +1,213 @@
+"""
+Session 寫後快取測試
+
+以記憶體中的假資料庫模擬 apply_inspire_session_delta RPC，驗證：
+1. 一輪中的多個變更合併為一次寫入，計數欄位以增量累加
+2. 未寫入前讀取會疊加待寫變更
+3. 寫入失敗保留變更並與之後的變更合併；未套用 migration 時退回直接寫表
+4. InspireDBWrapper 的 Session 方法改寫入寫後快取
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from src.api.services.inspire_db_wrapper import InspireDBWrapper
+from src.api.services.session_store import SessionWriteBehindStore
+
+
+class FakeQuery:
+    def __init__(self, table, op, payload=None):
+        self.table, self.op, self.payload, self.filters = table, op, payload, {}
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+
+class FakeTable:
+    def __init__(self, name):
+        self.name = name
+
+    def select(self, columns):
+        return FakeQuery(self.name, "select")
+
+    def update(self, payload):
+        return FakeQuery(self.name, "update", payload)
+
+    def upsert(self, payload, ignore_duplicates=False):
+        return FakeQuery(self.name, "upsert", payload)
+
+
+class FakeAsyncDB:
+    """inspire_sessions 的記憶體模擬（RPC 語義同 scripts/15_session_write_behind.sql）"""
+
+    def __init__(self, rpc_available=True, fail=0):
+        self.rows = {}
+        self.calls = []
+        self.rpc_available = rpc_available
+        self.fail = fail
+
+    def table(self, name):
+        return FakeTable(name)
+
+    def rpc(self, func, params):
+        return SimpleNamespace(op="rpc", func=func, params=params)
+
+    async def execute(self, query):
+        await asyncio.sleep(0)
+        self.calls.append(query.op)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("connection reset")
+        if query.op == "rpc":
+            if not self.rpc_available:
+                raise RuntimeError("PGRST202 Could not find the function public.apply_inspire_session_delta")
+            return SimpleNamespace(data=self._apply(**query.params))
+        session_id = query.filters.get("session_id") or query.payload.get("session_id")
+        if query.op == "upsert":
+            self.rows.setdefault(session_id, self._new_row(session_id))
+            return SimpleNamespace(data=[])
+        row = self.rows.get(session_id)
+        if row is None:
+            return SimpleNamespace(data=[])
+        if query.op == "update":
+            row.update(query.payload)
+        return SimpleNamespace(data=[dict(row)])
+
+    @staticmethod
+    def _new_row(session_id):
+        return {"session_id": session_id, "current_phase": "understanding", "total_cost": 0.0,
+                "total_tokens": 0, "total_tool_calls": 0, "tool_call_count": {}}
+
+    def _apply(self, p_session_id, p_fields, p_cost_delta, p_tokens_delta, p_tool_calls, p_create):
+        if p_create:
+            self.rows.setdefault(p_session_id, self._new_row(p_session_id))
+        row = self.rows.get(p_session_id)
+        if row is None:
+            return []
+        row.update({k: v for k, v in p_fields.items() if k != "total_tool_calls"})
+        row["total_cost"] += p_cost_delta
+        row["total_tokens"] += p_tokens_delta
+        row["total_tool_calls"] = p_fields.get("total_tool_calls", row["total_tool_calls"]) + sum(p_tool_calls.values())
+        for name, count in p_tool_calls.items():
+            row["tool_call_count"][name] = row["tool_call_count"].get(name, 0) + count
+        return [dict(row)]
+
+
+class TestSessionWriteBehindStore:
+    """SessionWriteBehindStore 單元測試"""
+
+    async def test_turn_coalesced_into_one_write(self):
+        adb = FakeAsyncDB()
+        store = SessionWriteBehindStore(adb)
+
+        store.create("s1", user_access_level="r15", current_phase="understanding")
+        store.set_fields("s1", last_user_message="櫻花", updated_at="ignored")
+        store.set_fields("s1", current_phase="exploring")
+        store.add_cost("s1", 0.001, 100)
+        store.add_cost("s1", 0.002, 50)
+        store.add_tool_call("s1", "search_examples")
+        store.add_tool_call("s1", "search_examples")
+        store.add_tool_call("s1", "generate_ideas")
+
+        row = await store.flush("s1")
+        assert adb.calls == ["rpc"]
+        assert row["current_phase"] == "exploring"
+        assert row["user_access_level"] == "r15"
+        assert "updated_at" not in row
+        assert row["total_cost"] == pytest.approx(0.003)
+        assert row["total_tokens"] == 150
+        assert row["tool_call_count"] == {"search_examples": 2, "generate_ideas": 1}
+        assert row["total_tool_calls"] == 3
+        assert await store.flush("s1") is None  # 沒有待寫變更
+        assert store.get_stats()["pending_sessions"] == 0
+
+    def test_overlay_reads_pending_changes(self):
+        store = SessionWriteBehindStore(FakeAsyncDB())
+        db_row = {"session_id": "s1", "current_phase": "understanding", "total_cost": 0.01,
+                  "total_tokens": 10, "total_tool_calls": 1, "tool_call_count": {"a": 1}}
+
+        assert store.overlay("s1", db_row) is db_row
+        assert store.overlay("s2", None) is None
+
+        store.set_fields("s1", current_phase="refining")
+        store.add_cost("s1", 0.005, 5)
+        store.add_tool_call("s1", "a")
+        merged = store.overlay("s1", db_row)
+        assert merged["current_phase"] == "refining"
+        assert merged["total_cost"] == pytest.approx(0.015)
+        assert merged["tool_call_count"] == {"a": 2}
+        assert merged["total_tool_calls"] == 2
+        assert db_row["tool_call_count"] == {"a": 1}
+
+        with pytest.raises(ValueError):
+            store.set_fields("s1", total_cost=1.0)
+
+    async def test_failed_flush_keeps_changes(self):
+        adb = FakeAsyncDB(fail=1)
+        store = SessionWriteBehindStore(adb)
+        store.create("s1", current_phase="understanding")
+        store.add_cost("s1", 0.001, 10)
+
+        with pytest.raises(RuntimeError):
+            await store.flush("s1")
+        store.set_fields("s1", current_phase="exploring")
+        store.add_cost("s1", 0.002, 20)
+
+        assert await store.flush_all() == 1
+        row = adb.rows["s1"]
+        assert row["current_phase"] == "exploring"
+        assert row["total_tokens"] == 30
+        assert store.get_stats()["failed_flushes"] == 1
+
+    async def test_concurrent_turns_do_not_lose_increments(self):
+        adb = FakeAsyncDB()
+        store = SessionWriteBehindStore(adb)
+        store.create("s1")
+        await store.flush("s1")
+
+        async def turn(i):
+            store.add_cost("s1", 0.001, 1)
+            store.add_tool_call("s1", "search_examples")
+            await asyncio.sleep(0)
+            await store.flush("s1")
+
+        await asyncio.gather(*[turn(i) for i in range(10)])
+        assert adb.rows["s1"]["total_tokens"] == 10
+        assert adb.rows["s1"]["tool_call_count"] == {"search_examples": 10}
+
+    async def test_falls_back_without_rpc(self):
+        adb = FakeAsyncDB(rpc_available=False)
+        store = SessionWriteBehindStore(adb)
+        store.create("s1", current_phase="understanding")
+        store.add_cost("s1", 0.004, 40)
+        store.add_tool_call("s1", "validate_quality")
+
+        row = await store.flush("s1")
+        assert adb.calls == ["rpc", "upsert", "select", "update"]
+        assert row["total_tokens"] == 40
+        assert row["tool_call_count"] == {"validate_quality": 1}
+        assert store.get_stats()["rpc_available"] is False
+
+
+class TestDBWrapperWriteBehind:
+    """InspireDBWrapper 的 Session 方法只在 flush_session 時寫入"""
+
+    async def test_turn_uses_single_write(self):
+        adb = FakeAsyncDB()
+        db = InspireDBWrapper.__new__(InspireDBWrapper)
+        db.adb = adb
+        db.session_store = SessionWriteBehindStore(adb)
+
+        await db.create_session("s1", user_access_level="r15")
+        await db.update_session_data("s1", last_user_message="櫻花", total_tool_calls=2)
+        await db.update_session_phase("s1", "exploring")
+        await db.increment_tool_call("s1", "search_examples")
+        cost = await db.update_session_cost("s1", 0.02, 200)
+        session = await db.flush_session("s1")
+        assert cost["over_limit"] is True
+        assert adb.calls == ["select", "rpc"]  # 成本上限檢查讀一次，整輪寫一次
+        assert session["current_phase"] == "exploring"
+        assert session["total_tool_calls"] == 3
+        assert session["total_tokens"] == 200
@@ -0,0 +1,118 @@
+"""
+快取未命中合併測試
+
+測試 SingleFlight / cached_call / cache_with_ttl：
+1. 同鍵並發未命中只執行一次計算，不同鍵互不影響
+2. 計算失敗時所有等待者都收到例外，之後可重試
+3. stale-while-revalidate：過期值立即返回，背景只刷新一次
+"""
+
+import asyncio
+
+from src.api.services.cache_manager import cache_with_ttl
+from src.api.services.single_flight import MISSING, SingleFlight, cached_call
+
+
+class TestSingleFlight:
+    """SingleFlight 單元測試"""
+
+    async def test_concurrent_calls_coalesced(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def compute(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key.upper()
+
+        results = await asyncio.gather(
+            *[flight.do("a", lambda: compute("a")) for _ in range(10)],
+            flight.do("b", lambda: compute("b")),
+        )
+        assert results == ["A"] * 10 + ["B"]
+        assert calls == ["a", "b"]
+        assert flight.stats["coalesced"] == 9
+        assert flight.in_flight() == 0
+
+    async def test_errors_propagate_and_allow_retry(self):
+        flight = SingleFlight()
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            await asyncio.sleep(0.01)
+            if attempts == 1:
+                raise RuntimeError("boom")
+            return "ok"
+
+        results = await asyncio.gather(
+            *[flight.do("k", flaky) for _ in range(3)], return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert await flight.do("k", flaky) == "ok"
+        assert attempts == 2
+
+    async def test_cancelled_waiter_does_not_cancel_computation(self):
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return 42
+
+        first = asyncio.ensure_future(flight.do("k", slow))
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == 42
+
+
+class TestStaleWhileRevalidate:
+    """cached_call 的 stale-while-revalidate"""
+
+    async def test_stale_value_served_and_refreshed_once(self):
+        store = {}
+        flight = SingleFlight()
+        version = 0
+
+        async def compute():
+            nonlocal version
+            version += 1
+            await asyncio.sleep(0.01)
+            return version
+
+        async def load():
+            return store.get("k", MISSING)
+
+        async def save(value):
+            store["k"] = value
+
+        def call():
+            return cached_call("k", compute, load, save, flight, ttl=0.1, stale_ttl=60)
+
+        assert await call() == 1
+        await asyncio.sleep(0.12)  # 過期但仍在寬限期
+        stale = await asyncio.gather(*[call() for _ in range(5)])
+        await asyncio.sleep(0.03)  # 等待背景刷新完成（新值仍新鮮）
+        refreshed = await call()
+        assert stale == [1] * 5
+        assert refreshed == 2
+        assert flight.stats["background_refreshes"] == 1
+
+
+class TestCacheDecoratorCoalescing:
+    """cache_with_ttl 並發未命中"""
+
+    async def test_stampede_runs_function_once(self):
+        calls = 0
+
+        @cache_with_ttl(ttl_seconds=60)
+        async def popular(query):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return [query]
+
+        assert await asyncio.gather(*[popular("girl") for _ in range(20)]) == [["girl"]] * 20
+        assert calls == 1
+        assert popular.cache_info()["single_flight"]["coalesced"] == 19
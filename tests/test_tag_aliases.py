@@ -0,0 +1,82 @@
+"""
+標籤別名圖測試
+
+測試 AliasGraph：
+1. 傳遞閉包與反向索引
+2. 循環與衝突的處理
+3. 冗餘檢查（依標準標籤分組）
+4. 內建別名表合併與外部別名檔載入
+"""
+
+import json
+
+from src.api.inspire_config.database_mappings import TAG_ALIASES, resolve_alias
+from src.api.inspire_config.tag_aliases import AliasGraph, default_alias_pairs, load_alias_file
+from src.api.inspire_config.tag_mappings import TAG_ALIAS_MAP, resolve_tag_alias
+
+
+class TestAliasGraph:
+    """AliasGraph 單元測試"""
+
+    def test_transitive_closure(self):
+        graph = AliasGraph([("a", "b"), ("b", "c"), ("x", "a"), ("Long_Hair", "long_hair")])
+
+        assert graph.resolve("x") == "c"
+        assert graph.resolve("A") == "c"
+        assert graph.resolve("c") == "c"
+        assert graph.resolve("Unknown") == "Unknown"
+        assert graph.aliases_of("c") == {"a", "b", "x"}
+        assert len(graph) == 3  # 大小寫相同的自我別名被忽略
+
+    def test_cycles_and_conflicts(self):
+        graph = AliasGraph([("a", "b"), ("b", "c"), ("c", "a"), ("d", "e"), ("d", "f")])
+
+        assert graph.cycles == [["a", "b", "c"]]
+        assert {graph.resolve(t) for t in "abc"} == {"c"}
+        assert graph.resolve("d") == "e"
+        assert graph.conflicts == [("d", "e", "f")]
+
+    def test_find_redundancies(self):
+        graph = AliasGraph([("longhair", "long_hair"), ("long_hairs", "long_hair"), ("1g", "1girl")])
+
+        assert graph.find_redundancies(["longhair", "1girl", "long_hair", "smile"]) == [
+            ("longhair", "long_hair")
+        ]
+        # 標準標籤不在列表中時保留最先出現的別名
+        assert graph.find_redundancies(["long_hairs", "longhair", "1g"]) == [("longhair", "long_hairs")]
+        assert graph.find_redundancies([]) == []
+
+    def test_large_alias_table(self):
+        pairs = [(f"alias_{i}", f"tag_{i % 1000}") for i in range(50000)]
+        graph = AliasGraph(pairs)
+
+        assert graph.resolve("alias_12345") == "tag_345"
+        assert len(graph.aliases_of("tag_7")) == 50
+        assert graph.find_redundancies(["alias_1", "alias_1001", "tag_2"]) == [("alias_1001", "alias_1")]
+
+
+class TestAliasSources:
+    """內建別名表與外部別名檔"""
+
+    def test_builtin_tables_unified(self):
+        for alias, canonical in list(TAG_ALIASES.items()) + list(TAG_ALIAS_MAP.items()):
+            assert resolve_alias(alias) == canonical
+            assert resolve_tag_alias(alias) == canonical
+
+    def test_load_alias_files(self, tmp_path):
+        csv_path = tmp_path / "tag_aliases.csv"
+        csv_path.write_text(
+            "antecedent_name,consequent_name,status\n"
+            "scool_uniform,school_uniform,active\n"
+            "old_tag,new_tag,deleted\n",
+            encoding="utf-8",
+        )
+        json_path = tmp_path / "aliases.json"
+        json_path.write_text(json.dumps({"kitty": "cat"}), encoding="utf-8")
+
+        assert load_alias_file(str(csv_path)) == [("scool_uniform", "school_uniform")]
+        assert load_alias_file(str(json_path)) == [("kitty", "cat")]
+
+        graph = AliasGraph(default_alias_pairs(str(csv_path)))
+        assert graph.resolve("scool_uniform") == "school_uniform"
+        assert graph.resolve("1g") == "1girl"
@@ -0,0 +1,179 @@
+"""
+標籤目錄匯出測試
+
+測試 TagExport 與 export_tags：
+1. 全量匯出依名稱分批，最後一行 summary（count / watermark / complete）
+2. since 增量匯出依 (updated_at, name) 分批，同一時間戳跨批不遺漏
+3. Supabase 後端（經由 PostgREST stub）與本地 SQLite 後端結果一致
+4. columnar + gzip、內容等級過濾、中途失敗
+"""
+
+import asyncio
+import gzip
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+from benchmarks.fixtures import create_fixture_database
+from src.api.services.tag_export import TagExport, normalize_since
+from src.api.services.tag_storage import SQLiteTagBackend
+
+
+NAMES = ["a,b", ":)", '"quoted"', "(paren)", "nude", "large_breasts"] + [f"tag_{i:02d}" for i in range(19)]
+
+
+def timestamp(i):
+    # 每 3 個標籤共用同一個 updated_at
+    return f"2025-10-{1 + i // 3:02d}T12:00:00+00:00"
+
+
+def tag_rows():
+    return [
+        {
+            "id": f"tag-{i}",
+            "name": name,
+            "danbooru_cat": 0,
+            "post_count": 1000 + i,
+            "main_category": "SCENE" if i % 2 else "OBJECT",
+            "nsfw_level": "all-ages",
+            "updated_at": timestamp(i),
+        }
+        for i, name in enumerate(NAMES)
+    ]
+
+
+async def collect(export):
+    await export.start()
+    return b"".join([chunk async for chunk in export.stream()])
+
+
+def parse(body):
+    lines = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    return lines[:-1], lines[-1]["summary"]
+
+
+@pytest.fixture
+def sqlite_backend(make_sqlite_backend):
+    return make_sqlite_backend(tag_rows())
+
+
+@pytest.fixture
+def supabase_backend(make_supabase_backend, monkeypatch):
+    backend = make_supabase_backend(tag_rows())
+    monkeypatch.setattr(backend, "content_level_current", lambda: asyncio.sleep(0, result=False))
+    return backend
+
+
+@pytest.fixture(params=["sqlite", "supabase"])
+def either_backend(request, sqlite_backend, supabase_backend):
+    return sqlite_backend if request.param == "sqlite" else supabase_backend
+
+
+class TestTagExport:
+    """TagExport 串流內容"""
+
+    async def test_full_export(self, sqlite_backend):
+        rows, summary = parse(await collect(TagExport(sqlite_backend, batch_size=4)))
+        assert [r["name"] for r in rows] == sorted(NAMES)
+        assert summary["count"] == len(NAMES) and summary["complete"] is True
+        assert summary["max_updated_at"] == timestamp(len(NAMES) - 1)
+        # watermark 往前保留安全間隔（預設 300 秒）
+        assert summary["watermark"] == timestamp(len(NAMES) - 1).replace("T12:00:00", "T11:55:00")
+        assert "embedding" not in rows[0] and rows[0]["updated_at"]
+
+    async def test_incremental_export(self, either_backend):
+        backend = either_backend
+        since = normalize_since(datetime(2025, 10, 3, 12, 0))
+        export = TagExport(backend, batch_size=2, since=since, category="SCENE")
+        rows, summary = parse(await collect(export))
+
+        expected = sorted(
+            (r for r in tag_rows() if r["updated_at"] > since and r["main_category"] == "SCENE"),
+            key=lambda r: (r["updated_at"], r["name"]),
+        )
+        assert [r["name"] for r in rows] == [r["name"] for r in expected]
+        assert summary["max_updated_at"] == expected[-1]["updated_at"]
+        assert export.stats["batches"] == len(expected) // 2  # 最後一次查詢為空
+
+        # 以 watermark 再同步：只重疊安全間隔內的標籤，watermark 不後退
+        watermark = summary["watermark"]
+        rows, summary = parse(await collect(TagExport(backend, batch_size=2, since=watermark, category="SCENE")))
+        assert [r["name"] for r in rows] == [r["name"] for r in expected if r["updated_at"] == expected[-1]["updated_at"]]
+        assert summary["watermark"] == watermark
+
+        export = TagExport(backend, batch_size=2, since=since, category="SCENE", watermark_margin_seconds=0)
+        _, summary = parse(await collect(export))
+        assert summary["watermark"] == expected[-1]["updated_at"]
+
+    async def test_full_export_matches_between_backends(self, sqlite_backend, supabase_backend):
+        local, _ = parse(await collect(TagExport(sqlite_backend, batch_size=3, min_popularity=1005)))
+        remote, _ = parse(await collect(TagExport(supabase_backend, batch_size=3, min_popularity=1005)))
+        assert [r["name"] for r in local] == [r["name"] for r in remote]
+        assert len(local) == len(NAMES) - 5
+
+    async def test_supabase_without_content_level_columns(self, make_supabase_backend):
+        # 未套用 08 / 14 遷移：沒有 nsfw_level、content_level
+        conn = create_fixture_database(tag_rows())
+        for column in ("nsfw_level", "content_level", "content_rating_version"):
+            conn.execute(f"ALTER TABLE tags_final DROP COLUMN {column}")
+        backend = make_supabase_backend(conn)
+
+        rows, summary = parse(await collect(TagExport(backend, batch_size=10)))
+        assert summary["count"] == len(NAMES) and "content_level" not in rows[0]
+        with pytest.raises(ValueError):
+            await backend.export_tags(10, max_content_level=1)
+
+    async def test_columnar_gzip(self, sqlite_backend):
+        export = TagExport(sqlite_backend, batch_size=10, output_format="columnar", compression="gzip")
+        assert export.headers["Content-Encoding"] == "gzip"
+        batches, summary = parse(gzip.decompress(await collect(export)))
+
+        assert [b["rows"] for b in batches] == [10, 10, 5]
+        names = []
+        for batch in batches:
+            column = batch["columns"].index("name")
+            names.extend(batch["values"][column])
+        assert names == sorted(NAMES) and summary["count"] == len(NAMES)
+
+    async def test_content_level_filtered_by_rater(self, sqlite_backend):
+        # 本地檔案的 content_level 未計算，以分級規則過濾
+        rows, summary = parse(await collect(TagExport(sqlite_backend, batch_size=5, access_level="all-ages")))
+        assert {"nude", "large_breasts"} & {r["name"] for r in rows} == set()
+        assert summary["count"] == len(NAMES) - 2 and summary["scanned"] == len(NAMES)
+
+        rows, _ = parse(await collect(TagExport(sqlite_backend, batch_size=5, access_level="r15")))
+        assert "large_breasts" in {r["name"] for r in rows} and "nude" not in {r["name"] for r in rows}
+
+    async def test_failure_marks_summary_incomplete(self, sqlite_backend, monkeypatch):
+        export = TagExport(sqlite_backend, batch_size=5)
+        calls = {"count": 0}
+        original = sqlite_backend.export_tags
+
+        async def flaky(*args, **kwargs):
+            calls["count"] += 1
+            if calls["count"] == 3:
+                raise RuntimeError("connection reset")
+            return await original(*args, **kwargs)
+
+        monkeypatch.setattr(sqlite_backend, "export_tags", flaky)
+        rows, summary = parse(await collect(export))
+        assert len(rows) == 10
+        assert summary["complete"] is False and summary["error"] == "connection reset"
+
+    async def test_since_requires_updated_at(self, tmp_path):
+        path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE tags_final (name TEXT, post_count INTEGER, main_category TEXT)")
+        conn.execute("INSERT INTO tags_final VALUES ('cat', 10, 'OBJECT')")
+        conn.commit()
+        conn.close()
+        backend = SQLiteTagBackend(path)
+        try:
+            with pytest.raises(ValueError):
+                await TagExport(backend, since="2025-01-01T00:00:00+00:00").start()
+            rows, summary = parse(await collect(TagExport(backend)))
+            assert rows == [{"id": "cat", "name": "cat", "post_count": 10, "main_category": "OBJECT"}]
+            assert summary["watermark"] is None
+        finally:
+            await backend.close()
@@ -0,0 +1,131 @@
+"""
+標籤游標分頁測試
+
+測試 tag_cursor 與 list_tags_after：
+1. 游標編碼、篩選條件綁定與錯誤處理
+2. 逐頁走訪與一次排序的結果相同（post_count 相同、名稱含 PostgREST 保留字元）
+3. Supabase 後端（經由 PostgREST stub）與本地 SQLite 後端的結果一致
+4. SupabaseService.get_tags_page 的 next_cursor 與估計總數
+"""
+
+import pytest
+from src.api.services import supabase_client as supabase_module
+from src.api.services.tag_cursor import (
+    InvalidCursorError,
+    cursor_scope,
+    decode_tag_cursor,
+    encode_tag_cursor,
+)
+from src.api.services.tag_statistics import TagStatistics
+
+
+SPECIAL_NAMES = ["a,b", ":)", '"quoted"', "back\\slash", "(paren)", "dot.name", "o_o", "^_^"]
+
+
+def tag_rows():
+    names = SPECIAL_NAMES + [f"tag_{i:02d}" for i in range(32)]
+    return [
+        {
+            "id": f"tag-{i}",
+            "name": name,
+            "danbooru_cat": 0,
+            "post_count": (i % 10) * 100,  # 每個數量有 4 個標籤
+            "main_category": "SCENE" if i % 2 else "OBJECT",
+            "nsfw_level": "all-ages",
+        }
+        for i, name in enumerate(names)
+    ]
+
+
+def expected_order(rows, category=None):
+    rows = [r for r in rows if category is None or r["main_category"] == category]
+    return [r["name"] for r in sorted(rows, key=lambda r: (-r["post_count"], r["name"]))]
+
+
+async def walk(backend, limit, category=None):
+    names, after = [], None
+    while True:
+        rows = await backend.list_tags_after(limit, after=after, category=category)
+        names.extend(r["name"] for r in rows)
+        if len(rows) < limit:
+            return names
+        after = (rows[-1]["post_count"], rows[-1]["name"])
+
+
+@pytest.fixture
+def sqlite_backend(make_sqlite_backend):
+    return make_sqlite_backend(tag_rows())
+
+
+@pytest.fixture
+def supabase_backend(make_supabase_backend):
+    return make_supabase_backend(tag_rows())
+
+
+class TestTagCursor:
+    """游標編碼"""
+
+    def test_round_trip_and_scope(self):
+        scope = cursor_scope("SCENE", None)
+        token = encode_tag_cursor(1200, 'a,b "c"', scope)
+        assert "=" not in token and "," not in token
+        assert decode_tag_cursor(token, scope) == (1200, 'a,b "c"')
+
+        with pytest.raises(InvalidCursorError):
+            decode_tag_cursor(token, cursor_scope("OBJECT", None))
+        with pytest.raises(InvalidCursorError):
+            decode_tag_cursor("not-a-cursor", scope)
+        with pytest.raises(InvalidCursorError):
+            decode_tag_cursor(encode_tag_cursor(1, "x", scope)[:-3], scope)
+
+
+class TestKeysetPagination:
+    """list_tags_after 走訪"""
+
+    @pytest.mark.parametrize("limit", [1, 3, 4, 7, 100])
+    async def test_sqlite_walk_matches_full_order(self, sqlite_backend, limit):
+        assert await walk(sqlite_backend, limit) == expected_order(tag_rows())
+
+    async def test_sqlite_walk_with_category(self, sqlite_backend):
+        assert await walk(sqlite_backend, 3, category="SCENE") == expected_order(tag_rows(), "SCENE")
+
+    @pytest.mark.parametrize("limit", [1, 4, 7])
+    async def test_supabase_walk_matches_full_order(self, supabase_backend, limit):
+        # 名稱含 , . ( ) " \ 時 or= 過濾仍正確
+        assert await walk(supabase_backend, limit) == expected_order(tag_rows())
+
+    async def test_supabase_walk_with_category(self, supabase_backend):
+        assert await walk(supabase_backend, 2, category="OBJECT") == expected_order(tag_rows(), "OBJECT")
+
+
+class TestGetTagsPage:
+    """SupabaseService.get_tags_page"""
+
+    async def test_pages_and_estimated_total(self, sqlite_backend, monkeypatch):
+        statistics = TagStatistics(40, {"SCENE": 20, "OBJECT": 20}, {}, {}, source="test")
+
+        class FakeStatisticsService:
+            async def get(self):
+                return statistics
+
+        monkeypatch.setattr(supabase_module, "get_tag_storage", lambda: sqlite_backend)
+        monkeypatch.setattr(supabase_module, "get_tag_statistics_service", lambda: FakeStatisticsService())
+        service = supabase_module.SupabaseService()
+
+        pages, cursor = [], None
+        while True:
+            rows, cursor, total = await service.get_tags_page(limit=15, cursor=cursor, category="SCENE")
+            pages.append(([r["name"] for r in rows], total))
+            if cursor is None:
+                break
+
+        assert [len(names) for names, _ in pages] == [15, 5]
+        assert sum((names for names, _ in pages), []) == expected_order(tag_rows(), "SCENE")
+        assert all(total == 20 for _, total in pages)
+
+        rows, cursor, total = await service.get_tags_page(limit=40, name_filter="tag")
+        assert len(rows) == 32 and cursor is None and total is None
+
+        _, cursor, _ = await service.get_tags_page(limit=5)
+        with pytest.raises(InvalidCursorError):
+            await service.get_tags_page(limit=5, cursor=cursor, category="SCENE")
@@ -0,0 +1,100 @@
+"""
+標籤子字串索引測試
+
+以暴力 ILIKE 比對作為基準，驗證 TagSearchIndex 的結果一致：
+1. 一般子字串 / 多關鍵字 OR
+2. '_' 與 '%' 萬用字元
+3. 流行度、分類篩選與排序
+"""
+
+import re
+
+import pytest
+from src.api.services.tag_snapshot import TagSnapshot
+from src.api.services.tag_search_index import compile_ilike_matcher
+
+
+NAMES = [
+    ("1girl", 5000000, "CHARACTER"),
+    ("long_hair", 3000000, "APPEARANCE"),
+    ("short_hair", 2000000, "APPEARANCE"),
+    ("blue_eyes", 1500000, "APPEARANCE"),
+    ("school_uniform", 1200000, "CLOTHING"),
+    ("hair_ornament", 900000, "APPEARANCE"),
+    ("night_sky", 300000, "ENVIRONMENT"),
+    ("starry_sky", 150000, "ENVIRONMENT"),
+    ("cat_ears", 120000, "APPEARANCE"),
+    ("serafuku", 80000, "CLOTHING"),
+    ("a", 500, None),
+    ("sky", 90, "ENVIRONMENT"),
+]
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    rows = [
+        {"id": str(i), "name": name, "post_count": count, "main_category": category}
+        for i, (name, count, category) in enumerate(NAMES)
+    ]
+    return TagSnapshot.from_rows(rows, version="test", source="test")
+
+
+def brute_force(snapshot, keywords, limit, min_popularity=0, category=None):
+    """逐一比對的 ILIKE '%kw%' 基準實作"""
+    patterns = [
+        re.compile("".join("." if c == "_" else ".*" if c in "%*" else re.escape(c) for c in kw.lower()))
+        for kw in keywords
+    ]
+    results = []
+    for entry in snapshot.entries:
+        if entry.post_count < min_popularity:
+            break
+        if category and entry.main_category != category:
+            continue
+        if not patterns or any(p.search(entry.name.lower()) for p in patterns):
+            results.append(entry.name)
+            if len(results) >= limit:
+                break
+    return results
+
+
+class TestTagSearchIndex:
+    """TagSearchIndex 單元測試"""
+
+    @pytest.mark.parametrize("keywords,limit,min_popularity,category", [
+        (["hair"], 10, 0, None),
+        (["HAIR"], 10, 0, None),
+        (["sky", "eyes"], 10, 0, None),
+        (["sky"], 10, 100, None),
+        (["a"], 20, 0, None),
+        (["a"], 20, 0, "APPEARANCE"),
+        (["r_h"], 10, 0, None),
+        (["school_uniform"], 10, 0, None),
+        (["hair%ment"], 10, 0, None),
+        (["zzz"], 10, 0, None),
+        ([], 3, 0, None),
+    ])
+    def test_matches_ilike_semantics(self, snapshot, keywords, limit, min_popularity, category):
+        results = snapshot.search_index.search(
+            keywords, limit=limit, min_popularity=min_popularity, category=category
+        )
+        assert [e.name for e in results] == brute_force(
+            snapshot, keywords, limit, min_popularity, category
+        )
+
+    def test_results_sorted_by_popularity(self, snapshot):
+        results = snapshot.search_index.search(["hair", "sky"], limit=10)
+        counts = [e.post_count for e in results]
+        assert counts == sorted(counts, reverse=True)
+        assert len({e.name for e in results}) == len(results)
+
+    def test_limit(self, snapshot):
+        assert len(snapshot.search_index.search(["a"], limit=2)) == 2
+        assert snapshot.search_index.search(["a"], limit=0) == []
+
+    def test_underscore_is_single_char_wildcard(self):
+        matcher, segments = compile_ilike_matcher("long_hair")
+        assert matcher("long_hair")
+        assert matcher("long hair")
+        assert not matcher("longhair")
+        assert segments == ["long", "hair"]
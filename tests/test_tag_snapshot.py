@@ -0,0 +1,123 @@
+"""
+標籤快照測試
+
+測試 TagSnapshot / TagSnapshotStore：
+1. 本地傾印載入（JSONL / SQLite）
+2. 批量查詢命中與未命中
+3. 版本未變更時跳過重建
+"""
+
+import json
+import os
+import sqlite3
+
+import pytest
+from src.api.services.tag_snapshot import TagSnapshot, TagSnapshotStore
+
+
+ROWS = [
+    {"id": "1", "name": "1girl", "danbooru_cat": 0, "post_count": 5000000,
+     "main_category": "CHARACTER", "sub_category": None, "confidence": 0.9,
+     "classification_source": "rule"},
+    {"id": "2", "name": "long_hair", "danbooru_cat": 0, "post_count": 3000000,
+     "main_category": "APPEARANCE", "sub_category": "HAIR", "confidence": 0.95,
+     "classification_source": "rule"},
+    {"id": "3", "name": "smile", "danbooru_cat": 0, "post_count": 2500000,
+     "main_category": "EXPRESSION", "sub_category": None, "confidence": None,
+     "classification_source": "llm"},
+]
+
+
+@pytest.fixture
+def jsonl_dump(tmp_path):
+    path = tmp_path / "tags.jsonl"
+    path.write_text("\n".join(json.dumps(row) for row in ROWS), encoding="utf-8")
+    return str(path)
+
+
+class TestTagSnapshot:
+    """TagSnapshot 單元測試"""
+
+    def test_entries_sorted_by_post_count(self):
+        snapshot = TagSnapshot.from_rows(list(reversed(ROWS)), version="v1", source="test")
+        assert [e.name for e in snapshot.entries] == ["1girl", "long_hair", "smile"]
+
+    def test_lookup_many(self):
+        snapshot = TagSnapshot.from_rows(ROWS, version="v1", source="test")
+        found, missing = snapshot.lookup_many(["smile", "unknown_tag", "1girl", "unknown_tag"])
+
+        assert set(found) == {"smile", "1girl"}
+        assert missing == ["unknown_tag"]
+        assert found["smile"].to_row()["main_category"] == "EXPRESSION"
+
+    def test_to_row_matches_table_columns(self):
+        snapshot = TagSnapshot.from_rows(ROWS, version="v1", source="test")
+        row = snapshot.get("long_hair").to_row()
+        assert row == ROWS[1]
+
+
+class TestTagSnapshotStore:
+    """TagSnapshotStore 單元測試"""
+
+    def test_load_jsonl(self, jsonl_dump):
+        store = TagSnapshotStore(path=jsonl_dump)
+        snapshot = store.load()
+
+        assert snapshot is not None
+        assert len(snapshot) == 3
+        assert "smile" in snapshot
+        assert store.snapshot is snapshot
+
+    def test_skip_reload_when_version_unchanged(self, jsonl_dump):
+        store = TagSnapshotStore(path=jsonl_dump)
+        first = store.load()
+        second = store.load()
+
+        assert first is second
+        assert store.stats["loads"] == 1
+        assert store.stats["skipped"] == 1
+
+        # 強制重建
+        third = store.load(force=True)
+        assert third is not first
+
+    def test_reload_when_dump_changes(self, jsonl_dump):
+        store = TagSnapshotStore(path=jsonl_dump)
+        first = store.load()
+
+        with open(jsonl_dump, "a", encoding="utf-8") as f:
+            f.write("\n" + json.dumps({**ROWS[0], "id": "4", "name": "blush", "post_count": 10}))
+        os.utime(jsonl_dump, (first.loaded_at + 10, first.loaded_at + 10))
+
+        second = store.load()
+        assert second is not first
+        assert "blush" in second
+
+    def test_load_sqlite_dump(self, tmp_path):
+        path = str(tmp_path / "tags.db")
+        conn = sqlite3.connect(path)
+        conn.execute("""
+            CREATE TABLE tags_final (
+                name TEXT, danbooru_cat INTEGER, post_count INTEGER,
+                main_category TEXT, sub_category TEXT,
+                classification_confidence REAL, classification_source TEXT
+            )
+        """)
+        conn.execute(
+            "INSERT INTO tags_final VALUES ('smile', 0, 2500000, 'EXPRESSION', NULL, 0.8, 'rule')"
+        )
+        conn.commit()
+        conn.close()
+
+        snapshot = TagSnapshotStore(path=path).load()
+        entry = snapshot.get("smile")
+        assert entry.post_count == 2500000
+        assert entry.confidence == 0.8
+
+    def test_load_failure_keeps_previous_snapshot(self, jsonl_dump):
+        store = TagSnapshotStore(path=jsonl_dump)
+        first = store.load()
+
+        store.path = jsonl_dump + ".missing"
+        assert store.load() is first
+        assert store.stats["errors"] == 1
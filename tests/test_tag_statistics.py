@@ -0,0 +1,159 @@
+"""
+標籤統計測試
+
+測試 tag_statistics：
+1. 計數列（tag_statistics 表）與標籤列計算出相同的統計
+2. 本地 SQLite 後端的 GROUP BY 彙總
+3. 服務快取：讀取不查詢後端、過期時背景刷新、快照優先
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+from src.api.services import tag_statistics as statistics_module
+from src.api.services.tag_snapshot import TagSnapshot
+from src.api.services.tag_statistics import TagStatistics, TagStatisticsService, popularity_tier
+from src.api.services.tag_storage import SQLiteTagBackend, prepare_local_tag_database
+
+
+ROWS = [
+    {"name": "1girl", "post_count": 5000000, "main_category": "CHARACTER", "sub_category": None},
+    {"name": "long_hair", "post_count": 3000000, "main_category": "APPEARANCE", "sub_category": "HAIR"},
+    {"name": "hair_ornament", "post_count": 50000, "main_category": "APPEARANCE", "sub_category": "HAIR"},
+    {"name": "cat_ears", "post_count": 5000, "main_category": "APPEARANCE", "sub_category": "ACCESSORY"},
+    {"name": "rare_tag", "post_count": 1000, "main_category": None, "sub_category": None},
+    {"name": "unknown", "post_count": 0, "main_category": None, "sub_category": None},
+]
+
+EXPECTED = {
+    "total_tags": 6,
+    "category_distribution": {"CHARACTER": 1, "APPEARANCE": 3},
+    "subcategory_distribution": {"APPEARANCE": {"HAIR": 2, "ACCESSORY": 1}},
+    "popularity_distribution": {"very_popular": 2, "popular": 1, "moderate": 1, "niche": 2},
+    "classified_count": 4,
+    "unclassified_count": 2,
+    "classification_rate": 66.67,
+}
+
+
+def summary(statistics: TagStatistics) -> dict:
+    data = statistics.to_dict()
+    data.pop("source")
+    data.pop("computed_at")
+    return data
+
+
+class FakeStorage:
+    """記錄呼叫次數的儲存後端"""
+
+    name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 6
+
+    async def get_statistic_buckets(self):
+        self.calls += 1
+        return [
+            {"dimension": "total", "bucket": "", "tag_count": self.total},
+            {"dimension": "main_category", "bucket": "CHARACTER", "tag_count": 1},
+            {"dimension": "main_category", "bucket": "APPEARANCE", "tag_count": 3},
+            {"dimension": "sub_category", "bucket": "APPEARANCE/HAIR", "tag_count": 2},
+            {"dimension": "sub_category", "bucket": "APPEARANCE/ACCESSORY", "tag_count": 1},
+            {"dimension": "popularity_tier", "bucket": "very_popular", "tag_count": 2},
+            {"dimension": "popularity_tier", "bucket": "popular", "tag_count": 1},
+            {"dimension": "popularity_tier", "bucket": "moderate", "tag_count": 1},
+            {"dimension": "popularity_tier", "bucket": "niche", "tag_count": 2},
+            {"dimension": "main_category", "bucket": "REMOVED", "tag_count": 0},
+        ]
+
+
+@pytest.fixture
+def fake_storage(monkeypatch):
+    storage = FakeStorage()
+    monkeypatch.setattr("src.api.services.tag_storage.get_tag_storage", lambda: storage)
+    monkeypatch.setattr("src.api.services.tag_snapshot.get_tag_snapshot", lambda: None)
+    return storage
+
+
+class TestTagStatistics:
+    """TagStatistics 單元測試"""
+
+    def test_popularity_tier_thresholds(self):
+        assert [popularity_tier(c) for c in (100001, 100000, 10001, 1001, 1000, None)] == [
+            "very_popular", "popular", "popular", "moderate", "niche", "niche",
+        ]
+
+    async def test_from_tags_matches_from_buckets(self):
+        snapshot = TagSnapshot.from_rows(ROWS, version="v1", source="test")
+        assert summary(snapshot.statistics) == EXPECTED
+        assert snapshot.statistics.version == "v1"
+        assert summary(TagStatistics.from_buckets(await FakeStorage().get_statistic_buckets(), source="fake")) == EXPECTED
+
+    async def test_sqlite_backend_buckets(self, tmp_path):
+        path = tmp_path / "tags.db"
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE tags_final (name TEXT, post_count INTEGER, main_category TEXT, sub_category TEXT)")
+        conn.executemany(
+            "INSERT INTO tags_final VALUES (?, ?, ?, ?)",
+            [(r["name"], r["post_count"], r["main_category"], r["sub_category"]) for r in ROWS],
+        )
+        conn.commit()
+        conn.close()
+        prepare_local_tag_database(str(path))
+
+        backend = SQLiteTagBackend(str(path))
+        try:
+            rows = await backend.get_statistic_buckets()
+            assert summary(TagStatistics.from_buckets(rows, source="sqlite")) == EXPECTED
+            queries = backend.stats["queries"]
+            await backend.get_statistic_buckets()
+            assert backend.stats["queries"] == queries  # 唯讀檔案只彙總一次
+        finally:
+            await backend.close()
+
+
+class TestTagStatisticsService:
+    """TagStatisticsService 快取行為"""
+
+    async def test_reads_served_from_cache(self, fake_storage):
+        service = TagStatisticsService(refresh_seconds=300)
+
+        results = await asyncio.gather(*(service.get() for _ in range(5)))
+        await service.get()
+        assert fake_storage.calls == 1
+        assert all(r is results[0] for r in results)
+        assert results[0].source == "fake" and results[0].total_tags == 6
+
+    async def test_stale_value_refreshed_in_background(self, fake_storage):
+        service = TagStatisticsService(refresh_seconds=300)
+
+        first = await service.get()
+        fake_storage.total = 7
+        service.invalidate()
+        stale = await service.get()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        fresh = await service.get()
+        assert stale is first and stale.total_tags == 6
+        assert fresh.total_tags == 7
+        assert fake_storage.calls == 2
+        assert service.get_stats()["stale_served"] == 1
+
+    async def test_snapshot_statistics_preferred(self, fake_storage, monkeypatch):
+        snapshot = TagSnapshot.from_rows(ROWS, version="v2", source="test")
+        monkeypatch.setattr("src.api.services.tag_snapshot.get_tag_snapshot", lambda: snapshot)
+        service = TagStatisticsService(refresh_seconds=300)
+
+        statistics = await service.get()
+        assert statistics is snapshot.statistics
+        assert statistics.source == "snapshot:test"
+        assert fake_storage.calls == 0
+
+    def test_singleton_uses_settings(self, monkeypatch):
+        monkeypatch.setattr(statistics_module, "_tag_statistics_service", None)
+        monkeypatch.setattr(statistics_module.settings, "tag_statistics_refresh_seconds", 42)
+        assert statistics_module.get_tag_statistics_service().refresh_seconds == 42
+        assert statistics_module.get_tag_statistics_service() is statistics_module.get_tag_statistics_service()
+        monkeypatch.setattr(statistics_module, "_tag_statistics_service", None)
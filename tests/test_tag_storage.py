@@ -0,0 +1,203 @@
+"""
+標籤儲存後端測試
+
+測試 tag_storage：
+1. 舊管線 tags.db（classification_confidence、無 id 欄位）建立索引後可直接查詢
+2. 名稱子字串查詢與 PostgREST ILIKE 語義一致（FTS5 trigram / 短關鍵字 / '_' 萬用字元 / 不分大小寫）
+3. SupabaseService 經由本地後端查詢
+4. 本地檔案不存在時退回 supabase
+"""
+
+import sqlite3
+
+import pytest
+from src.api.services import supabase_client as supabase_module
+from src.api.services import tag_storage as storage_module
+from src.api.services.tag_storage import SQLiteTagBackend, SupabaseTagBackend, prepare_local_tag_database
+
+
+ROWS = [
+    ("1girl", 0, 5000000, "CHARACTER", None, 0.9),
+    ("long_hair", 0, 3000000, "APPEARANCE", "HAIR", 0.95),
+    ("cat_ears", 0, 400000, "APPEARANCE", "ACCESSORY", 0.8),
+    ("cat", 0, 200000, "OBJECT", None, 0.85),
+    ("Cityscape", 0, 90000, "SCENE", None, None),
+    ("city", 0, 150000, "SCENE", None, 0.7),
+    ("hair_ornament", 0, 800000, "APPEARANCE", "HAIR", 0.9),
+]
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """舊管線格式的 tags.db"""
+    path = tmp_path / "tags.db"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE tags_final (name TEXT, danbooru_cat INTEGER, post_count INTEGER, "
+        "main_category TEXT, sub_category TEXT, classification_confidence REAL)"
+    )
+    conn.executemany("INSERT INTO tags_final VALUES (?, ?, ?, ?, ?, ?)", ROWS)
+    conn.commit()
+    conn.close()
+    prepare_local_tag_database(str(path))
+    return str(path)
+
+
+@pytest.fixture
+async def backend(legacy_db):
+    backend = SQLiteTagBackend(legacy_db)
+    yield backend
+    await backend.close()
+
+
+class TestSQLiteTagBackend:
+    """SQLiteTagBackend 單元測試"""
+
+    async def test_prepare_creates_fts_index(self, backend):
+        assert backend.has_fts
+        assert await backend.count_tags() == len(ROWS)
+
+    async def test_legacy_columns_mapped(self, backend):
+        tag = await backend.get_tag_by_name("long_hair")
+        assert tag["id"] == "long_hair"
+        assert tag["confidence"] == 0.95
+        assert tag["sub_category"] == "HAIR"
+        assert await backend.get_tag_by_name("missing") is None
+
+    async def test_search_matches_ilike_semantics(self, backend):
+        names = lambda rows: [r["name"] for r in rows]
+
+        # 3 個以上字元：FTS5 trigram，不分大小寫，依 post_count 排序
+        assert names(await backend.search_tags(["CITY"], limit=10)) == ["city", "Cityscape"]
+        # 短關鍵字：直接 LIKE
+        assert names(await backend.search_tags(["ca"], limit=10)) == ["cat_ears", "cat", "Cityscape"]
+        # '_' 為單一字元萬用字元（與 PostgREST 相同）
+        assert names(await backend.search_tags(["cat_"], limit=10)) == ["cat_ears"]
+        # 多個關鍵字為 OR，並套用過濾與欄位選擇
+        rows = await backend.search_tags(
+            ["hair", "cat"], limit=10, category="APPEARANCE", min_popularity=500000, columns="name, post_count",
+        )
+        assert rows == [
+            {"name": "long_hair", "post_count": 3000000},
+            {"name": "hair_ornament", "post_count": 800000},
+        ]
+
+    async def test_lookup_list_and_stats(self, backend):
+        found = await backend.get_tags_by_names(["cat", "missing", "city"], columns="name, main_category")
+        assert found == {
+            "cat": {"name": "cat", "main_category": "OBJECT"},
+            "city": {"name": "city", "main_category": "SCENE"},
+        }
+
+        rows, total = await backend.list_tags(limit=1, offset=1, name_filter="hair")
+        assert total == 2 and [r["name"] for r in rows] == ["hair_ornament"]
+        rows, total = await backend.list_tags(limit=10, category="SCENE", order_by="name", order_desc=False)
+        assert total == 2 and [r["name"] for r in rows] == ["Cityscape", "city"]
+
+        assert [r["name"] for r in await backend.search_prefix("ca", limit=5)] == ["cat_ears", "cat"]
+        assert await backend.get_category_stats() == {"CHARACTER": 1, "APPEARANCE": 3, "OBJECT": 1, "SCENE": 2}
+        # 舊檔沒有 content_level 欄位，過濾退回 Python 端
+        assert await backend.content_level_current() is False
+
+    async def test_read_only(self, backend, legacy_db):
+        with pytest.raises(sqlite3.OperationalError):
+            backend._connection().execute("DELETE FROM tags_final")
+        with pytest.raises(ValueError):
+            await backend.search_tags(["cat"], limit=5, columns="name, embedding")
+
+
+class TestTagStorageSelection:
+    """後端選擇與 SupabaseService 整合"""
+
+    async def test_supabase_service_uses_local_backend(self, backend, monkeypatch):
+        monkeypatch.setattr(supabase_module, "get_tag_storage", lambda: backend)
+        monkeypatch.setattr(supabase_module, "get_tag_snapshot", lambda: None)
+        service = supabase_module.SupabaseService()
+
+        assert await service.test_connection() is True
+        result = await service.get_tags_by_names(["cat_ears", "unknown_local_tag"])
+        assert result["cat_ears"]["main_category"] == "APPEARANCE"
+        assert result["unknown_local_tag"] is None
+        rows, total = await service.get_tags(limit=2)
+        assert total == len(ROWS) and [r["name"] for r in rows] == ["1girl", "long_hair"]
+
+    def test_missing_file_falls_back_to_supabase(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(storage_module, "_tag_storage", None)
+        monkeypatch.setattr(storage_module.settings, "tag_storage_backend", "sqlite")
+        monkeypatch.setattr(storage_module.settings, "tag_storage_path", str(tmp_path / "missing.db"))
+
+        assert isinstance(storage_module.get_tag_storage(), SupabaseTagBackend)
+        monkeypatch.setattr(storage_module, "_tag_storage", None)
+
+    async def test_sqlite_backend_selected(self, legacy_db, monkeypatch):
+        monkeypatch.setattr(storage_module, "_tag_storage", None)
+        monkeypatch.setattr(storage_module.settings, "tag_storage_backend", "sqlite")
+        monkeypatch.setattr(storage_module.settings, "tag_storage_path", legacy_db)
+
+        storage = storage_module.get_tag_storage()
+        assert isinstance(storage, SQLiteTagBackend)
+        await storage_module.close_tag_storage()
+        assert storage_module._tag_storage is None
+
+
+class FakeSupabaseTable:
+    """只有 08 / 14 遷移前欄位的 tags_final（選取不存在的欄位時報錯）"""
+
+    columns = ("id", "name", "danbooru_cat", "post_count", "main_category", "sub_category", "embedding")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.selected = None
+        self.bound = None
+        self.size = None
+
+    def select(self, columns):
+        selected = [c.strip() for c in columns.split(",")]
+        missing = [c for c in selected if c != "*" and c not in self.columns]
+        if missing:
+            raise RuntimeError(f"column tags_final.{missing[0]} does not exist")
+        self.selected = list(self.columns) if selected == ["*"] else selected
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, size):
+        self.size = size
+        return self
+
+    def gt(self, column, value):
+        self.bound = value
+        return self
+
+    def execute(self):
+        rows = [r for r in self.rows if self.bound is None or r["name"] > self.bound][: self.size]
+        data = [{c: r.get(c) for c in self.selected} for r in rows]
+        return type("Result", (), {"data": data})()
+
+
+class TestExportToLocalDatabase:
+    """export_tags_to_local_database"""
+
+    async def test_missing_columns_on_source(self, tmp_path):
+        rows = [
+            {"id": f"tag-{i}", "name": name, "danbooru_cat": 0, "post_count": count,
+             "main_category": category, "sub_category": sub, "embedding": [0.1]}
+            for i, (name, _, count, category, sub, _) in enumerate(sorted(ROWS))
+        ]
+
+        class Client:
+            def table(self, name):
+                return FakeSupabaseTable(rows)
+
+        path = tmp_path / "edge" / "tags.db"
+        summary = storage_module.export_tags_to_local_database(Client(), str(path), page_size=3)
+        assert summary["tags"] == len(ROWS)
+
+        backend = SQLiteTagBackend(str(path))
+        try:
+            tag = (await backend.get_tags_by_names(["cat_ears"]))["cat_ears"]
+            assert tag["id"] == "tag-3" and tag["nsfw_level"] is None
+            assert await backend.content_level_current() is False
+        finally:
+            await backend.close()
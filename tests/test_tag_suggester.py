@@ -0,0 +1,113 @@
+"""
+標籤拼字建議測試
+
+以暴力編輯距離掃描作為基準，驗證 TagSuggester：
+1. OSA 編輯距離（含相鄰交換）與提早結束
+2. 拼字錯誤建議與暴力掃描一致，依（距離, 熱門度）排序
+3. 沒有拼字建議時退回前綴補全；批量 suggest
+"""
+
+import random
+import string
+
+import pytest
+from src.api.services.tag_snapshot import TagSnapshot
+from src.api.services.tag_suggester import TagSuggester, edit_distance
+
+
+NAMES = [
+    ("1girl", 5000000),
+    ("long_hair", 3000000),
+    ("short_hair", 2000000),
+    ("school_uniform", 1200000),
+    ("school_bag", 300000),
+    ("school", 250000),
+    ("long_sleeves", 1100000),
+    ("hair_ornament", 900000),
+    ("cat_ears", 120000),
+    ("cat_tail", 110000),
+    ("car", 50000),
+    ("cap", 40000),
+]
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    rows = [
+        {"id": str(i), "name": name, "post_count": count, "main_category": None}
+        for i, (name, count) in enumerate(NAMES)
+    ]
+    return TagSnapshot.from_rows(rows, version="test", source="test")
+
+
+def reference_distance(a, b):
+    """完整 OSA 動態規劃（不提早結束）"""
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+class TestEditDistance:
+    """OSA 編輯距離"""
+
+    def test_operations(self):
+        assert edit_distance("school", "school", 2) == 0
+        assert edit_distance("scool", "school", 2) == 1
+        assert edit_distance("shcool", "school", 2) == 1  # 相鄰交換
+        assert edit_distance("cat", "dog", 2) == 3  # 超過上限返回 max + 1
+
+    def test_matches_reference(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            a = "".join(rng.choice("abc_") for _ in range(rng.randint(0, 8)))
+            b = "".join(rng.choice("abc_") for _ in range(rng.randint(0, 8)))
+            expected = reference_distance(a, b)
+            assert edit_distance(a, b, 2) == min(expected, 3)
+
+
+class TestTagSuggester:
+    """TagSuggester 單元測試"""
+
+    def test_typo_suggestions(self, snapshot):
+        suggester = snapshot.suggester
+        assert [e.name for e, _ in suggester.lookup("scool_uniform")] == ["school_uniform"]
+        assert [e.name for e, _ in suggester.lookup("long_hiar")] == ["long_hair"]
+        # 同距離依熱門度排序
+        assert [e.name for e, _ in suggester.lookup("cax")] == ["car", "cap"]
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        words = ["".join(rng.choice(string.ascii_lowercase[:6]) for _ in range(rng.randint(2, 9))) for _ in range(400)]
+        rows = [{"id": str(i), "name": w, "post_count": 1000 - i} for i, w in enumerate(dict.fromkeys(words))]
+        snapshot = TagSnapshot.from_rows(rows, version="t", source="t")
+        suggester = TagSuggester(snapshot.entries, prefix_length=4)
+
+        for _ in range(200):
+            query = "".join(rng.choice(string.ascii_lowercase[:6]) for _ in range(rng.randint(2, 9)))
+            expected = sorted(
+                (reference_distance(query, e.name), -e.post_count, e.name)
+                for e in snapshot.entries
+                if e.name != query and reference_distance(query, e.name) <= 1
+            )
+            got = suggester.lookup(query, limit=100, max_distance=1)
+            assert [e.name for e, _ in got] == [name for _, _, name in expected]
+
+    def test_prefix_completion_fallback(self, snapshot):
+        suggester = snapshot.suggester
+        assert [e.name for e in suggester.complete("school", limit=2)] == ["school_uniform", "school_bag"]
+        assert suggester.complete("zzz") == []
+
+        suggestions = suggester.suggest(["scool_uniform", "hair_orn", "qqqqqqqq", "scool_uniform"])
+        assert {k: [e.name for e in v] for k, v in suggestions.items()} == {
+            "scool_uniform": ["school_uniform"],
+            "hair_orn": ["hair_ornament"],
+        }
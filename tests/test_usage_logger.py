@@ -0,0 +1,104 @@
+"""
+使用數據記錄管線測試
+
+測試 UsageLogger 的背景寫入：
+1. log_api_call 只放入佇列，依批次大小 / 時間批次寫入
+2. 佇列已滿時的 drop_newest / drop_oldest / block 策略
+3. 寫入失敗時寫入 spool 檔，恢復後重播
+"""
+
+import asyncio
+
+import pytest
+from src.api.services.usage_logger import UsageLogger, UsageSpool
+
+
+class RecordingSink:
+    def __init__(self, fail=False, delay=0.0):
+        self.batches = []
+        self.fail = fail
+        self.delay = delay
+
+    async def write(self, entries):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("database unreachable")
+        self.batches.append([e["endpoint"] for e in entries])
+
+
+class TestUsageLogger:
+    """UsageLogger 背景寫入測試"""
+
+    async def test_log_call_only_enqueues(self):
+        sink = RecordingSink()
+        usage_logger = UsageLogger(sink=sink, batch_size=3, flush_interval=0.2)
+
+        for i in range(3):
+            await usage_logger.log_api_call(f"/api/{i}", response_time_ms=12.5)
+        assert sink.batches == []  # 請求路徑上不寫入
+        await asyncio.sleep(0.01)
+        assert sink.batches == [["/api/0", "/api/1", "/api/2"]]  # 滿批次立即寫入
+        await usage_logger.log_api_call("/api/3")
+        await asyncio.sleep(0.01)
+        assert len(sink.batches) == 1
+        await asyncio.sleep(0.3)
+        assert sink.batches[-1] == ["/api/3"]  # 其餘依時間寫入
+        await usage_logger.close()
+        assert usage_logger.get_stats()["written"] == 4
+
+    async def test_overflow_policies(self):
+        async def fill(policy):
+            sink = RecordingSink(delay=1.0)
+            usage_logger = UsageLogger(
+                sink=sink, max_queue_size=2, batch_size=100, flush_interval=10,
+                overflow_policy=policy, block_timeout=0.01,
+            )
+            for i in range(4):
+                await usage_logger.log_api_call(f"/api/{i}")
+            queued = [e["endpoint"] for e in usage_logger._queue]
+            dropped = usage_logger.get_stats()["dropped"]
+            usage_logger._writer.cancel()
+            return queued, dropped
+
+        assert await fill("drop_newest") == (["/api/0", "/api/1"], 2)
+        assert await fill("drop_oldest") == (["/api/2", "/api/3"], 2)
+        with pytest.raises(ValueError):
+            UsageLogger(overflow_policy="unbounded")
+
+    async def test_block_policy_waits_for_writer(self):
+        sink = RecordingSink()
+        usage_logger = UsageLogger(
+            sink=sink, max_queue_size=2, batch_size=2, flush_interval=10,
+            overflow_policy="block", block_timeout=1.0,
+        )
+
+        for i in range(5):
+            await usage_logger.log_api_call(f"/api/{i}")
+        await usage_logger.close()
+        assert [e for batch in sink.batches for e in batch] == [f"/api/{i}" for i in range(5)]
+        assert usage_logger.get_stats()["dropped"] == 0
+
+    async def test_spool_and_replay(self, tmp_path):
+        sink = RecordingSink(fail=True)
+        spool = UsageSpool(str(tmp_path / "spool" / "usage.jsonl"))
+        usage_logger = UsageLogger(sink=sink, spool=spool, batch_size=2, replay_interval=3600)
+
+        for i in range(3):
+            await usage_logger.log_api_call(f"/api/{i}", request_body={"tags": ["櫻花"]})
+        await usage_logger.close()
+        assert len(spool.read()) == 3
+
+        sink.fail = False
+        assert await usage_logger.replay_spool() == 3
+        assert [e for batch in sink.batches for e in batch] == ["/api/0", "/api/1", "/api/2"]
+        assert spool.size() == 0
+        stats = usage_logger.get_stats()
+        assert stats["spooled"] == 3 and stats["replayed"] == 3 and stats["dropped"] == 0
+
+    def test_spool_skips_torn_lines_and_limit(self, tmp_path):
+        path = tmp_path / "usage.jsonl"
+        path.write_text('{"endpoint": "/api/a"}\n{"endpoint": "/ap', encoding="utf-8")
+        assert UsageSpool(str(path)).read() == [{"endpoint": "/api/a"}]
+
+        small = UsageSpool(str(tmp_path / "small.jsonl"), max_bytes=10)
+        assert small.append([{"endpoint": "/api/long-endpoint"}]) == 0
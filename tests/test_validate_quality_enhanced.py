@@ -12,8 +12,10 @@ Version: 1.0.0
 Date: 2025-01-27
 """
 
+import asyncio
+
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from src.api.tools.inspire_tools import (
     validate_quality,
     _normalize_tags,
@@ -102,10 +104,10 @@ class TestCheckPopularity:
             {"name": "sakura", "post_count": 8000},  # 熱門
             {"name": "rare_tag", "post_count": 500},  # 冷門
         ]
-        mock_db.client.table.return_value.select.return_value.in_.return_value.execute.return_value = mock_result
+        mock_db.async_db.execute = AsyncMock(return_value=mock_result)
         
         tags = ["1girl", "sakura", "rare_tag"]
-        unpopular_tags, count = _check_popularity(tags, mock_db)
+        unpopular_tags, count = asyncio.run(_check_popularity(tags, mock_db))
         
         assert "rare_tag" in unpopular_tags
         assert count == 1
@@ -115,7 +117,7 @@ class TestCheckPopularity:
     def test_check_popularity_empty(self):
         """測試空列表"""
         mock_db = MagicMock()
-        unpopular_tags, count = _check_popularity([], mock_db)
+        unpopular_tags, count = asyncio.run(_check_popularity([], mock_db))
         assert unpopular_tags == []
         assert count == 0
 
@@ -127,10 +129,10 @@ class TestCheckPopularity:
             {"name": "1girl", "post_count": 50000},
             {"name": "sakura", " concentrations": 8000},
         ]
-        mock_db.client.table.return_value.select.return_value.in_.return_value.execute.return_value = mock_result
+        mock_db.async_db.execute = AsyncMock(return_value=mock_result)
         
         tags = ["1girl", "sakura"]
-        unpopular_tags, count = _check_popularity(tags, mock_db)
+        unpopular_tags, count = asyncio.run(_check_popularity(tags, mock_db))
         assert count == 0
 
 
@@ -145,10 +147,10 @@ class TestSuggestSimilarTags:
             {"name": "long_hair", "post_count": 30000},
             {"name": "long_hair_style", "post_count": 5000},
         ]
-        mock_db.client.table.return_value.select.return_value.ilike.return_value.order.return_value.limit.return_value.execute.return_value = mock_result
+        mock_db.async_db.execute = AsyncMock(return_value=mock_result)
         
         invalid_tags = ["longhair"]
-        suggestions = _suggest_similar_tags(invalid_tags, mock_db)
+        suggestions = asyncio.run(_suggest_similar_tags(invalid_tags, mock_db))
         
         assert isinstance(suggestions, dict)
         # 如果找到相似標籤，應該有建議
@@ -158,7 +160,7 @@ class TestSuggestSimilarTags:
     def test_suggest_similar_tags_empty(self):
         """測試空列表"""
         mock_db = MagicMock()
-        suggestions = _suggest_similar_tags([], mock_db)
+        suggestions = asyncio.run(_suggest_similar_tags([], mock_db))
         assert suggestions == {}
 
     def test_suggest_similar_tags_not_found(self):
@@ -166,10 +168,10 @@ class TestSuggestSimilarTags:
         mock_db = MagicMock()
         mock_result = MagicMock()
         mock_result.data = []
-        mock_db.client.table.return_value.select.return_value.ilike.return_value.order.return_value.limit.return_value.execute.return_value = mock_result
+        mock_db.async_db.execute = AsyncMock(return_value=mock_result)
         
         invalid_tags = ["nonexistent_tag"]
-        suggestions = _suggest_similar_tags(invalid_tags, mock_db)
+        suggestions = asyncio.run(_suggest_similar_tags(invalid_tags, mock_db))
         assert suggestions == {}
 
 
@@ -264,10 +266,10 @@ class TestValidateQualityScenarios:
             {"name": "rare2", "post_count": 800},
             {"name": "popular", "post_count": 10000},
         ]
-        mock_db.client.table.return_value.select.return_value.in_.return_value.execute.return_value = mock_result
+        mock_db.async_db.execute = AsyncMock(return_value=mock_result)
         
         tags = ["rare1", "rare2", "popular"]
-        unpopular_tags, count = _check_popularity(tags, mock_db)
+        unpopular_tags, count = asyncio.run(_check_popularity(tags, mock_db))
         
         assert count == 2
         assert len(unpopular_tags) == 2